@@ -0,0 +1,215 @@
+"""
+Generator trafik sintetis deterministik untuk benchmark
+
+Trafik terdiri dari campuran sesi web TCP, transfer bulk, query DNS, ICMP
+echo dan port scan. Frame dibangun langsung dengan struct (Ethernet + IPv4)
+sehingga pembuatan jutaan paket tetap cepat dan hasilnya identik untuk seed
+yang sama.
+
+Contoh:
+    python -m benchmarks.traffic --packets 100000 --output synthetic.pcap
+"""
+import random
+import struct
+import argparse
+
+# Bobot jenis sesi dalam campuran trafik
+SESSION_MIX = (
+    ('web', 0.50),
+    ('bulk', 0.25),
+    ('dns', 0.12),
+    ('icmp', 0.03),
+    ('scan', 0.10),
+)
+
+TCP_FIN, TCP_SYN, TCP_RST, TCP_PSH, TCP_ACK = 0x01, 0x02, 0x04, 0x08, 0x10
+
+_ETHERNET = struct.Struct('!6s6sH')
+_IPV4 = struct.Struct('!BBHHHBBH4s4s')
+_TCP = struct.Struct('!HHIIBBHHH')
+_UDP = struct.Struct('!HHHH')
+_ICMP = struct.Struct('!BBHHH')
+
+_CLIENT_MAC = bytes.fromhex('020000000001')
+_SERVER_MAC = bytes.fromhex('020000000002')
+
+_PCAP_HEADER = struct.Struct('<IHHiIII')
+_PCAP_RECORD = struct.Struct('<IIII')
+
+
+def build_frame(src_ip, dst_ip, protocol, src_port=0, dst_port=0, flags=0,
+                window=0, ttl=64, payload_size=0, icmp_type=8):
+    """
+    Bangun frame Ethernet/IPv4 dengan header TCP, UDP atau ICMP
+
+    Args:
+        src_ip (str): Alamat IPv4 sumber
+        dst_ip (str): Alamat IPv4 tujuan
+        protocol (int): 6 (TCP), 17 (UDP) atau 1 (ICMP)
+        src_port (int): Port sumber (TCP/UDP)
+        dst_port (int): Port tujuan (TCP/UDP)
+        flags (int): Bit flag TCP
+        window (int): Ukuran window TCP
+        ttl (int): Time to live IP
+        payload_size (int): Jumlah byte payload
+        icmp_type (int): Tipe ICMP
+
+    Returns:
+        bytes: Frame lengkap
+    """
+    payload = bytes(payload_size)
+    if protocol == 6:
+        transport = _TCP.pack(src_port, dst_port, 0, 0, 5 << 4, flags, window, 0, 0)
+    elif protocol == 17:
+        transport = _UDP.pack(src_port, dst_port, _UDP.size + payload_size, 0)
+    else:
+        transport = _ICMP.pack(icmp_type, 0, 0, 0, 0)
+
+    total_length = _IPV4.size + len(transport) + payload_size
+    ip_header = _IPV4.pack(0x45, 0, total_length, 0, 0, ttl, protocol, 0,
+                           _ip_bytes(src_ip), _ip_bytes(dst_ip))
+    return _ETHERNET.pack(_SERVER_MAC, _CLIENT_MAC, 0x0800) + ip_header + transport + payload
+
+
+def _ip_bytes(address):
+    return bytes(int(part) for part in address.split('.'))
+
+
+class _SessionBuilder:
+    """Membuat daftar paket (offset waktu, frame) untuk satu sesi"""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def client(self):
+        return f"10.{self.rng.randint(0, 3)}.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}"
+
+    def server(self):
+        return f"172.16.{self.rng.randint(0, 15)}.{self.rng.randint(1, 254)}"
+
+    def tcp_session(self, data_packets, data_size, dst_port, gap):
+        rng = self.rng
+        client, server = self.client(), self.server()
+        sport = rng.randint(32768, 60999)
+        window = rng.choice((29200, 64240, 65535))
+        client_ttl, server_ttl = rng.choice((64, 128)), rng.choice((52, 57, 118))
+        t = 0.0
+        packets = [
+            (t, build_frame(client, server, 6, sport, dst_port, TCP_SYN, window, client_ttl)),
+            (t + gap, build_frame(server, client, 6, dst_port, sport, TCP_SYN | TCP_ACK, window, server_ttl)),
+            (t + 2 * gap, build_frame(client, server, 6, sport, dst_port, TCP_ACK, window, client_ttl)),
+        ]
+        t += 2 * gap
+        for index in range(data_packets):
+            t += rng.expovariate(1.0 / gap)
+            if index % 3 == 0:
+                frame = build_frame(client, server, 6, sport, dst_port, TCP_PSH | TCP_ACK, window,
+                                    client_ttl, rng.randint(40, 600))
+            else:
+                frame = build_frame(server, client, 6, dst_port, sport, TCP_ACK, window,
+                                    server_ttl, data_size(rng))
+            packets.append((t, frame))
+        t += gap
+        packets.append((t, build_frame(client, server, 6, sport, dst_port, TCP_FIN | TCP_ACK, window, client_ttl)))
+        packets.append((t + gap, build_frame(server, client, 6, dst_port, sport, TCP_FIN | TCP_ACK, window, server_ttl)))
+        return packets
+
+    def web(self):
+        return self.tcp_session(self.rng.randint(4, 30), lambda rng: rng.randint(200, 1460),
+                                self.rng.choice((80, 443, 443, 8080)), 0.02)
+
+    def bulk(self):
+        return self.tcp_session(self.rng.randint(200, 800), lambda rng: 1460,
+                                self.rng.choice((443, 22, 873)), 0.001)
+
+    def dns(self):
+        rng = self.rng
+        client, resolver = self.client(), f"172.16.0.{rng.randint(1, 4)}"
+        sport = rng.randint(32768, 60999)
+        return [
+            (0.0, build_frame(client, resolver, 17, sport, 53, ttl=64, payload_size=rng.randint(20, 60))),
+            (rng.uniform(0.001, 0.03), build_frame(resolver, client, 17, 53, sport, ttl=60,
+                                                   payload_size=rng.randint(60, 300))),
+        ]
+
+    def icmp(self):
+        client, server = self.client(), self.server()
+        packets = []
+        for index in range(self.rng.randint(1, 5)):
+            packets.append((index * 1.0, build_frame(client, server, 1, ttl=64, payload_size=56, icmp_type=8)))
+            packets.append((index * 1.0 + 0.01, build_frame(server, client, 1, ttl=57, payload_size=56, icmp_type=0)))
+        return packets
+
+    def scan(self):
+        rng = self.rng
+        scanner, target = f"203.0.113.{rng.randint(1, 254)}", self.server()
+        sport = rng.randint(32768, 60999)
+        first_port = rng.randint(1, 60000)
+        return [
+            (index * 0.0005, build_frame(scanner, target, 6, sport, first_port + index, TCP_SYN, 1024, 48))
+            for index in range(rng.randint(50, 400))
+        ]
+
+
+def generate_traffic(n_packets, seed=42, start_time=1700000000.0, sessions_per_second=200):
+    """
+    Buat trafik sintetis deterministik
+
+    Args:
+        n_packets (int): Jumlah paket
+        seed (int): Seed generator acak
+        start_time (float): Timestamp paket pertama (epoch detik)
+        sessions_per_second (float): Laju sesi baru
+
+    Returns:
+        list: (timestamp, frame) terurut menurut waktu
+    """
+    rng = random.Random(seed)
+    builder = _SessionBuilder(rng)
+    kinds = [kind for kind, _ in SESSION_MIX]
+    weights = [weight for _, weight in SESSION_MIX]
+
+    packets = []
+    session_start = start_time
+    while len(packets) < n_packets:
+        session_start += rng.expovariate(sessions_per_second)
+        kind = rng.choices(kinds, weights)[0]
+        packets.extend((session_start + offset, frame) for offset, frame in getattr(builder, kind)())
+
+    packets.sort(key=lambda packet: packet[0])
+    return packets[:n_packets]
+
+
+def write_pcap(path, packets):
+    """
+    Tulis paket ke file pcap (Ethernet, resolusi mikrodetik)
+
+    Args:
+        path (str): Path file tujuan
+        packets (list): (timestamp, frame) dari generate_traffic
+    """
+    with open(path, 'wb') as pcap_file:
+        pcap_file.write(_PCAP_HEADER.pack(0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for timestamp, frame in packets:
+            seconds = int(timestamp)
+            microseconds = int(round((timestamp - seconds) * 1e6))
+            if microseconds >= 1000000:
+                seconds, microseconds = seconds + 1, microseconds - 1000000
+            pcap_file.write(_PCAP_RECORD.pack(seconds, microseconds, len(frame), len(frame)))
+            pcap_file.write(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate deterministic synthetic traffic as pcap')
+    parser.add_argument('--packets', type=int, default=100000, help='Number of packets')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--output', required=True, help='Output pcap path')
+    args = parser.parse_args()
+
+    packets = generate_traffic(args.packets, args.seed)
+    write_pcap(args.output, packets)
+    print(f"Wrote {len(packets)} packets to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,44 +13,174 @@ DB_CONFIG = {
     'user': getenv("DB_USERNAME"),
     'password': getenv("DB_PASSWORD"),
     'host': getenv("DB_HOST"),
-    'port': int(getenv("DB_PORT")),
+    'port': int(getenv("DB_PORT", 0)),  # sensor tidak memakai database
     'database': getenv("DB_NAME")
 }
 
+# Batched Database Writer Configuration
+DB_WRITER_CONFIG = {
+    'queue_size': int(getenv("DB_WRITER_QUEUE_SIZE", 100000)),
+    'batch_size': int(getenv("DB_WRITER_BATCH_SIZE", 1000)),
+    'flush_interval_seconds': float(getenv("DB_WRITER_FLUSH_INTERVAL", 1.0))
+}
+
+# Database Maintenance Configuration (retensi, partisi, rollup)
+DB_MAINTENANCE_CONFIG = {
+    'interval_seconds': float(getenv("DB_MAINTENANCE_INTERVAL", 3600)),
+    'packet_retention_days': int(getenv("DB_RETENTION_DAYS", 0)),  # 0 = simpan selamanya
+    'minute_rollup_retention_days': int(getenv("DB_MINUTE_ROLLUP_RETENTION_DAYS", 7)),
+    'talker_retention_days': int(getenv("DB_TALKER_RETENTION_DAYS", 90)),
+    'partitioning': getenv("DB_PARTITIONING", "False") == "True",  # hanya PostgreSQL
+    'partition_days_ahead': int(getenv("DB_PARTITION_DAYS_AHEAD", 3)),
+    'archive_dir': getenv("DB_ARCHIVE_DIR", ""),  # kosong = tanpa arsip kolumnar
+    'archive_after_days': int(getenv("DB_ARCHIVE_AFTER_DAYS", 30))
+}
+
 # Machine Learning Configuration
 ML_CONFIG = {
     'internal': {
         'n_clusters': int(getenv("N_CLUSTERS")),
         'buffer_size': int(getenv("BUFFER_SIZE")),
         'suspicious_threshold': float(getenv("SUSPICIOUS_THRESHOLD")),
+        'training_mode': getenv("TRAINING_MODE", "full"),  # 'full' atau 'incremental'
+        'retrain_interval': int(getenv("RETRAIN_INTERVAL", 0)),  # 0 = hanya training pertama
+        'window_mode': getenv("TRAINING_WINDOW", "recent"),  # 'recent' atau 'reservoir'
+        'background_training': getenv("BACKGROUND_TRAINING", "True") == "True",
+        'fast_scoring': getenv("FAST_SCORING", "True") == "True",  # kernel scoring tanpa overhead sklearn
+        'model_dir': getenv("MODEL_DIR", "models"),  # kosong = snapshot dinonaktifkan
+        'model_snapshot': getenv("MODEL_SNAPSHOT"),  # snapshot tertentu untuk warm start
+        'snapshot_keep': int(getenv("MODEL_SNAPSHOT_KEEP", 5)),
+        'warm_start': getenv("MODEL_WARM_START", "True") == "True",
     },
     'external': {
         'api_endpoint': getenv("API_ENDPOINT"),
         'api_key': getenv("API_KEY"),
         'batch_size': int(getenv("BATCH_SIZE")),
-        'timeout_seconds': int(getenv("TIMEOUT_SECONDS"))
+        'timeout_seconds': int(getenv("TIMEOUT_SECONDS")),
+        'batch_endpoint': getenv("BATCH_API_ENDPOINT"),  # kosong = satu request per paket ke API_ENDPOINT
+        'batch_delay_ms': float(getenv("EXTERNAL_BATCH_DELAY_MS", 50)),
+        'max_in_flight': int(getenv("EXTERNAL_MAX_IN_FLIGHT", 4)),
+        'breaker_failure_threshold': int(getenv("EXTERNAL_BREAKER_FAILURES", 5)),
+        'breaker_reset_seconds': float(getenv("EXTERNAL_BREAKER_RESET_SECONDS", 30)),
+        'cache_size': int(getenv("EXTERNAL_CACHE_SIZE", 50000)),  # 0 = cache nonaktif
+        'cache_ttl_seconds': float(getenv("EXTERNAL_CACHE_TTL_SECONDS", 300)),
+        # Contoh: "packet_size=16,window_size=1024" (kosong = nilai persis)
+        'cache_quantization': getenv("EXTERNAL_CACHE_QUANTIZATION", ""),
+    },
+    'hybrid': {
+        # Paket dengan anomaly score internal di rentang ini dikirim ke API eksternal
+        'uncertain_low': float(getenv("HYBRID_UNCERTAIN_LOW", 1.0)),
+        'uncertain_high': float(getenv("HYBRID_UNCERTAIN_HIGH", 2.0)),
+        'max_pending': int(getenv("HYBRID_MAX_PENDING", 10000)),
     }
 }
 
-# # Common service ports to exclude
-# EXCLUDE_PORTS = [getenv("EXCLUDE_PORTS")]
-
-# SERVICE_FILTER = ' and '.join([
-#     f'not (src port {port} or dst port {port})' 
-#     for port in EXCLUDE_PORTS
-# ])
+# Common service ports to exclude (menjadi aturan 'port N' di trust list)
+EXCLUDE_PORTS = [port.strip() for port in getenv("EXCLUDE_PORTS", "").split(',') if port.strip()]
 
 # Packet Capture Configuration
 CAPTURE_CONFIG = {
     'interface': None,  # None for default interface
     'filter': 'ip',    # BPF filter string
-    'packet_count': 0   # 0 for infinite capture
+    'packet_count': 0,  # 0 for infinite capture
+    'backend': getenv("CAPTURE_BACKEND", "scapy"),  # 'scapy' atau 'af_packet' (Linux, ring TPACKET_V3)
+    'af_packet': {
+        'block_size': int(getenv("AF_PACKET_BLOCK_SIZE", 1 << 20)),  # kelipatan page size
+        'block_count': int(getenv("AF_PACKET_BLOCK_COUNT", 64)),
+        'frame_size': int(getenv("AF_PACKET_FRAME_SIZE", 2048)),
+        'block_timeout_ms': int(getenv("AF_PACKET_BLOCK_TIMEOUT_MS", 10)),
+        # Tanpa libpcap filter BPF tidak bisa dikompilasi; True = tetap tangkap tanpa filter
+        'allow_unfiltered': getenv("AF_PACKET_ALLOW_UNFILTERED", "False") == "True"
+    },
+    'extractor': getenv("FEATURE_EXTRACTOR", "scapy"),  # 'scapy' atau 'raw'
+    'analysis_batch_size': int(getenv("ANALYSIS_BATCH_SIZE", 1)),  # >1 untuk micro-batching ML
+    'analysis_batch_delay_ms': float(getenv("ANALYSIS_BATCH_DELAY_MS", 50)),
+    'aggregation': getenv("CAPTURE_AGGREGATION", "packet"),  # 'packet' atau 'flow'
+    'flow': {
+        'max_flows': int(getenv("FLOW_MAX_FLOWS", 100000)),
+        'idle_timeout_seconds': float(getenv("FLOW_IDLE_TIMEOUT", 15)),
+        'active_timeout_seconds': float(getenv("FLOW_ACTIVE_TIMEOUT", 300)),
+        'expire_interval_seconds': float(getenv("FLOW_EXPIRE_INTERVAL", 1))
+    },
+    'load_shedding': {
+        'enabled': getenv("LOAD_SHEDDING", "False") == "True",
+        'check_interval_seconds': float(getenv("LOAD_SHEDDING_INTERVAL", 1)),
+        'high_watermark': float(getenv("LOAD_SHEDDING_HIGH_WATERMARK", 0.5)),  # isi antrian (0..1)
+        'low_watermark': float(getenv("LOAD_SHEDDING_LOW_WATERMARK", 0.1)),
+        'latency_budget_ms': float(getenv("LOAD_SHEDDING_LATENCY_BUDGET_MS", 0)),  # 0 = hanya backlog
+        'min_sampling_rate': float(getenv("LOAD_SHEDDING_MIN_RATE", 0.01)),
+        'new_flow_packets': int(getenv("LOAD_SHEDDING_NEW_FLOW_PACKETS", 20)),  # selalu diproses penuh
+        'benign_ports': getenv("LOAD_SHEDDING_BENIGN_PORTS", "22,80,443,445,873,2049,3306,5432"),
+        'reputation_size': int(getenv("LOAD_SHEDDING_REPUTATION_SIZE", 100000))
+    },
+    'host_sketches': {
+        'enabled': getenv("HOST_SKETCHES", "False") == "True",
+        'window_seconds': float(getenv("HOST_SKETCH_WINDOW", 10)),
+        'slots': int(getenv("HOST_SKETCH_SLOTS", 4096)),  # counter HyperLogLog per baris
+        'precision': int(getenv("HOST_SKETCH_PRECISION", 6)),  # 2^p register per counter
+        'width': int(getenv("HOST_SKETCH_WIDTH", 16384)),  # counter count-min per baris (pangkat dua)
+        'heavy_hitters': int(getenv("HOST_SKETCH_HEAVY_HITTERS", 20)),
+        # Ambang verdict (0 = nonaktif)
+        'port_scan_ports': int(getenv("PORT_SCAN_THRESHOLD", 100)),  # port tujuan berbeda per jendela
+        'host_sweep_hosts': int(getenv("HOST_SWEEP_THRESHOLD", 50)),  # host tujuan berbeda per jendela
+        'syn_flood_rate': float(getenv("SYN_FLOOD_THRESHOLD", 500)),  # SYN/detik per sumber atau tujuan
+        'packet_flood_rate': float(getenv("PACKET_FLOOD_THRESHOLD", 10000))  # paket/detik per sumber
+    },
+    'trust_list': {
+        'enabled': bool(getenv("TRUST_LIST_FILE") or EXCLUDE_PORTS),
+        'file': getenv("TRUST_LIST_FILE", ""),  # satu aturan per baris (lihat packet_processing/trust_list.py)
+        'rules': [f"port {port}" for port in EXCLUDE_PORTS],
+        'reload_interval_seconds': float(getenv("TRUST_LIST_RELOAD_INTERVAL", 5)),  # 0 = tanpa reload
+        'bpf_rules': int(getenv("TRUST_LIST_BPF_RULES", 32))  # aturan sederhana di filter kernel (0 = nonaktif)
+    },
+    'alerts': {
+        'enabled': getenv("ALERT_AGGREGATION", "True") == "True",
+        'summary_interval_seconds': float(getenv("ALERT_SUMMARY_INTERVAL", 10)),
+        'per_key_rate': float(getenv("ALERT_RATE_PER_KEY", 0.2)),  # alert/detik per pasangan sumber/tujuan
+        'per_key_burst': int(getenv("ALERT_BURST_PER_KEY", 3)),
+        'global_rate': float(getenv("ALERT_RATE", 20)),  # total baris alert/detik
+        'max_keys': int(getenv("ALERT_MAX_KEYS", 10000)),
+        'max_summaries': int(getenv("ALERT_MAX_SUMMARIES", 20))  # baris ringkasan per interval
+    },
+    'workers': int(getenv("CAPTURE_WORKERS", 1)),  # >1 untuk pipeline multi-proses
+    'worker_queue_size': int(getenv("CAPTURE_WORKER_QUEUE_SIZE", 1024)),  # dalam chunk
+    'worker_chunk_size': int(getenv("CAPTURE_WORKER_CHUNK_SIZE", 256)),
+    # Detik menunggu worker menghabiskan antriannya saat berhenti, lalu worker dihentikan paksa
+    'worker_stop_timeout': float(getenv("CAPTURE_WORKER_STOP_TIMEOUT", 30))
+}
+
+# Distributed Sensor/Collector Configuration
+REMOTE_CONFIG = {
+    'role': getenv("NODE_ROLE", "standalone"),  # 'standalone', 'sensor' atau 'collector'
+    'collector_address': getenv("COLLECTOR_ADDRESS", "127.0.0.1:9200"),  # tujuan stream sensor
+    'listen_address': getenv("COLLECTOR_LISTEN", "0.0.0.0:9200"),
+    'sensor_name': getenv("SENSOR_NAME", ""),  # kosong = hostname
+    'batch_size': int(getenv("SENSOR_BATCH_SIZE", 512)),  # record per batch
+    'flush_interval_seconds': float(getenv("SENSOR_FLUSH_INTERVAL", 0.2)),
+    'queue_size': int(getenv("SENSOR_QUEUE_SIZE", 256)),  # batch menunggu dikirim; selebihnya dibuang
+    'max_in_flight': int(getenv("SENSOR_MAX_IN_FLIGHT", 16)),  # batch terkirim yang belum di-ack
+    'compression_level': int(getenv("SENSOR_COMPRESSION_LEVEL", 1)),  # zlib, 0 = tanpa kompresi
+    'reconnect_min_seconds': float(getenv("SENSOR_RECONNECT_MIN", 0.5)),
+    'reconnect_max_seconds': float(getenv("SENSOR_RECONNECT_MAX", 30)),
+    'connect_timeout_seconds': float(getenv("SENSOR_CONNECT_TIMEOUT", 5)),
+    'drain_timeout_seconds': float(getenv("SENSOR_DRAIN_TIMEOUT", 10)),  # tunggu ack saat berhenti
+    'collector_queue_size': int(getenv("COLLECTOR_QUEUE_SIZE", 64))  # batch menunggu analisis
+}
+
+# Metrics Configuration
+METRICS_CONFIG = {
+    'port': int(getenv("METRICS_PORT", 9108)),  # 0 = endpoint /metrics nonaktif
+    'host': getenv("METRICS_HOST", "127.0.0.1"),
+    'stats_interval_seconds': float(getenv("METRICS_STATS_INTERVAL", 60)),  # 0 = tanpa baris stats
 }
 
 # Logging Configuration
 LOG_CONFIG = {
     'log_level': getenv("LOG_LEVEL"),
     'log_file': getenv("LOG_FILE"),
-    'rotate_logs': getenv("ROTATE_LOGS"),
+    'rotate_logs': getenv("ROTATING_LOGS", "True") == "True",
     'max_log_size_mb': int(getenv("MAX_LOG_IN_MB")),
+    'backup_count': int(getenv("LOG_BACKUP_COUNT", 5)),
+    'queue': getenv("LOG_QUEUE", "True") == "True",  # tulis log di thread listener
+    'queue_size': int(getenv("LOG_QUEUE_SIZE", 10000)),  # record; selebihnya dibuang
 }
@@ -0,0 +1,461 @@
+"""
+Columnar archive of aged PacketData rows.
+
+Rows older than a cutoff are moved out of the live table into one directory
+per day, ``<archive_dir>/YYYY-MM-DD/part-NNNNN/``. Each part holds one
+``.npy`` file per column plus ``meta.json``. Columns use compact fixed-width
+types (about 56 bytes per packet):
+
+- IPv4 addresses as uint32. A part that contains IPv6 uses 16-byte
+  IPv6-mapped values for that column.
+- Protocol, TTL and ports as small unsigned ints.
+- TCP flags as a bitmask (bit order ``TCP_FLAG_LETTERS``).
+- Analyzer type and model version as dictionary codes.
+- Scores, durations and sampling rates as float32.
+
+Files are stored uncompressed so that ``PacketArchive`` can memory-map them
+and read only the columns a scan needs. A part is written to a temporary
+directory and renamed when complete. Live rows are deleted only after their
+part is in place.
+"""
+import os
+import json
+import shutil
+import socket
+import ipaddress
+from datetime import datetime, timedelta
+
+import numpy as np
+from pony.orm import db_session, select, min as orm_min
+
+from database.models import PacketData
+from database.queries import iter_packets
+from packet_processing.raw_features import TCP_FLAG_LETTERS, TCP_FLAG_STRINGS
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+DAY_FORMAT = '%Y-%m-%d'
+META_FILE = 'meta.json'
+
+# Column order of an archived part
+ARCHIVE_COLUMNS = (
+    'id', 'timestamp', 'src_ip', 'dst_ip', 'protocol', 'src_port', 'dst_port',
+    'packet_size', 'flags', 'ttl', 'window_size',
+    'analyzer_type', 'anomaly_score', 'cluster', 'is_suspicious',
+    'ml_model_version', 'analysis_duration_ms', 'sampling_rate',
+)
+
+# Fixed-width numeric columns: name -> numpy dtype
+NUMERIC_COLUMNS = {
+    'id': np.int64,
+    'timestamp': 'datetime64[us]',
+    'protocol': np.uint8,
+    'src_port': np.uint16,
+    'dst_port': np.uint16,
+    'packet_size': np.uint32,
+    'ttl': np.uint8,
+    'window_size': np.uint16,
+    'anomaly_score': np.float32,
+    'cluster': np.int16,
+    'is_suspicious': np.bool_,
+    'analysis_duration_ms': np.float32,
+    'sampling_rate': np.float32,
+}
+IP_COLUMNS = ('src_ip', 'dst_ip')
+DICTIONARY_COLUMNS = ('analyzer_type', 'ml_model_version')
+
+_FLAG_MASKS = {flags: mask for mask, flags in enumerate(TCP_FLAG_STRINGS)}
+_FLAG_STRINGS = np.array(TCP_FLAG_STRINGS, dtype=object)
+_IPV4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+
+def _flag_mask(flags):
+    """Return the bitmask for a scapy flag string such as 'SA'."""
+    mask = _FLAG_MASKS.get(flags)
+    if mask is None:
+        mask = 0
+        for letter in flags or '':
+            if letter in TCP_FLAG_LETTERS:
+                mask |= 1 << TCP_FLAG_LETTERS.index(letter)
+    return mask
+
+
+def _encode_ips(addresses):
+    """
+    Encode address strings as uint32, or as S16 if any of them is IPv6.
+
+    :return: A (values, encoding) tuple; encoding is 'ipv4' or 'ipv6'.
+    """
+    try:
+        packed = b''.join([socket.inet_aton(address) for address in addresses])
+        return np.frombuffer(packed, dtype='>u4').astype(np.uint32), 'ipv4'
+    except OSError:
+        return np.array([_ip_bytes(address) for address in addresses], dtype='S16'), 'ipv6'
+
+
+def _ip_bytes(address):
+    """Return the 16-byte form of an address (IPv4 as IPv6-mapped)."""
+    if ':' in address:
+        return socket.inet_pton(socket.AF_INET6, address)
+    return _IPV4_MAPPED_PREFIX + socket.inet_aton(address)
+
+
+def _ipv4_to_ipv6(values):
+    """Convert a uint32 IPv4 column to 16-byte IPv6-mapped values."""
+    mapped = np.zeros((len(values), 16), dtype=np.uint8)
+    mapped[:, 10:12] = 0xff
+    mapped[:, 12:] = values.astype('>u4').view(np.uint8).reshape(-1, 4)
+    return mapped.view('S16').ravel()
+
+
+def _decode_ips(values, encoding):
+    """Decode an IP column back to address strings."""
+    if encoding == 'ipv4':
+        packed = np.asarray(values).astype('>u4').tobytes()
+        return np.array([socket.inet_ntoa(packed[i:i + 4]) for i in range(0, len(packed), 4)], dtype=object)
+    decoded = []
+    for value in values:
+        packed = bytes(value).ljust(16, b'\x00')
+        if packed.startswith(_IPV4_MAPPED_PREFIX):
+            decoded.append(socket.inet_ntoa(packed[12:]))
+        else:
+            decoded.append(socket.inet_ntop(socket.AF_INET6, packed))
+    return np.array(decoded, dtype=object)
+
+
+def _ip_mask(values, encoding, network):
+    """Boolean mask of the rows whose address lies in ``network``."""
+    if encoding == 'ipv4':
+        if network.version != 4:
+            return np.zeros(len(values), dtype=bool)
+        netmask = np.uint32(int(network.netmask))
+        return (values & netmask) == np.uint32(int(network.network_address))
+
+    if network.version == 4:
+        prefix = _IPV4_MAPPED_PREFIX + network.network_address.packed
+        prefixlen = network.prefixlen + 96
+    else:
+        prefix = network.network_address.packed
+        prefixlen = network.prefixlen
+    octets = np.asarray(values).view(np.uint8).reshape(-1, 16)
+    whole, bits = divmod(prefixlen, 8)
+    expected = np.frombuffer(prefix, dtype=np.uint8)
+    mask = np.all(octets[:, :whole] == expected[:whole], axis=1)
+    if bits:
+        byte_mask = (0xff << (8 - bits)) & 0xff
+        mask &= (octets[:, whole] & byte_mask) == (expected[whole] & byte_mask)
+    return mask
+
+
+class _PartBuilder:
+    """Encoded column pages of one archive part before it is written"""
+
+    def __init__(self):
+        self.pages = {name: [] for name in ARCHIVE_COLUMNS}
+        self.ip_encodings = {name: 'ipv4' for name in IP_COLUMNS}
+        self.dictionaries = {name: {} for name in DICTIONARY_COLUMNS}
+        self.rows = 0
+
+    def add(self, rows):
+        """Encode a page of row dicts from the query API."""
+        for name, dtype in NUMERIC_COLUMNS.items():
+            values = [row[name] for row in rows]
+            if name == 'protocol':
+                values = [int(value) for value in values]
+            elif name in ('ttl', 'window_size', 'analysis_duration_ms'):
+                values = [0 if value is None else value for value in values]
+            self.pages[name].append(np.array(values, dtype=dtype))
+
+        for name in IP_COLUMNS:
+            values, encoding = _encode_ips([row[name] for row in rows])
+            if encoding != self.ip_encodings[name]:
+                if encoding == 'ipv6':
+                    self.pages[name] = [_ipv4_to_ipv6(page) for page in self.pages[name]]
+                    self.ip_encodings[name] = 'ipv6'
+                else:
+                    values = _ipv4_to_ipv6(values)
+            self.pages[name].append(values)
+
+        self.pages['flags'].append(np.array([_flag_mask(row['flags']) for row in rows], dtype=np.uint16))
+
+        for name in DICTIONARY_COLUMNS:
+            codes = self.dictionaries[name]
+            self.pages[name].append(np.array(
+                [codes.setdefault(row[name], len(codes)) for row in rows], dtype=np.uint16
+            ))
+        self.rows += len(rows)
+
+    def write(self, part_dir):
+        """
+        Write the part atomically.
+
+        :param part_dir: Final directory of the part.
+        :return: The id column that was written.
+        """
+        temp_dir = os.path.join(os.path.dirname(part_dir), '.' + os.path.basename(part_dir) + '.tmp')
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+
+        columns = {name: np.concatenate(pages) for name, pages in self.pages.items()}
+        for name, values in columns.items():
+            np.save(os.path.join(temp_dir, f'{name}.npy'), values)
+        meta = {
+            'rows': self.rows,
+            'min_timestamp': str(columns['timestamp'].min()),
+            'max_timestamp': str(columns['timestamp'].max()),
+            'ip_encodings': self.ip_encodings,
+            'dictionaries': {name: list(codes) for name, codes in self.dictionaries.items()},
+        }
+        with open(os.path.join(temp_dir, META_FILE), 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.rename(temp_dir, part_dir)
+        return columns['id']
+
+
+def _part_dirs(day_dir):
+    """Complete parts of a day directory, in write order."""
+    if not os.path.isdir(day_dir):
+        return []
+    return [os.path.join(day_dir, name) for name in sorted(os.listdir(day_dir)) if name.startswith('part-')]
+
+
+def _delete_ids(ids, batch_size=1000):
+    """Delete live PacketData rows by primary key in short transactions."""
+    ids = [int(row_id) for row_id in ids]
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        with db_session:
+            select(p for p in PacketData if p.id in batch).delete(bulk=True)
+
+
+def archive_day(archive_dir, day, part_rows=200000, batch_size=10000):
+    """
+    Move all PacketData rows of one day into the archive.
+
+    Rows that an interrupted earlier run already archived (same id in an
+    existing part of the day) are only deleted.
+
+    :param archive_dir: Root directory of the archive.
+    :param day: Midnight of the day to archive.
+    :param part_rows: Maximum rows per part.
+    :param batch_size: Rows read from the database per query.
+    :return: The number of rows archived.
+    """
+    day_dir = os.path.join(archive_dir, day.strftime(DAY_FORMAT))
+    os.makedirs(day_dir, exist_ok=True)
+    parts = _part_dirs(day_dir)
+    archived_ids = np.concatenate(
+        [np.load(os.path.join(part, 'id.npy'), mmap_mode='r') for part in parts]
+    ) if parts else np.empty(0, dtype=np.int64)
+
+    archived = 0
+    builder = _PartBuilder()
+    page = []
+    leftover_ids = []
+
+    def flush_page():
+        rows = page
+        if len(archived_ids):
+            seen = np.isin([row['id'] for row in rows], archived_ids)
+            leftover_ids.extend(row['id'] for row, done in zip(rows, seen) if done)
+            rows = [row for row, done in zip(rows, seen) if not done]
+        if rows:
+            builder.add(rows)
+        page.clear()
+
+    def flush_part():
+        nonlocal builder, archived
+        part_dir = os.path.join(day_dir, f'part-{len(parts):05d}')
+        ids = builder.write(part_dir)
+        parts.append(part_dir)
+        _delete_ids(ids)
+        archived += builder.rows
+        builder = _PartBuilder()
+
+    for row in iter_packets(since=day, until=day + timedelta(days=1), suspicious_only=False,
+                            batch_size=batch_size):
+        page.append(row)
+        if len(page) == batch_size:
+            flush_page()
+            if builder.rows >= part_rows:
+                flush_part()
+    flush_page()
+    if builder.rows:
+        flush_part()
+    _delete_ids(leftover_ids)
+    return archived
+
+
+def archive_packets(archive_dir, cutoff, part_rows=200000, batch_size=10000):
+    """
+    Archive every whole day of PacketData before ``cutoff``.
+
+    :param archive_dir: Root directory of the archive.
+    :param cutoff: Days that end on or before this datetime's midnight are archived.
+    :param part_rows: Maximum rows per part file set.
+    :param batch_size: Rows read from the database per query.
+    :return: The number of rows archived.
+    """
+    end = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+    with db_session:
+        oldest = orm_min(p.timestamp for p in PacketData if p.timestamp < end)
+    if oldest is None:
+        return 0
+
+    archived = 0
+    day = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end:
+        count = archive_day(archive_dir, day, part_rows, batch_size)
+        if count:
+            logger.info(f"Archived {count} packets of {day.strftime(DAY_FORMAT)}")
+        archived += count
+        day += timedelta(days=1)
+    return archived
+
+
+class PacketArchive:
+    """
+    Reader for the columnar packet archive
+
+    Scans memory-map only the columns they need (requested columns plus
+    filter columns) and skip days and parts outside the time range.
+    Filters use the encoded values directly, so an IP/CIDR filter is an
+    integer mask comparison, not a string parse per row.
+    """
+
+    def __init__(self, archive_dir):
+        """
+        :param archive_dir: Root directory of the archive.
+        """
+        self.archive_dir = archive_dir
+
+    def days(self, since=None, until=None):
+        """
+        Return the archived days overlapping ``[since, until)``.
+
+        :return: A sorted list of midnight datetimes.
+        """
+        if not os.path.isdir(self.archive_dir):
+            return []
+        days = []
+        for name in os.listdir(self.archive_dir):
+            try:
+                day = datetime.strptime(name, DAY_FORMAT)
+            except ValueError:
+                continue
+            if since is not None and day + timedelta(days=1) <= since:
+                continue
+            if until is not None and day >= until:
+                continue
+            days.append(day)
+        return sorted(days)
+
+    def scan(self, columns=None, decode=False, since=None, until=None, ip=None, src_ip=None,
+             dst_ip=None, port=None, protocol=None, cluster=None, min_score=None, max_score=None,
+             suspicious_only=False):
+        """
+        Yield the matching rows of each archived part as a dict of arrays.
+
+        :param columns: Column names to return (default all ARCHIVE_COLUMNS).
+        :param decode: Return IPs, flags, protocol and dictionary columns as
+            the strings stored in PacketData instead of their encoded values.
+        :param since / until: Time range (until is exclusive).
+        :param ip: Address or CIDR matched against either src_ip or dst_ip.
+        :param src_ip / dst_ip: Address or CIDR for one direction.
+        :param port: Matched against either src_port or dst_port.
+        :param protocol: IP protocol number.
+        :param cluster: Cluster ID.
+        :param min_score / max_score: Anomaly score range (max is exclusive).
+        :param suspicious_only: Only suspicious packets.
+        :return: A generator of dicts mapping column name to array.
+        """
+        columns = list(columns or ARCHIVE_COLUMNS)
+        since64 = np.datetime64(since, 'us') if since is not None else None
+        until64 = np.datetime64(until, 'us') if until is not None else None
+        networks = [
+            (names, ipaddress.ip_network(spec, strict=False))
+            for names, spec in ((IP_COLUMNS, ip), (('src_ip',), src_ip), (('dst_ip',), dst_ip)) if spec
+        ]
+
+        for day in self.days(since, until):
+            for part_dir in _part_dirs(os.path.join(self.archive_dir, day.strftime(DAY_FORMAT))):
+                with open(os.path.join(part_dir, META_FILE)) as meta_file:
+                    meta = json.load(meta_file)
+                if since64 is not None and np.datetime64(meta['max_timestamp']) < since64:
+                    continue
+                if until64 is not None and np.datetime64(meta['min_timestamp']) >= until64:
+                    continue
+
+                loaded = {}
+
+                def column(name):
+                    if name not in loaded:
+                        loaded[name] = np.load(os.path.join(part_dir, f'{name}.npy'), mmap_mode='r')
+                    return loaded[name]
+
+                mask = np.ones(meta['rows'], dtype=bool)
+                if since64 is not None:
+                    mask &= column('timestamp') >= since64
+                if until64 is not None:
+                    mask &= column('timestamp') < until64
+                if suspicious_only:
+                    mask &= column('is_suspicious')
+                if port is not None:
+                    mask &= (column('src_port') == port) | (column('dst_port') == port)
+                if protocol is not None:
+                    mask &= column('protocol') == int(protocol)
+                if cluster is not None:
+                    mask &= column('cluster') == cluster
+                if min_score is not None:
+                    mask &= column('anomaly_score') >= min_score
+                if max_score is not None:
+                    mask &= column('anomaly_score') < max_score
+                for names, network in networks:
+                    matched = np.zeros(meta['rows'], dtype=bool)
+                    for name in names:
+                        matched |= _ip_mask(column(name), meta['ip_encodings'][name], network)
+                    mask &= matched
+
+                if not mask.any():
+                    continue
+                selected = None if mask.all() else np.flatnonzero(mask)
+                result = {}
+                for name in columns:
+                    values = column(name)
+                    values = np.asarray(values) if selected is None else values[selected]
+                    result[name] = self._decode(name, values, meta) if decode else values
+                yield result
+
+    def read(self, columns=None, decode=False, **filters):
+        """
+        Return all matching rows as one dict of arrays.
+
+        Takes the same arguments as ``scan``.
+        """
+        columns = list(columns or ARCHIVE_COLUMNS)
+        chunks = {name: [] for name in columns}
+        for part in self.scan(columns, decode, **filters):
+            for name in columns:
+                chunks[name].append(part[name])
+        return {
+            name: np.concatenate(values) if values else np.empty(0)
+            for name, values in chunks.items()
+        }
+
+    def count(self, **filters):
+        """Return the number of matching rows (filters as for ``scan``)."""
+        return sum(len(part['id']) for part in self.scan(['id'], **filters))
+
+    @staticmethod
+    def _decode(name, values, meta):
+        """Decode an encoded column to the values stored in PacketData."""
+        if name in IP_COLUMNS:
+            return _decode_ips(values, meta['ip_encodings'][name])
+        if name == 'flags':
+            return _FLAG_STRINGS[values]
+        if name in DICTIONARY_COLUMNS:
+            return np.array(meta['dictionaries'][name], dtype=object)[values]
+        if name == 'protocol':
+            return values.astype(str).astype(object)
+        return values
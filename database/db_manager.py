@@ -1,9 +1,34 @@
 import time
+import threading
+from queue import Queue, Empty, Full
 
-from datetime import datetime
-from pony.orm import db_session, commit, select
-from database.models import PacketData
+from datetime import datetime, timedelta
+from functools import partial
+from pony.orm import db_session, commit, select, desc, sum as orm_sum
+from pony.orm.dbapiprovider import Converter
+from database.models import PacketData, FlowData, TrafficRollup, TalkerRollup
+from utils.logging_utils import get_logger
+from utils import metrics
 
+logger = get_logger(__name__)
+
+DB_ROWS = metrics.counter('nta_db_rows_total', 'Rows handled by the batched writer', ('table', 'result'))
+DB_WRITE_SECONDS = metrics.histogram('nta_db_write_seconds', 'Time to insert one batch', ('table',))
+DB_QUEUE_DEPTH = metrics.gauge('nta_db_writer_queue_depth', 'Rows waiting in the writer queue')
+
+# Urutan kolom untuk insert batch PacketData
+PACKET_COLUMNS = (
+    'timestamp', 'src_ip', 'dst_ip', 'protocol', 'src_port', 'dst_port',
+    'packet_size', 'flags', 'ttl', 'window_size',
+    'analyzer_type', 'anomaly_score', 'cluster', 'is_suspicious',
+    'ml_model_version', 'analysis_duration_ms', 'sampling_rate',
+)
+
+
+def _packet_timestamp(packet_features):
+    """Capture time of the packet (epoch seconds in 'timestamp'), or now if unknown."""
+    timestamp = packet_features.get('timestamp')
+    return datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
 
 @db_session
 def store_packet_analysis(packet_features, ml_results):
@@ -20,6 +45,8 @@ def store_packet_analysis(packet_features, ml_results):
         - flags: (Optional) The flags associated with the packet.
         - ttl: (Optional) The time-to-live value of the packet.
         - window_size: (Optional) The window size of the packet.
+        - timestamp: (Optional) The capture time in epoch seconds (default now).
+        - sampling_rate: (Optional) The load shedding sampling rate (default 1.0).
 
     :param ml_results: A dictionary containing the machine learning analysis results, including:
         - analyzer_type: (Optional) The type of analyzer used (default 'internal').
@@ -36,7 +63,7 @@ def store_packet_analysis(packet_features, ml_results):
         start_time = time.time()
         
         packet_record = PacketData(
-            timestamp = datetime.now(),
+            timestamp = _packet_timestamp(packet_features),
             src_ip = packet_features['src_ip'],
             dst_ip = packet_features['dst_ip'],
             protocol = str(packet_features['protocol']),
@@ -52,8 +79,10 @@ def store_packet_analysis(packet_features, ml_results):
             cluster = ml_results['cluster'],
             is_suspicious = ml_results['is_suspicious'],
             ml_model_version = ml_results.get('model_version', '1.0'),
-            analysis_duration_ms = ml_results.get('analysis_duration_ms', 0)
+            analysis_duration_ms = ml_results.get('analysis_duration_ms', 0),
+            sampling_rate = packet_features.get('sampling_rate', 1.0)
         )
+        update_rollups([packet_row(packet_features, ml_results)])
         
         commit()
         return packet_record
@@ -67,17 +96,603 @@ def get_suspicious_packet(limit=100):
     Return a list of recent suspicious packets.
 
     :param limit: The maximum number of packets to return.
-    :return: A list of PacketData objects, ordered by timestamp.
+    :return: A list of PacketData objects, newest first.
     """
-    return select(p for p in PacketData if p.is_suspicious).order_by(lambda p: p.timestamp)[:][:limit]
+    return select(p for p in PacketData if p.is_suspicious).order_by(
+        lambda p: (desc(p.timestamp), desc(p.id)))[:limit]
 
 @db_session
-def get_packet_stats():
-    total_count = select(p for p in PacketData).count()
-    suspicious_count = select(p for p in PacketData if p.is_suspicious).count()
+def get_packet_stats(since=None):
+    """
+    Return packet totals from the hourly rollups.
+
+    Rows stored while load shedding was active stand for ``1 / sampling_rate``
+    packets, so totals estimate the traffic actually seen. ``stored_packets``
+    is the plain row count. The query reads one rollup row per hour and
+    protocol, so its cost does not depend on the size of PacketData.
+    Only PacketData is rolled up; FlowData rows from flow mode are not
+    counted.
+
+    :param since: (Optional) Only count traffic from this datetime on.
+    """
+    since = since or datetime.min
+    rollups = select(r for r in TrafficRollup if r.resolution == 'hour' and r.bucket_start >= since)
+    total_count = orm_sum(r.packets for r in rollups)
+    suspicious_count = orm_sum(r.suspicious for r in rollups)
     
     return {
-        'total_packets': total_count,
-        'suspicious_packets': suspicious_count,
-        'suspicious_percentage': (suspicious_count / total_count * 100) if total_count > 0 else 0
+        'total_packets': round(total_count),
+        'suspicious_packets': round(suspicious_count),
+        'suspicious_percentage': (suspicious_count / total_count * 100) if total_count > 0 else 0,
+        'stored_packets': orm_sum(r.stored_rows for r in rollups),
+        'sampled_packets': orm_sum(r.sampled_rows for r in rollups)
     }
+
+@db_session
+def get_traffic_timeseries(resolution='minute', since=None, until=None):
+    """
+    Return per-bucket traffic totals (all protocols combined) for dashboards.
+
+    :param resolution: 'minute' or 'hour'.
+    :param since: (Optional) First bucket to include.
+    :param until: (Optional) Only buckets starting before this datetime.
+    :return: A list of dicts with bucket_start, packets, bytes and suspicious, oldest first.
+    """
+    since = since or datetime.min
+    until = until or datetime.max
+    query = select(
+        (r.bucket_start, orm_sum(r.packets), orm_sum(r.bytes), orm_sum(r.suspicious))
+        for r in TrafficRollup
+        if r.resolution == resolution and r.bucket_start >= since and r.bucket_start < until
+    ).order_by(1)
+    return [
+        {'bucket_start': bucket_start, 'packets': round(packets), 'bytes': round(byte_count),
+         'suspicious': round(suspicious)}
+        for bucket_start, packets, byte_count, suspicious in query
+    ]
+
+@db_session
+def get_protocol_breakdown(since=None):
+    """
+    Return estimated packet, byte and suspicious totals per protocol.
+
+    :param since: (Optional) Only count traffic from this datetime on.
+    """
+    since = since or datetime.min
+    query = select(
+        (r.protocol, orm_sum(r.packets), orm_sum(r.bytes), orm_sum(r.suspicious))
+        for r in TrafficRollup if r.resolution == 'hour' and r.bucket_start >= since
+    ).order_by(lambda protocol, packets, byte_count, suspicious: desc(packets))
+    return [
+        {'protocol': protocol, 'packets': round(packets), 'bytes': round(byte_count),
+         'suspicious': round(suspicious)}
+        for protocol, packets, byte_count, suspicious in query
+    ]
+
+@db_session
+def get_top_talkers(since=None, limit=10):
+    """
+    Return the source IPs that sent the most packets.
+
+    :param since: (Optional) Only count traffic from this datetime on (hour granularity).
+    :param limit: The maximum number of talkers to return.
+    """
+    since = since or datetime.min
+    query = select(
+        (t.src_ip, orm_sum(t.packets), orm_sum(t.bytes), orm_sum(t.suspicious))
+        for t in TalkerRollup if t.bucket_start >= since
+    ).order_by(lambda src_ip, packets, byte_count, suspicious: desc(packets))
+    return [
+        {'src_ip': src_ip, 'packets': round(packets), 'bytes': round(byte_count),
+         'suspicious': round(suspicious)}
+        for src_ip, packets, byte_count, suspicious in query[:limit]
+    ]
+
+
+# Urutan kolom untuk insert batch FlowData
+FLOW_COLUMNS = (
+    'first_seen', 'last_seen', 'src_ip', 'dst_ip', 'protocol', 'src_port', 'dst_port',
+    'duration_ms', 'packet_count', 'fwd_packet_count', 'byte_count',
+    'fin_count', 'syn_count', 'rst_count', 'psh_count',
+    'ack_count', 'urg_count', 'ece_count', 'cwr_count',
+    'iat_mean_ms', 'iat_std_ms', 'iat_min_ms', 'iat_max_ms', 'end_reason',
+    'analyzer_type', 'anomaly_score', 'cluster', 'is_suspicious',
+    'ml_model_version', 'analysis_duration_ms', 'sampling_rate',
+)
+
+def packet_row(packet_features, ml_results):
+    """
+    Build a PacketData row tuple ordered as PACKET_COLUMNS.
+
+    Uses the same defaults as store_packet_analysis so batched and
+    per-packet storage produce identical rows.
+    """
+    return (
+        _packet_timestamp(packet_features),
+        packet_features['src_ip'],
+        packet_features['dst_ip'],
+        str(packet_features['protocol']),
+        packet_features.get('src_port', 0),
+        packet_features.get('dst_port', 0),
+        packet_features['packet_size'],
+        packet_features.get('flags', ''),
+        packet_features.get('ttl', 0),
+        packet_features.get('window_size', 0),
+        ml_results.get('analyzer_type', 'internal'),
+        float(ml_results['anomaly_score']),
+        int(ml_results['cluster']),
+        bool(ml_results['is_suspicious']),
+        ml_results.get('model_version', '1.0'),
+        ml_results.get('analysis_duration_ms', 0),
+        packet_features.get('sampling_rate', 1.0),
+    )
+
+def flow_row(flow_record, ml_results):
+    """
+    Build a FlowData row tuple ordered as FLOW_COLUMNS.
+
+    :param flow_record: A flow record produced by FlowTable (timestamps in epoch seconds).
+    :param ml_results: The machine learning analysis results for the flow.
+    """
+    flag_counts = flow_record['flag_counts']
+    return (
+        datetime.fromtimestamp(flow_record['first_seen']),
+        datetime.fromtimestamp(flow_record['last_seen']),
+        flow_record['src_ip'],
+        flow_record['dst_ip'],
+        str(flow_record['protocol']),
+        flow_record['src_port'],
+        flow_record['dst_port'],
+        flow_record['duration_ms'],
+        flow_record['packet_count'],
+        flow_record['fwd_packet_count'],
+        flow_record['byte_count'],
+        flag_counts['F'],
+        flag_counts['S'],
+        flag_counts['R'],
+        flag_counts['P'],
+        flag_counts['A'],
+        flag_counts['U'],
+        flag_counts['E'],
+        flag_counts['C'],
+        flow_record['iat_mean_ms'],
+        flow_record['iat_std_ms'],
+        flow_record['iat_min_ms'],
+        flow_record['iat_max_ms'],
+        flow_record['end_reason'],
+        ml_results.get('analyzer_type', 'internal'),
+        float(ml_results['anomaly_score']),
+        int(ml_results['cluster']),
+        bool(ml_results['is_suspicious']),
+        ml_results.get('model_version', '1.0'),
+        ml_results.get('analysis_duration_ms', 0),
+        flow_record.get('sampling_rate', 1.0),
+    )
+
+@db_session
+def store_flow_analysis(flow_record, ml_results):
+    """
+    Stores the analysis result of an expired flow in the database.
+
+    :param flow_record: A flow record produced by FlowTable.
+    :param ml_results: The machine learning analysis results for the flow.
+    :return: The created FlowData object if successful, None if an error occurs.
+    """
+    try:
+        flow = FlowData(**dict(zip(FLOW_COLUMNS, flow_row(flow_record, ml_results))))
+        commit()
+        return flow
+    except Exception as e:
+        logger.error(f"Error storing flow analysis: {e}")
+        return None
+
+@db_session
+def bulk_insert(entity, columns, rows):
+    """
+    Insert many rows of an entity in a single statement and transaction.
+
+    PostgreSQL uses a multi-row ``INSERT ... VALUES`` through psycopg2's
+    execute_values; other providers fall back to ``executemany``.
+
+    :param entity: The Pony entity class whose table is written.
+    :param columns: Attribute names, in the same order as each row tuple.
+    :param rows: A list of row tuples.
+    :return: The number of rows written.
+    """
+    if not rows:
+        return 0
+    _insert_rows(entity, columns, rows)
+    commit()
+    return len(rows)
+
+def _sqlite_rows(entity, columns, rows):
+    """
+    Convert row values the way Pony stores them in SQLite.
+
+    The sqlite3 module writes datetimes without microseconds when they are
+    zero, while Pony always writes and compares them with microseconds, so
+    raw inserts must use Pony's converters for range and keyset queries to
+    see the rows.
+    """
+    provider = entity._database_.provider
+    adapters = []
+    for index, name in enumerate(columns):
+        converter = provider.get_converter_by_attr(entity._adict_[name])
+        if type(converter).py2sql is not Converter.py2sql:
+            adapters.append((index, converter.py2sql))
+    if not adapters:
+        return rows
+    converted = []
+    for row in rows:
+        row = list(row)
+        for index, py2sql in adapters:
+            if row[index] is not None:
+                row[index] = py2sql(row[index])
+        converted.append(row)
+    return converted
+
+def _insert_rows(entity, columns, rows):
+    """Execute the batch INSERT of bulk_insert in the current transaction."""
+    database = entity._database_
+    provider = database.provider
+    table = provider.quote_name(entity._table_)
+    column_sql = ', '.join(
+        provider.quote_name(entity._adict_[name].column) for name in columns
+    )
+
+    cursor = database.get_connection().cursor()
+    if provider.dialect == 'PostgreSQL':
+        from psycopg2.extras import execute_values
+        execute_values(
+            cursor,
+            f'INSERT INTO {table} ({column_sql}) VALUES %s',
+            rows,
+            page_size=len(rows)
+        )
+    else:
+        if provider.dialect == 'SQLite':
+            rows = _sqlite_rows(entity, columns, rows)
+        placeholder = '%s' if provider.paramstyle in ('format', 'pyformat') else '?'
+        values_sql = ', '.join([placeholder] * len(columns))
+        cursor.executemany(
+            f'INSERT INTO {table} ({column_sql}) VALUES ({values_sql})',
+            rows
+        )
+
+def upsert_add(entity, key_columns, value_columns, rows):
+    """
+    Insert rows or add their values to the existing row with the same key.
+
+    Runs in the current transaction. Keys must be unique within ``rows``
+    (aggregate them first) and covered by a composite_key of the entity.
+
+    :param entity: The Pony entity class whose table is written.
+    :param key_columns: Attribute names of the unique key.
+    :param value_columns: Attribute names of the numeric columns to add up.
+    :param rows: A list of tuples, key values followed by the values to add.
+    """
+    if not rows:
+        return
+
+    database = entity._database_
+    provider = database.provider
+    quote = provider.quote_name
+    table = quote(entity._table_)
+    keys = [quote(entity._adict_[name].column) for name in key_columns]
+    values = [quote(entity._adict_[name].column) for name in value_columns]
+    column_sql = ', '.join(keys + values)
+
+    if provider.dialect == 'MySQL':
+        conflict_sql = 'ON DUPLICATE KEY UPDATE ' + ', '.join(
+            f'{column} = {column} + VALUES({column})' for column in values
+        )
+    else:
+        conflict_sql = f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET ' + ', '.join(
+            f'{column} = {table}.{column} + EXCLUDED.{column}' for column in values
+        )
+
+    cursor = database.get_connection().cursor()
+    if provider.dialect == 'PostgreSQL':
+        from psycopg2.extras import execute_values
+        execute_values(
+            cursor,
+            f'INSERT INTO {table} ({column_sql}) VALUES %s {conflict_sql}',
+            rows,
+            page_size=len(rows)
+        )
+    else:
+        if provider.dialect == 'SQLite':
+            rows = _sqlite_rows(entity, key_columns + value_columns, rows)
+        placeholder = '%s' if provider.paramstyle in ('format', 'pyformat') else '?'
+        values_sql = ', '.join([placeholder] * (len(keys) + len(values)))
+        cursor.executemany(
+            f'INSERT INTO {table} ({column_sql}) VALUES ({values_sql}) {conflict_sql}',
+            rows
+        )
+
+# Posisi kolom PacketData yang dipakai rollup
+_TIMESTAMP, _SRC_IP, _PROTOCOL, _PACKET_SIZE, _IS_SUSPICIOUS, _SAMPLING_RATE = (
+    PACKET_COLUMNS.index(name)
+    for name in ('timestamp', 'src_ip', 'protocol', 'packet_size', 'is_suspicious', 'sampling_rate')
+)
+
+_ONE_MINUTE = timedelta(minutes=1)
+
+def update_rollups(rows):
+    """
+    Add PacketData rows to the per-minute/hour traffic and talker rollups.
+
+    Runs in the current transaction so rollups stay consistent with the
+    inserted rows. Each row counts as ``1 / sampling_rate`` packets.
+
+    :param rows: Row tuples ordered as PACKET_COLUMNS.
+    """
+    traffic = {}
+    talkers = {}
+    minute = minute_end = None
+    for row in rows:
+        # Row datang hampir terurut waktu; bucket hanya dihitung ulang saat menit berganti
+        timestamp = row[_TIMESTAMP]
+        if minute is None or not minute <= timestamp < minute_end:
+            minute = timestamp.replace(second=0, microsecond=0)
+            minute_end = minute + _ONE_MINUTE
+            hour = minute.replace(minute=0)
+        sampling_rate = row[_SAMPLING_RATE]
+        weight = 1.0 / sampling_rate
+        size = row[_PACKET_SIZE] * weight
+        suspicious = weight if row[_IS_SUSPICIOUS] else 0.0
+        sampled = 1 if sampling_rate < 1.0 else 0
+
+        for key in (('minute', minute, row[_PROTOCOL]), ('hour', hour, row[_PROTOCOL])):
+            totals = traffic.get(key)
+            if totals is None:
+                traffic[key] = [1, sampled, weight, size, suspicious]
+            else:
+                totals[0] += 1
+                totals[1] += sampled
+                totals[2] += weight
+                totals[3] += size
+                totals[4] += suspicious
+
+        key = (hour, row[_SRC_IP])
+        totals = talkers.get(key)
+        if totals is None:
+            talkers[key] = [weight, size, suspicious]
+        else:
+            totals[0] += weight
+            totals[1] += size
+            totals[2] += suspicious
+
+    upsert_add(
+        TrafficRollup,
+        ('resolution', 'bucket_start', 'protocol'),
+        ('stored_rows', 'sampled_rows', 'packets', 'bytes', 'suspicious'),
+        [key + tuple(totals) for key, totals in traffic.items()]
+    )
+    upsert_add(
+        TalkerRollup,
+        ('bucket_start', 'src_ip'),
+        ('packets', 'bytes', 'suspicious'),
+        [key + tuple(totals) for key, totals in talkers.items()]
+    )
+
+@db_session
+def write_packet_rows(rows):
+    """
+    Insert PacketData rows and update the rollups in one transaction.
+
+    :param rows: Row tuples ordered as PACKET_COLUMNS.
+    :return: The number of rows written.
+    """
+    if not rows:
+        return 0
+    _insert_rows(PacketData, PACKET_COLUMNS, rows)
+    update_rollups(rows)
+    commit()
+    return len(rows)
+
+
+class BatchedPacketWriter:
+    """
+    Writer database di background thread yang menyimpan hasil analisis secara batch.
+
+    Capture thread hanya memasukkan row ke antrian terbatas (tidak pernah
+    menunggu database). Background thread mengumpulkan row dan menulisnya
+    sekaligus ketika jumlahnya mencapai ``batch_size`` atau row tertua sudah
+    menunggu lebih dari ``flush_interval_seconds``. Jika antrian penuh, row
+    dibuang dan dihitung sebagai ``dropped``.
+    """
+
+    _STOP = object()
+
+    def __init__(self, config):
+        """
+        Initialize batched writer
+
+        Args:
+            config (dict): Konfigurasi writer (queue_size, batch_size,
+                flush_interval_seconds)
+        """
+        self.config = config
+        self.batch_size = config['batch_size']
+        self.flush_interval = config['flush_interval_seconds']
+        self.queue = Queue(maxsize=config['queue_size'])
+
+        # Tabel yang didukung: kind -> fungsi insert batch
+        self.tables = {
+            'packet': write_packet_rows,
+            'flow': partial(bulk_insert, FlowData, FLOW_COLUMNS),
+        }
+
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._dropped_rows = {kind: DB_ROWS.labels(table=kind, result='dropped') for kind in self.tables}
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        """Mulai background writer thread"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='db-writer', daemon=True
+        )
+        self._thread.start()
+        DB_QUEUE_DEPTH.set_function(self.queue.qsize)
+
+    def submit(self, packet_features, ml_results):
+        """
+        Masukkan hasil analisis paket ke antrian tanpa blocking
+
+        Args:
+            packet_features (dict): Fitur paket
+            ml_results (dict): Hasil analisis ML
+
+        Returns:
+            bool: True jika row masuk antrian, False jika dibuang
+        """
+        return self.submit_row('packet', packet_row(packet_features, ml_results))
+
+    def submit_flow(self, flow_record, ml_results):
+        """
+        Masukkan hasil analisis flow ke antrian tanpa blocking
+
+        Args:
+            flow_record (dict): Record flow dari FlowTable
+            ml_results (dict): Hasil analisis ML untuk flow
+
+        Returns:
+            bool: True jika row masuk antrian, False jika dibuang
+        """
+        return self.submit_row('flow', flow_row(flow_record, ml_results))
+
+    def submit_row(self, kind, row):
+        """
+        Masukkan row yang sudah dibentuk ke antrian tanpa blocking
+
+        Args:
+            kind (str): Jenis tabel tujuan (key dari ``self.tables``)
+            row (tuple): Row sesuai urutan kolom tabel
+
+        Returns:
+            bool: True jika row masuk antrian, False jika dibuang
+        """
+        try:
+            self.queue.put_nowait((kind, row))
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            self._dropped_rows[kind].inc()
+            return False
+
+        with self._lock:
+            self.queued += 1
+        return True
+
+    def stop(self, timeout=None):
+        """
+        Hentikan writer setelah semua row di antrian ditulis
+
+        Tidak pernah menunggu slot antrian: jika antrian penuh (misalnya
+        database macet) thread writer tetap melihat flag berhenti.
+
+        Args:
+            timeout (float): Batas waktu menunggu flush terakhir (detik)
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        try:
+            # Bangunkan thread writer yang sedang menunggu antrian kosong
+            self.queue.put_nowait(self._STOP)
+        except Full:
+            pass
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Database writer did not finish flushing before timeout")
+        self._thread = None
+
+    def get_stats(self):
+        """
+        Statistik writer
+
+        Returns:
+            dict: Jumlah row queued, written, dropped, failed, pending dan batches
+        """
+        with self._lock:
+            queued = self.queued
+            dropped = self.dropped
+        return {
+            'queued': queued,
+            'written': self.written,
+            'dropped': dropped,
+            'failed': self.failed,
+            'pending': self.queue.qsize(),
+            'batches': self.batches,
+        }
+
+    def _run(self):
+        """Loop utama background writer"""
+        pending = {kind: [] for kind in self.tables}
+        pending_count = 0
+        deadline = None
+
+        while not self._stopping.is_set():
+            if pending_count:
+                timeout = max(0.0, deadline - time.monotonic())
+            else:
+                timeout = self.flush_interval
+
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                item = None
+
+            if item is self._STOP:
+                break
+
+            if item is not None:
+                kind, row = item
+                pending[kind].append(row)
+                if not pending_count:
+                    deadline = time.monotonic() + self.flush_interval
+                pending_count += 1
+
+            if pending_count and (
+                pending_count >= self.batch_size or time.monotonic() >= deadline
+            ):
+                self._flush(pending)
+                pending_count = 0
+
+        # Drain sisa antrian sebelum berhenti
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                break
+            if item is not self._STOP:
+                kind, row = item
+                pending[kind].append(row)
+        self._flush(pending)
+
+    def _flush(self, pending):
+        """Tulis semua row yang tertunda, satu statement per tabel"""
+        for kind, rows in pending.items():
+            if not rows:
+                continue
+            start = time.perf_counter()
+            try:
+                self.written += self.tables[kind](rows)
+                self.batches += 1
+                DB_WRITE_SECONDS.labels(table=kind).observe(time.perf_counter() - start)
+                DB_ROWS.labels(table=kind, result='written').inc(len(rows))
+            except Exception as e:
+                self.failed += len(rows)
+                DB_ROWS.labels(table=kind, result='failed').inc(len(rows))
+                logger.error(f"Error writing {len(rows)} {kind} rows: {e}")
+            pending[kind] = []
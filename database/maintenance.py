@@ -0,0 +1,371 @@
+"""
+Pemeliharaan database: partisi harian PacketData, retensi data dan backfill rollup.
+
+Partisi hanya didukung PostgreSQL. Tabel PacketData dibuat sebagai tabel
+``PARTITION BY RANGE (timestamp)`` sebelum Pony membuat mapping, sehingga
+retensi cukup men-drop partisi lama alih-alih DELETE jutaan row.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from pony.orm import db_session, commit, select
+from pony.orm.dbapiprovider import DBException
+from database.models import PacketData, FlowData, TrafficRollup, TalkerRollup
+from database.archive import archive_packets, PacketArchive
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Nama partisi harian: packetdata_pYYYYMMDD
+PARTITION_DATE_FORMAT = '%Y%m%d'
+
+# Kolom yang ditambahkan setelah tabel mungkin sudah dibuat: (entity, atribut, default)
+ADDED_COLUMNS = (
+    (PacketData, 'sampling_rate', 1.0),
+    (FlowData, 'sampling_rate', 1.0),
+)
+
+
+def _is_postgres(database):
+    return database.provider.dialect == 'PostgreSQL'
+
+
+def create_partitioned_packet_table(database, days_ahead=3):
+    """
+    Buat tabel PacketData yang dipartisi per hari (PostgreSQL)
+
+    Dipanggil setelah ``db.bind`` dan sebelum ``generate_mapping``. Kolom
+    dibentuk dari atribut entity dengan tipe SQL milik provider Pony;
+    primary key menjadi (id, timestamp) karena PostgreSQL mewajibkan kolom
+    partisi ada di setiap unique key. Index dibuat Pony seperti biasa.
+    Partisi untuk hari ini dan beberapa hari ke depan langsung dibuat agar
+    row baru tidak masuk ke partisi default.
+
+    Args:
+        database: Objek Database Pony yang sudah di-bind
+        days_ahead (int): Jumlah hari ke depan yang disiapkan
+    """
+    provider = database.provider
+    if not _is_postgres(database):
+        logger.warning(f"Table partitioning requires PostgreSQL, {provider.dialect} uses a regular table")
+        return
+
+    quote = provider.quote_name
+    table = provider.get_default_entity_table_name(PacketData)
+    timestamp_column = provider.normalize_name('timestamp')
+    columns = []
+    for attr in PacketData._attrs_:
+        name = quote(provider.normalize_name(attr.name))
+        if attr.auto:
+            sql_type = 'SERIAL'
+        else:
+            sql_type = provider.get_converter_by_attr(attr).get_sql_type()
+        not_null = ' NOT NULL' if attr.is_required or attr.is_pk else ''
+        columns.append(f"{name} {sql_type}{not_null}")
+    columns.append(f"PRIMARY KEY ({quote(provider.normalize_name('id'))}, {quote(timestamp_column)})")
+
+    with db_session:
+        database.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(table)} ({', '.join(columns)}) "
+            f"PARTITION BY RANGE ({quote(timestamp_column)})"
+        )
+        # Row di luar semua partisi harian (misalnya replay capture lama)
+        database.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT"
+        )
+    ensure_partitions(database, days_ahead)
+    logger.info(f"Using daily partitions for table {table}")
+
+
+def add_missing_columns(database):
+    """
+    Tambahkan kolom ADDED_COLUMNS yang belum ada di tabel lama
+
+    ``generate_mapping(create_tables=True)`` hanya membuat tabel baru dan
+    tidak menambah kolom ke tabel yang sudah ada, sehingga database dari
+    versi sebelumnya diperbarui dengan ``ALTER TABLE ... ADD COLUMN``
+    (dengan default agar row lama tetap valid). Aman dipanggil berulang kali;
+    dipanggil setelah ``db.bind`` dan sebelum ``generate_mapping``.
+
+    Args:
+        database: Objek Database Pony yang sudah di-bind
+    """
+    provider = database.provider
+    quote = provider.quote_name
+    for entity, attr_name, default in ADDED_COLUMNS:
+        table = provider.get_default_entity_table_name(entity)
+        column = provider.normalize_name(attr_name)
+        try:
+            with db_session:
+                cursor = database.execute(f"SELECT * FROM {quote(table)} WHERE 1 = 0")
+                existing = {description[0].lower() for description in cursor.description}
+        except DBException:
+            # Tabel belum ada, dibuat lengkap oleh generate_mapping
+            continue
+        if column.lower() in existing:
+            continue
+
+        sql_type = provider.get_converter_by_attr(getattr(entity, attr_name)).get_sql_type()
+        with db_session:
+            database.execute(
+                f"ALTER TABLE {quote(table)} ADD COLUMN {quote(column)} {sql_type} NOT NULL DEFAULT {default!r}"
+            )
+        logger.info(f"Added column {column} to table {table}")
+
+
+def _partition_names(database):
+    """Partisi harian PacketData yang ada: nama -> tanggal"""
+    table = database.provider.get_default_entity_table_name(PacketData)
+    rows = database.select(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = $table"
+    )
+    partitions = {}
+    prefix = table + '_p'
+    for name in rows:
+        if name.startswith(prefix):
+            try:
+                partitions[name] = datetime.strptime(name[len(prefix):], PARTITION_DATE_FORMAT)
+            except ValueError:
+                continue
+    return partitions
+
+
+def ensure_partitions(database, days_ahead=3, now=None):
+    """
+    Buat partisi harian dari kemarin sampai ``days_ahead`` hari ke depan
+
+    Args:
+        database: Objek Database Pony
+        days_ahead (int): Jumlah hari ke depan yang disiapkan
+        now (datetime): Waktu acuan (default sekarang)
+
+    Returns:
+        int: Jumlah partisi baru
+    """
+    provider = database.provider
+    quote = provider.quote_name
+    table = provider.get_default_entity_table_name(PacketData)
+    today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    created = 0
+    with db_session:
+        existing = _partition_names(database)
+        for offset in range(-1, days_ahead + 1):
+            day = today + timedelta(days=offset)
+            name = f"{table}_p{day.strftime(PARTITION_DATE_FORMAT)}"
+            if name in existing:
+                continue
+            try:
+                database.execute(
+                    f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} "
+                    f"FOR VALUES FROM ('{day.isoformat(' ')}') TO ('{(day + timedelta(days=1)).isoformat(' ')}')"
+                )
+                commit()
+                created += 1
+            except Exception as e:
+                # Misalnya partisi default sudah berisi row untuk hari itu
+                logger.warning(f"Cannot create partition {name}: {e}")
+                database.rollback()
+    return created
+
+
+def drop_expired_partitions(database, cutoff):
+    """
+    Drop partisi harian yang seluruh isinya lebih tua dari cutoff
+
+    Args:
+        database: Objek Database Pony
+        cutoff (datetime): Batas waktu retensi
+
+    Returns:
+        int: Jumlah partisi yang di-drop
+    """
+    quote = database.provider.quote_name
+    dropped = 0
+    with db_session:
+        for name, day in sorted(_partition_names(database).items(), key=lambda item: item[1]):
+            if day + timedelta(days=1) <= cutoff:
+                database.execute(f"DROP TABLE {quote(name)}")
+                dropped += 1
+    if dropped:
+        logger.info(f"Dropped {dropped} expired PacketData partitions")
+    return dropped
+
+
+def delete_before(entity, attr_name, cutoff, batch_size=5000):
+    """
+    Hapus row lama dalam batch kecil agar transaksi dan lock tetap pendek
+
+    Args:
+        entity: Class entity Pony
+        attr_name (str): Atribut datetime yang dibandingkan dengan cutoff
+        cutoff (datetime): Row sebelum waktu ini dihapus
+        batch_size (int): Jumlah row per transaksi
+
+    Returns:
+        int: Jumlah row yang dihapus
+    """
+    deleted = 0
+    while True:
+        with db_session:
+            ids = select(row.id for row in entity if getattr(row, attr_name) < cutoff)[:batch_size]
+            if not ids:
+                break
+            select(row for row in entity if row.id in ids).delete(bulk=True)
+        deleted += len(ids)
+    return deleted
+
+
+def apply_retention(config, now=None):
+    """
+    Terapkan kebijakan retensi
+
+    Args:
+        config (dict): DB_MAINTENANCE_CONFIG
+        now (datetime): Waktu acuan (default sekarang)
+
+    Returns:
+        dict: Jumlah row/partisi yang dihapus per tabel
+    """
+    now = now or datetime.now()
+    database = PacketData._database_
+    removed = {}
+
+    if config.get('packet_retention_days'):
+        cutoff = now - timedelta(days=config['packet_retention_days'])
+        if config.get('partitioning') and _is_postgres(database):
+            removed['packet_partitions'] = drop_expired_partitions(database, cutoff)
+        removed['packets'] = delete_before(PacketData, 'timestamp', cutoff)
+        removed['flows'] = delete_before(FlowData, 'last_seen', cutoff)
+
+    if config.get('minute_rollup_retention_days'):
+        cutoff = now - timedelta(days=config['minute_rollup_retention_days'])
+        with db_session:
+            removed['minute_rollups'] = select(
+                r for r in TrafficRollup if r.resolution == 'minute' and r.bucket_start < cutoff
+            ).delete(bulk=True)
+
+    if config.get('talker_retention_days'):
+        cutoff = now - timedelta(days=config['talker_retention_days'])
+        with db_session:
+            removed['talker_rollups'] = select(t for t in TalkerRollup if t.bucket_start < cutoff).delete(bulk=True)
+
+    if any(removed.values()):
+        logger.info(f"Retention removed {removed}")
+    return removed
+
+
+def rebuild_rollups(batch_size=50000, archive_dir=None):
+    """
+    Hitung ulang semua rollup dari PacketData (backfill database lama)
+
+    Args:
+        batch_size (int): Jumlah row PacketData yang dibaca per transaksi
+        archive_dir (str): Direktori arsip kolumnar yang ikut dihitung
+            (row yang sudah diarsipkan tidak ada lagi di PacketData)
+
+    Returns:
+        int: Jumlah row yang diproses
+    """
+    from database.db_manager import PACKET_COLUMNS, update_rollups
+
+    with db_session:
+        TrafficRollup.select().delete(bulk=True)
+        TalkerRollup.select().delete(bulk=True)
+
+    processed = 0
+    if archive_dir:
+        columns = ('timestamp', 'src_ip', 'protocol', 'packet_size', 'is_suspicious', 'sampling_rate')
+        for part in PacketArchive(archive_dir).scan(columns, decode=True):
+            values = {name: part[name].tolist() for name in columns}
+            values['timestamp'] = part['timestamp'].astype(datetime).tolist()
+            rows = list(zip(*(values.get(name, [None] * len(part['timestamp'])) for name in PACKET_COLUMNS)))
+            with db_session:
+                update_rollups(rows)
+            processed += len(rows)
+
+    last_id = 0
+    while True:
+        with db_session:
+            packets = select(p for p in PacketData if p.id > last_id).order_by(PacketData.id)[:batch_size]
+            if not packets:
+                break
+            update_rollups([tuple(getattr(p, name) for name in PACKET_COLUMNS) for p in packets])
+            last_id = packets[-1].id
+        processed += len(packets)
+    logger.info(f"Rebuilt rollups from {processed} packets")
+    return processed
+
+
+def backfill_rollups(archive_dir=None):
+    """
+    Isi rollup dari PacketData jika tabel rollup masih kosong
+
+    Database dari versi sebelum rollup berisi PacketData tetapi belum punya
+    TrafficRollup/TalkerRollup, sehingga statistik akan bernilai 0 sampai
+    ``--rebuild-rollups`` dijalankan. Fungsi ini menjalankannya sekali secara
+    otomatis saat startup.
+
+    Args:
+        archive_dir (str): Direktori arsip kolumnar yang ikut dihitung
+
+    Returns:
+        int: Jumlah row yang diproses (0 jika rollup sudah terisi)
+    """
+    with db_session:
+        if TrafficRollup.select().exists() or not PacketData.select().exists():
+            return 0
+    logger.info("Rollup tables are empty, backfilling them from stored packets...")
+    return rebuild_rollups(archive_dir=archive_dir)
+
+
+class DatabaseMaintenance:
+    """Background thread yang menyiapkan partisi dan menerapkan retensi secara berkala"""
+
+    def __init__(self, config):
+        """
+        Initialize database maintenance
+
+        Args:
+            config (dict): DB_MAINTENANCE_CONFIG (interval_seconds,
+                packet_retention_days, minute_rollup_retention_days,
+                talker_retention_days, partitioning, partition_days_ahead,
+                archive_dir, archive_after_days)
+        """
+        self.config = config
+        self.interval = config.get('interval_seconds', 3600)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """Satu putaran pemeliharaan"""
+        database = PacketData._database_
+        if self.config.get('partitioning') and _is_postgres(database):
+            ensure_partitions(database, self.config.get('partition_days_ahead', 3))
+        # Arsip dulu agar retensi tidak menghapus row yang belum diarsipkan
+        if self.config.get('archive_dir') and self.config.get('archive_after_days'):
+            cutoff = datetime.now() - timedelta(days=self.config['archive_after_days'])
+            archive_packets(self.config['archive_dir'], cutoff)
+        apply_retention(self.config)
+
+    def start(self):
+        """Jalankan pemeliharaan sekarang lalu setiap ``interval_seconds``"""
+        self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Database maintenance failed: {e}")
+            if self._stop.wait(self.interval):
+                break
@@ -1,13 +1,13 @@
 from datetime import datetime
-from pony.orm import Database, Required, Optional, PrimaryKey
+from pony.orm import Database, Required, Optional, PrimaryKey, composite_key, composite_index
 
 db = Database()
 
 class PacketData(db.Entity):
     id = PrimaryKey(int, auto=True)
-    timestamp = Required(datetime)
-    src_ip = Required(str)
-    dst_ip = Required(str)
+    timestamp = Required(datetime, index=True)
+    src_ip = Required(str, index=True)
+    dst_ip = Required(str, index=True)
     protocol = Required(str)
     src_port = Required(int)
     dst_port = Required(int)
@@ -23,8 +23,77 @@ class PacketData(db.Entity):
     
     ml_model_version = Required(str)
     analysis_duration_ms = Optional(float)
+    sampling_rate = Required(float, default=1.0)  # <1 jika diambil lewat load shedding
+    
+    # Query paket mencurigakan terbaru
+    composite_index(is_suspicious, timestamp)
+
+class FlowData(db.Entity):
+    id = PrimaryKey(int, auto=True)
+    first_seen = Required(datetime)
+    last_seen = Required(datetime)
+    src_ip = Required(str)
+    dst_ip = Required(str)
+    protocol = Required(str)
+    src_port = Required(int)
+    dst_port = Required(int)
+    
+    duration_ms = Required(float)
+    packet_count = Required(int, size=64)
+    fwd_packet_count = Required(int, size=64)
+    byte_count = Required(int, size=64)
+    fin_count = Required(int)
+    syn_count = Required(int)
+    rst_count = Required(int)
+    psh_count = Required(int)
+    ack_count = Required(int)
+    urg_count = Required(int)
+    ece_count = Required(int)
+    cwr_count = Required(int)
+    iat_mean_ms = Optional(float)
+    iat_std_ms = Optional(float)
+    iat_min_ms = Optional(float)
+    iat_max_ms = Optional(float)
+    end_reason = Required(str)
+    
+    analyzer_type = Required(str)
+    anomaly_score = Required(float)
+    cluster = Required(int)
+    is_suspicious = Required(bool)
+    
+    ml_model_version = Required(str)
+    analysis_duration_ms = Optional(float)
+    sampling_rate = Required(float, default=1.0)
+
+class TrafficRollup(db.Entity):
+    """Jumlah paket per menit/jam dan protokol, diperbarui oleh writer"""
+    id = PrimaryKey(int, auto=True)
+    resolution = Required(str)  # 'minute' atau 'hour'
+    bucket_start = Required(datetime)
+    protocol = Required(str)
+    
+    stored_rows = Required(int, size=64)
+    sampled_rows = Required(int, size=64)
+    # Perkiraan trafik asli (setiap row dihitung 1 / sampling_rate)
+    packets = Required(float)
+    bytes = Required(float)
+    suspicious = Required(float)
     
-def initialize_database(db_config):
+    composite_key(resolution, bucket_start, protocol)
+
+class TalkerRollup(db.Entity):
+    """Jumlah paket per jam untuk setiap IP sumber (top talkers)"""
+    id = PrimaryKey(int, auto=True)
+    bucket_start = Required(datetime)
+    src_ip = Required(str)
+    
+    packets = Required(float)
+    bytes = Required(float)
+    suspicious = Required(float)
+    
+    composite_key(bucket_start, src_ip)
+    
+def initialize_database(db_config, partitioned=False, partition_days_ahead=3):
     """
     Initialize the database connection and create tables.
 
@@ -37,8 +106,18 @@ def initialize_database(db_config):
         - host: The hostname or IP address of the database server
         - database: The name of the database to connect to
 
+    :param partitioned: Create PacketData as a table partitioned by day
+        (PostgreSQL only, see database.maintenance).
+    :param partition_days_ahead: Number of future daily partitions to create.
+
     :return: The initialized Database object
     """
     db.bind(**db_config)
+    # Kolom baru untuk tabel dari versi sebelumnya (lihat database.maintenance)
+    from database.maintenance import add_missing_columns
+    add_missing_columns(db)
+    if partitioned:
+        from database.maintenance import create_partitioned_packet_table
+        create_partitioned_packet_table(db, partition_days_ahead)
     db.generate_mapping(create_tables=True)
     return db
@@ -0,0 +1,240 @@
+"""
+Filtered, keyset-paginated queries over PacketData and streaming export.
+
+Pages are ordered newest first by ``(timestamp, id)`` and continue from an
+opaque cursor instead of an OFFSET, so every page is one indexed range scan
+with LIMIT in SQL, however deep the caller pages. Rows are returned as plain
+dicts selected column by column, each page in its own db_session, so
+streaming a whole table keeps memory constant.
+"""
+import csv
+import json
+import ipaddress
+from datetime import datetime
+
+from pony.orm import db_session, select
+from database.models import PacketData
+from database.db_manager import PACKET_COLUMNS
+
+# Columns returned by the query API (PACKET_COLUMNS plus the primary key)
+QUERY_COLUMNS = ('id',) + PACKET_COLUMNS
+
+CURSOR_SEPARATOR = '|'
+
+
+def encode_cursor(row):
+    """
+    Return the cursor that continues after ``row``.
+
+    :param row: A row dict returned by the query API.
+    """
+    return f"{row['timestamp'].isoformat()}{CURSOR_SEPARATOR}{row['id']}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor from ``encode_cursor``.
+
+    :param cursor: The cursor string.
+    :return: A (timestamp, id) tuple.
+    :raises ValueError: If the cursor is malformed.
+    """
+    timestamp, _, row_id = cursor.rpartition(CURSOR_SEPARATOR)
+    return datetime.fromisoformat(timestamp), int(row_id)
+
+
+def _address_filter(spec):
+    """
+    Split an IP or CIDR filter into an SQL part and an exact Python check.
+
+    A plain address is matched with equality (using the src_ip/dst_ip
+    indexes). Addresses are stored as text, so an IPv4 network is narrowed
+    in SQL with the prefix of its whole octets ('10.1.' for 10.1.0.0/16) and
+    checked exactly in Python only when the prefix length is not a multiple
+    of 8. IPv6 networks are checked in Python only.
+
+    :param spec: An address ('10.0.0.5') or network ('10.0.0.0/8').
+    :return: A (kind, value, network) tuple where kind is 'equals', 'prefix'
+        or None and network is the ip_network to check rows against, or None
+        when the SQL condition is exact.
+    """
+    if '/' not in spec:
+        return 'equals', str(ipaddress.ip_address(spec)), None
+    network = ipaddress.ip_network(spec, strict=False)
+    if network.version != 4:
+        return None, None, network
+    whole_octets = network.prefixlen // 8
+    if whole_octets == 4:
+        return 'equals', str(network.network_address), None
+    prefix = ''.join(f"{octet}." for octet in network.network_address.packed[:whole_octets])
+    exact = network.prefixlen % 8 == 0
+    return ('prefix' if prefix else None), prefix, (None if exact else network)
+
+
+def _apply_address(query, attr_names, spec, checks):
+    """Add an IP/CIDR condition on one or more address columns to the query."""
+    kind, value, network = _address_filter(spec)
+    if network is not None:
+        checks.append((attr_names, network))
+    if kind is None:
+        return query
+    if attr_names == ('src_ip',):
+        if kind == 'equals':
+            return query.where(lambda p: p.src_ip == value)
+        return query.where(lambda p: p.src_ip.startswith(value))
+    if attr_names == ('dst_ip',):
+        if kind == 'equals':
+            return query.where(lambda p: p.dst_ip == value)
+        return query.where(lambda p: p.dst_ip.startswith(value))
+    if kind == 'equals':
+        return query.where(lambda p: p.src_ip == value or p.dst_ip == value)
+    return query.where(lambda p: p.src_ip.startswith(value) or p.dst_ip.startswith(value))
+
+
+def _matches(row, checks):
+    """Apply the Python-side network checks to a row."""
+    for attr_names, network in checks:
+        for name in attr_names:
+            try:
+                if ipaddress.ip_address(row[name]) in network:
+                    break
+            except ValueError:
+                continue
+        else:
+            return False
+    return True
+
+
+def _build_query(since=None, until=None, ip=None, src_ip=None, dst_ip=None, port=None,
+                 protocol=None, cluster=None, min_score=None, max_score=None, suspicious_only=True):
+    """Return the filtered column query (unordered) and the Python-side checks."""
+    query = select(
+        (p.id, p.timestamp, p.src_ip, p.dst_ip, p.protocol, p.src_port, p.dst_port,
+         p.packet_size, p.flags, p.ttl, p.window_size,
+         p.analyzer_type, p.anomaly_score, p.cluster, p.is_suspicious,
+         p.ml_model_version, p.analysis_duration_ms, p.sampling_rate)
+        for p in PacketData
+    )
+    checks = []
+    if suspicious_only:
+        query = query.where(lambda p: p.is_suspicious)
+    if since is not None:
+        query = query.where(lambda p: p.timestamp >= since)
+    if until is not None:
+        query = query.where(lambda p: p.timestamp < until)
+    if ip:
+        query = _apply_address(query, ('src_ip', 'dst_ip'), ip, checks)
+    if src_ip:
+        query = _apply_address(query, ('src_ip',), src_ip, checks)
+    if dst_ip:
+        query = _apply_address(query, ('dst_ip',), dst_ip, checks)
+    if port is not None:
+        query = query.where(lambda p: p.src_port == port or p.dst_port == port)
+    if protocol is not None:
+        protocol = str(protocol)
+        query = query.where(lambda p: p.protocol == protocol)
+    if cluster is not None:
+        query = query.where(lambda p: p.cluster == cluster)
+    if min_score is not None:
+        query = query.where(lambda p: p.anomaly_score >= min_score)
+    if max_score is not None:
+        query = query.where(lambda p: p.anomaly_score < max_score)
+    return query, checks
+
+
+def _fetch_page(query, after, limit):
+    """Select up to ``limit`` rows older than the ``after`` key as dicts."""
+    if after is not None:
+        after_timestamp, after_id = after
+        # Upper bound on timestamp alone keeps the condition an index range scan
+        query = query.where(lambda p: p.timestamp <= after_timestamp and
+                            (p.timestamp < after_timestamp or p.id < after_id))
+    # The query selects a column tuple, so order by position: timestamp (2), id (1)
+    query = query.order_by(-2, -1)
+    return [dict(zip(QUERY_COLUMNS, values)) for values in query[:limit]]
+
+
+def iter_packets(after=None, batch_size=1000, **filters):
+    """
+    Stream matching packets newest first, one SQL page at a time.
+
+    :param after: (Optional) Cursor from ``encode_cursor``; only rows after it are returned.
+    :param batch_size: Rows fetched per query (and per db_session).
+    :param filters: Filters, all optional:
+        - since / until: Time range (datetime, until is exclusive).
+        - ip: Address or CIDR matched against either src_ip or dst_ip.
+        - src_ip / dst_ip: Address or CIDR for one direction.
+        - port: Matched against either src_port or dst_port.
+        - protocol: IP protocol number.
+        - cluster: Cluster ID.
+        - min_score / max_score: Anomaly score range (max is exclusive).
+        - suspicious_only: Only suspicious packets (default True).
+    :return: A generator of row dicts (keys in QUERY_COLUMNS).
+    """
+    key = decode_cursor(after) if after else None
+    while True:
+        with db_session:
+            query, checks = _build_query(**filters)
+            rows = _fetch_page(query, key, batch_size)
+        if not rows:
+            return
+        for row in rows:
+            if not checks or _matches(row, checks):
+                yield row
+        if len(rows) < batch_size:
+            return
+        key = (rows[-1]['timestamp'], rows[-1]['id'])
+
+
+def query_packets(limit=100, after=None, **filters):
+    """
+    Return one page of matching packets, newest first.
+
+    Without a CIDR filter that needs a Python check the page is a single
+    query with LIMIT in SQL. Filters are the same as for ``iter_packets``.
+
+    :param limit: The maximum number of rows to return.
+    :param after: (Optional) Cursor returned with the previous page.
+    :return: A (rows, next_cursor) tuple; next_cursor is None on the last page.
+    """
+    rows = []
+    for row in iter_packets(after=after, batch_size=limit + 1, **filters):
+        if len(rows) == limit:
+            return rows, encode_cursor(rows[-1])
+        rows.append(row)
+    return rows, None
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_packets(output, fmt='jsonl', batch_size=1000, **filters):
+    """
+    Write matching packets to a text stream as CSV or JSON lines.
+
+    Rows are streamed page by page, so memory use does not grow with the
+    number of exported rows.
+
+    :param output: A writable text file object.
+    :param fmt: 'csv' or 'jsonl'.
+    :param batch_size: Rows fetched per query.
+    :param filters: Filters as for ``iter_packets`` (plus ``after``).
+    :return: The number of rows written.
+    """
+    rows = iter_packets(batch_size=batch_size, **filters)
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(QUERY_COLUMNS)
+        for row in rows:
+            writer.writerow([_json_value(row[name]) for name in QUERY_COLUMNS])
+            count += 1
+    elif fmt == 'jsonl':
+        for row in rows:
+            output.write(json.dumps({name: _json_value(value) for name, value in row.items()}))
+            output.write('\n')
+            count += 1
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return count
@@ -1,11 +1,11 @@
 import argparse
+import sys
 import time
+from datetime import datetime, timedelta
 from database.models import initialize_database
-from ml.analyzer import NetworkTrafficAnalyzer
-from ml.external_integration import ExternalMLIntegration
-from packet_processing.capture import PacketCaptureManager
-from utils.logging_utils import get_logger
-from config import DB_CONFIG, ML_CONFIG, CAPTURE_CONFIG, LOG_CONFIG
+from utils.logging_utils import get_logger, configure_logging
+from config import (DB_CONFIG, DB_WRITER_CONFIG, DB_MAINTENANCE_CONFIG, ML_CONFIG, CAPTURE_CONFIG,
+                    LOG_CONFIG, METRICS_CONFIG, REMOTE_CONFIG)
 
 logger = get_logger(__name__, log_file=LOG_CONFIG['log_file'], level=LOG_CONFIG['log_level'])
 
@@ -17,47 +17,319 @@ def parse_arguments():
     parser.add_argument('--ml-type', choices=['internal', 'external', 'hybrid'],
                         default='internal', help='Type of ML analysis to use')
     parser.add_argument('--filter', type=str, help='BPF filter for packet capture')
+    parser.add_argument('--capture-backend', choices=['scapy', 'af_packet'],
+                        help='Live capture backend: scapy sniff or Linux AF_PACKET TPACKET_V3 ring')
+    parser.add_argument('--extractor', choices=['scapy', 'raw'],
+                        help='Feature extraction backend (raw reads header fields directly from frame bytes)')
+    parser.add_argument('--aggregate', choices=['packet', 'flow'],
+                        help='Store and analyze one row per packet or one row per expired flow')
+    parser.add_argument('--batch-size', type=int,
+                        help='Number of packets scored together by the ML analyzer (>1 enables micro-batching)')
+    parser.add_argument('--pcap', action='append', metavar='PATH',
+                        help='Replay a pcap/pcapng file, directory or glob instead of live capture (repeatable)')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Replay at the original packet timing instead of as fast as possible')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Speed multiplier for --realtime replay')
+    parser.add_argument('--model', type=str, metavar='PATH',
+                        help='Warm start the internal analyzer from this model snapshot (.npz)')
+    parser.add_argument('--workers', type=int,
+                        help='Number of analysis worker processes (>1 enables pipeline mode)')
+    parser.add_argument('--role', choices=['standalone', 'sensor', 'collector'],
+                        help='Run everything in one process, only capture and stream features to a '
+                             'collector (sensor), or analyze and store streams from sensors (collector)')
+    parser.add_argument('--collector-address', type=str, metavar='HOST:PORT',
+                        help='Collector a sensor streams features to')
+    parser.add_argument('--listen', type=str, metavar='[HOST:]PORT',
+                        help='Address the collector accepts sensor connections on')
+    parser.add_argument('--sensor-name', type=str, help='Name reported by this sensor (default hostname)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Port for the Prometheus /metrics endpoint (0 disables)')
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help='Recompute the statistics rollup tables from stored packets and exit')
+    
+    subparsers = parser.add_subparsers(dest='command')
+    export_parser = subparsers.add_parser('export', help='Export stored packets as CSV or JSON lines (newest first)')
+    export_parser.add_argument('--format', choices=['csv', 'jsonl'], default='jsonl', help='Output format')
+    export_parser.add_argument('--output', '-o', type=str, help='Output file (default stdout)')
+    export_parser.add_argument('--all', action='store_true', help='Include packets that are not suspicious')
+    export_parser.add_argument('--since', type=datetime.fromisoformat, help='Start time (ISO format)')
+    export_parser.add_argument('--until', type=datetime.fromisoformat, help='End time, exclusive (ISO format)')
+    export_parser.add_argument('--ip', type=str, help='Source or destination address or CIDR')
+    export_parser.add_argument('--src-ip', type=str, help='Source address or CIDR')
+    export_parser.add_argument('--dst-ip', type=str, help='Destination address or CIDR')
+    export_parser.add_argument('--port', type=int, help='Source or destination port')
+    export_parser.add_argument('--protocol', type=int, help='IP protocol number')
+    export_parser.add_argument('--cluster', type=int, help='Cluster ID')
+    export_parser.add_argument('--min-score', type=float, help='Minimum anomaly score')
+    export_parser.add_argument('--max-score', type=float, help='Maximum anomaly score (exclusive)')
+    export_parser.add_argument('--after', type=str, metavar='CURSOR',
+                               help='Continue after this cursor (timestamp|id of the last exported row)')
+    stats_parser = subparsers.add_parser('stats', help='Print traffic totals, protocols and top talkers and exit')
+    stats_parser.add_argument('--since', type=datetime.fromisoformat, help='Start time (ISO format)')
+    stats_parser.add_argument('--top', type=int, default=10, help='Number of top talkers to show')
+    suspicious_parser = subparsers.add_parser('suspicious', help='Print the most recent suspicious packets and exit')
+    suspicious_parser.add_argument('--limit', type=int, default=20, help='Number of packets to show')
+    archive_parser = subparsers.add_parser('archive', help='Move aged packets into the columnar archive and exit')
+    archive_parser.add_argument('--archive-dir', type=str, help='Archive directory (default DB_ARCHIVE_DIR)')
+    archive_parser.add_argument('--after-days', type=int,
+                                help='Archive whole days older than this many days (default DB_ARCHIVE_AFTER_DAYS)')
     
     return parser.parse_args()
 
+def run_stats(args):
+    """Tampilkan statistik trafik dari tabel rollup"""
+    from database.db_manager import get_packet_stats, get_protocol_breakdown, get_top_talkers
+    
+    stats = get_packet_stats(args.since)
+    print(f"Packets:    {stats['total_packets']} ({stats['stored_packets']} stored, "
+          f"{stats['sampled_packets']} sampled)")
+    print(f"Suspicious: {stats['suspicious_packets']} ({stats['suspicious_percentage']:.2f}%)")
+    print("\nProtocol      packets        bytes   suspicious")
+    for row in get_protocol_breakdown(args.since):
+        print(f"{row['protocol']:<8} {row['packets']:>12} {row['bytes']:>12} {row['suspicious']:>12}")
+    print("\nSource IP                                  packets        bytes   suspicious")
+    for row in get_top_talkers(args.since, args.top):
+        print(f"{row['src_ip']:<39} {row['packets']:>12} {row['bytes']:>12} {row['suspicious']:>12}")
+
+def run_suspicious(args):
+    """Tampilkan paket mencurigakan terbaru"""
+    from database.db_manager import get_suspicious_packet
+    
+    for packet in get_suspicious_packet(args.limit):
+        print(f"{packet.timestamp.isoformat(' ')}  {packet.src_ip}:{packet.src_port} -> "
+              f"{packet.dst_ip}:{packet.dst_port}  proto={packet.protocol}  "
+              f"score={packet.anomaly_score:.3f}  cluster={packet.cluster}  model={packet.ml_model_version}")
+
+def run_archive(args):
+    """Pindahkan paket lama ke arsip kolumnar"""
+    from database.archive import archive_packets
+    
+    archive_dir = args.archive_dir or DB_MAINTENANCE_CONFIG['archive_dir']
+    if not archive_dir:
+        logger.error("No archive directory, set DB_ARCHIVE_DIR or --archive-dir")
+        return
+    days = args.after_days if args.after_days is not None else DB_MAINTENANCE_CONFIG['archive_after_days']
+    count = archive_packets(archive_dir, datetime.now() - timedelta(days=days))
+    logger.info(f"Archived {count} packets to {archive_dir}")
+
+def run_export(args):
+    """Tulis paket dari database ke file atau stdout"""
+    from database.queries import export_packets
+    
+    filters = {
+        'since': args.since, 'until': args.until, 'ip': args.ip,
+        'src_ip': args.src_ip, 'dst_ip': args.dst_ip, 'port': args.port,
+        'protocol': args.protocol, 'cluster': args.cluster,
+        'min_score': args.min_score, 'max_score': args.max_score,
+        'suspicious_only': not args.all, 'after': args.after,
+    }
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        count = export_packets(output, args.format, **filters)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    logger.info(f"Exported {count} packets")
+
+def run_pipeline(args):
+    """Jalankan capture dengan pipeline multi-proses"""
+    from packet_processing.pipeline import PipelineCaptureManager
+    from packet_processing.replay import expand_capture_paths
+    
+    worker_config = {
+        'ml_type': args.ml_type,
+        'ml_config': ML_CONFIG,
+        'db_config': DB_CONFIG,
+        'db_writer_config': DB_WRITER_CONFIG,
+        'log_config': LOG_CONFIG,
+        'metrics_port': METRICS_CONFIG['port'],
+        'metrics_host': METRICS_CONFIG['host'],
+    }
+    capture_manager = PipelineCaptureManager(CAPTURE_CONFIG, worker_config)
+    
+    logger.info("Starting Network Traffic Analysis...")
+    if args.pcap:
+        capture_manager.replay(expand_capture_paths(args.pcap), args.realtime, args.replay_speed)
+    else:
+        capture_manager.start_capture()
+
 def main():
     """Fungsi utama aplikasi"""
     args = parse_arguments()
+    configure_logging(LOG_CONFIG)
     
     # Update konfigurasi dengan argumen command line
     if args.interface:
         CAPTURE_CONFIG['interface'] = args.interface
     if args.filter:
         CAPTURE_CONFIG['filter'] = args.filter
+    if args.capture_backend:
+        CAPTURE_CONFIG['backend'] = args.capture_backend
+    if args.extractor:
+        CAPTURE_CONFIG['extractor'] = args.extractor
+    if args.aggregate:
+        CAPTURE_CONFIG['aggregation'] = args.aggregate
+    if args.batch_size:
+        CAPTURE_CONFIG['analysis_batch_size'] = args.batch_size
+    if args.workers:
+        CAPTURE_CONFIG['workers'] = args.workers
+    if args.model:
+        ML_CONFIG['internal']['model_snapshot'] = args.model
+    if args.metrics_port is not None:
+        METRICS_CONFIG['port'] = args.metrics_port
+    if args.role:
+        REMOTE_CONFIG['role'] = args.role
+    if args.collector_address:
+        REMOTE_CONFIG['collector_address'] = args.collector_address
+    if args.listen:
+        REMOTE_CONFIG['listen_address'] = args.listen
+    if args.sensor_name:
+        REMOTE_CONFIG['sensor_name'] = args.sensor_name
+    
+    # Sensor tidak memakai database maupun analyzer ML
+    if REMOTE_CONFIG['role'] == 'sensor' and not args.command and not args.rebuild_rollups:
+        run_sensor(args)
+        return
     
-    # Inisialisasi database
+    # Inisialisasi database sekali di proses utama (skema, index dan partisi)
     logger.info("Initializing database connection...")
-    db = initialize_database(DB_CONFIG)
+    db = initialize_database(DB_CONFIG, DB_MAINTENANCE_CONFIG['partitioning'],
+                             DB_MAINTENANCE_CONFIG['partition_days_ahead'])
+    if args.rebuild_rollups:
+        from database.maintenance import rebuild_rollups
+        rebuild_rollups(archive_dir=DB_MAINTENANCE_CONFIG['archive_dir'])
+        return
+    
+    # Database lama tanpa rollup: statistik dihitung ulang sekali dari PacketData
+    from database.maintenance import backfill_rollups
+    backfill_rollups(archive_dir=DB_MAINTENANCE_CONFIG['archive_dir'])
+    if args.command:
+        COMMANDS[args.command](args)
+        return
+    run_capture(args)
+
+def run_sensor(args):
+    """Jalankan sensor: capture dan ekstraksi fitur, fitur dikirim ke collector"""
+    from packet_processing.remote import SensorCaptureManager
+    from packet_processing.replay import expand_capture_paths
+    from utils.metrics import start_metrics_server, StatsReporter
+    
+    if METRICS_CONFIG['port']:
+        start_metrics_server(METRICS_CONFIG['port'], METRICS_CONFIG['host'])
+    stats_reporter = None
+    if METRICS_CONFIG['stats_interval_seconds'] > 0:
+        stats_reporter = StatsReporter(METRICS_CONFIG['stats_interval_seconds'])
+        stats_reporter.start()
+    
+    capture_manager = SensorCaptureManager(CAPTURE_CONFIG, REMOTE_CONFIG)
+    try:
+        logger.info(f"Starting sensor, streaming features to {REMOTE_CONFIG['collector_address']}...")
+        if args.pcap:
+            capture_manager.replay(expand_capture_paths(args.pcap), args.realtime, args.replay_speed)
+        else:
+            capture_manager.start_capture()
+    except KeyboardInterrupt:
+        logger.info("Sensor terminated by user")
+    except Exception as e:
+        logger.error(f"Error in sensor: {e}")
+    finally:
+        if stats_reporter:
+            stats_reporter.stop()
+        logger.info("Sensor shutdown complete")
+
+def run_capture(args):
+    """Jalankan penangkapan dan analisis paket"""
+    # Dependensi berat (Scapy, scikit-learn, requests) hanya dimuat untuk capture
+    from database.db_manager import BatchedPacketWriter
+    from database.maintenance import DatabaseMaintenance
+    from ml.factory import create_analyzer
+    from packet_processing.capture import PacketCaptureManager
+    from packet_processing.replay import expand_capture_paths
+    from utils.metrics import start_metrics_server, StatsReporter
+    
+    maintenance = DatabaseMaintenance(DB_MAINTENANCE_CONFIG)
+    maintenance.start()
+    
+    # Endpoint metrik dan baris stats berkala
+    if METRICS_CONFIG['port']:
+        start_metrics_server(METRICS_CONFIG['port'], METRICS_CONFIG['host'])
+    stats_reporter = None
+    if METRICS_CONFIG['stats_interval_seconds'] > 0:
+        stats_reporter = StatsReporter(METRICS_CONFIG['stats_interval_seconds'])
+        stats_reporter.start()
+    
+    is_collector = REMOTE_CONFIG['role'] == 'collector'
+    if CAPTURE_CONFIG['workers'] > 1 and not is_collector:
+        # Setiap worker membuat koneksi database dan analyzer sendiri
+        try:
+            run_pipeline(args)
+        except KeyboardInterrupt:
+            logger.info("Application terminated by user")
+        except Exception as e:
+            logger.error(f"Error in main application: {e}")
+        finally:
+            maintenance.stop()
+            if stats_reporter:
+                stats_reporter.stop()
+            logger.info("Application shutdown complete")
+        return
+    
+    db_writer = BatchedPacketWriter(DB_WRITER_CONFIG)
+    db_writer.start()
     
     # Inisialisasi ML analyzer berdasarkan pilihan
     logger.info(f"Initializing ML analyzer (type: {args.ml_type})...")
-    
-    if args.ml_type == 'internal':
-        analyzer = NetworkTrafficAnalyzer(ML_CONFIG['internal'])
-    elif args.ml_type == 'external':
-        analyzer = ExternalMLIntegration(ML_CONFIG['external'])
-    else:  # hybrid - implementasi untuk mengombinasikan hasil internal dan eksternal
-        # Implementasi hybrid bisa dibuat sebagai wrapper kedua analyzer
-        pass
+    analyzer = create_analyzer(args.ml_type, ML_CONFIG)
     
     # Inisialisasi packet capture manager
-    capture_manager = PacketCaptureManager(analyzer, CAPTURE_CONFIG)
+    collector = None
+    if is_collector:
+        from packet_processing.remote import Collector
+        # Trust list, sketch perilaku dan agregasi flow sudah dijalankan sensor
+        collector_config = dict(CAPTURE_CONFIG, aggregation='packet', trust_list={}, host_sketches={})
+        capture_manager = PacketCaptureManager(analyzer, collector_config, db_writer=db_writer)
+        collector = Collector(REMOTE_CONFIG, capture_manager)
+    else:
+        capture_manager = PacketCaptureManager(analyzer, CAPTURE_CONFIG, db_writer=db_writer)
     
     # Mulai proses penangkapan
     try:
         logger.info("Starting Network Traffic Analysis...")
-        capture_manager.start_capture()
+        if collector is not None:
+            try:
+                collector.run()
+            finally:
+                capture_manager.close()
+        elif args.pcap:
+            capture_manager.replay(expand_capture_paths(args.pcap), args.realtime, args.replay_speed)
+        else:
+            capture_manager.start_capture()
     except KeyboardInterrupt:
         logger.info("Application terminated by user")
     except Exception as e:
         logger.error(f"Error in main application: {e}")
     finally:
+        db_writer.stop()
+        maintenance.stop()
+        if stats_reporter:
+            stats_reporter.stop()
+        stats = db_writer.get_stats()
+        logger.info(f"Database writer: {stats['queued']} queued, {stats['written']} written, "
+                    f"{stats['dropped']} dropped, {stats['failed']} failed")
+        if collector is not None:
+            for name, sensor in collector.get_stats()['sensors'].items():
+                logger.info(f"Sensor '{name}': {sensor['records']} records in {sensor['batches']} batches, "
+                            f"{sensor['connects']} connections")
         logger.info("Application shutdown complete")
 
+# Subcommand yang hanya membaca/menulis database lalu keluar
+COMMANDS = {
+    'stats': run_stats,
+    'suspicious': run_suspicious,
+    'export': run_export,
+    'archive': run_archive,
+}
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
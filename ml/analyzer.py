@@ -1,13 +1,28 @@
+import copy
 import time
+import threading
+from collections import namedtuple
+
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 
+from ml.scoring import FusedScorer
+from ml.snapshot import save_snapshot, load_snapshot, latest_snapshot, prune_snapshots
+from ml.training_window import TrainingWindow
 from packet_processing.feature_extraction import prepare_ml_features
 from utils.logging_utils import get_logger
+from utils import metrics
 
 logger = get_logger(__name__)
 
+TRAINING_SECONDS = metrics.histogram('nta_model_training_seconds', 'Duration of model training runs', ('mode',))
+MODEL_VERSION = metrics.gauge('nta_model_version', 'Active internal model version', ('part',))
+
+# Model yang sudah dilatih; diganti sebagai satu objek agar swap bersifat atomik.
+# scorer adalah FusedScorer hasil kompilasi scaler + model (None = jalur sklearn)
+ModelState = namedtuple('ModelState', ['scaler', 'model', 'version', 'scorer'], defaults=(None,))
+
 class NetworkTrafficAnalyzer:
     """Analyzer jaringan menggunakan clustering K-means"""
     
@@ -19,24 +34,222 @@ class NetworkTrafficAnalyzer:
             config (dict): Konfigurasi untuk analyzer
         """
         self.config = config
-        self.scaler = StandardScaler()
-        self.model = KMeans(n_clusters=config['n_clusters'], random_state=42)
-        self.trained = False
-        self.buffer = []
+        self.n_clusters = config['n_clusters']
         self.buffer_size = config['buffer_size']
         self.suspicious_threshold = config['suspicious_threshold']
+        
+        # 'full': KMeans dilatih ulang dari awal, 'incremental': MiniBatchKMeans.partial_fit
+        self.training_mode = config.get('training_mode', 'full')
+        # Jumlah paket baru sebelum model diperbarui (0 = hanya training pertama)
+        self.retrain_interval = config.get('retrain_interval', 0)
+        self.background_training = config.get('background_training', True)
+        # Scoring dengan kernel FusedScorer alih-alih transform/predict sklearn per panggilan
+        self.fast_scoring = config.get('fast_scoring', True)
+        
+        # Snapshot model: disimpan setiap selesai training, dimuat saat start
+        self.model_dir = config.get('model_dir')
+        self.snapshot_keep = config.get('snapshot_keep', 5)
+        
+        # Window fitur training (float32 prealokasi): 'recent' = paket terbaru,
+        # 'reservoir' = sampel acak seragam dari semua paket yang pernah diamati
+        self.buffer = TrainingWindow(self.buffer_size, len(prepare_ml_features({})),
+                                     config.get('window_mode', 'recent'), seed=42)
+        self.packets_since_training = 0
+        
+        self.state = None
+        self.version_major = 0
+        self.version_minor = 0
+        self.training_in_progress = False
+        self.trained_packets = 0
+        self._training_thread = None
+        
+        if config.get('warm_start', True):
+            snapshot_path = config.get('model_snapshot') or (
+                latest_snapshot(self.model_dir) if self.model_dir else None
+            )
+            if snapshot_path:
+                try:
+                    # Snapshot terbaru di MODEL_DIR hanya dipakai jika N_CLUSTERS sama,
+                    # snapshot yang dipilih eksplisit selalu dimuat
+                    self.load_model(snapshot_path, match_clusters=not config.get('model_snapshot'))
+                except Exception as e:
+                    logger.error(f"Error loading model snapshot {snapshot_path}: {e}")
+    
+    @property
+    def trained(self):
+        """True jika sudah ada model yang dapat dipakai untuk scoring"""
+        return self.state is not None
     
     def train_if_needed(self):
-        """Train model jika buffer mencapai threshold"""
-        if len(self.buffer) >= self.buffer_size:
-            logger.info(f"Training model on {len(self.buffer)} packets...")
-            X = np.array(self.buffer)
-            self.scaler.fit(X)
-            X_scaled = self.scaler.transform(X)
-            self.model.fit(X_scaled)
-            self.trained = True
-            self.buffer = []  # Clear buffer after training
-            logger.info("Model training complete.")
+        """Mulai training jika buffer penuh atau interval retrain tercapai"""
+        if self.training_in_progress or not self.buffer.full:
+            return
+        
+        if self.state is None:
+            window = None
+            incremental = False
+        elif self.retrain_interval and self.packets_since_training >= self.retrain_interval:
+            incremental = self.training_mode == 'incremental'
+            window = self.packets_since_training if incremental else None
+        else:
+            return
+        
+        # Satu salinan float64 (presisi model dan scoring) sekaligus snapshot
+        # yang aman dibaca thread training selama window terus ditulis
+        X = self.buffer.rows(window, dtype=np.float64)
+        self.packets_since_training = 0
+        self.training_in_progress = True
+        if self.background_training:
+            self._training_thread = threading.Thread(
+                target=self._train, args=(X, incremental), name='model-training', daemon=True
+            )
+            self._training_thread.start()
+        else:
+            self._train(X, incremental)
+    
+    def save_model(self, directory=None):
+        """
+        Simpan model aktif sebagai snapshot
+        
+        Args:
+            directory (str): Direktori tujuan (default: model_dir dari konfigurasi)
+        
+        Returns:
+            str: Path snapshot, atau None jika belum ada model
+        """
+        state = self.state
+        directory = directory or self.model_dir
+        if state is None or not directory:
+            return None
+        
+        path = save_snapshot(directory, state, {
+            'n_clusters': state.model.n_clusters,
+            'suspicious_threshold': self.suspicious_threshold,
+            'training_mode': self.training_mode,
+            'trained_packets': self.trained_packets,
+        })
+        prune_snapshots(directory, self.snapshot_keep)
+        logger.info(f"Model {state.version} saved to {path}")
+        return path
+    
+    def load_model(self, path, match_clusters=False):
+        """
+        Muat snapshot dan jadikan model aktif
+        
+        ``n_clusters`` dan ``suspicious_threshold`` dari konfigurasi tetap
+        berlaku; snapshot hanya menyediakan scaler dan centroid.
+        
+        Args:
+            path (str): Path file snapshot
+            match_clusters (bool): Lewati snapshot yang jumlah clusternya
+                berbeda dari ``n_clusters`` konfigurasi
+        
+        Returns:
+            bool: True jika snapshot dimuat
+        """
+        start_time = time.time()
+        scaler, model, version, metadata = load_snapshot(path)
+        n_features = len(prepare_ml_features({}))
+        if scaler.n_features_in_ != n_features:
+            raise ValueError(f"snapshot has {scaler.n_features_in_} features, expected {n_features}")
+        
+        if model.n_clusters != self.n_clusters:
+            if match_clusters:
+                logger.warning(f"Model snapshot {path} has {model.n_clusters} clusters but N_CLUSTERS is "
+                               f"{self.n_clusters}, not loading it; a new model will be trained")
+                return False
+            logger.warning(f"Model snapshot {path} has {model.n_clusters} clusters but N_CLUSTERS is "
+                           f"{self.n_clusters}; the next full training uses {self.n_clusters}")
+        
+        saved_threshold = metadata.get('suspicious_threshold', self.suspicious_threshold)
+        if saved_threshold != self.suspicious_threshold:
+            logger.info(f"Model snapshot was saved with suspicious threshold {saved_threshold}, "
+                        f"using the configured {self.suspicious_threshold}")
+        self.trained_packets = metadata.get('trained_packets', 0)
+        self.version_major, self.version_minor = (int(part) for part in version.split('.'))
+        self.packets_since_training = 0
+        self.state = self._model_state(scaler, model, version)
+        self._publish_version()
+        logger.info(f"Model {version} loaded from {path} "
+                    f"({(time.time() - start_time) * 1000:.0f} ms)")
+        return True
+    
+    def _model_state(self, scaler, model, version):
+        """Bentuk ModelState dan kompilasi kernel scoring-nya"""
+        scorer = FusedScorer(scaler, model) if self.fast_scoring else None
+        return ModelState(scaler, model, version, scorer)
+    
+    def _publish_version(self):
+        """Perbarui gauge versi model aktif"""
+        MODEL_VERSION.labels(part='major').set(self.version_major)
+        MODEL_VERSION.labels(part='minor').set(self.version_minor)
+    
+    def wait_for_training(self, timeout=None):
+        """Tunggu training background yang sedang berjalan selesai"""
+        thread = self._training_thread
+        if thread is not None:
+            thread.join(timeout)
+    
+    def _train(self, X, incremental):
+        """
+        Latih model baru dari snapshot buffer lalu tukar model secara atomik
+        
+        Args:
+            X (np.ndarray): Snapshot fitur training
+            incremental (bool): Perbarui model aktif dengan partial_fit
+                alih-alih melatih ulang dari awal
+        """
+        try:
+            start_time = time.time()
+            state = self.state
+            if incremental and state is not None:
+                scaler = copy.deepcopy(state.scaler)
+                model = copy.deepcopy(state.model)
+                scaler.partial_fit(X)
+                model.partial_fit(scaler.transform(X))
+                version = f"{self.version_major}.{self.version_minor + 1}"
+            else:
+                logger.info(f"Training model on {len(X)} packets...")
+                scaler = StandardScaler()
+                scaler.fit(X)
+                if self.training_mode == 'incremental':
+                    model = MiniBatchKMeans(n_clusters=self.n_clusters, random_state=42, n_init=3)
+                else:
+                    model = KMeans(n_clusters=self.n_clusters, random_state=42)
+                model.fit(scaler.transform(X))
+                version = f"{self.version_major + 1}.0"
+            
+            self.state = self._model_state(scaler, model, version)
+            self.version_major, self.version_minor = (int(part) for part in version.split('.'))
+            self.trained_packets += len(X)
+            TRAINING_SECONDS.labels(mode='incremental' if incremental else 'full').observe(time.time() - start_time)
+            self._publish_version()
+            logger.info(f"Model {version} ready ({len(X)} packets, "
+                        f"{(time.time() - start_time) * 1000:.0f} ms).")
+            
+            if self.model_dir:
+                self.save_model()
+        except Exception as e:
+            logger.error(f"Error training model: {e}")
+        finally:
+            self.training_in_progress = False
+    
+    def _observe(self, rows):
+        """Tambahkan fitur ke window training dan mulai training jika perlu"""
+        self.buffer.add(rows)
+        if self.state is not None:
+            self.packets_since_training += len(rows)
+        self.train_if_needed()
+    
+    def _rows_until_training(self):
+        """Jumlah paket sampai training berikutnya dipicu (None jika tidak ada)"""
+        if self.training_in_progress:
+            return None
+        if self.state is None:
+            return max(1, self.buffer_size - len(self.buffer))
+        if self.retrain_interval:
+            return max(1, self.retrain_interval - self.packets_since_training)
+        return None
     
     def analyze(self, features_dict):
         """
@@ -44,42 +257,113 @@ class NetworkTrafficAnalyzer:
         
         Args:
             features_dict (dict): Fitur-fitur paket
-            
+        
         Returns:
             dict: Hasil analisis ML
         """
         ml_features = prepare_ml_features(features_dict)
+        state = self.state
+        
+        # Paket selalu masuk window training; training berjalan di luar jalur scoring
+        self._observe([ml_features])
+        
+        # If not trained yet, return default values
+        if state is None:
+            return self._training_result()
         
-        # If not trained yet, add to buffer and return default values
-        if not self.trained:
-            self.buffer.append(ml_features)
-            self.train_if_needed()
-            return {
-                'analyzer_type': 'internal',
-                'anomaly_score': 0.0,
-                'cluster': -1,
-                'is_suspicious': False,
-                'model_version': 'training'
-            }
+        if state.scorer is not None:
+            return self._result(state, *state.scorer.score_one(ml_features))
         
         # Preprocess input for prediction
         X = np.array([ml_features])
-        X_scaled = self.scaler.transform(X)
+        clusters, distances = self._score(state, X)
         
-        # Get cluster assignment
-        cluster = self.model.predict(X_scaled)[0]
+        return self._build_results(state, clusters, distances)[0]
+    
+    def analyze_batch(self, features_list):
+        """
+        Menganalisis banyak paket sekaligus dalam satu operasi vektor
+        
+        Hasil untuk setiap paket identik dengan memanggil ``analyze`` satu per
+        satu: batch dipecah pada titik di mana training dipicu sehingga setiap
+        paket di-score dengan model yang aktif saat paket itu tiba.
+        
+        Args:
+            features_list (list): Daftar dictionary fitur paket
+        
+        Returns:
+            list: Hasil analisis ML untuk setiap paket, urutan sama dengan input
+        """
+        rows = [prepare_ml_features(f) for f in features_list]
+        results = []
+        index = 0
+        while index < len(rows):
+            remaining = self._rows_until_training()
+            end = len(rows) if remaining is None else min(len(rows), index + remaining)
+            segment = np.array(rows[index:end])
+            state = self.state
+            
+            if state is None:
+                results.extend(self._training_result() for _ in segment)
+            else:
+                clusters, distances = self._score(state, segment)
+                results.extend(self._build_results(state, clusters, distances))
+            
+            self._observe(segment)
+            index = end
+        
+        return results
+    
+    def _training_result(self):
+        """Hasil default selama model pertama belum tersedia"""
+        return {
+            'analyzer_type': 'internal',
+            'anomaly_score': 0.0,
+            'cluster': -1,
+            'is_suspicious': False,
+            'model_version': 'training'
+        }
+    
+    def _score(self, state, X):
+        """
+        Hitung cluster dan jarak ke pusat cluster untuk matriks fitur
         
-        # Calculate anomaly score (distance to cluster center)
-        center = self.model.cluster_centers_[cluster]
-        distance = np.linalg.norm(X_scaled[0] - center)
+        Args:
+            state (ModelState): Model yang dipakai untuk scoring
+            X (np.ndarray): Matriks fitur (n_paket x n_fitur)
         
-        # Determine if suspicious based on distance threshold
-        is_suspicious = distance > self.suspicious_threshold
+        Returns:
+            tuple: (array cluster, array jarak ke pusat cluster)
+        """
+        if state.scorer is not None:
+            return state.scorer.score(X)
         
+        X_scaled = state.scaler.transform(X)
+        
+        # Get cluster assignment
+        clusters = state.model.predict(X_scaled)
+        
+        # Calculate anomaly score (distance to cluster center); vecdot per baris
+        # memberi hasil yang sama persis dengan np.linalg.norm pada satu vektor
+        diff = X_scaled - state.model.cluster_centers_[clusters]
+        distances = np.sqrt(np.vecdot(diff, diff))
+        
+        return clusters, distances
+    
+    def _result(self, state, cluster, distance):
+        """Dictionary hasil untuk satu paket"""
         return {
             'analyzer_type': 'internal',
-            'anomaly_score': float(distance),
-            'cluster': int(cluster),
-            'is_suspicious': bool(is_suspicious),
-            'model_version': '1.0'
+            'anomaly_score': distance,
+            'cluster': cluster,
+            # Determine if suspicious based on distance threshold
+            'is_suspicious': distance > self.suspicious_threshold,
+            'model_version': state.version
         }
+    
+    def _build_results(self, state, clusters, distances):
+        """Bentuk dictionary hasil dari array cluster dan jarak"""
+        return [
+            self._result(state, cluster, distance)
+            for cluster, distance in zip(clusters.tolist(), distances.tolist())
+        ]
@@ -1,16 +1,108 @@
 import time
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from collections import deque
+from requests.adapters import HTTPAdapter
 
+from ml.verdict_cache import VerdictCache, parse_quantization
 from packet_processing.feature_extraction import prepare_ml_features_for_external
 from utils.logging_utils import get_logger
+from utils import metrics
 
 logger = get_logger(__name__)
 
+EXTERNAL_REQUESTS = metrics.counter('nta_external_requests_total', 'Batch requests to the external ML API', ('result',))
+EXTERNAL_REQUEST_SECONDS = metrics.histogram('nta_external_request_seconds', 'Round trip of one batch request')
+EXTERNAL_FALLBACK_PACKETS = metrics.counter('nta_external_fallback_packets_total',
+                                            'Packets scored by the local fallback rules')
+EXTERNAL_SHED_BATCHES = metrics.counter('nta_external_shed_batches_total',
+                                        'Batches not sent because too many requests were queued')
+CIRCUIT_STATE = metrics.gauge('nta_external_circuit_state', 'External API circuit breaker (0 closed, 1 half open, 2 open)')
+
+class CircuitBreaker:
+    """
+    Circuit breaker untuk API eksternal
+    
+    Setelah ``failure_threshold`` kegagalan berturut-turut circuit terbuka dan
+    semua request langsung memakai fallback. Setelah ``reset_timeout`` detik
+    circuit setengah terbuka: satu request percobaan dikirim, jika berhasil
+    circuit kembali tertutup, jika gagal circuit terbuka lagi.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    # Nilai gauge nta_external_circuit_state
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        Initialize circuit breaker
+        
+        Args:
+            failure_threshold (int): Jumlah kegagalan berturut-turut sebelum circuit terbuka
+            reset_timeout (float): Detik sebelum request percobaan diizinkan
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set_function(lambda: self.STATE_VALUES[self.state])
+    
+    def allow(self):
+        """
+        Cek apakah request boleh dikirim
+        
+        Returns:
+            bool: True jika request boleh dikirim ke API
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        """Catat request yang berhasil"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("External ML API recovered, circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+    
+    def record_failure(self):
+        """Catat request yang gagal"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"External ML API circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+
 class ExternalMLIntegration:
     """
     Kelas untuk integrasi dengan layanan ML eksternal melalui API
+    
+    Paket dari ``analyze_async`` dikumpulkan menjadi batch (``batch_size``
+    paket atau ``batch_delay_ms``) dan dikirim ke endpoint batch oleh thread
+    pool dengan koneksi HTTP yang dipakai ulang, sehingga thread capture tidak
+    pernah menunggu round trip jaringan. Tanpa ``batch_endpoint`` atau dengan
+    ``batch_size`` 1 setiap paket dikirim sebagai satu request ke
+    ``api_endpoint`` (format API lama).
     """
     
     def __init__(self, config):
@@ -22,77 +114,318 @@ class ExternalMLIntegration:
         """
         self.config = config
         self.api_endpoint = config['api_endpoint']
+        # None = satu request per paket ke api_endpoint
+        self.batch_endpoint = config.get('batch_endpoint') or None
+        if config['batch_size'] <= 1:
+            self.batch_endpoint = None
         self.api_key = config['api_key']
         self.timeout = config['timeout_seconds']
+        self.batch_size = config['batch_size'] if self.batch_endpoint else 1
+        self.batch_delay = config.get('batch_delay_ms', 50) / 1000.0
+        self.max_in_flight = config.get('max_in_flight', 4)
+        # Batch yang menunggu slot request; lebih dari ini langsung memakai fallback
+        self.max_queued_batches = config.get('max_queued_batches', 4 * self.max_in_flight)
         
-        # Buffer untuk batch processing
-        self.buffer = deque(maxlen=config['batch_size'])
-        self.batch_size = config['batch_size']
+        # Session dengan connection pool untuk request paralel
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.api_key}'
+        })
         
         # Fallback untuk kasus API tidak tersedia
-        self.use_fallback = False
+        self.breaker = CircuitBreaker(
+            config.get('breaker_failure_threshold', 5),
+            config.get('breaker_reset_seconds', 30.0)
+        )
+        
+        # Cache verdict untuk vektor fitur yang sering berulang (0 = nonaktif)
+        self.cache = None
+        if config.get('cache_size', 0) > 0:
+            self.cache = VerdictCache(
+                config['cache_size'],
+                config.get('cache_ttl_seconds', 300),
+                parse_quantization(config.get('cache_quantization'))
+            )
+        
+        self.stats = {
+            'requests': 0,
+            'failures': 0,
+            'packets_sent': 0,
+            'fallback_packets': 0,
+            'shed_batches': 0,
+        }
+        
+        # Batch yang sedang dikumpulkan: list (fitur asli, fitur API, callback, waktu submit)
+        self.buffer = []
+        self.deadline = None
+        self.outstanding = 0
+        self._lock = threading.Lock()
+        self._callback_lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                            thread_name_prefix='external-ml')
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='external-ml-flusher', daemon=True)
+        self._flusher.start()
     
     def analyze(self, features_dict):
         """
-        Mengirim fitur paket ke API ML eksternal untuk analisis
+        Mengirim fitur paket ke API ML eksternal untuk analisis (blocking)
         
         Args:
             features_dict (dict): Fitur-fitur paket
-            
+        
         Returns:
             dict: Hasil analisis dari ML eksternal atau fallback
         """
-        # Siapkan fitur untuk API eksternal
+        return self.analyze_batch([features_dict])[0]
+    
+    def analyze_batch(self, features_list):
+        """
+        Analisis batch untuk beberapa paket sekaligus (blocking)
+        
+        Daftar dipecah per ``batch_size`` dan semua potongan dikirim paralel.
+        
+        Args:
+            features_list (list): Daftar fitur-fitur paket
+        
+        Returns:
+            list: Hasil analisis untuk setiap paket
+        """
+        api_features = [prepare_ml_features_for_external(f) for f in features_list]
+        results = [self._cached(api) for api in api_features]
+        misses = [index for index, result in enumerate(results) if result is None]
+        
+        chunks = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+        batches = [[api_features[index] for index in chunk] for chunk in chunks]
+        chunk_results = [self._request(batches[0])] if len(chunks) == 1 else \
+            self._executor.map(self._request, batches)
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            for index, result in zip(chunk, chunk_result):
+                results[index] = result
+        return results
+    
+    # Nama lama
+    batch_analyze = analyze_batch
+    
+    def analyze_async(self, features_dict, callback):
+        """
+        Masukkan paket ke batch berikutnya tanpa menunggu API
+        
+        Args:
+            features_dict (dict): Fitur-fitur paket
+            callback (callable): Dipanggil ``callback(features_dict, ml_results)``
+                setelah hasil tersedia; pemanggilan callback diserialisasi
+        """
         api_features = prepare_ml_features_for_external(features_dict)
+        cached = self._cached(api_features)
+        if cached is not None:
+            cached['analysis_duration_ms'] = 0.0
+            with self._callback_lock:
+                callback(features_dict, cached)
+            return
+        
+        entry = (features_dict, api_features, callback, time.time())
+        with self._lock:
+            if not self.buffer:
+                self.deadline = time.monotonic() + self.batch_delay
+            self.buffer.append(entry)
+            batch = self._take_batch() if len(self.buffer) >= self.batch_size else None
+        if batch:
+            self._dispatch(batch)
+    
+    def flush(self, timeout=None):
+        """
+        Kirim batch yang belum penuh dan tunggu semua hasil async selesai
         
-        # Jika fallback mode aktif, gunakan analisis sederhana
-        if self.use_fallback:
-            return self._fallback_analysis(api_features)
+        Args:
+            timeout (float): Waktu tunggu maksimum dalam detik (None = tanpa batas)
+        
+        Returns:
+            bool: True jika tidak ada lagi request yang berjalan
+        """
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._dispatch(batch)
+        with self._idle:
+            return self._idle.wait_for(lambda: self.outstanding == 0, timeout)
+    
+    def close(self, timeout=None):
+        """Selesaikan semua hasil async lalu tutup thread dan koneksi"""
+        self._stop.set()
+        self._flusher.join()
+        self.flush(timeout)
+        self._executor.shutdown(wait=True)
+        self.session.close()
+    
+    def get_stats(self):
+        """
+        Statistik client
         
-        # Coba kirim ke API eksternal
+        Returns:
+            dict: Jumlah request, kegagalan, paket terkirim, paket fallback,
+                batch yang dibuang ke fallback, request berjalan, status circuit
+                dan statistik verdict cache
+        """
+        with self._lock:
+            stats = dict(self.stats, in_flight=self.outstanding, circuit=self.breaker.state)
+        if self.cache is not None:
+            stats['cache'] = self.cache.get_stats()
+        return stats
+    
+    def _cached(self, api_features):
+        """Verdict dari cache untuk fitur API, atau None"""
+        if self.cache is None:
+            return None
+        return self.cache.get(self.cache.key(api_features))
+    
+    def _take_batch(self):
+        """Ambil isi buffer (dipanggil dengan lock dipegang)"""
+        batch = self.buffer
+        self.buffer = []
+        if batch:
+            self.outstanding += 1
+        return batch
+    
+    def _flush_loop(self):
+        """Kirim batch yang melewati deadline saat trafik sepi"""
+        while not self._stop.wait(self.batch_delay / 2):
+            with self._lock:
+                batch = self._take_batch() if self.buffer and time.monotonic() >= self.deadline else None
+            if batch:
+                self._dispatch(batch)
+    
+    def _dispatch(self, batch):
+        """Serahkan batch ke thread pool, atau fallback jika API tidak bisa menampung"""
+        with self._lock:
+            overloaded = self.outstanding > self.max_queued_batches
+            if overloaded:
+                self.stats['shed_batches'] += 1
+                EXTERNAL_SHED_BATCHES.inc()
+        if overloaded:
+            self._complete(batch, [self._fallback_analysis(api) for _, api, _, _ in batch], fallback=True)
+            return
+        self._executor.submit(self._send_batch, batch)
+    
+    def _send_batch(self, batch):
+        """Kirim satu batch async (dijalankan di thread pool)"""
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.api_key}'
-            }
-            
-            payload = {
-                'features': api_features,
-                'metadata': {
-                    'client_version': '1.0',
-                    'timestamp': time.time()
-                }
+            # Circuit dicek saat batch benar-benar dikirim, bukan saat masuk antrian
+            results = self._post([api for _, api, _, _ in batch]) if self.breaker.allow() else None
+        except Exception as e:
+            logger.error(f"Error calling external ML API: {e}")
+            results = None
+        fallback = results is None
+        if fallback:
+            results = [self._fallback_analysis(api) for _, api, _, _ in batch]
+        self._complete(batch, results, fallback)
+    
+    def _complete(self, batch, results, fallback):
+        """Panggil callback untuk setiap paket dalam batch"""
+        now = time.time()
+        try:
+            with self._callback_lock:
+                for (features_dict, _, callback, submitted), ml_results in zip(batch, results):
+                    ml_results['analysis_duration_ms'] = (now - submitted) * 1000
+                    callback(features_dict, ml_results)
+        except Exception as e:
+            logger.error(f"Error delivering external ML results: {e}")
+        finally:
+            self._finish_batch(len(batch) if fallback else 0)
+    
+    def _finish_batch(self, fallback_packets=0):
+        """Tandai satu batch async selesai"""
+        with self._idle:
+            self.outstanding -= 1
+            self.stats['fallback_packets'] += fallback_packets
+            self._idle.notify_all()
+        if fallback_packets:
+            EXTERNAL_FALLBACK_PACKETS.inc(fallback_packets)
+    
+    def _request(self, api_features):
+        """Kirim batch secara sinkron dengan fallback jika API gagal atau circuit terbuka"""
+        results = self._post(api_features) if self.breaker.allow() else None
+        if results is None:
+            with self._lock:
+                self.stats['fallback_packets'] += len(api_features)
+            EXTERNAL_FALLBACK_PACKETS.inc(len(api_features))
+            return [self._fallback_analysis(features) for features in api_features]
+        return results
+    
+    def _post(self, api_features):
+        """
+        Kirim satu batch fitur ke endpoint batch, atau satu paket ke
+        ``api_endpoint`` jika endpoint batch tidak dipakai
+        
+        Args:
+            api_features (list): Fitur paket yang disiapkan untuk API
+        
+        Returns:
+            list: Hasil per paket, atau None jika request gagal
+        """
+        # Dengan cache aktif, vektor fitur yang sama dalam satu batch hanya dikirim sekali
+        keys = None
+        if self.cache is not None:
+            keys = [self.cache.key(features) for features in api_features]
+            api_features = list(dict(zip(keys, api_features)).values())
+        
+        payload = {
+            'features': api_features if self.batch_endpoint else api_features[0],
+            'metadata': {
+                'client_version': '1.1',
+                'timestamp': time.time()
             }
+        }
+        
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['packets_sent'] += len(api_features)
+        
+        start = time.perf_counter()
+        try:
+            endpoint = self.batch_endpoint or self.api_endpoint
+            response = self.session.post(endpoint, data=json.dumps(payload), timeout=self.timeout)
+            EXTERNAL_REQUEST_SECONDS.observe(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise ValueError(f"status {response.status_code}")
             
-            # Kirim request ke API
-            response = requests.post(
-                self.api_endpoint,
-                headers=headers,
-                data=json.dumps(payload),
-                timeout=self.timeout
-            )
+            results = response.json()['results'] if self.batch_endpoint else [response.json()]
+            if len(results) != len(api_features):
+                raise ValueError(f"{len(results)} results for {len(api_features)} packets")
             
-            # Periksa status response
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Format hasil untuk integrasi dengan sistem
-                return {
+            # Format hasil untuk integrasi dengan sistem
+            results = [
+                {
                     'analyzer_type': 'external',
                     'anomaly_score': result.get('anomaly_score', 0.0),
                     'cluster': result.get('cluster', -1),
                     'is_suspicious': result.get('is_suspicious', False),
                     'model_version': result.get('model_version', 'external-1.0')
                 }
-            else:
-                logger.warning(f"External ML API returned status {response.status_code}")
-                self.use_fallback = True
-                return self._fallback_analysis(api_features)
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error calling external ML API: {e}")
-            self.use_fallback = True
-            return self._fallback_analysis(api_features)
+                for result in results
+            ]
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"External ML API request failed: {e}")
+            with self._lock:
+                self.stats['failures'] += 1
+            EXTERNAL_REQUESTS.labels(result='error').inc()
+            self.breaker.record_failure()
+            return None
+        
+        EXTERNAL_REQUESTS.labels(result='ok').inc()
+        self.breaker.record_success()
+        if keys is None:
+            return results
+        
+        verdicts = dict(zip(dict.fromkeys(keys), results))
+        for key, result in verdicts.items():
+            self.cache.put(key, result)
+        return [dict(verdicts[key]) for key in keys]
     
     def _fallback_analysis(self, features):
         """
@@ -100,7 +433,7 @@ class ExternalMLIntegration:
         
         Args:
             features (dict): Fitur paket yang disiapkan untuk API
-            
+        
         Returns:
             dict: Hasil analisis fallback sederhana
         """
@@ -125,17 +458,3 @@ class ExternalMLIntegration:
             'is_suspicious': is_suspicious,
             'model_version': 'fallback-1.0'
         }
-    
-    def batch_analyze(self, features_list):
-        """
-        Analisis batch untuk beberapa paket sekaligus
-        
-        Args:
-            features_list (list): Daftar fitur-fitur paket
-            
-        Returns:
-            list: Hasil analisis untuk setiap paket
-        """
-        # Implementasi batch processing untuk API eksternal
-        # Berguna untuk efisiensi jika API mendukung batch processing
-        pass
\ No newline at end of file
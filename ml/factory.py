@@ -0,0 +1,28 @@
+def create_analyzer(ml_type, ml_config):
+    """
+    Membuat analyzer ML berdasarkan tipe yang dipilih
+
+    Args:
+        ml_type (str): Tipe analyzer ('internal', 'external' atau 'hybrid')
+        ml_config (dict): Konfigurasi ML lengkap (ML_CONFIG)
+
+    Returns:
+        Objek analyzer dengan method ``analyze(features_dict)``
+    """
+    # Hanya dependensi analyzer yang dipilih yang diimport (scikit-learn, requests)
+    if ml_type == 'internal':
+        from ml.analyzer import NetworkTrafficAnalyzer
+        return NetworkTrafficAnalyzer(ml_config['internal'])
+    if ml_type == 'external':
+        from ml.external_integration import ExternalMLIntegration
+        return ExternalMLIntegration(ml_config['external'])
+    if ml_type == 'hybrid':
+        from ml.analyzer import NetworkTrafficAnalyzer
+        from ml.external_integration import ExternalMLIntegration
+        from ml.hybrid import HybridAnalyzer
+        return HybridAnalyzer(
+            ml_config['hybrid'],
+            NetworkTrafficAnalyzer(ml_config['internal']),
+            ExternalMLIntegration(ml_config['external'])
+        )
+    raise ValueError(f"Unknown ML analyzer type '{ml_type}'")
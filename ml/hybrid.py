@@ -0,0 +1,221 @@
+import time
+import threading
+from functools import partial
+
+from utils.logging_utils import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+HYBRID_PACKETS = metrics.counter('nta_hybrid_packets_total', 'Hybrid analyzer outcomes per packet', ('outcome',))
+HYBRID_PENDING = metrics.gauge('nta_hybrid_pending', 'Packets waiting for an external verdict')
+
+class HybridAnalyzer:
+    """
+    Analyzer gabungan internal dan eksternal
+    
+    Setiap paket di-score oleh analyzer internal (K-means). Hanya paket dengan
+    anomaly score di dalam rentang "ragu" ``[uncertain_low, uncertain_high)``
+    yang dikirim secara async ke API eksternal. Penyimpanan paket tersebut
+    ditunda sampai verdict eksternal tiba sehingga setiap paket tetap disimpan
+    satu kali dengan hasil yang sudah direkonsiliasi.
+    """
+    
+    def __init__(self, config, internal_analyzer, external_analyzer):
+        """
+        Initialize hybrid analyzer
+        
+        Args:
+            config (dict): Konfigurasi hybrid (uncertain_low, uncertain_high,
+                max_pending)
+            internal_analyzer: NetworkTrafficAnalyzer
+            external_analyzer: ExternalMLIntegration
+        """
+        self.config = config
+        self.internal = internal_analyzer
+        self.external = external_analyzer
+        self.uncertain_low = config['uncertain_low']
+        self.uncertain_high = config['uncertain_high']
+        # Batas paket yang menunggu verdict eksternal; selebihnya memakai verdict internal
+        self.max_pending = config.get('max_pending', 10000)
+        
+        self.pending = 0
+        self.stats = {
+            'packets': 0,
+            'escalated': 0,
+            'reconciled': 0,
+            'overridden': 0,
+            'external_fallback': 0,
+            'skipped': 0,
+        }
+        self._lock = threading.Lock()
+        self._callback_lock = threading.Lock()
+        HYBRID_PENDING.set_function(lambda: self.pending)
+    
+    def is_uncertain(self, ml_results):
+        """
+        Cek apakah hasil internal perlu pendapat analyzer eksternal
+        
+        Args:
+            ml_results (dict): Hasil analyzer internal
+        
+        Returns:
+            bool: True jika anomaly score berada di rentang ragu
+        """
+        return ml_results['model_version'] != 'training' and \
+            self.uncertain_low <= ml_results['anomaly_score'] < self.uncertain_high
+    
+    def analyze(self, features_dict):
+        """
+        Analisis satu paket (blocking jika paket perlu dikirim ke API eksternal)
+        
+        Args:
+            features_dict (dict): Fitur-fitur paket
+        
+        Returns:
+            dict: Hasil analisis
+        """
+        return self.analyze_batch([features_dict])[0]
+    
+    def analyze_batch(self, features_list):
+        """
+        Analisis banyak paket (blocking untuk paket yang dikirim ke API eksternal)
+        
+        Args:
+            features_list (list): Daftar fitur paket
+        
+        Returns:
+            list: Hasil analisis untuk setiap paket
+        """
+        results = self.internal.analyze_batch(features_list)
+        uncertain = [index for index, ml_results in enumerate(results) if self.is_uncertain(ml_results)]
+        self._count(packets=len(results), escalated=len(uncertain))
+        
+        if uncertain:
+            external_results = self.external.analyze_batch([features_list[index] for index in uncertain])
+            for index, external_result in zip(uncertain, external_results):
+                results[index] = self._reconcile(results[index], external_result)
+        return results
+    
+    def analyze_async(self, features_dict, callback):
+        """
+        Analisis satu paket; callback dipanggil setelah hasil final tersedia
+        
+        Args:
+            features_dict (dict): Fitur-fitur paket
+            callback (callable): Dipanggil ``callback(features_dict, ml_results)``
+        """
+        self.analyze_batch_async([features_dict], callback)
+    
+    def analyze_batch_async(self, features_list, callback):
+        """
+        Score batch dengan analyzer internal dan kirim paket ragu ke API eksternal
+        
+        Paket yang pasti langsung diteruskan ke callback; paket ragu diteruskan
+        ketika verdict eksternal tiba. Pemanggilan callback diserialisasi.
+        
+        Args:
+            features_list (list): Daftar fitur paket
+            callback (callable): Dipanggil ``callback(features_dict, ml_results)``
+                untuk setiap paket
+        """
+        start_time = time.time()
+        results = self.internal.analyze_batch(features_list)
+        analysis_duration_ms = (time.time() - start_time) * 1000 / len(features_list)
+        
+        ready = []
+        escalated = skipped = 0
+        for features_dict, ml_results in zip(features_list, results):
+            ml_results['analysis_duration_ms'] = analysis_duration_ms
+            if not self.is_uncertain(ml_results):
+                ready.append((features_dict, ml_results))
+                continue
+            
+            with self._lock:
+                accepted = self.pending < self.max_pending
+                if accepted:
+                    self.pending += 1
+            if accepted:
+                escalated += 1
+                self.external.analyze_async(features_dict, partial(self._on_external, ml_results, callback))
+            else:
+                skipped += 1
+                ready.append((features_dict, ml_results))
+        
+        self._count(packets=len(results), escalated=escalated, skipped=skipped)
+        if ready:
+            with self._callback_lock:
+                for features_dict, ml_results in ready:
+                    callback(features_dict, ml_results)
+    
+    def flush(self, timeout=None):
+        """
+        Tunggu semua verdict eksternal yang masih berjalan
+        
+        Args:
+            timeout (float): Waktu tunggu maksimum dalam detik (None = tanpa batas)
+        
+        Returns:
+            bool: True jika tidak ada lagi paket yang menunggu
+        """
+        return self.external.flush(timeout)
+    
+    def close(self, timeout=None):
+        """Tunggu verdict yang tersisa lalu tutup client eksternal"""
+        self.external.close(timeout)
+    
+    def get_stats(self):
+        """
+        Statistik hybrid
+        
+        Returns:
+            dict: Jumlah paket, paket yang dikirim ke API eksternal, hasil yang
+                direkonsiliasi, verdict yang berubah, fallback, paket yang
+                dilewati karena antrian penuh dan paket yang masih menunggu
+        """
+        with self._lock:
+            stats = dict(self.stats, pending=self.pending)
+        stats['escalation_rate'] = stats['escalated'] / stats['packets'] if stats['packets'] else 0.0
+        return stats
+    
+    def _on_external(self, internal_result, callback, features_dict, external_result):
+        """Gabungkan verdict eksternal lalu teruskan hasil final (dari thread client eksternal)"""
+        with self._lock:
+            self.pending -= 1
+        ml_results = self._reconcile(internal_result, external_result)
+        ml_results['analysis_duration_ms'] = internal_result['analysis_duration_ms'] + \
+            external_result.get('analysis_duration_ms', 0.0)
+        with self._callback_lock:
+            callback(features_dict, ml_results)
+    
+    def _reconcile(self, internal_result, external_result):
+        """
+        Gabungkan hasil internal dengan verdict eksternal
+        
+        Verdict eksternal menentukan ``is_suspicious``; anomaly score dan
+        cluster tetap dari model internal agar skalanya konsisten di database.
+        Jika API eksternal memakai fallback, salinan hasil internal dipakai
+        (pemanggil boleh mengubah hasil tanpa menyentuh milik analyzer internal).
+        """
+        if external_result['analyzer_type'] != 'external':
+            self._count(external_fallback=1)
+            return dict(internal_result)
+        
+        self._count(reconciled=1,
+                    overridden=int(external_result['is_suspicious'] != internal_result['is_suspicious']))
+        return {
+            'analyzer_type': 'hybrid',
+            'anomaly_score': internal_result['anomaly_score'],
+            'cluster': internal_result['cluster'],
+            'is_suspicious': external_result['is_suspicious'],
+            'model_version': f"{internal_result['model_version']}+{external_result['model_version']}"
+        }
+    
+    def _count(self, **counts):
+        """Tambahkan nilai ke statistik"""
+        with self._lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+        for name, value in counts.items():
+            if name != 'packets' and value:
+                HYBRID_PACKETS.labels(outcome=name).inc(value)
@@ -0,0 +1,115 @@
+import math
+from operator import mul
+
+import numpy as np
+
+# Batas relatif selisih jarak dua cluster terdekat. Di bawah batas ini
+# pembulatan bisa membalik urutan keduanya, sehingga cluster ditentukan oleh
+# KMeans.predict. Galat pembulatan sebenarnya di bawah (n_fitur + 2) * 2^-53,
+# jauh lebih kecil dari nilai ini.
+TIE_TOLERANCE = 1e-12
+
+
+class FusedScorer:
+    """
+    Kernel scoring untuk StandardScaler + KMeans yang sudah dilatih
+
+    Hasilnya bit-for-bit sama dengan ``scaler.transform`` lalu
+    ``model.predict`` dan jarak ``vecdot`` ke pusat cluster, tetapi tanpa
+    validasi input, konversi dtype dan setup thread pool sklearn di setiap
+    panggilan:
+
+    - Skala dihitung dengan operasi IEEE yang sama: ``(x - mean_) / scale_``.
+    - Cluster dipilih dengan trik norma kuadrat ``|c|^2 - 2 x.c``
+      (``|x|^2`` sama untuk semua cluster). Hasilnya hanya dipakai jika
+      selisih dengan cluster kedua jauh di atas batas galat pembulatan;
+      selain itu (hampir seri, NaN) ``predict`` sklearn yang menentukan.
+    - Jarak anomali memakai primitif dot numpy yang sama dengan jalur sklearn
+      (juga di ``score_one``: satu array per paket demi paritas bit).
+
+    Objek tidak berubah setelah dibuat sehingga aman dipakai bersama thread
+    training yang menukar model.
+    """
+
+    def __init__(self, scaler, model):
+        """
+        Initialize fused scorer
+
+        Args:
+            scaler (StandardScaler): Scaler yang sudah di-fit
+            model (KMeans | MiniBatchKMeans): Model yang sudah di-fit
+        """
+        self.model = model
+        self.mean = scaler.mean_
+        self.scale = scaler.scale_
+        self.centers = model.cluster_centers_
+        self.center_norms = np.einsum('ij,ij->i', self.centers, self.centers)
+        # |c_i| terbesar per fitur dan |c|^2 terbesar, untuk batas galat
+        self.max_abs_centers = np.abs(self.centers).max(axis=0)
+        self.max_center_norm = float(self.center_norms.max())
+
+        # Salinan list Python untuk jalur satu paket (pencarian cluster tanpa alokasi array)
+        self._mean = self.mean.tolist()
+        self._scale = self.scale.tolist()
+        self._clusters = list(zip(self.center_norms.tolist(), self.centers.tolist()))
+        self._center_rows = list(self.centers)
+        self._max_abs_centers = self.max_abs_centers.tolist()
+
+    def score_one(self, row):
+        """
+        Cluster dan jarak ke pusat cluster untuk satu paket
+
+        Args:
+            row (list): Fitur ML satu paket (prepare_ml_features)
+
+        Returns:
+            tuple: (cluster, jarak) sebagai int dan float Python
+        """
+        scaled = [(value - mean) / scale for value, mean, scale in zip(row, self._mean, self._scale)]
+
+        best = -1
+        best_distance = second_distance = math.inf
+        for cluster, (norm, center) in enumerate(self._clusters):
+            distance = norm - 2.0 * sum(map(mul, scaled, center))
+            if distance < best_distance:
+                best, best_distance, second_distance = cluster, distance, best_distance
+            elif distance < second_distance:
+                second_distance = distance
+
+        bound = TIE_TOLERANCE * (self.max_center_norm +
+                                 2.0 * sum(map(mul, map(abs, scaled), self._max_abs_centers)))
+        if not second_distance - best_distance > 2.0 * bound:
+            best = int(self.model.predict(np.array([scaled]))[0])
+
+        # Jarak sengaja memakai numpy: vecdot menjumlahkan dengan urutan
+        # (SIMD/pairwise) yang berbeda dari sum() berurutan, sehingga jumlah
+        # Python berbeda di bit terakhir untuk sekitar separuh vektor
+        diff = np.array(scaled) - self._center_rows[best]
+        return best, math.sqrt(np.vecdot(diff, diff))
+
+    def score(self, X):
+        """
+        Cluster dan jarak ke pusat cluster untuk matriks fitur
+
+        Args:
+            X (np.ndarray): Matriks fitur (n_paket x n_fitur)
+
+        Returns:
+            tuple: (array cluster, array jarak ke pusat cluster)
+        """
+        X_scaled = (X - self.mean) / self.scale
+
+        distances = self.center_norms - 2.0 * (X_scaled @ self.centers.T)
+        rows = np.arange(len(X_scaled))
+        clusters = distances.argmin(axis=1)
+        best = distances[rows, clusters]
+        distances[rows, clusters] = np.inf
+        margin = distances.min(axis=1) - best
+
+        bound = TIE_TOLERANCE * (self.max_center_norm + 2.0 * (np.abs(X_scaled) @ self.max_abs_centers))
+        if not (margin > 2.0 * bound).all():
+            # Ada baris yang hampir seri: seluruh batch memakai predict seperti jalur sklearn
+            clusters = self.model.predict(X_scaled)
+
+        diff = X_scaled - self.centers[clusters]
+        return clusters, np.sqrt(np.vecdot(diff, diff))
@@ -0,0 +1,135 @@
+import os
+import glob
+import time
+from datetime import datetime
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_PATTERN = 'model-*.npz'
+
+
+def save_snapshot(directory, state, metadata):
+    """
+    Simpan model ke file .npz (array numpy saja, tanpa pickle)
+
+    File ditulis ke nama sementara lalu di-rename sehingga pembaca tidak
+    pernah melihat snapshot yang setengah tertulis.
+
+    Args:
+        directory (str): Direktori snapshot (dibuat jika belum ada)
+        state (ModelState): Scaler, model dan versi yang disimpan
+        metadata (dict): Informasi tambahan (suspicious_threshold,
+            training_mode, trained_packets, ...)
+
+    Returns:
+        str: Path file snapshot
+    """
+    os.makedirs(directory, exist_ok=True)
+    saved_at = time.time()
+    stamp = datetime.fromtimestamp(saved_at).strftime('%Y%m%dT%H%M%S%f')
+    path = os.path.join(directory, f"model-{stamp}-{state.version}.npz")
+
+    arrays = {
+        'format_version': np.array(SNAPSHOT_FORMAT_VERSION),
+        'version': np.array(state.version),
+        'saved_at': np.array(saved_at),
+        'model_type': np.array('minibatch' if isinstance(state.model, MiniBatchKMeans) else 'kmeans'),
+        'scaler_mean': state.scaler.mean_,
+        'scaler_scale': state.scaler.scale_,
+        'scaler_var': state.scaler.var_,
+        'scaler_samples': np.array(state.scaler.n_samples_seen_),
+        'centers': state.model.cluster_centers_,
+    }
+    if isinstance(state.model, MiniBatchKMeans):
+        arrays['center_counts'] = state.model._counts
+    for name, value in metadata.items():
+        arrays[f'meta_{name}'] = np.array(value)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as snapshot_file:
+        np.savez_compressed(snapshot_file, **arrays)
+    os.replace(temp_path, path)
+    return path
+
+
+def load_snapshot(path):
+    """
+    Muat snapshot model
+
+    Args:
+        path (str): Path file .npz hasil save_snapshot
+
+    Returns:
+        tuple: (scaler, model, version, metadata)
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['format_version']) > SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"{path} uses unsupported snapshot format {int(data['format_version'])}")
+
+        scaler = StandardScaler()
+        scaler.mean_ = data['scaler_mean']
+        scaler.scale_ = data['scaler_scale']
+        scaler.var_ = data['scaler_var']
+        scaler.n_samples_seen_ = data['scaler_samples'][()]
+        scaler.n_features_in_ = scaler.mean_.shape[0]
+
+        # Model dibangun ulang dengan satu iterasi fit pada centroid itu sendiri:
+        # setiap centroid menjadi anggota cluster-nya sendiri sehingga tidak bergeser
+        centers = data['centers']
+        n_clusters = centers.shape[0]
+        if str(data['model_type']) == 'minibatch':
+            model = MiniBatchKMeans(n_clusters=n_clusters, init=centers, n_init=1, max_iter=1,
+                                    batch_size=n_clusters, reassignment_ratio=0, random_state=42)
+            model.fit(centers)
+            model._counts = data['center_counts'].copy()
+        else:
+            model = KMeans(n_clusters=n_clusters, init=centers, n_init=1, max_iter=1, random_state=42)
+            model.fit(centers)
+        model.cluster_centers_ = centers.copy()
+
+        metadata = {
+            name[len('meta_'):]: data[name][()].item() if data[name].ndim == 0 else data[name]
+            for name in data.files if name.startswith('meta_')
+        }
+        metadata['saved_at'] = float(data['saved_at'])
+        return scaler, model, str(data['version']), metadata
+
+
+def latest_snapshot(directory):
+    """
+    Cari snapshot terbaru di sebuah direktori
+
+    Args:
+        directory (str): Direktori snapshot
+
+    Returns:
+        str: Path snapshot terbaru atau None jika tidak ada
+    """
+    paths = glob.glob(os.path.join(directory, SNAPSHOT_PATTERN))
+    # Nama file diawali timestamp sehingga urutan nama = urutan waktu
+    return max(paths, key=os.path.basename) if paths else None
+
+
+def prune_snapshots(directory, keep):
+    """
+    Hapus snapshot lama, sisakan ``keep`` snapshot terbaru
+
+    Args:
+        directory (str): Direktori snapshot
+        keep (int): Jumlah snapshot yang disimpan (0 = simpan semua)
+    """
+    if keep <= 0:
+        return
+    paths = sorted(glob.glob(os.path.join(directory, SNAPSHOT_PATTERN)), key=os.path.basename)
+    for path in paths[:-keep]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove old snapshot {path}: {e}")
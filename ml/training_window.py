@@ -0,0 +1,130 @@
+import numpy as np
+
+
+class TrainingWindow:
+    """
+    Window fitur training dengan array float32 yang dialokasikan sekali
+
+    Mode ``recent`` adalah ring buffer: ``capacity`` paket terbaru, paket
+    baru menimpa slot paling lama di tempat. Mode ``reservoir`` memakai
+    reservoir sampling (Algorithm R): setiap paket yang pernah diamati punya
+    peluang sama untuk berada di window, sehingga training mewakili rentang
+    waktu yang jauh lebih panjang dengan memori tetap.
+
+    Baris ditulis langsung ke array tanpa objek per paket; ``rows()``
+    mengembalikan baris sesuai urutan kedatangan untuk training.
+    """
+
+    MODES = ('recent', 'reservoir')
+
+    def __init__(self, capacity, n_features, mode='recent', seed=None):
+        """
+        Initialize training window
+
+        Args:
+            capacity (int): Jumlah baris maksimum
+            n_features (int): Jumlah fitur per baris
+            mode (str): 'recent' (ring buffer) atau 'reservoir'
+            seed (int): Seed RNG untuk mode reservoir
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown training window mode: {mode}")
+        self.capacity = capacity
+        self.mode = mode
+        self.data = np.zeros((capacity, n_features), dtype=np.float32)
+        self.count = 0       # Baris yang terisi
+        self.position = 0    # Slot tulis berikutnya (mode recent)
+        self.seen = 0        # Total baris yang pernah ditambahkan
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count == self.capacity
+
+    def add(self, rows):
+        """
+        Tambahkan baris fitur (ditulis langsung ke array)
+
+        Args:
+            rows (list | np.ndarray): Baris fitur (n_baris x n_fitur)
+        """
+        n_rows = len(rows)
+        if not n_rows:
+            return
+        if self.mode == 'reservoir':
+            self._add_reservoir(rows, n_rows)
+        else:
+            self._add_recent(rows, n_rows)
+        self.seen += n_rows
+
+    def _add_recent(self, rows, n_rows):
+        capacity = self.capacity
+        if n_rows == 1:
+            self.data[self.position] = rows[0]
+        else:
+            if n_rows > capacity:
+                rows = rows[-capacity:]
+                n_rows = capacity
+            first = min(n_rows, capacity - self.position)
+            self.data[self.position:self.position + first] = rows[:first]
+            if first < n_rows:
+                self.data[:n_rows - first] = rows[first:]
+        self.position = (self.position + n_rows) % capacity
+        self.count = min(capacity, self.count + n_rows)
+
+    def _add_reservoir(self, rows, n_rows):
+        capacity = self.capacity
+        start = 0
+        # Isi slot kosong dulu
+        if self.count < capacity:
+            start = min(n_rows, capacity - self.count)
+            self.data[self.count:self.count + start] = rows[:start]
+            self.count += start
+            self.position = self.count % capacity
+        if start == n_rows:
+            return
+        # Baris ke-i (0-based, dari semua yang pernah diamati) menggantikan slot
+        # acak j < capacity dengan j ~ U[0, i]; baris selebihnya dibuang
+        indexes = np.arange(self.seen + start, self.seen + n_rows)
+        slots = (self._rng.random(len(indexes)) * (indexes + 1)).astype(np.int64)
+        kept = np.flatnonzero(slots < capacity)
+        if len(kept):
+            rows = rows if isinstance(rows, np.ndarray) else np.asarray(rows, dtype=np.float32)
+            self.data[slots[kept]] = rows[start + kept]
+
+    def view(self):
+        """
+        Semua baris yang terisi tanpa salinan (urutan slot, bukan urutan waktu)
+
+        Returns:
+            np.ndarray: View (count x n_fitur) ke array window
+        """
+        return self.data[:self.count]
+
+    def rows(self, n_rows=None, dtype=None):
+        """
+        Baris untuk training: ``n_rows`` paket terbaru sesuai urutan kedatangan
+
+        Hasilnya view tanpa salinan jika baris tersebut berurutan di array dan
+        ``dtype`` sama; selain itu satu salinan dengan ``dtype`` yang diminta.
+        Mode reservoir tidak menyimpan urutan waktu sehingga seluruh sampel
+        dikembalikan.
+
+        Args:
+            n_rows (int): Jumlah baris (default semua)
+            dtype: Tipe hasil (default float32 milik window)
+
+        Returns:
+            np.ndarray: Matriks fitur (n_baris x n_fitur)
+        """
+        count = self.count
+        n_rows = count if n_rows is None or self.mode == 'reservoir' else min(n_rows, count)
+        end = self.position if count == self.capacity else count
+        if end >= n_rows:
+            X = self.data[end - n_rows:end]
+        else:
+            X = np.concatenate((self.data[self.capacity - (n_rows - end):], self.data[:end]))
+        return X if dtype is None else X.astype(dtype, copy=False)
@@ -0,0 +1,155 @@
+import time
+import threading
+from collections import OrderedDict
+
+from utils import metrics
+
+CACHE_LOOKUPS = metrics.counter('nta_verdict_cache_lookups_total', 'Verdict cache lookups', ('result',))
+CACHE_HITS = CACHE_LOOKUPS.labels(result='hit')
+CACHE_MISSES = CACHE_LOOKUPS.labels(result='miss')
+CACHE_REMOVALS = metrics.counter('nta_verdict_cache_removals_total', 'Verdict cache entries removed', ('reason',))
+
+
+def parse_quantization(spec):
+    """
+    Parse spesifikasi kuantisasi seperti ``"packet_size=16,window_size=1024"``
+
+    Args:
+        spec (str): Pasangan field=langkah dipisah koma (kosong = tanpa kuantisasi)
+
+    Returns:
+        dict: Nama field -> ukuran langkah
+    """
+    quantization = {}
+    for item in (spec or '').split(','):
+        if item.strip():
+            name, step = item.split('=')
+            quantization[name.strip()] = float(step)
+    return quantization
+
+
+class VerdictCache:
+    """
+    Cache LRU + TTL untuk hasil analisis ML eksternal
+
+    Kunci cache adalah vektor fitur API yang dikuantisasi, sehingga paket
+    dengan fitur (hampir) sama memakai verdict yang sama tanpa round trip.
+    Semua entri dibuang ketika API melaporkan ``model_version`` baru.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, quantization=None):
+        """
+        Initialize verdict cache
+
+        Args:
+            max_entries (int): Jumlah entri maksimum
+            ttl_seconds (float): Umur maksimum entri (0 = tanpa batas)
+            quantization (dict): Nama field numerik -> ukuran langkah kuantisasi
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.quantization = quantization or {}
+        self.model_version = None
+
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, api_features):
+        """
+        Bentuk kunci cache dari fitur API
+
+        Args:
+            api_features (dict): Fitur hasil prepare_ml_features_for_external
+
+        Returns:
+            tuple: Nilai fitur (terkuantisasi) dengan urutan nama field
+        """
+        quantization = self.quantization
+        return tuple(
+            (name, value // quantization[name] if name in quantization else value)
+            for name, value in sorted(api_features.items())
+        )
+
+    def get(self, key):
+        """
+        Ambil verdict dari cache
+
+        Args:
+            key (tuple): Kunci dari ``key()``
+
+        Returns:
+            dict: Salinan hasil analisis, atau None jika tidak ada/kedaluwarsa
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if not self.ttl or time.monotonic() < expires_at:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_HITS.inc()
+                    return dict(result)
+                del self.entries[key]
+                self.expirations += 1
+                CACHE_REMOVALS.labels(reason='expired').inc()
+            self.misses += 1
+            CACHE_MISSES.inc()
+            return None
+
+    def put(self, key, result):
+        """
+        Simpan verdict; cache dikosongkan jika model_version berubah
+
+        Args:
+            key (tuple): Kunci dari ``key()``
+            result (dict): Hasil analisis dari API eksternal
+        """
+        with self._lock:
+            version = result.get('model_version')
+            if version != self.model_version:
+                if self.entries:
+                    self.invalidations += 1
+                    CACHE_REMOVALS.labels(reason='invalidated').inc(len(self.entries))
+                    self.entries.clear()
+                self.model_version = version
+
+            self.entries[key] = (dict(result), time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+                CACHE_REMOVALS.labels(reason='evicted').inc()
+
+    def clear(self):
+        """Kosongkan cache"""
+        with self._lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        """
+        Statistik cache
+
+        Returns:
+            dict: Ukuran, hit, miss, hit rate, eviction LRU, entri kedaluwarsa
+                dan jumlah invalidasi karena model_version berubah
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'model_version': self.model_version,
+            }
@@ -0,0 +1,319 @@
+"""
+Backend capture Linux AF_PACKET dengan ring PACKET_MMAP TPACKET_V3.
+
+Kernel menulis frame langsung ke ring yang di-mmap dan menyerahkannya per
+blok (banyak frame sekaligus), sehingga tidak ada ``recv`` atau objek Scapy
+per paket. Frame diberikan sebagai ``memoryview`` ke dalam ring (zero-copy)
+yang hanya valid sampai blok dikembalikan ke kernel; salin dengan
+``bytes(frame)`` jika frame perlu disimpan lebih lama.
+"""
+import mmap
+import time
+import select
+import socket
+import struct
+
+from packet_processing.raw_features import LINKTYPE_ETHERNET, LINKTYPE_RAW
+from utils.logging_utils import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+KERNEL_PACKETS = metrics.counter('nta_capture_kernel_packets_total',
+                                 'Packets seen by the AF_PACKET socket (PACKET_STATISTICS)', ('result',))
+KERNEL_RECEIVED = KERNEL_PACKETS.labels(result='received')
+KERNEL_DROPPED = KERNEL_PACKETS.labels(result='dropped')
+
+# Konstanta <linux/if_packet.h> dan <linux/if_ether.h>
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+ETH_P_ALL = 0x0003
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+PACKET_OUTGOING = 4
+
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+ARPHRD_NONE = 0xFFFE
+
+# Tipe hardware -> LINKTYPE_* untuk ekstraktor; tipe lain dilewati
+ARPHRD_LINKTYPES = {
+    ARPHRD_ETHER: LINKTYPE_ETHERNET,
+    ARPHRD_LOOPBACK: LINKTYPE_ETHERNET,
+    ARPHRD_NONE: LINKTYPE_RAW,
+}
+
+# struct tpacket_req3: block_size, block_nr, frame_size, frame_nr,
+# retire_blk_tov, sizeof_priv, feature_req_word
+_TPACKET_REQ3 = struct.Struct('=7I')
+# struct tpacket_stats_v3: tp_packets, tp_drops, tp_freeze_q_cnt
+_TPACKET_STATS_V3 = struct.Struct('=III')
+# struct tpacket_block_desc: block_status, num_pkts, offset_to_first_pkt (setelah version, offset_to_priv)
+_BLOCK_HEADER = struct.Struct('=8xIII')
+_BLOCK_STATUS = struct.Struct('=I')
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac, tp_net
+_PACKET_HEADER = struct.Struct('=IIIIIIHH')
+# struct sockaddr_ll setelah TPACKET_ALIGN(sizeof(tpacket3_hdr)): sll_hatype, sll_pkttype
+_SOCKADDR_LL_OFFSET = 48
+_SOCKADDR_LL = struct.Struct('=8xHB')
+
+
+class TPacketV3Ring:
+    """
+    Socket AF_PACKET dengan ring RX TPACKET_V3 yang di-mmap
+
+    Pemakaian::
+
+        ring = TPacketV3Ring('eth0', bpf_filter='ip')
+        frames = ring.next_block(timeout_ms=100)
+        for timestamp, frame, linktype in frames:
+            ...
+        ring.release_block()
+    """
+
+    def __init__(self, interface=None, bpf_filter=None, block_size=1 << 20, block_count=64,
+                 frame_size=2048, block_timeout_ms=10, allow_unfiltered=False):
+        """
+        Buka socket, pasang filter BPF dan siapkan ring
+
+        Args:
+            interface (str): Interface yang ditangkap (None = semua interface)
+            bpf_filter (str): Filter BPF gaya tcpdump (butuh libpcap untuk kompilasi)
+            block_size (int): Ukuran satu blok dalam byte (kelipatan page size)
+            block_count (int): Jumlah blok dalam ring
+            frame_size (int): Perkiraan ukuran slot frame (untuk frame_nr)
+            block_timeout_ms (int): Blok yang belum penuh diserahkan setelah waktu ini
+            allow_unfiltered (bool): Tangkap tanpa filter jika libpcap tidak ada
+                (default: gagal dengan OSError)
+        """
+        if not hasattr(socket, 'AF_PACKET'):
+            raise OSError("AF_PACKET capture is only available on Linux")
+        if block_size % mmap.PAGESIZE:
+            raise ValueError(f"block_size must be a multiple of the page size ({mmap.PAGESIZE})")
+
+        self.interface = interface
+        self.allow_unfiltered = allow_unfiltered
+        self.block_size = block_size
+        self.block_count = block_count
+        self.block_index = 0
+        self.current_block = None
+        self.kernel_packets = 0
+        self.kernel_drops = 0
+        self.kernel_freezes = 0
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            # Bind sebelum filter dan ring agar frame dari interface lain tidak masuk ke ring
+            if interface:
+                self.sock.bind((interface, ETH_P_ALL))
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            if bpf_filter:
+                self._attach_filter(bpf_filter)
+            self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, _TPACKET_REQ3.pack(
+                block_size, block_count, frame_size, block_size // frame_size * block_count,
+                block_timeout_ms, 0, 0
+            ))
+            self.ring = mmap.mmap(self.sock.fileno(), block_size * block_count,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except Exception:
+            self.sock.close()
+            raise
+
+        self.view = memoryview(self.ring)
+        self.poller = select.poll()
+        self.poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        logger.info(f"AF_PACKET TPACKET_V3 ring on {interface or 'all interfaces'}: "
+                    f"{block_count} x {block_size // 1024} KiB blocks")
+
+    def _attach_filter(self, bpf_filter):
+        """
+        Kompilasi filter dengan libpcap (via Scapy) dan pasang ke socket
+
+        Raises:
+            OSError: libpcap tidak tersedia dan allow_unfiltered tidak aktif
+            ValueError: Filter tidak bisa dikompilasi atau dipasang
+        """
+        try:
+            from scapy.arch.linux import attach_filter
+            attach_filter(self.sock, bpf_filter, self.interface)
+        except ImportError as e:
+            if not self.allow_unfiltered:
+                raise OSError(f"Cannot compile BPF filter '{bpf_filter}' ({e}); install libpcap or set "
+                              f"AF_PACKET_ALLOW_UNFILTERED=True to capture without the filter") from e
+            # Opt-in eksplisit: semua paket sampai ke userspace, ekspresi filter tidak diterapkan
+            logger.warning(f"Cannot compile BPF filter '{bpf_filter}' ({e}); AF_PACKET capture is UNFILTERED "
+                           f"(AF_PACKET_ALLOW_UNFILTERED=True)")
+        except Exception as e:
+            raise ValueError(f"Cannot attach BPF filter '{bpf_filter}' to AF_PACKET socket: {e}") from e
+
+    def next_block(self, timeout_ms=100):
+        """
+        Tunggu blok berikutnya yang sudah diserahkan kernel
+
+        Blok sebelumnya dikembalikan ke kernel terlebih dahulu jika belum.
+
+        Args:
+            timeout_ms (int): Waktu tunggu maksimum
+
+        Returns:
+            list: (timestamp, frame memoryview, linktype) untuk setiap frame
+                di dalam blok; kosong jika timeout
+        """
+        if self.current_block is not None:
+            self.release_block()
+
+        offset = self.block_index * self.block_size
+        status, num_packets, packet_offset = _BLOCK_HEADER.unpack_from(self.ring, offset)
+        if not status & TP_STATUS_USER:
+            self.poller.poll(timeout_ms)
+            status, num_packets, packet_offset = _BLOCK_HEADER.unpack_from(self.ring, offset)
+            if not status & TP_STATUS_USER:
+                return []
+
+        self.current_block = offset
+        ring, view = self.ring, self.view
+        unpack_packet = _PACKET_HEADER.unpack_from
+        unpack_sockaddr = _SOCKADDR_LL.unpack_from
+
+        frames = []
+        position = offset + packet_offset
+        for _ in range(num_packets):
+            next_offset, seconds, nanoseconds, snaplen, _, _, mac, _ = unpack_packet(ring, position)
+            hatype, packet_type = unpack_sockaddr(ring, position + _SOCKADDR_LL_OFFSET)
+            linktype = ARPHRD_LINKTYPES.get(hatype)
+            # Loopback menerima setiap paket dua kali (keluar dan masuk); libpcap juga membuang salinan keluar
+            if linktype is not None and not (hatype == ARPHRD_LOOPBACK and packet_type == PACKET_OUTGOING):
+                start = position + mac
+                frames.append((seconds + nanoseconds * 1e-9, view[start:start + snaplen], linktype))
+            position += next_offset
+        return frames
+
+    def release_block(self):
+        """Kembalikan blok saat ini ke kernel (frame view dari blok itu tidak boleh dipakai lagi)"""
+        if self.current_block is None:
+            return
+        _BLOCK_STATUS.pack_into(self.ring, self.current_block + 8, TP_STATUS_KERNEL)
+        self.current_block = None
+        self.block_index = (self.block_index + 1) % self.block_count
+
+    def read_statistics(self):
+        """
+        Baca PACKET_STATISTICS dari kernel (counter kernel direset setiap dibaca)
+
+        Returns:
+            dict: Total kumulatif paket diterima, dibuang kernel karena ring
+                penuh dan jumlah freeze antrian
+        """
+        packets, drops, freezes = _TPACKET_STATS_V3.unpack(
+            self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _TPACKET_STATS_V3.size)
+        )
+        # tp_packets dari kernel sudah termasuk paket yang dibuang
+        self.kernel_packets += packets
+        self.kernel_drops += drops
+        self.kernel_freezes += freezes
+        KERNEL_RECEIVED.inc(packets)
+        KERNEL_DROPPED.inc(drops)
+        return {
+            'kernel_packets': self.kernel_packets,
+            'kernel_drops': self.kernel_drops,
+            'kernel_freezes': self.kernel_freezes,
+        }
+
+    def close(self):
+        """Tutup ring dan socket"""
+        self.current_block = None
+        try:
+            self.view.release()
+            self.ring.close()
+        except BufferError:
+            logger.warning("AF_PACKET ring still referenced by frame views; leaving it to the garbage collector")
+        self.sock.close()
+
+
+def open_ring(capture_config):
+    """
+    Buka TPacketV3Ring dari CAPTURE_CONFIG
+
+    Args:
+        capture_config (dict): Konfigurasi penangkapan (interface, filter, af_packet)
+
+    Returns:
+        TPacketV3Ring: Ring yang siap dibaca
+    """
+    ring_config = capture_config.get('af_packet', {})
+    return TPacketV3Ring(
+        interface=capture_config.get('interface'),
+        bpf_filter=capture_config.get('filter'),
+        block_size=ring_config.get('block_size', 1 << 20),
+        block_count=ring_config.get('block_count', 64),
+        frame_size=ring_config.get('frame_size', 2048),
+        block_timeout_ms=ring_config.get('block_timeout_ms', 10),
+        allow_unfiltered=ring_config.get('allow_unfiltered', False),
+    )
+
+
+def _deliver_block(ring, callback, budget=0):
+    """
+    Teruskan frame dari satu blok ke callback lalu kembalikan blok ke kernel
+
+    Frame view hanya hidup di dalam fungsi ini sehingga ring bisa ditutup
+    dengan aman setelahnya.
+
+    Returns:
+        int: Jumlah frame yang diteruskan (paling banyak ``budget`` jika > 0)
+    """
+    frames = ring.next_block()
+    if budget:
+        frames = frames[:budget]
+    for timestamp, frame, linktype in frames:
+        callback(frame, timestamp, linktype)
+    ring.release_block()
+    return len(frames)
+
+
+def capture_af_packet(capture_config, callback, should_stop=None, stats_interval=1.0):
+    """
+    Tangkap paket dari ring TPACKET_V3 dan panggil callback per frame
+
+    Args:
+        capture_config (dict): Konfigurasi penangkapan (packet_count 0 = tanpa batas)
+        callback (callable): Dipanggil ``callback(frame, timestamp, linktype)``;
+            frame adalah memoryview yang hanya valid selama callback
+        should_stop (callable): Fungsi tanpa argumen; capture berhenti jika True
+        stats_interval (float): Jarak pembacaan PACKET_STATISTICS dalam detik
+
+    Returns:
+        dict: Jumlah frame, statistik kernel, durasi dan packets per second
+    """
+    limit = capture_config.get('packet_count', 0)
+    ring = open_ring(capture_config)
+    frames_seen = 0
+    start = last_stats = time.perf_counter()
+    try:
+        while not (should_stop and should_stop()):
+            frames_seen += _deliver_block(ring, callback, limit - frames_seen if limit else 0)
+            if limit and frames_seen >= limit:
+                break
+
+            now = time.perf_counter()
+            if now - last_stats >= stats_interval:
+                ring.read_statistics()
+                last_stats = now
+    finally:
+        stats = ring.read_statistics()
+        ring.close()
+
+    elapsed = time.perf_counter() - start
+    stats.update({
+        'packets': frames_seen,
+        'elapsed_seconds': elapsed,
+        'packets_per_second': frames_seen / elapsed if elapsed > 0 else 0.0,
+    })
+    logger.info(f"AF_PACKET capture: {frames_seen} frames, kernel received {stats['kernel_packets']}, "
+                f"dropped {stats['kernel_drops']}")
+    return stats
@@ -0,0 +1,170 @@
+import time
+import threading
+
+from utils.logging_utils import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+ALERTS = metrics.counter('nta_alerts_total', 'Suspicious packet/flow alerts by logging outcome', ('result',))
+ALERTS_LOGGED = ALERTS.labels(result='logged')
+ALERTS_SUPPRESSED = ALERTS.labels(result='suppressed')
+
+# Kunci bersama untuk pasangan host baru saat tabel kunci sudah penuh
+OVERFLOW_KEY = ('*', '*')
+
+
+class AlertAggregator:
+    """
+    Rate limit dan agregasi alert per pasangan sumber/tujuan
+
+    Setiap kunci (jenis alert, src_ip, dst_ip) punya token bucket: alert
+    dicatat satu per satu selama token tersedia (``per_key_burst`` sekaligus,
+    lalu ``per_key_rate`` per detik), dan token bucket global membatasi total
+    baris alert per detik. Alert selebihnya hanya dihitung lalu dilaporkan
+    sebagai satu baris ringkasan per kunci setiap ``summary_interval_seconds``
+    dengan jumlah dan skor tertinggi (paling banyak ``max_summaries`` baris,
+    sisanya digabung dalam satu baris). Jumlah kunci dibatasi ``max_keys``;
+    pasangan host selebihnya digabung dalam satu kunci overflow, sehingga
+    badai alert (misalnya SYN flood dengan sumber palsu) tidak menambah
+    memori maupun baris log tanpa batas.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize alert aggregator
+
+        Args:
+            config (dict): Konfigurasi alert (summary_interval_seconds,
+                per_key_rate, per_key_burst, global_rate, max_keys,
+                max_summaries)
+        """
+        self.interval = config.get('summary_interval_seconds', 10)
+        self.rate = config.get('per_key_rate', 0.2)
+        self.burst = config.get('per_key_burst', 3)
+        self.global_rate = config.get('global_rate', 20)
+        self.max_keys = config.get('max_keys', 10000)
+        self.max_summaries = config.get('max_summaries', 20)
+
+        # Kunci -> [token, waktu terakhir, jumlah ditahan, skor tertinggi, keterangan]
+        self._keys = {}
+        self._global_tokens = float(self.global_rate)
+        self._global_last = time.monotonic()
+        self._next_summary = self._global_last + self.interval
+        self._lock = threading.Lock()
+
+        self.logged = 0
+        self.suppressed = 0
+
+    def allow(self, kind, src_ip, dst_ip, score, detail=''):
+        """
+        Tentukan apakah sebuah alert dicatat sekarang
+
+        Args:
+            kind (str): Jenis alert (misalnya 'PACKET' atau 'FLOW')
+            src_ip (str): Alamat sumber
+            dst_ip (str): Alamat tujuan
+            score (float): Skor anomali
+            detail (str): Keterangan tambahan untuk ringkasan (misalnya verdict perilaku)
+
+        Returns:
+            bool: True jika pemanggil harus mencatat alert ini; False jika
+                alert hanya dihitung untuk ringkasan berikutnya
+        """
+        now = time.monotonic()
+        key = (kind, src_ip, dst_ip)
+        with self._lock:
+            summaries = self._take_summaries(now) if now >= self._next_summary else None
+
+            entry = self._keys.get(key)
+            if entry is None:
+                if len(self._keys) >= self.max_keys:
+                    key = (kind,) + OVERFLOW_KEY
+                    entry = self._keys.get(key)
+                if entry is None:
+                    entry = self._keys[key] = [self.burst, now, 0, score, detail]
+
+            tokens = min(self.burst, entry[0] + (now - entry[1]) * self.rate)
+            entry[1] = now
+            global_tokens = min(self.global_rate,
+                                self._global_tokens + (now - self._global_last) * self.global_rate)
+            self._global_last = now
+            allowed = tokens >= 1 and global_tokens >= 1
+            if allowed:
+                entry[0] = tokens - 1
+                self._global_tokens = global_tokens - 1
+                self.logged += 1
+            else:
+                entry[0] = tokens
+                self._global_tokens = global_tokens
+                if not entry[2] or score > entry[3]:
+                    entry[3] = score
+                entry[2] += 1
+                if detail:
+                    entry[4] = detail
+                self.suppressed += 1
+
+        if summaries:
+            self._log_summaries(summaries)
+        if allowed:
+            ALERTS_LOGGED.inc()
+        else:
+            ALERTS_SUPPRESSED.inc()
+        return allowed
+
+    def flush(self, force=False):
+        """
+        Catat ringkasan alert yang ditahan jika interval ringkasan sudah lewat
+
+        Args:
+            force (bool): Catat ringkasan sekarang (misalnya saat capture berhenti)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now < self._next_summary:
+                return
+            summaries = self._take_summaries(now)
+        self._log_summaries(summaries)
+
+    def _take_summaries(self, now):
+        """Ambil ringkasan kunci yang menahan alert dan buang kunci yang sudah diam"""
+        self._next_summary = now + self.interval
+        summaries = []
+        idle = []
+        for key, entry in self._keys.items():
+            if entry[2]:
+                summaries.append((key, entry[2], entry[3], entry[4]))
+                entry[2] = 0
+            elif now - entry[1] >= self.interval:
+                idle.append(key)
+        for key in idle:
+            del self._keys[key]
+        return summaries
+
+    def _log_summaries(self, summaries):
+        summaries.sort(key=lambda summary: summary[1], reverse=True)
+        for (kind, src_ip, dst_ip), count, max_score, detail in summaries[:self.max_summaries]:
+            suffix = f", {detail.replace('_', ' ')}" if detail else ''
+            logger.warning(
+                f"SUSPICIOUS {kind} SUMMARY: {src_ip} -> {dst_ip}: {count} alerts suppressed "
+                f"(max score: {max_score:.2f}{suffix})"
+            )
+        rest = summaries[self.max_summaries:]
+        if rest:
+            logger.warning(
+                f"SUSPICIOUS SUMMARY: {sum(summary[1] for summary in rest)} more alerts suppressed "
+                f"for {len(rest)} other host pairs"
+            )
+
+    def get_stats(self):
+        """
+        Statistik agregasi alert
+
+        Returns:
+            dict: Jumlah alert yang dicatat dan ditahan, serta kunci aktif
+        """
+        return {
+            'logged': self.logged,
+            'suppressed': self.suppressed,
+            'active_keys': len(self._keys),
+        }
@@ -1,28 +1,232 @@
 import time
-from scapy.all import sniff
+import threading
 
-from packet_processing.feature_extraction import extract_features
-from database.db_manager import store_packet_analysis
+from packet_processing.feature_extraction import extract_features, load_scapy_layers
+from packet_processing.raw_features import extract_features_raw
+from packet_processing.flow_table import FlowTable
+from packet_processing.replay import replay_capture_files
+from packet_processing.af_packet import capture_af_packet
+from packet_processing.load_shedding import LoadShedder
+from packet_processing.host_sketches import HostSketches
+from packet_processing.alerts import AlertAggregator
+from packet_processing.trust_list import TrustList
+from database.db_manager import store_packet_analysis, store_flow_analysis
 from utils.logging_utils import get_logger
+from utils import metrics
 
 logger = get_logger(__name__)
 
+PACKETS_CAPTURED = metrics.counter('nta_packets_captured_total', 'Frames received by the capture callbacks')
+PACKETS_SKIPPED = metrics.counter('nta_packets_skipped_total', 'Frames without usable IP features')
+PACKETS_PROCESSED = metrics.counter('nta_packets_processed_total', 'Packets analyzed and handed to storage')
+SUSPICIOUS_PACKETS = metrics.counter('nta_suspicious_packets_total', 'Packets flagged as suspicious')
+FLOWS_EXPORTED = metrics.counter('nta_flows_exported_total', 'Expired flows analyzed and handed to storage')
+SUSPICIOUS_FLOWS = metrics.counter('nta_suspicious_flows_total', 'Flows flagged as suspicious')
+ACTIVE_FLOWS = metrics.gauge('nta_active_flows', 'Flows currently tracked by the flow table')
+STAGE_SECONDS = metrics.histogram('nta_stage_seconds', 'Per-packet processing time of each pipeline stage', ('stage',))
+EXTRACT_SECONDS = STAGE_SECONDS.labels(stage='extract')
+ANALYZE_SECONDS = STAGE_SECONDS.labels(stage='analyze')
+STORE_SECONDS = STAGE_SECONDS.labels(stage='store')
+FLOW_UPDATE_SECONDS = STAGE_SECONDS.labels(stage='flow_update')
+
+def open_raw_listen_socket(capture_config):
+    """
+    Membuka socket sniff Scapy yang mengembalikan frame mentah tanpa diseksi
+    
+    Args:
+        capture_config (dict): Konfigurasi penangkapan paket
+        
+    Returns:
+        tuple: (socket, linktype) atau (None, None) jika interface tidak
+            memberikan header link layer
+    """
+    load_scapy_layers()
+    from scapy.config import conf
+    sock = conf.L2listen(iface=capture_config['interface'], filter=capture_config['filter'])
+    linktype = conf.l2types.layer2num.get(sock.LL)
+    if getattr(sock, 'lvl', 2) != 2 or linktype is None:
+        sock.close()
+        return None, None
+    
+    # Paket dibungkus sebagai Raw sehingga Scapy tidak mendiseksi layer apa pun
+    sock.LL = conf.raw_layer
+    return sock, linktype
+
+def _behavior_suffix(features):
+    """Keterangan verdict sketch perilaku untuk log paket/flow mencurigakan"""
+    behavior = features.get('behavior')
+    return f", {behavior.replace('_', ' ')}" if behavior else ''
+
+class MicroBatcher:
+    """
+    Pengumpul paket untuk analisis ML secara batch
+    
+    Fitur paket dikumpulkan sampai ``max_batch_size`` atau sampai paket
+    tertua menunggu ``max_delay_ms``, lalu dianalisis dalam satu panggilan
+    ``analyze_batch``. Background thread memastikan batch yang belum penuh
+    tetap diproses saat trafik sepi. Jika analyzer menyediakan
+    ``analyze_batch_async`` hasil diteruskan oleh analyzer itu sendiri.
+    """
+    
+    def __init__(self, ml_analyzer, on_result, max_batch_size, max_delay_ms):
+        """
+        Initialize micro batcher
+        
+        Args:
+            ml_analyzer: Analyzer ML; ``analyze_batch`` dipakai jika tersedia
+            on_result (callable): Dipanggil ``on_result(features, ml_results)``
+                untuk setiap paket sesuai urutan kedatangan
+            max_batch_size (int): Jumlah paket maksimum per batch
+            max_delay_ms (float): Waktu tunggu maksimum paket pertama dalam batch
+        """
+        self.ml_analyzer = ml_analyzer
+        self.on_result = on_result
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        
+        analyze_batch = getattr(ml_analyzer, 'analyze_batch', None)
+        self.analyze_batch = analyze_batch or (
+            lambda features_list: [ml_analyzer.analyze(f) for f in features_list]
+        )
+        self.analyze_batch_async = getattr(ml_analyzer, 'analyze_batch_async', None)
+        
+        self.pending = []
+        self.deadline = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name='micro-batcher', daemon=True)
+        self._thread.start()
+    
+    def add(self, features):
+        """
+        Tambahkan fitur paket ke batch, proses batch jika sudah penuh
+        
+        Args:
+            features (dict): Fitur paket hasil ekstraksi
+        """
+        with self._lock:
+            if not self.pending:
+                self.deadline = time.monotonic() + self.max_delay
+            self.pending.append(features)
+            if len(self.pending) >= self.max_batch_size:
+                self._process()
+    
+    def flush(self):
+        """Proses semua paket yang masih menunggu"""
+        with self._lock:
+            self._process()
+    
+    def close(self):
+        """Hentikan background thread dan proses sisa batch"""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+    
+    def _flush_loop(self):
+        """Proses batch yang melewati deadline"""
+        while not self._stop.wait(self.max_delay / 2):
+            with self._lock:
+                if self.pending and time.monotonic() >= self.deadline:
+                    self._process()
+    
+    def _process(self):
+        """Analisis batch yang tertunda (dipanggil dengan lock dipegang)"""
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending = []
+        
+        if self.analyze_batch_async is not None:
+            self.analyze_batch_async(batch, self.on_result)
+            return
+        
+        start_time = time.time()
+        results = self.analyze_batch(batch)
+        
+        # Durasi analisis dibagi rata ke setiap paket dalam batch
+        analysis_duration_ms = (time.time() - start_time) * 1000 / len(batch)
+        ANALYZE_SECONDS.observe(analysis_duration_ms / 1000, len(batch))
+        for features, ml_results in zip(batch, results):
+            ml_results['analysis_duration_ms'] = analysis_duration_ms
+            self.on_result(features, ml_results)
+
 class PacketCaptureManager:
     """Manager untuk penangkapan dan pemrosesan paket"""
     
-    def __init__(self, ml_analyzer, capture_config):
+    def __init__(self, ml_analyzer, capture_config, db_writer=None, backlog_sources=()):
         """
         Initialize packet capture manager
         
         Args:
             ml_analyzer: Objek analyzer ML (internal atau wrapper untuk eksternal)
             capture_config (dict): Konfigurasi untuk penangkapan paket
+            db_writer: BatchedPacketWriter opsional; jika None hasil disimpan
+                langsung per paket dengan store_packet_analysis
+            backlog_sources (iterable): Sumber backlog tambahan untuk load
+                shedding (fungsi tanpa argumen yang mengembalikan isi 0..1),
+                misalnya antrian input worker pipeline
         """
         self.ml_analyzer = ml_analyzer
         self.config = capture_config
+        self.extractor = capture_config.get('extractor', 'scapy')
+        if self.extractor == 'scapy':
+            self._link_layers, self._raw_layer = load_scapy_layers()
+        self.db_writer = db_writer
+        self.store_result = db_writer.submit if db_writer else store_packet_analysis
+        self.store_flow = db_writer.submit_flow if db_writer else store_flow_analysis
+        self.linktype = None
         self.is_running = False
         self.packets_processed = 0
         self.suspicious_packets = 0
+        self.flows_exported = 0
+        self.suspicious_flows = 0
+        
+        # Trust list: lalu lintas tepercaya dibuang sebelum ekstraksi fitur
+        self.trust_list = None
+        if capture_config.get('trust_list', {}).get('enabled'):
+            self.trust_list = TrustList(capture_config['trust_list'])
+            self.trust_list.start()
+        
+        # Mode agregasi flow: paket digabung per 5-tuple, hanya flow yang dianalisis
+        self.flow_table = None
+        if capture_config.get('aggregation', 'packet') == 'flow':
+            self.flow_table = FlowTable(capture_config['flow'])
+            ACTIVE_FLOWS.set_function(self.flow_table.__len__)
+        
+        # Sketch perilaku per host (scan/flood) dengan memori tetap
+        self.sketches = None
+        if capture_config.get('host_sketches', {}).get('enabled'):
+            self.sketches = HostSketches(capture_config['host_sketches'])
+        
+        # Rate limit dan ringkasan alert agar badai alert tidak membanjiri log
+        self.alerts = None
+        if capture_config.get('alerts', {}).get('enabled'):
+            self.alerts = AlertAggregator(capture_config['alerts'])
+        
+        # Overload controller: sampling flow benign saat backlog/latensi terlalu tinggi
+        self.shedder = None
+        shedding_config = capture_config.get('load_shedding', {})
+        if shedding_config.get('enabled'):
+            backlog_sources = list(backlog_sources)
+            if db_writer is not None:
+                backlog_sources.append(lambda: db_writer.queue.qsize() / db_writer.queue.maxsize)
+            if hasattr(ml_analyzer, 'max_pending'):
+                backlog_sources.append(lambda: ml_analyzer.pending / ml_analyzer.max_pending)
+            self.shedder = LoadShedder(shedding_config, backlog_sources, (ANALYZE_SECONDS, STORE_SECONDS))
+        
+        # Analyzer async (misalnya API eksternal) mengembalikan hasil lewat callback
+        self.analyze_async = getattr(ml_analyzer, 'analyze_async', None)
+        
+        # Micro-batching analisis ML jika analysis_batch_size > 1
+        self.batcher = None
+        batchable = self.analyze_async is None or hasattr(ml_analyzer, 'analyze_batch_async')
+        if self.flow_table is None and batchable and capture_config.get('analysis_batch_size', 1) > 1:
+            self.batcher = MicroBatcher(
+                ml_analyzer,
+                self.handle_result,
+                capture_config['analysis_batch_size'],
+                capture_config.get('analysis_batch_delay_ms', 50)
+            )
     
     def packet_callback(self, packet):
         """
@@ -31,9 +235,96 @@ class PacketCaptureManager:
         Args:
             packet: Paket Scapy yang ditangkap
         """
+        PACKETS_CAPTURED.inc()
+        
         # Ekstrak fitur
+        start = time.perf_counter()
         features = extract_features(packet)
+        EXTRACT_SECONDS.observe(time.perf_counter() - start)
+        if not features:
+            PACKETS_SKIPPED.inc()
+            return
+        # Paket sudah didiseksi Scapy, trust list dicocokkan pada fiturnya
+        if self.trust_list is not None and self.trust_list.match_features(features):
+            return
+        
+        self.process_features(features, float(packet.time))
+    
+    def raw_packet_callback(self, packet):
+        """
+        Callback untuk paket dari socket mentah (lihat open_raw_listen_socket)
+        
+        Args:
+            packet: Paket Raw Scapy berisi frame lengkap
+        """
+        PACKETS_CAPTURED.inc()
+        if self.trust_list is not None and self.trust_list.match_frame(packet.load, self.linktype):
+            return
+        start = time.perf_counter()
+        features = extract_features_raw(packet.load, self.linktype)
+        EXTRACT_SECONDS.observe(time.perf_counter() - start)
+        if not features:
+            PACKETS_SKIPPED.inc()
+            return
+        
+        self.process_features(features, float(packet.time))
+    
+    def frame_callback(self, frame, timestamp, linktype):
+        """
+        Proses frame mentah dengan backend ekstraksi yang dipilih
+        
+        Args:
+            frame (bytes): Frame mentah termasuk header link layer (atau
+                memoryview ke ring AF_PACKET)
+            timestamp (float): Waktu penangkapan frame
+            linktype (int): Tipe link layer (LINKTYPE_*)
+        """
+        PACKETS_CAPTURED.inc()
+        if self.trust_list is not None and self.trust_list.match_frame(frame, linktype):
+            return
+        start = time.perf_counter()
+        if self.extractor == 'raw':
+            features = extract_features_raw(frame, linktype)
+        else:
+            packet = self._link_layers.get(linktype, self._raw_layer)(bytes(frame))
+            packet.time = timestamp
+            features = extract_features(packet)
+        EXTRACT_SECONDS.observe(time.perf_counter() - start)
         if not features:
+            PACKETS_SKIPPED.inc()
+            return
+        
+        self.process_features(features, timestamp)
+    
+    def process_features(self, features, timestamp=None):
+        """
+        Analisis, simpan dan catat statistik untuk fitur satu paket
+        
+        Args:
+            features (dict): Fitur paket hasil ekstraksi
+            timestamp (float): Waktu penangkapan paket (default: sekarang)
+        """
+        features['timestamp'] = timestamp or time.time()
+        if self.sketches is not None:
+            # Semua paket masuk sketch, termasuk yang nanti dilewati load shedding
+            self.sketches.observe(features)
+        if self.flow_table is not None:
+            self.aggregate(features, features['timestamp'])
+            return
+        
+        if self.shedder is not None:
+            sampling_rate = self.shedder.admit(features)
+            if not sampling_rate:
+                return
+            if sampling_rate < 1.0:
+                features['sampling_rate'] = sampling_rate
+        
+        if self.batcher is not None:
+            self.batcher.add(features)
+            return
+        
+        if self.analyze_async is not None:
+            self.analyze_async(features, self.handle_result)
             return
         
         # Mulai timer untuk menghitung durasi analisis
@@ -45,43 +336,241 @@ class PacketCaptureManager:
         # Hitung durasi analisis
         analysis_duration_ms = (time.time() - start_time) * 1000
         ml_results['analysis_duration_ms'] = analysis_duration_ms
+        ANALYZE_SECONDS.observe(analysis_duration_ms / 1000)
+        
+        self.handle_result(features, ml_results)
+    
+    def handle_result(self, features, ml_results):
+        """
+        Simpan hasil analisis dan perbarui statistik
+        
+        Args:
+            features (dict): Fitur paket hasil ekstraksi
+            ml_results (dict): Hasil analisis ML
+        """
+        # Verdict sketch perilaku host (scan/flood) menandai paket mencurigakan
+        if 'behavior' in features:
+            ml_results['is_suspicious'] = True
         
         # Simpan di database
-        store_packet_analysis(features, ml_results)
+        start = time.perf_counter()
+        self.store_result(features, ml_results)
+        STORE_SECONDS.observe(time.perf_counter() - start)
         
         # Update statistik
         self.packets_processed += 1
+        PACKETS_PROCESSED.inc()
         if ml_results['is_suspicious']:
             self.suspicious_packets += 1
-            logger.warning(
-                f"SUSPICIOUS PACKET: {features['src_ip']}:{features.get('src_port', 0)} -> "
-                f"{features['dst_ip']}:{features.get('dst_port', 0)} "
-                f"(Score: {ml_results['anomaly_score']:.2f})"
-            )
+            SUSPICIOUS_PACKETS.inc()
+            if self.shedder is not None:
+                self.shedder.mark_suspicious(features)
+            if self.alerts is None or self.alerts.allow('PACKET', features['src_ip'], features['dst_ip'],
+                                                        ml_results['anomaly_score'], features.get('behavior')):
+                logger.warning(
+                    f"SUSPICIOUS PACKET: {features['src_ip']}:{features.get('src_port', 0)} -> "
+                    f"{features['dst_ip']}:{features.get('dst_port', 0)} "
+                    f"(Score: {ml_results['anomaly_score']:.2f}{_behavior_suffix(features)})"
+                )
         
         # Log progres
         if self.packets_processed % 1000 == 0:
             logger.info(f"Processed {self.packets_processed} packets "
                        f"({self.suspicious_packets} suspicious)")
+            if self.alerts is not None:
+                self.alerts.flush()
+    
+    def aggregate(self, features, timestamp):
+        """
+        Masukkan paket ke flow table dan analisis flow yang sudah berakhir
+        
+        Args:
+            features (dict): Fitur paket hasil ekstraksi
+            timestamp (float): Waktu penangkapan paket
+        """
+        start = time.perf_counter()
+        expired = self.flow_table.update(features, timestamp)
+        FLOW_UPDATE_SECONDS.observe(time.perf_counter() - start)
+        PACKETS_PROCESSED.inc()
+        if expired:
+            self.process_flows(expired)
+        
+        self.packets_processed += 1
+        if self.packets_processed % 1000 == 0:
+            logger.info(f"Processed {self.packets_processed} packets "
+                       f"({self.flows_exported} flows exported, {len(self.flow_table)} active)")
+            if self.alerts is not None:
+                self.alerts.flush()
+    
+    def process_flows(self, flow_records):
+        """
+        Analisis dan simpan flow yang sudah berakhir
+        
+        Args:
+            flow_records (list): Record flow dari FlowTable
+        """
+        if self.sketches is not None:
+            for record in flow_records:
+                self.sketches.annotate(record)
+        
+        if self.shedder is not None:
+            admitted = []
+            for record in flow_records:
+                sampling_rate = self.shedder.admit(record, record['packet_count'])
+                if sampling_rate:
+                    if sampling_rate < 1.0:
+                        record['sampling_rate'] = sampling_rate
+                    admitted.append(record)
+            flow_records = admitted
+            if not flow_records:
+                return
+        
+        analyze_batch_async = getattr(self.ml_analyzer, 'analyze_batch_async', None)
+        if analyze_batch_async is not None:
+            analyze_batch_async(flow_records, self.handle_flow_result)
+            return
+        if self.analyze_async is not None:
+            for record in flow_records:
+                self.analyze_async(record, self.handle_flow_result)
+            return
+        
+        start_time = time.time()
+        analyze_batch = getattr(self.ml_analyzer, 'analyze_batch', None)
+        if analyze_batch is not None:
+            results = analyze_batch(flow_records)
+        else:
+            results = [self.ml_analyzer.analyze(record) for record in flow_records]
+        analysis_duration_ms = (time.time() - start_time) * 1000 / len(flow_records)
+        ANALYZE_SECONDS.observe(analysis_duration_ms / 1000, len(flow_records))
+        
+        for record, ml_results in zip(flow_records, results):
+            ml_results['analysis_duration_ms'] = analysis_duration_ms
+            self.handle_flow_result(record, ml_results)
+    
+    def handle_flow_result(self, record, ml_results):
+        """
+        Simpan hasil analisis flow dan perbarui statistik
+        
+        Args:
+            record (dict): Record flow dari FlowTable
+            ml_results (dict): Hasil analisis ML
+        """
+        if 'behavior' in record:
+            ml_results['is_suspicious'] = True
+        
+        start = time.perf_counter()
+        self.store_flow(record, ml_results)
+        STORE_SECONDS.observe(time.perf_counter() - start)
+        
+        self.flows_exported += 1
+        FLOWS_EXPORTED.inc()
+        if ml_results['is_suspicious']:
+            self.suspicious_flows += 1
+            SUSPICIOUS_FLOWS.inc()
+            if self.shedder is not None:
+                self.shedder.mark_suspicious(record)
+            if self.alerts is None or self.alerts.allow('FLOW', record['src_ip'], record['dst_ip'],
+                                                        ml_results['anomaly_score'], record.get('behavior')):
+                logger.warning(
+                    f"SUSPICIOUS FLOW: {record['src_ip']}:{record['src_port']} -> "
+                    f"{record['dst_ip']}:{record['dst_port']} "
+                    f"({record['packet_count']} packets, Score: {ml_results['anomaly_score']:.2f}"
+                    f"{_behavior_suffix(record)})"
+                )
+    
+    def close(self):
+        """Proses paket yang masih menunggu di micro-batcher, flow aktif dan hasil async"""
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
+        if self.flow_table is not None:
+            remaining = self.flow_table.flush()
+            if remaining:
+                self.process_flows(remaining)
+        if self.analyze_async is not None:
+            self.ml_analyzer.flush()
+        if self.shedder is not None:
+            stats = self.shedder.get_stats()
+            if stats['shed_packets'] or stats['shed_flows']:
+                logger.info(f"Load shedding skipped {stats['shed_packets']} packets and "
+                            f"{stats['shed_flows']} flows of benign traffic")
+        if self.sketches is not None and self.sketches.flagged_packets:
+            logger.info(f"Host behavior sketches flagged {self.sketches.flagged_packets} packets")
+        if self.trust_list is not None:
+            self.trust_list.stop()
+            stats = self.trust_list.get_stats()
+            if stats['packets_trusted']:
+                hits = ', '.join(f"'{rule}': {count}" for rule, count in stats['rule_hits'])
+                logger.info(f"Trust list dropped {stats['packets_trusted']} packets ({hits})")
+        if self.alerts is not None:
+            self.alerts.flush(force=True)
+            stats = self.alerts.get_stats()
+            if stats['suppressed']:
+                logger.info(f"Alert logging: {stats['logged']} alerts logged, "
+                            f"{stats['suppressed']} summarized")
+    
+    def replay(self, paths, realtime=False, speed=1.0):
+        """
+        Proses file pcap/pcapng melalui jalur ekstraksi, analisis dan penyimpanan yang sama
+        
+        Args:
+            paths (list): Path file capture
+            realtime (bool): Ikuti jarak waktu asli antar paket
+            speed (float): Pengali kecepatan pada mode realtime
+            
+        Returns:
+            dict: Statistik replay
+        """
+        self.is_running = True
+        try:
+            return replay_capture_files(paths, self.frame_callback, realtime, speed)
+        finally:
+            self.close()
+            self.is_running = False
+            logger.info(f"Replay stopped. Total processed: {self.packets_processed} packets.")
     
     def start_capture(self):
         """Mulai penangkapan paket"""
         self.is_running = True
         logger.info("Starting packet capture...")
+        if self.trust_list is not None:
+            # Aturan sederhana dikecualikan langsung oleh filter BPF kernel
+            self.config = dict(self.config, filter=self.trust_list.bpf_filter(self.config.get('filter')))
         
+        sock = None
         try:
+            if self.config.get('backend', 'scapy') == 'af_packet':
+                # Ring TPACKET_V3: frame diambil per blok langsung dari memori kernel
+                capture_af_packet(self.config, self.frame_callback, lambda: not self.is_running)
+                return
+            
+            if self.extractor == 'raw':
+                sock, self.linktype = open_raw_listen_socket(self.config)
+            from scapy.sendrecv import sniff
+            
             # Mulai penangkapan paket
-            sniff(
-                prn=self.packet_callback,
-                iface=self.config['interface'],
-                filter=self.config['filter'],
-                count=self.config['packet_count'],
-                store=0
-            )
+            if sock is not None:
+                sniff(
+                    prn=self.raw_packet_callback,
+                    opened_socket=sock,
+                    count=self.config['packet_count'],
+                    store=0
+                )
+            else:
+                sniff(
+                    prn=self.packet_callback,
+                    iface=self.config['interface'],
+                    filter=self.config['filter'],
+                    count=self.config['packet_count'],
+                    store=0
+                )
         except KeyboardInterrupt:
             logger.info("\nStopping capture...")
         except Exception as e:
             logger.error(f"Error during packet capture: {e}")
         finally:
+            if sock is not None:
+                sock.close()
+            self.close()
             self.is_running = False
-            logger.info(f"Capture stopped. Total processed: {self.packets_processed} packets.")
\ No newline at end of file
+            logger.info(f"Capture stopped. Total processed: {self.packets_processed} packets.")
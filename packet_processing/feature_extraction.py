@@ -1,4 +1,26 @@
-from scapy.all import IP, TCP, UDP
+from packet_processing.raw_features import extract_features_raw
+from packet_processing.host_sketches import FEATURES as HOST_FEATURES
+
+# Layer Scapy diimport saat backend scapy pertama kali dipakai (lihat load_scapy_layers)
+IP = IPv6 = TCP = UDP = None
+
+def load_scapy_layers():
+    """
+    Import layer Scapy yang dibutuhkan ekstraksi dan diseksi frame
+    
+    Hanya ``scapy.layers.inet``/``inet6`` (beserta layer link-nya) yang
+    dimuat, bukan ``scapy.all``, sehingga startup jauh lebih cepat dan
+    backend raw maupun perintah database tidak memuat Scapy sama sekali.
+    
+    Returns:
+        tuple: (num2layer, raw_layer) untuk membentuk paket dari linktype
+    """
+    global IP, IPv6, TCP, UDP
+    if IP is None:
+        from scapy.layers.inet import IP, TCP, UDP
+        from scapy.layers.inet6 import IPv6
+    from scapy.config import conf
+    return conf.l2types.num2layer, conf.raw_layer
 
 def extract_features(packet):
     """
@@ -10,15 +32,28 @@ def extract_features(packet):
     Returns:
         dict: Dictionary berisi fitur-fitur yang diekstrak, atau None jika bukan paket IP
     """
+    if IP is None:
+        load_scapy_layers()
     features = {}
     
+    # Header IP terluar (alamat tunnel), port diambil dari TCP/UDP di dalamnya
+    layer = packet
+    while layer and type(layer) not in (IP, IPv6):
+        layer = layer.payload
+    
     # Basic IP features
-    if IP in packet:
-        features['src_ip'] = packet[IP].src
-        features['dst_ip'] = packet[IP].dst
+    if type(layer) is IP:
+        features['src_ip'] = layer.src
+        features['dst_ip'] = layer.dst
+        features['packet_size'] = len(packet)
+        features['ttl'] = layer.ttl
+        features['protocol'] = layer.proto
+    elif type(layer) is IPv6:
+        features['src_ip'] = layer.src
+        features['dst_ip'] = layer.dst
         features['packet_size'] = len(packet)
-        features['ttl'] = packet[IP].ttl
-        features['protocol'] = packet[IP].proto
+        features['ttl'] = layer.hlim
+        features['protocol'] = layer.nh
     else:
         return None  # Skip non-IP packets
     
@@ -42,6 +77,26 @@ def extract_features(packet):
     
     return features
 
+# Backend ekstraksi yang dapat dipilih lewat CAPTURE_CONFIG['extractor']
+EXTRACTORS = ('scapy', 'raw')
+
+def get_extractor(backend):
+    """
+    Mendapatkan fungsi ekstraksi untuk backend yang dipilih
+    
+    Args:
+        backend (str): 'scapy' (diseksi layer Scapy) atau 'raw' (langsung dari byte frame)
+        
+    Returns:
+        callable: extract_features(packet) untuk 'scapy' atau
+            extract_features_raw(frame, linktype) untuk 'raw'
+    """
+    if backend == 'scapy':
+        return extract_features
+    if backend == 'raw':
+        return extract_features_raw
+    raise ValueError(f"Unknown feature extractor backend '{backend}'")
+
 def prepare_ml_features(features_dict):
     """
     Menyiapkan fitur dalam format yang siap untuk analisis ML
@@ -72,7 +127,7 @@ def prepare_ml_features_for_external(features_dict):
     Returns:
         dict: Fitur dalam format JSON yang siap dikirim ke API eksternal
     """
-    return {
+    api_features = {
         'packet_size': features_dict.get('packet_size', 0),
         'ttl': features_dict.get('ttl', 0),
         'src_port': features_dict.get('src_port', 0),
@@ -85,4 +140,9 @@ def prepare_ml_features_for_external(features_dict):
         'flags_psh': '8' in str(features_dict.get('flags', '')),
         'flags_ack': '16' in str(features_dict.get('flags', '')),
         'flags_urg': '32' in str(features_dict.get('flags', ''))
-    }
\ No newline at end of file
+    }
+    # Fitur perilaku host dari HostSketches (jika diaktifkan)
+    for name in HOST_FEATURES:
+        if name in features_dict:
+            api_features[name] = features_dict[name]
+    return api_features
\ No newline at end of file
@@ -0,0 +1,219 @@
+import math
+import numpy as np
+
+from packet_processing.raw_features import TCP_FLAG_LETTERS
+
+# Flag TCP yang dihitung per flow (tanpa NS)
+FLOW_FLAGS = TCP_FLAG_LETTERS[:8]
+
+# Cache: string flag Scapy -> indeks flag yang aktif
+_FLAG_INDEXES = {}
+
+
+def _flag_indexes(flags):
+    """Indeks FLOW_FLAGS untuk string flag seperti 'SA' atau 'PA'"""
+    indexes = _FLAG_INDEXES.get(flags)
+    if indexes is None:
+        indexes = tuple(FLOW_FLAGS.index(letter) for letter in flags if letter in FLOW_FLAGS)
+        _FLAG_INDEXES[flags] = indexes
+    return indexes
+
+
+class FlowTable:
+    """
+    Tabel flow berbasis slot array untuk agregasi paket per 5-tuple
+
+    Statistik setiap flow disimpan di array numpy yang dialokasikan sekali
+    (satu baris per slot), sehingga memori dibatasi ``max_flows`` dan
+    pengecekan timeout dapat dilakukan secara vektor untuk seluruh tabel.
+    Flow bersifat dua arah: paket A->B dan B->A masuk ke flow yang sama,
+    dengan arah "forward" mengikuti paket pertama.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize flow table
+
+        Args:
+            config (dict): Konfigurasi flow (max_flows, idle_timeout_seconds,
+                active_timeout_seconds, expire_interval_seconds)
+        """
+        self.config = config
+        self.max_flows = config['max_flows']
+        self.idle_timeout = config['idle_timeout_seconds']
+        self.active_timeout = config['active_timeout_seconds']
+        self.expire_interval = config.get('expire_interval_seconds', 1.0)
+        # Persentase slot yang dikosongkan sekaligus ketika tabel penuh
+        self.evict_fraction = config.get('evict_fraction', 0.01)
+
+        n = self.max_flows
+        self.active = np.zeros(n, dtype=bool)
+        self.first_seen = np.zeros(n, dtype=np.float64)
+        self.last_seen = np.full(n, np.inf)
+        self.packets = np.zeros(n, dtype=np.int64)
+        self.fwd_packets = np.zeros(n, dtype=np.int64)
+        self.bytes = np.zeros(n, dtype=np.int64)
+        self.flag_counts = np.zeros((n, len(FLOW_FLAGS)), dtype=np.int64)
+        self.iat_mean = np.zeros(n, dtype=np.float64)
+        self.iat_m2 = np.zeros(n, dtype=np.float64)
+        self.iat_min = np.zeros(n, dtype=np.float64)
+        self.iat_max = np.zeros(n, dtype=np.float64)
+        self.window_size = np.zeros(n, dtype=np.int64)
+
+        # Kunci dan fitur paket pertama (arah forward) per slot
+        self.keys = [None] * n
+        self.headers = [None] * n
+        self.slots = {}
+        self.free_slots = list(range(n - 1, -1, -1))
+
+        self.next_expire = None
+        self.flows_created = 0
+        self.flows_evicted = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def update(self, features, timestamp):
+        """
+        Tambahkan satu paket ke flow-nya
+
+        Args:
+            features (dict): Fitur paket hasil ekstraksi
+            timestamp (float): Waktu paket (epoch detik)
+
+        Returns:
+            list: Record flow yang berakhir (timeout atau eviction) saat ini
+        """
+        src = (features['src_ip'], features.get('src_port', 0))
+        dst = (features['dst_ip'], features.get('dst_port', 0))
+        protocol = features['protocol']
+        key = (protocol, src, dst) if src <= dst else (protocol, dst, src)
+
+        expired = []
+        if self.next_expire is None:
+            self.next_expire = timestamp + self.expire_interval
+        elif timestamp >= self.next_expire:
+            expired = self.expire(timestamp)
+            self.next_expire = timestamp + self.expire_interval
+
+        slot = self.slots.get(key)
+        if slot is None:
+            if not self.free_slots:
+                expired.extend(self._evict_oldest())
+            slot = self.free_slots.pop()
+            self.slots[key] = slot
+            self.keys[slot] = key
+            self.headers[slot] = (src, dst, protocol, features.get('ttl', 0))
+            self.active[slot] = True
+            self.first_seen[slot] = timestamp
+            self.last_seen[slot] = timestamp
+            self.packets[slot] = 0
+            self.fwd_packets[slot] = 0
+            self.bytes[slot] = 0
+            self.flag_counts[slot] = 0
+            self.iat_mean[slot] = 0.0
+            self.iat_m2[slot] = 0.0
+            self.iat_min[slot] = 0.0
+            self.iat_max[slot] = 0.0
+            self.flows_created += 1
+        else:
+            # Statistik inter-arrival time (algoritma Welford)
+            iat = timestamp - self.last_seen[slot]
+            count = self.packets[slot]
+            delta = iat - self.iat_mean[slot]
+            mean = self.iat_mean[slot] + delta / count
+            self.iat_mean[slot] = mean
+            self.iat_m2[slot] += delta * (iat - mean)
+            if count == 1 or iat < self.iat_min[slot]:
+                self.iat_min[slot] = iat
+            if iat > self.iat_max[slot]:
+                self.iat_max[slot] = iat
+            self.last_seen[slot] = timestamp
+
+        self.packets[slot] += 1
+        self.bytes[slot] += features['packet_size']
+        if src == self.headers[slot][0]:
+            self.fwd_packets[slot] += 1
+        flags = features.get('flags', '')
+        if flags:
+            for index in _flag_indexes(flags):
+                self.flag_counts[slot, index] += 1
+        self.window_size[slot] = features.get('window_size', 0)
+
+        return expired
+
+    def expire(self, now):
+        """
+        Keluarkan flow yang idle atau aktif melebihi timeout
+
+        Args:
+            now (float): Waktu saat ini (epoch detik, skala sama dengan timestamp paket)
+
+        Returns:
+            list: Record flow yang berakhir
+        """
+        idle = self.active & (now - self.last_seen >= self.idle_timeout)
+        long_running = self.active & (now - self.first_seen >= self.active_timeout) & ~idle
+
+        records = [self._release(slot, 'idle') for slot in np.flatnonzero(idle).tolist()]
+        records.extend(self._release(slot, 'active') for slot in np.flatnonzero(long_running).tolist())
+        return records
+
+    def flush(self):
+        """
+        Keluarkan semua flow yang masih aktif (misalnya saat shutdown)
+
+        Returns:
+            list: Record flow yang berakhir
+        """
+        return [self._release(slot, 'shutdown') for slot in np.flatnonzero(self.active).tolist()]
+
+    def _evict_oldest(self):
+        """Kosongkan sebagian slot dengan last_seen paling lama ketika tabel penuh"""
+        count = max(1, int(self.max_flows * self.evict_fraction))
+        oldest = np.argpartition(self.last_seen, count - 1)[:count] if count < self.max_flows \
+            else np.arange(self.max_flows)
+        self.flows_evicted += len(oldest)
+        return [self._release(slot, 'evicted') for slot in oldest.tolist()]
+
+    def _release(self, slot, end_reason):
+        """Bentuk record flow dari slot lalu kembalikan slot ke free list"""
+        (src_ip, src_port), (dst_ip, dst_port), protocol, ttl = self.headers[slot]
+        packets = int(self.packets[slot])
+        byte_count = int(self.bytes[slot])
+        intervals = packets - 1
+        flag_counts = self.flag_counts[slot].tolist()
+
+        record = {
+            'src_ip': src_ip,
+            'dst_ip': dst_ip,
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'protocol': protocol,
+            'first_seen': float(self.first_seen[slot]),
+            'last_seen': float(self.last_seen[slot]),
+            'duration_ms': float(self.last_seen[slot] - self.first_seen[slot]) * 1000,
+            'packet_count': packets,
+            'fwd_packet_count': int(self.fwd_packets[slot]),
+            'byte_count': byte_count,
+            'flag_counts': dict(zip(FLOW_FLAGS, flag_counts)),
+            'iat_mean_ms': float(self.iat_mean[slot]) * 1000 if intervals else 0.0,
+            'iat_std_ms': math.sqrt(self.iat_m2[slot] / intervals) * 1000 if intervals else 0.0,
+            'iat_min_ms': float(self.iat_min[slot]) * 1000,
+            'iat_max_ms': float(self.iat_max[slot]) * 1000,
+            'end_reason': end_reason,
+
+            # Fitur representatif agar flow dapat dianalisis seperti paket
+            'packet_size': byte_count // packets,
+            'ttl': ttl,
+            'window_size': int(self.window_size[slot]),
+            'flags': ''.join(flag for flag, count in zip(FLOW_FLAGS, flag_counts) if count),
+        }
+
+        del self.slots[self.keys[slot]]
+        self.keys[slot] = None
+        self.headers[slot] = None
+        self.active[slot] = False
+        self.last_seen[slot] = np.inf
+        self.free_slots.append(slot)
+        return record
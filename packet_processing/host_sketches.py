@@ -0,0 +1,471 @@
+import math
+import zlib
+import random
+from array import array
+
+from utils.logging_utils import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+BEHAVIOR_PACKETS = metrics.counter('nta_behavior_packets_total',
+                                   'Packets flagged by the per-host behavior sketches', ('behavior',))
+BEHAVIOR_ALERTS = metrics.counter('nta_behavior_alerts_total',
+                                  'Hosts newly flagged by the per-host behavior sketches', ('behavior',))
+
+# Verdict perilaku, sesuai urutan prioritas
+BEHAVIORS = ('syn_flood', 'packet_flood', 'port_scan', 'host_sweep')
+
+# Fitur yang ditambahkan ke setiap paket/flow
+FEATURES = ('src_port_count', 'src_host_count', 'src_packet_rate', 'src_syn_rate', 'dst_syn_rate')
+
+# Seed tabel hash: hasil sketch (dan verdict) sama di setiap proses
+HASH_SEED = 0x5eed
+
+
+class HyperLogLogBank:
+    """
+    Sekumpulan counter HyperLogLog dengan ukuran tetap dalam satu bytearray
+
+    Setiap slot adalah satu HLL dengan ``2 ** precision`` register. Jumlah
+    ``2 ** -register``, register nol dan estimasi per slot diperbarui hanya
+    saat register berubah, sehingga membaca estimasi cukup satu akses list.
+    """
+
+    def __init__(self, slots, precision):
+        """
+        Initialize HyperLogLog bank
+
+        Args:
+            slots (int): Jumlah counter HLL
+            precision (int): Bit indeks register (4..16); galat standar
+                sekitar 1.04 / sqrt(2 ** precision)
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 16, got {precision}")
+        self.slots = slots
+        self.precision = precision
+        self.registers_per_slot = m = 1 << precision
+        self.registers = bytearray(slots * m)
+        self.sums = [float(m)] * slots
+        self.zeros = [m] * slots
+        self.estimates = [0.0] * slots
+        self._index_mask = m - 1
+        self._rank_bits = 64 - precision
+        if m >= 128:
+            self._alpha_mm = 0.7213 / (1 + 1.079 / m) * m * m
+        else:
+            self._alpha_mm = {16: 0.673, 32: 0.697, 64: 0.709}[m] * m * m
+
+    def add(self, slot, element_hash):
+        """
+        Tambahkan elemen (hash 64-bit) ke satu slot
+
+        Returns:
+            bool: True jika register slot berubah (estimasi berubah)
+        """
+        index = slot * self.registers_per_slot + (element_hash & self._index_mask)
+        rank = self._rank_bits - (element_hash >> self.precision).bit_length() + 1
+        old = self.registers[index]
+        if rank <= old:
+            return False
+        self.registers[index] = rank
+        self.sums[slot] += 2.0 ** -rank - 2.0 ** -old
+        if not old:
+            self.zeros[slot] -= 1
+        self.estimates[slot] = self._estimate(slot)
+        return True
+
+    def _estimate(self, slot):
+        m = self.registers_per_slot
+        zeros = self.zeros[slot]
+        estimate = self._alpha_mm / self.sums[slot]
+        if zeros and estimate <= 2.5 * m:
+            # Koreksi rentang kecil (linear counting)
+            return m * math.log(m / zeros)
+        return estimate
+
+    def estimate(self, slot):
+        """Estimasi jumlah elemen berbeda di satu slot"""
+        return self.estimates[slot]
+
+    @property
+    def memory_bytes(self):
+        return len(self.registers) + 24 * self.slots
+
+
+class CountMinSketch:
+    """
+    Count-min sketch dua baris dengan conservative update
+
+    Dua baris x ``width`` counter 32-bit; indeks kunci di setiap baris
+    diambil dari potongan 16-bit hash 64-bit (``indexes``), dihitung sekali
+    per paket dan dipakai ulang untuk semua sketch dengan ukuran sama.
+    Conservative update hanya menaikkan counter yang sama dengan minimum,
+    sehingga overestimasi akibat tabrakan lebih kecil dibanding update biasa.
+    """
+
+    def __init__(self, width):
+        """
+        Initialize count-min sketch
+
+        Args:
+            width (int): Counter per baris (pangkat dua, maksimum 65536)
+        """
+        if width & (width - 1) or not 0 < width <= 1 << 16:
+            raise ValueError(f"Count-min width must be a power of two up to 65536, got {width}")
+        self.width = width
+        self.counters = array('I', bytes(8 * width))
+
+    def indexes(self, key_hash):
+        """Indeks counter kunci di kedua baris"""
+        mask = self.width - 1
+        return key_hash & mask, self.width + (key_hash >> 16 & mask)
+
+    def add(self, indexes, count=1):
+        """
+        Tambahkan ``count`` untuk kunci
+
+        Args:
+            indexes (tuple): Hasil ``indexes(key_hash)``
+            count (int): Penambahan
+
+        Returns:
+            int: Estimasi baru untuk kunci
+        """
+        counters = self.counters
+        first, second = indexes
+        a = counters[first]
+        b = counters[second]
+        estimate = (a if a < b else b) + count
+        if a < estimate:
+            counters[first] = estimate
+        if b < estimate:
+            counters[second] = estimate
+        return estimate
+
+    def estimate(self, indexes):
+        """Estimasi jumlah untuk kunci (tidak pernah di bawah nilai sebenarnya)"""
+        counters = self.counters
+        a = counters[indexes[0]]
+        b = counters[indexes[1]]
+        return a if a < b else b
+
+    @property
+    def memory_bytes(self):
+        return self.counters.itemsize * len(self.counters)
+
+
+class _Window:
+    """Semua sketch untuk satu jendela waktu"""
+
+    def __init__(self, start, config):
+        slots = config['slots']
+        precision = config['precision']
+        width = config['width']
+        self.start = start
+        # Pasangan (sumber, port tujuan) dan (sumber, host tujuan) di dua baris
+        # slot per sumber, ditambah satu HLL global untuk koreksi tabrakan slot
+        self.ports = HyperLogLogBank(2 * slots, precision)
+        self.hosts = HyperLogLogBank(2 * slots, precision)
+        self.all_ports = HyperLogLogBank(1, 12)
+        self.all_hosts = HyperLogLogBank(1, 12)
+        self.src_packets = CountMinSketch(width)
+        self.src_syns = CountMinSketch(width)
+        self.dst_syns = CountMinSketch(width)
+        # Kandidat heavy hitter: sumber -> estimasi paket (count-min)
+        self.heavy = {}
+        self.heavy_min = 0
+        self.syns = False
+        self.alerted = set()
+
+    def distinct(self, slots):
+        """
+        Estimasi port dan host tujuan berbeda untuk satu sumber
+
+        Minimum dari dua baris slot, dikurangi derau rata-rata dari sumber
+        lain yang berbagi slot (estimasi global dibagi jumlah slot per baris).
+
+        Returns:
+            tuple: (jumlah port, jumlah host)
+        """
+        first, second = slots
+        scale = 2 / self.ports.slots
+        estimates = self.ports.estimates
+        ports = min(estimates[first], estimates[second]) - self.all_ports.estimates[0] * scale
+        estimates = self.hosts.estimates
+        hosts = min(estimates[first], estimates[second]) - self.all_hosts.estimates[0] * scale
+        return (ports if ports > 0 else 0.0), (hosts if hosts > 0 else 0.0)
+
+    @property
+    def memory_bytes(self):
+        return sum(sketch.memory_bytes for sketch in (
+            self.ports, self.hosts, self.all_ports, self.all_hosts,
+            self.src_packets, self.src_syns, self.dst_syns))
+
+
+class HostSketches:
+    """
+    Sketch perilaku per host dengan memori tetap untuk deteksi scan dan flood
+
+    Model internal hanya melihat fitur satu paket, sedangkan port scan, host
+    sweep dan SYN flood baru terlihat dari banyak paket. Setiap paket
+    memperbarui:
+
+    - HyperLogLog jumlah port dan host tujuan berbeda per sumber. Sumber
+      di-hash ke satu slot di masing-masing dua baris ``slots`` counter dan
+      estimasinya adalah minimum kedua slot, sehingga host biasa yang
+      berbagi slot dengan scanner tidak ikut tampak sebagai scanner. Derau
+      dari sumber spoofed dikurangi dengan estimasi global dibagi jumlah slot.
+    - Count-min sketch paket dan SYN per sumber serta SYN per tujuan (SYN
+      flood dengan sumber spoofed hanya terlihat dari sisi tujuan).
+    - Heavy hitter: ``heavy_hitters`` sumber dengan paket terbanyak per
+      jendela, dipilih dari estimasi count-min.
+
+    Statistik dihitung per jendela ``window_seconds`` berdasarkan timestamp
+    paket; jendela sebelumnya disimpan agar deteksi tidak terputus saat
+    jendela berganti. Memori tidak bergantung pada jumlah alamat.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize host sketches
+
+        Args:
+            config (dict): Konfigurasi sketch (CAPTURE_CONFIG['host_sketches'])
+        """
+        self.config = config
+        self.window_seconds = config.get('window_seconds', 10.0)
+        self.n_heavy = config.get('heavy_hitters', 20)
+        self.port_scan_ports = config.get('port_scan_ports', 100)
+        self.host_sweep_hosts = config.get('host_sweep_hosts', 50)
+        self.syn_flood_rate = config.get('syn_flood_rate', 500)
+        self.packet_flood_rate = config.get('packet_flood_rate', 10000)
+        # Batas alert yang di-log per jendela (satu per host dan perilaku)
+        self.max_alerts = config.get('max_alerts', 1000)
+        self.slots = config['slots']
+
+        # Tabulation hashing: crc32 alamat dipecah dua 16-bit, masing-masing
+        # memilih nilai acak 64-bit (hash 3-independent, tanpa perkalian int besar)
+        rng = random.Random(HASH_SEED)
+        self._low_table = array('Q', rng.randbytes(8 << 16))
+        self._high_table = array('Q', rng.randbytes(8 << 16))
+        self._port_table = array('Q', rng.randbytes(8 << 16))
+
+        self.current = None
+        self.previous = None
+        self.window_start = float('inf')
+        self.window_end = float('-inf')
+        self.last_heavy_hitters = []
+        self.flagged_packets = 0
+
+    def _rotate(self, timestamp):
+        """Mulai jendela baru untuk timestamp yang melewati jendela aktif"""
+        current = self.current
+        if current is None or timestamp < current.start:
+            # Awal capture, atau timestamp mundur (misalnya file replay berikutnya lebih lama)
+            start = timestamp
+            self.previous = None
+        else:
+            self.last_heavy_hitters = self._heavy_hitters(current)
+            if self.last_heavy_hitters:
+                logger.debug("Heavy hitters: " + ", ".join(
+                    f"{src_ip} ({packets})" for src_ip, packets in self.last_heavy_hitters[:5]))
+            elapsed = int((timestamp - current.start) // self.window_seconds)
+            start = current.start + elapsed * self.window_seconds
+            # Jendela sebelumnya hanya dipakai jika berbatasan langsung
+            self.previous = current if elapsed == 1 else None
+        self.current = _Window(start, self.config)
+        self.window_start = start
+        self.window_end = start + self.window_seconds
+
+    def _host_hash(self, address):
+        """Hash 64-bit alamat IP"""
+        crc = zlib.crc32(address.encode())
+        return self._low_table[crc & 0xffff] ^ self._high_table[crc >> 16]
+
+    def _slots(self, src_hash):
+        """Slot sumber di kedua baris HyperLogLog"""
+        return (src_hash % self.slots, self.slots + (src_hash >> 32) % self.slots)
+
+    def observe(self, features):
+        """
+        Perbarui sketch dengan satu paket dan tambahkan fitur perilaku sumbernya
+
+        Fitur yang ditambahkan: ``src_port_count`` dan ``src_host_count``
+        (port/host tujuan berbeda), ``src_packet_rate``, ``src_syn_rate`` dan
+        ``dst_syn_rate`` (per detik), serta ``behavior`` jika ambang terlampaui.
+
+        Args:
+            features (dict): Fitur paket (termasuk timestamp)
+
+        Returns:
+            str: Verdict perilaku (lihat BEHAVIORS) atau None
+        """
+        timestamp = features['timestamp']
+        if not self.window_start <= timestamp < self.window_end:
+            self._rotate(timestamp)
+        window = self.current
+        src_ip = features['src_ip']
+        src_hash = self._host_hash(src_ip)
+        dst_hash = self._host_hash(features['dst_ip'])
+        slots = self._slots(src_hash)
+
+        port_hash = src_hash ^ self._port_table[features.get('dst_port', 0)]
+        window.ports.add(slots[0], port_hash)
+        window.ports.add(slots[1], port_hash)
+        window.all_ports.add(0, port_hash)
+        host_hash = src_hash ^ dst_hash
+        window.hosts.add(slots[0], host_hash)
+        window.hosts.add(slots[1], host_hash)
+        window.all_hosts.add(0, host_hash)
+
+        src_packets = window.src_packets
+        src_indexes = src_packets.indexes(src_hash)
+        dst_indexes = src_packets.indexes(dst_hash)
+        packets = src_packets.add(src_indexes)
+        if packets > window.heavy_min or src_ip in window.heavy:
+            self._update_heavy(window, src_ip, packets)
+
+        flags = features.get('flags', '')
+        is_syn = 'S' in flags and 'A' not in flags
+        if is_syn:
+            window.src_syns.add(src_indexes)
+            window.dst_syns.add(dst_indexes)
+            window.syns = True
+
+        return self._annotate(features, timestamp, slots, src_indexes, dst_indexes, is_syn, packets)
+
+    def annotate(self, record):
+        """
+        Tambahkan fitur dan verdict perilaku tanpa memperbarui sketch
+
+        Dipakai untuk record flow yang paketnya sudah diamati lewat ``observe``.
+
+        Args:
+            record (dict): Record flow dari FlowTable
+
+        Returns:
+            str: Verdict perilaku atau None
+        """
+        window = self.current
+        if window is None:
+            return None
+        src_hash = self._host_hash(record['src_ip'])
+        flags = record.get('flags', '')
+        src_indexes = window.src_packets.indexes(src_hash)
+        return self._annotate(record, record['last_seen'], self._slots(src_hash), src_indexes,
+                              window.src_packets.indexes(self._host_hash(record['dst_ip'])),
+                              'S' in flags and 'A' not in flags, window.src_packets.estimate(src_indexes))
+
+    def _annotate(self, features, timestamp, slots, src_indexes, dst_indexes, is_syn, packets):
+        window = self.current
+        previous = self.previous
+        src_ports, src_hosts = window.distinct(slots)
+        if previous is not None:
+            previous_ports, previous_hosts = previous.distinct(slots)
+            src_ports = max(src_ports, previous_ports)
+            src_hosts = max(src_hosts, previous_hosts)
+            # Bobot jendela sebelumnya: bagiannya yang masih tercakup jendela geser
+            # sepanjang window_seconds yang berakhir di timestamp
+            overlap = max(0.0, 1.0 - (timestamp - window.start) / self.window_seconds)
+        else:
+            overlap = 0.0
+        src_packet_rate = packets
+        if overlap:
+            src_packet_rate += previous.src_packets.estimate(src_indexes) * overlap
+        src_packet_rate /= self.window_seconds
+        src_syn_rate = dst_syn_rate = 0.0
+        # Sketch SYN hanya dibaca jika jendela berisi SYN
+        if window.syns or (overlap and previous.syns):
+            src_syn_rate = self._rate(window.src_syns, previous and previous.src_syns, overlap, src_indexes)
+            dst_syn_rate = self._rate(window.dst_syns, previous and previous.dst_syns, overlap, dst_indexes)
+
+        features['src_port_count'] = round(src_ports)
+        features['src_host_count'] = round(src_hosts)
+        features['src_packet_rate'] = src_packet_rate
+        features['src_syn_rate'] = src_syn_rate
+        features['dst_syn_rate'] = dst_syn_rate
+
+        behavior = None
+        syn_flood_rate = self.syn_flood_rate
+        # SYN ke tujuan yang dibanjiri dihitung flood meski setiap sumber (spoofed) pelan
+        if syn_flood_rate and (src_syn_rate >= syn_flood_rate or (is_syn and dst_syn_rate >= syn_flood_rate)):
+            behavior = 'syn_flood'
+        elif self.packet_flood_rate and src_packet_rate >= self.packet_flood_rate:
+            behavior = 'packet_flood'
+        elif self.port_scan_ports and src_ports >= self.port_scan_ports:
+            behavior = 'port_scan'
+        elif self.host_sweep_hosts and src_hosts >= self.host_sweep_hosts:
+            behavior = 'host_sweep'
+        if behavior is None:
+            return None
+
+        features['behavior'] = behavior
+        self.flagged_packets += 1
+        BEHAVIOR_PACKETS.labels(behavior=behavior).inc()
+        if behavior == 'syn_flood' and src_syn_rate < syn_flood_rate:
+            host, direction = features['dst_ip'], 'to'
+        else:
+            host, direction = features['src_ip'], 'from'
+        key = (behavior, host)
+        if key not in window.alerted and len(window.alerted) < self.max_alerts:
+            window.alerted.add(key)
+            BEHAVIOR_ALERTS.labels(behavior=behavior).inc()
+            logger.warning(
+                f"{behavior.replace('_', ' ').upper()} {direction} {host}: "
+                f"{round(src_ports)} ports, {round(src_hosts)} hosts, {src_packet_rate:.0f} pkt/s, "
+                f"{max(src_syn_rate, dst_syn_rate):.0f} SYN/s"
+            )
+        return behavior
+
+    def _rate(self, sketch, previous, overlap, indexes):
+        """Laju per detik dari jendela aktif dan sisa jendela sebelumnya"""
+        count = sketch.estimate(indexes)
+        if overlap:
+            count += previous.estimate(indexes) * overlap
+        return count / self.window_seconds
+
+    def _update_heavy(self, window, src_ip, packets):
+        """Perbarui kandidat heavy hitter dengan estimasi count-min terbaru"""
+        heavy = window.heavy
+        old = heavy.get(src_ip)
+        if old is None and len(heavy) >= self.n_heavy:
+            del heavy[min(heavy, key=heavy.get)]
+        heavy[src_ip] = packets
+        # Minimum hanya dihitung ulang jika kandidat terkecil berubah
+        if len(heavy) >= self.n_heavy and (old is None or old == window.heavy_min):
+            window.heavy_min = min(heavy.values())
+
+    def _heavy_hitters(self, window):
+        return sorted(window.heavy.items(), key=lambda item: item[1], reverse=True)
+
+    def heavy_hitters(self):
+        """
+        Heavy hitter jendela terakhir yang sudah selesai
+
+        Returns:
+            list: (src_ip, estimasi paket) terurut dari yang terbesar
+        """
+        return list(self.last_heavy_hitters)
+
+    @property
+    def memory_bytes(self):
+        """Memori sketch (dua jendela dan tabel hash), tidak bergantung pada jumlah alamat"""
+        tables = 3 * len(self._port_table) * self._port_table.itemsize
+        if self.current is None:
+            return tables
+        return tables + 2 * self.current.memory_bytes
+
+    def get_stats(self):
+        """
+        Statistik sketch
+
+        Returns:
+            dict: Paket yang diberi verdict, heavy hitter jendela aktif dan memori
+        """
+        return {
+            'flagged_packets': self.flagged_packets,
+            'heavy_hitters': self._heavy_hitters(self.current) if self.current else [],
+            'memory_bytes': self.memory_bytes,
+        }
@@ -0,0 +1,209 @@
+import time
+import zlib
+import threading
+from collections import OrderedDict
+
+from utils.logging_utils import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+SAMPLING_RATE = metrics.gauge('nta_sampling_rate', 'Current sampling rate for benign flows (1 = no shedding)')
+SHED_ITEMS = metrics.counter('nta_shed_total', 'Benign packets/flows skipped by the overload controller', ('kind',))
+SHED_PACKETS = SHED_ITEMS.labels(kind='packet')
+SHED_FLOWS = SHED_ITEMS.labels(kind='flow')
+
+# Rentang hash crc32 untuk sampling deterministik per flow
+_HASH_SPACE = 1 << 32
+
+
+class LoadShedder:
+    """
+    Overload controller dengan sampling deterministik per flow
+
+    Secara berkala controller membaca backlog (misalnya antrian DB writer)
+    dan rata-rata latensi tahap analisis/penyimpanan. Saat overload sampling
+    rate diturunkan setengahnya, saat pulih dinaikkan perlahan sampai 1.
+
+    Sampling hanya berlaku untuk trafik yang jelas benign: port layanan yang
+    dikenal, flow yang sudah melewati ``new_flow_packets`` paket pertama dan
+    tidak pernah mendapat verdict mencurigakan. Flow baru, flow langka (port
+    lain) dan flow mencurigakan selalu diproses penuh. Keputusan diambil dari
+    hash 5-tuple sehingga satu flow selalu utuh diambil atau dilewati, dan
+    setiap paket/flow yang disimpan membawa ``sampling_rate``-nya agar
+    statistik bisa diskalakan kembali.
+    """
+
+    def __init__(self, config, backlog_sources=(), latency_histograms=()):
+        """
+        Initialize load shedder
+
+        Args:
+            config (dict): Konfigurasi load shedding (CAPTURE_CONFIG['load_shedding'])
+            backlog_sources (iterable): Fungsi tanpa argumen yang mengembalikan
+                tingkat isi antrian (0..1)
+            latency_histograms (iterable): Histogram per paket (utils.metrics) yang
+                rata-ratanya dijumlahkan sebagai latensi pemrosesan
+        """
+        self.check_interval = config.get('check_interval_seconds', 1.0)
+        self.high_watermark = config.get('high_watermark', 0.5)
+        self.low_watermark = config.get('low_watermark', 0.1)
+        self.latency_budget_ms = config.get('latency_budget_ms', 0)
+        self.min_rate = config.get('min_sampling_rate', 0.01)
+        self.new_flow_packets = config.get('new_flow_packets', 20)
+        self.reputation_size = config.get('reputation_size', 100000)
+        self.benign_ports = frozenset(
+            int(port) for port in str(config.get('benign_ports', '')).split(',') if port.strip()
+        )
+
+        self.backlog_sources = list(backlog_sources)
+        self.latency_histograms = list(latency_histograms)
+        self._latency_marks = [(histogram.sum, histogram.count) for histogram in self.latency_histograms]
+        self.next_check = time.monotonic() + self.check_interval
+
+        self.sampling_rate = 1.0
+        self.threshold = _HASH_SPACE
+        # Reputasi flow: kunci -> [paket terlihat, pernah mencurigakan]. Lock
+        # diperlukan karena mark_suspicious dipanggil dari thread callback
+        # analyzer async (eksternal/hybrid), sedangkan admit dari thread capture
+        self.flows = OrderedDict()
+        self._lock = threading.Lock()
+        self.shed_packets = 0
+        self.shed_flows = 0
+        self.last_backlog = 0.0
+        self.last_latency_ms = 0.0
+        SAMPLING_RATE.set_function(lambda: self.sampling_rate)
+
+    @staticmethod
+    def flow_key(features):
+        """Kunci flow simetris (A->B sama dengan B->A) dari fitur paket atau record flow"""
+        src = (features['src_ip'], features.get('src_port', 0))
+        dst = (features['dst_ip'], features.get('dst_port', 0))
+        if src > dst:
+            src, dst = dst, src
+        return (features['protocol'], src, dst)
+
+    def admit(self, features, packet_count=None):
+        """
+        Putuskan apakah paket/flow diproses
+
+        Args:
+            features (dict): Fitur paket, atau record flow dari FlowTable
+            packet_count (int): Jumlah paket flow (hanya untuk record flow;
+                flow pendek diperlakukan seperti flow baru)
+
+        Returns:
+            float: Sampling rate yang dicatat bersama row (1.0 = diproses
+                penuh), atau 0.0 jika paket/flow dilewati
+        """
+        if time.monotonic() >= self.next_check:
+            self.update()
+        if self.sampling_rate >= 1.0:
+            return 1.0
+
+        key = self.flow_key(features)
+        is_flow = packet_count is not None
+        with self._lock:
+            state = self.flows.get(key)
+            if not is_flow:
+                if state is None:
+                    state = self.flows[key] = [0, False]
+                    if len(self.flows) > self.reputation_size:
+                        self.flows.popitem(last=False)
+                else:
+                    self.flows.move_to_end(key)
+                state[0] += 1
+                packet_count = state[0]
+            suspicious = state is not None and state[1]
+
+        if suspicious or packet_count <= self.new_flow_packets:
+            return 1.0
+        if features.get('src_port', 0) not in self.benign_ports and \
+                features.get('dst_port', 0) not in self.benign_ports:
+            return 1.0
+
+        if zlib.crc32(repr(key).encode()) < self.threshold:
+            return self.sampling_rate
+
+        if is_flow:
+            self.shed_flows += 1
+            SHED_FLOWS.inc()
+        else:
+            self.shed_packets += 1
+            SHED_PACKETS.inc()
+        return 0.0
+
+    def mark_suspicious(self, features):
+        """
+        Catat flow yang mendapat verdict mencurigakan agar selalu diproses penuh
+
+        Args:
+            features (dict): Fitur paket atau record flow
+        """
+        key = self.flow_key(features)
+        with self._lock:
+            state = self.flows.get(key)
+            if state is None:
+                self.flows[key] = [0, True]
+                if len(self.flows) > self.reputation_size:
+                    self.flows.popitem(last=False)
+            else:
+                state[1] = True
+
+    def update(self):
+        """Evaluasi backlog dan latensi lalu sesuaikan sampling rate"""
+        self.next_check = time.monotonic() + self.check_interval
+
+        backlog = 0.0
+        for source in self.backlog_sources:
+            try:
+                backlog = max(backlog, source())
+            except Exception:
+                continue
+
+        latency_ms = 0.0
+        for index, histogram in enumerate(self.latency_histograms):
+            total, count = histogram.sum, histogram.count
+            previous_total, previous_count = self._latency_marks[index]
+            if count > previous_count:
+                latency_ms += (total - previous_total) / (count - previous_count) * 1000
+            self._latency_marks[index] = (total, count)
+        self.last_backlog, self.last_latency_ms = backlog, latency_ms
+
+        slow = self.latency_budget_ms and latency_ms > self.latency_budget_ms
+        if backlog >= self.high_watermark or slow:
+            rate = max(self.min_rate, self.sampling_rate / 2)
+        elif backlog <= self.low_watermark and \
+                (not self.latency_budget_ms or latency_ms <= self.latency_budget_ms / 2):
+            rate = min(1.0, self.sampling_rate * 1.25)
+        else:
+            return
+
+        if rate == self.sampling_rate:
+            return
+        if self.sampling_rate >= 1.0:
+            logger.warning(f"Overload (backlog {backlog:.0%}, {latency_ms:.2f} ms/packet): "
+                           f"sampling benign flows at {rate:.3f}")
+        elif rate >= 1.0:
+            logger.info("Load back to normal, processing all traffic")
+            # Hanya reputasi mencurigakan yang perlu disimpan saat tidak ada sampling
+            with self._lock:
+                self.flows = OrderedDict((key, state) for key, state in self.flows.items() if state[1])
+        self.sampling_rate = rate
+        self.threshold = int(rate * _HASH_SPACE)
+
+    def get_stats(self):
+        """
+        Statistik load shedding
+
+        Returns:
+            dict: Sampling rate, paket/flow yang dilewati, backlog dan latensi terakhir
+        """
+        return {
+            'sampling_rate': self.sampling_rate,
+            'shed_packets': self.shed_packets,
+            'shed_flows': self.shed_flows,
+            'tracked_flows': len(self.flows),
+            'backlog': self.last_backlog,
+            'latency_ms': self.last_latency_ms,
+        }
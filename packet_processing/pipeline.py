@@ -0,0 +1,441 @@
+import sys
+import time
+import zlib
+import signal
+import threading
+import multiprocessing
+from queue import Full
+
+from packet_processing.capture import open_raw_listen_socket
+from packet_processing.raw_features import flow_key, source_key, LINKTYPE_ETHERNET
+from packet_processing.replay import replay_capture_files
+from packet_processing.af_packet import capture_af_packet
+from packet_processing.trust_list import TrustList
+from utils.logging_utils import get_logger, configure_logging, stop_logging
+from utils import metrics
+
+logger = get_logger(__name__)
+
+PIPELINE_FRAMES = metrics.counter('nta_pipeline_frames_total', 'Frames handled by the pipeline dispatcher', ('result',))
+PIPELINE_DISPATCHED = PIPELINE_FRAMES.labels(result='dispatched')
+PIPELINE_DROPPED = PIPELINE_FRAMES.labels(result='dropped')
+PIPELINE_QUEUE_DEPTH = metrics.gauge('nta_pipeline_queue_depth', 'Chunks waiting in each worker queue', ('worker',))
+
+
+def flow_shard(frame, n_shards, linktype=LINKTYPE_ETHERNET):
+    """
+    Menentukan worker untuk sebuah frame berdasarkan hash 5-tuple
+
+    Hash bersifat simetris (arah A->B dan B->A menghasilkan shard yang sama)
+    sehingga satu flow selalu diproses oleh worker yang sama.
+
+    Args:
+        frame (bytes): Frame mentah
+        n_shards (int): Jumlah worker
+        linktype (int): Tipe link layer (LINKTYPE_*)
+
+    Returns:
+        int: Indeks worker (0..n_shards-1)
+    """
+    if n_shards <= 1:
+        return 0
+    key = flow_key(frame, linktype)
+    if key is None:
+        key = frame[:64]
+    return zlib.crc32(key) % n_shards
+
+
+def source_shard(frame, n_shards, linktype=LINKTYPE_ETHERNET):
+    """
+    Menentukan worker untuk sebuah frame berdasarkan alamat sumber
+
+    Dipakai bersama sketch perilaku host: semua paket dari satu sumber
+    diproses worker yang sama, sehingga ambang port scan, host sweep dan
+    flood per sumber tidak terbagi ke N worker.
+
+    Args:
+        frame (bytes): Frame mentah
+        n_shards (int): Jumlah worker
+        linktype (int): Tipe link layer (LINKTYPE_*)
+
+    Returns:
+        int: Indeks worker (0..n_shards-1)
+    """
+    if n_shards <= 1:
+        return 0
+    key = source_key(frame, linktype)
+    if key is None:
+        key = frame[:64]
+    return zlib.crc32(key) % n_shards
+
+
+def _worker_main(worker_id, packet_queue, counters, worker_config):
+    """
+    Entry point proses worker
+
+    Setiap worker memiliki koneksi database, analyzer dan writer sendiri,
+    lalu memproses chunk paket dari antriannya dengan PacketCaptureManager.
+    """
+    # Ctrl+C ditangani oleh proses capture, worker berhenti lewat sentinel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    if worker_config.get('log_config'):
+        configure_logging(worker_config['log_config'])
+
+    from database.models import initialize_database
+    from database.db_manager import BatchedPacketWriter
+    from ml.factory import create_analyzer
+    from packet_processing.capture import PacketCaptureManager
+
+    db_writer = None
+    try:
+        # Setiap worker mengekspos metriknya sendiri di port berikutnya
+        if worker_config.get('metrics_port'):
+            metrics.start_metrics_server(worker_config['metrics_port'] + 1 + worker_id,
+                                         worker_config.get('metrics_host', '127.0.0.1'))
+
+        initialize_database(worker_config['db_config'])
+        db_writer = BatchedPacketWriter(worker_config['db_writer_config'])
+        db_writer.start()
+
+        analyzer = create_analyzer(worker_config['ml_type'], worker_config['ml_config'])
+        # Antrian input yang penuh berarti worker tertinggal dari proses capture:
+        # load shedding worker ikut memperhitungkannya sebelum chunk mulai dibuang
+        queue_size = worker_config['capture_config'].get('worker_queue_size', 1024)
+        manager = PacketCaptureManager(analyzer, worker_config['capture_config'], db_writer=db_writer,
+                                       backlog_sources=[lambda: packet_queue.qsize() / queue_size])
+    except Exception as e:
+        # Proses capture melihat exit code bukan nol dan menghentikan run
+        logger.error(f"Worker {worker_id} failed to start: {e}")
+        if db_writer is not None:
+            db_writer.stop()
+        # Proses anak multiprocessing tidak menjalankan atexit: tulis sisa log sekarang
+        stop_logging()
+        sys.exit(1)
+
+    try:
+        while True:
+            chunk = packet_queue.get()
+            if chunk is None:
+                break
+
+            for timestamp, frame, linktype in chunk:
+                manager.frame_callback(frame, timestamp, linktype)
+
+            counters[2 * worker_id] = manager.packets_processed
+            counters[2 * worker_id + 1] = manager.suspicious_packets
+    finally:
+        manager.close()
+        counters[2 * worker_id] = manager.packets_processed
+        counters[2 * worker_id + 1] = manager.suspicious_packets
+        db_writer.stop()
+        logger.info(f"Worker {worker_id} stopped after {manager.packets_processed} packets")
+        stop_logging()
+
+
+class PipelineCaptureManager:
+    """
+    Capture manager multi-proses
+
+    Proses utama hanya menangkap paket dan membagikan frame mentah ke N proses
+    worker berdasarkan hash 5-tuple (atau alamat sumber jika sketch perilaku
+    host aktif). Ekstraksi fitur, analisis ML dan penyimpanan dilakukan di
+    worker sehingga pemrosesan dapat memakai banyak core.
+    """
+
+    def __init__(self, capture_config, worker_config):
+        """
+        Initialize pipeline capture manager
+
+        Args:
+            capture_config (dict): Konfigurasi penangkapan paket (CAPTURE_CONFIG)
+            worker_config (dict): Konfigurasi yang dikirim ke setiap worker:
+                ml_type, ml_config, db_config, db_writer_config, serta
+                metrics_port/metrics_host dan log_config opsional
+        """
+        self.config = capture_config
+        self.n_workers = capture_config['workers']
+        self.chunk_size = capture_config.get('worker_chunk_size', 256)
+        self.flush_interval = capture_config.get('worker_flush_interval', 0.1)
+        self.stop_timeout = capture_config.get('worker_stop_timeout', 30.0)
+        # Sketch perilaku host menghitung per sumber, jadi frame dibagi per alamat
+        # sumber. Mode flow tetap memakai 5-tuple agar kedua arah flow ada di
+        # worker yang sama; ambang sketch di mode itu berlaku per worker.
+        self.shard = flow_shard
+        if capture_config.get('host_sketches', {}).get('enabled') and self.n_workers > 1:
+            if capture_config.get('aggregation', 'packet') == 'flow':
+                logger.warning(f"Flow mode shards by 5-tuple: host sketch thresholds apply to each "
+                               f"of the {self.n_workers} workers separately")
+            else:
+                self.shard = source_shard
+        # Trust list dicocokkan di proses capture sebelum frame dikirim ke worker
+        self.trust_list = None
+        if capture_config.get('trust_list', {}).get('enabled'):
+            self.trust_list = TrustList(capture_config['trust_list'])
+        self.worker_config = dict(worker_config, capture_config=dict(capture_config, trust_list={}))
+
+        self.context = multiprocessing.get_context('spawn')
+        self.counters = self.context.Array('q', 2 * self.n_workers, lock=False)
+        self.queues = []
+        self.workers = []
+
+        self.linktype = None
+        self._chunks = [[] for _ in range(self.n_workers)]
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+        self.is_running = False
+        self.packets_captured = 0
+        self.packets_dropped = 0
+        self.failed_worker = None
+
+    def start_workers(self):
+        """Jalankan semua proses worker"""
+        for worker_id in range(self.n_workers):
+            packet_queue = self.context.Queue(maxsize=self.config.get('worker_queue_size', 1024))
+            worker = self.context.Process(
+                target=_worker_main,
+                args=(worker_id, packet_queue, self.counters, self.worker_config),
+                name=f'capture-worker-{worker_id}',
+                daemon=True
+            )
+            worker.start()
+            PIPELINE_QUEUE_DEPTH.labels(worker=worker_id).set_function(packet_queue.qsize)
+            self.queues.append(packet_queue)
+            self.workers.append(worker)
+        logger.info(f"Started {self.n_workers} pipeline workers")
+        if self.trust_list is not None:
+            self.trust_list.start()
+
+    def stop_workers(self):
+        """
+        Kirim sisa chunk dan hentikan worker setelah antriannya habis
+
+        Worker yang macet atau mati tidak boleh menggantung shutdown: sentinel
+        dan join dibatasi ``worker_stop_timeout`` detik secara keseluruhan,
+        lalu worker yang masih berjalan dihentikan paksa.
+        """
+        with self._lock:
+            self._flush_all()
+        deadline = time.monotonic() + self.stop_timeout
+        for worker_id, (worker, packet_queue) in enumerate(zip(self.workers, self.queues)):
+            if not worker.is_alive():
+                continue
+            try:
+                packet_queue.put(None, timeout=max(deadline - time.monotonic(), 0))
+            except Full:
+                logger.warning(f"Worker {worker_id} queue still full, stop sentinel not delivered")
+        for worker_id, (worker, packet_queue) in enumerate(zip(self.workers, self.queues)):
+            worker.join(max(deadline - time.monotonic(), 0))
+            if worker.is_alive():
+                logger.warning(f"Worker {worker_id} did not exit within {self.stop_timeout:.0f}s, "
+                               f"terminating it ({packet_queue.qsize()} chunks left in its queue)")
+                worker.terminate()
+                worker.join(1)
+            elif worker.exitcode:
+                logger.warning(f"Worker {worker_id} exited with code {worker.exitcode}")
+            if worker.exitcode != 0:
+                # Sisa chunk tidak akan dibaca lagi, jangan tunggu feeder thread saat exit
+                packet_queue.cancel_join_thread()
+        self.queues = []
+        self.workers = []
+        if self.trust_list is not None:
+            self.trust_list.stop()
+            stats = self.trust_list.get_stats()
+            if stats['packets_trusted']:
+                hits = ', '.join(f"'{rule}': {count}" for rule, count in stats['rule_hits'])
+                logger.info(f"Trust list dropped {stats['packets_trusted']} packets ({hits})")
+
+    def dispatch(self, frame, timestamp, linktype):
+        """
+        Masukkan frame mentah ke chunk worker yang sesuai
+
+        Args:
+            frame (bytes): Frame mentah termasuk header link layer
+            timestamp (float): Waktu penangkapan frame
+            linktype (int): Tipe link layer (LINKTYPE_*)
+        """
+        if self.trust_list is not None and self.trust_list.match_frame(frame, linktype):
+            return
+        self._enqueue(frame, timestamp, linktype)
+
+    def _ring_frame(self, frame, timestamp, linktype):
+        """Callback ring AF_PACKET: frame disalin keluar dari ring hanya jika diproses"""
+        if self.trust_list is not None and self.trust_list.match_frame(frame, linktype):
+            return
+        self._enqueue(bytes(frame), timestamp, linktype)
+
+    def _enqueue(self, frame, timestamp, linktype):
+        if self.failed_worker is not None:
+            raise RuntimeError(f"Pipeline worker {self.failed_worker} died "
+                               f"(exit code {self.workers[self.failed_worker].exitcode}), stopping capture")
+        shard = self.shard(frame, self.n_workers, linktype)
+
+        with self._lock:
+            self.packets_captured += 1
+            chunk = self._chunks[shard]
+            chunk.append((timestamp, frame, linktype))
+            if len(chunk) >= self.chunk_size:
+                self._send(shard)
+
+    def raw_packet_callback(self, packet):
+        """Callback sniff untuk socket mentah (lihat open_raw_listen_socket)"""
+        self.dispatch(packet.load, float(packet.time), self.linktype)
+
+    def packet_callback(self, packet):
+        """Callback sniff untuk paket Scapy yang sudah didiseksi"""
+        frame = getattr(packet, 'original', None) or bytes(packet)
+        linktype = self._layer2num.get(type(packet))
+        self.dispatch(frame, float(packet.time), linktype)
+
+    def _send(self, shard):
+        """Kirim chunk sebuah shard ke worker tanpa blocking"""
+        chunk = self._chunks[shard]
+        self._chunks[shard] = []
+        if not self.workers[shard].is_alive():
+            self._worker_died(shard, len(chunk))
+            return
+        try:
+            self.queues[shard].put_nowait(chunk)
+            PIPELINE_DISPATCHED.inc(len(chunk))
+        except Full:
+            self.packets_dropped += len(chunk)
+            PIPELINE_DROPPED.inc(len(chunk))
+
+    def _worker_died(self, shard, frames):
+        """
+        Catat worker yang mati: chunk-nya dibuang dan capture dihentikan
+
+        Shard tidak dialihkan ke worker lain karena itu memecah flow (atau
+        sumber) ke dua worker; frame berikutnya membuat dispatch gagal.
+        """
+        self.packets_dropped += frames
+        PIPELINE_DROPPED.inc(frames)
+        if self.failed_worker is None:
+            self.failed_worker = shard
+            self.is_running = False
+            logger.error(f"Pipeline worker {shard} died (exit code {self.workers[shard].exitcode}), "
+                         f"stopping capture")
+
+    def _flush_all(self):
+        """Kirim semua chunk yang belum penuh"""
+        for shard, chunk in enumerate(self._chunks):
+            if chunk:
+                self._send(shard)
+        self._last_flush = time.monotonic()
+
+    def _flush_loop(self):
+        """Kirim chunk secara berkala agar paket tidak tertahan saat trafik sepi"""
+        while self.is_running:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                if time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush_all()
+
+    def get_stats(self):
+        """
+        Statistik gabungan dari semua worker
+
+        Returns:
+            dict: Jumlah paket ditangkap, diproses, mencurigakan dan dibuang
+        """
+        counters = self.counters[:]
+        processed = counters[0::2]
+        suspicious = counters[1::2]
+        return {
+            'packets_captured': self.packets_captured,
+            'packets_processed': sum(processed),
+            'suspicious_packets': sum(suspicious),
+            'packets_dropped': self.packets_dropped,
+            'packets_trusted': self.trust_list.packets_trusted if self.trust_list is not None else 0,
+            'per_worker': [
+                {'packets_processed': p, 'suspicious_packets': s}
+                for p, s in zip(processed, suspicious)
+            ],
+        }
+
+    def replay(self, paths, realtime=False, speed=1.0):
+        """
+        Putar ulang file pcap/pcapng melalui worker pipeline
+
+        Args:
+            paths (list): Path file capture
+            realtime (bool): Ikuti jarak waktu asli antar paket
+            speed (float): Pengali kecepatan pada mode realtime
+
+        Returns:
+            dict: Statistik replay (packets_per_second dihitung sampai semua worker selesai)
+        """
+        self.start_workers()
+        self.is_running = True
+        self._flusher = threading.Thread(target=self._flush_loop, name='pipeline-flusher', daemon=True)
+        self._flusher.start()
+
+        start = time.perf_counter()
+        try:
+            stats = replay_capture_files(paths, self.dispatch, realtime, speed)
+        finally:
+            self.is_running = False
+            self.stop_workers()
+
+        elapsed = time.perf_counter() - start
+        stats.update(self.get_stats())
+        stats['elapsed_seconds'] = elapsed
+        stats['packets_per_second'] = stats['packets_processed'] / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Pipeline replay finished: {stats['packets_processed']} packets processed in "
+                    f"{elapsed:.2f}s ({stats['packets_per_second']:.0f} packets/s, "
+                    f"{stats['packets_dropped']} dropped)")
+        return stats
+
+    def start_capture(self):
+        """Mulai penangkapan paket dengan pipeline multi-proses"""
+        self.start_workers()
+        self.is_running = True
+        self._flusher = threading.Thread(target=self._flush_loop, name='pipeline-flusher', daemon=True)
+        self._flusher.start()
+        logger.info("Starting packet capture (pipeline mode)...")
+        if self.trust_list is not None:
+            # Aturan sederhana dikecualikan langsung oleh filter BPF kernel
+            self.config = dict(self.config, filter=self.trust_list.bpf_filter(self.config.get('filter')))
+
+        sock = None
+        try:
+            if self.config.get('backend', 'scapy') == 'af_packet':
+                # Frame disalin keluar dari ring karena dikirim ke proses worker
+                capture_af_packet(self.config, self._ring_frame, lambda: not self.is_running)
+                return
+
+            # Proses capture tidak pernah mendiseksi paket, cukup frame mentah
+            sock, self.linktype = open_raw_listen_socket(self.config)
+            from scapy.config import conf
+            from scapy.sendrecv import sniff
+            self._layer2num = conf.l2types.layer2num
+            if sock is not None:
+                sniff(
+                    prn=self.raw_packet_callback,
+                    opened_socket=sock,
+                    count=self.config['packet_count'],
+                    store=0
+                )
+            else:
+                sniff(
+                    prn=self.packet_callback,
+                    iface=self.config['interface'],
+                    filter=self.config['filter'],
+                    count=self.config['packet_count'],
+                    store=0
+                )
+        except KeyboardInterrupt:
+            logger.info("\nStopping capture...")
+        except Exception as e:
+            logger.error(f"Error during packet capture: {e}")
+        finally:
+            if sock is not None:
+                sock.close()
+            self.is_running = False
+            self.stop_workers()
+            stats = self.get_stats()
+            logger.info(f"Capture stopped. Total processed: {stats['packets_processed']} packets "
+                        f"({stats['suspicious_packets']} suspicious, "
+                        f"{stats['packets_dropped']} dropped) by {self.n_workers} workers.")
@@ -0,0 +1,364 @@
+"""
+Ekstraksi fitur langsung dari byte frame mentah tanpa diseksi Scapy.
+
+Menghasilkan dictionary yang identik dengan ``extract_features`` (termasuk
+string flags TCP ala Scapy), tetapi hanya membaca field yang dibutuhkan
+dengan ``struct.unpack_from`` pada offset yang dihitung sendiri.
+
+Tunnel diikuti sejauh Scapy mengikutinya dengan layer ``inet``/``inet6``:
+IP-in-IP, IPv6-in-IP, GRE (termasuk Ethernet di dalam GRE) dan GRE-in-UDP.
+Alamat, TTL dan protocol selalu dari header IP luar, sedangkan port, flags
+dan window dari header TCP/UDP di dalam tunnel.
+"""
+import socket
+import struct
+
+# Link-layer header types (pcap LINKTYPE_* / DLT_*)
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW_BSD = 12
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_TEB = 0x6558      # Transparent Ethernet Bridging (Ethernet di dalam GRE)
+VLAN_ETHERTYPES = (0x8100, 0x88A8)
+
+PROTO_TCP = 6
+PROTO_UDP = 17
+PROTO_IPIP = 4
+PROTO_IPV6 = 41
+PROTO_GRE = 47
+
+# Flag header GRE (RFC 2784/2890) yang menentukan panjang header
+GRE_CHECKSUM = 0x8000
+GRE_ROUTING = 0x4000
+GRE_KEY = 0x2000
+GRE_SEQUENCE = 0x1000
+
+# Port tujuan UDP untuk GRE-in-UDP yang didiseksi Scapy (bind_layers UDP -> GRE)
+GRE_UDP_PORT = 4754
+
+# IPv6 extension header yang didiseksi Scapy sebelum layer transport
+IPV6_EXT_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT_HEADER = 44
+
+# Urutan huruf flag TCP Scapy (bit 0..8)
+TCP_FLAG_LETTERS = 'FSRPAUECN'
+
+# String flag untuk setiap bitmask 9-bit, sama dengan str(packet[TCP].flags)
+TCP_FLAG_STRINGS = tuple(
+    ''.join(letter for bit, letter in enumerate(TCP_FLAG_LETTERS) if value >> bit & 1)
+    for value in range(1 << len(TCP_FLAG_LETTERS))
+)
+
+_u16 = struct.Struct('!H').unpack_from
+_ipv4_header = struct.Struct('!B5xHBB2x4s4s').unpack_from   # ver_ihl, frag, ttl, proto, src, dst
+_ipv6_header = struct.Struct('!4x2xBB16s16s').unpack_from     # nh, hlim, src, dst
+_ports = struct.Struct('!HH').unpack_from
+_gre_header = struct.Struct('!HH').unpack_from               # flags/version, protocol type
+_tcp_flags_window = struct.Struct('!BBH').unpack_from         # offset/ns, flags, window
+_null_family = struct.Struct('=I').unpack_from
+
+_inet_ntoa = socket.inet_ntoa
+_inet6_ntoa = socket.inet_ntop
+_AF_INET6 = socket.AF_INET6
+
+# Nilai address family untuk IPv6 pada header LINKTYPE_NULL (berbeda per OS)
+_NULL_AF_INET6 = (10, 24, 28, 30)
+
+
+def network_offset(frame, linktype=LINKTYPE_ETHERNET):
+    """
+    Mencari awal header IP di dalam frame
+
+    Args:
+        frame (bytes): Frame mentah
+        linktype (int): Tipe link layer (LINKTYPE_*)
+
+    Returns:
+        tuple: (offset, versi IP) atau (None, None) jika bukan paket IP
+    """
+    try:
+        if linktype == LINKTYPE_ETHERNET or linktype == LINKTYPE_LINUX_SLL:
+            offset = 12 if linktype == LINKTYPE_ETHERNET else 14
+            ethertype = _u16(frame, offset)[0]
+            while ethertype in VLAN_ETHERTYPES:
+                offset += 4
+                ethertype = _u16(frame, offset)[0]
+            offset += 2
+            if ethertype == ETH_P_IP:
+                return offset, 4
+            if ethertype == ETH_P_IPV6:
+                return offset, 6
+            return None, None
+
+        if linktype in (LINKTYPE_RAW, LINKTYPE_RAW_BSD, LINKTYPE_IPV4, LINKTYPE_IPV6):
+            version = frame[0] >> 4
+            return (0, version) if version in (4, 6) else (None, None)
+
+        if linktype == LINKTYPE_NULL:
+            family = _null_family(frame, 0)[0]
+            if family == socket.AF_INET:
+                return 4, 4
+            if family in _NULL_AF_INET6:
+                return 4, 6
+    except (IndexError, struct.error):
+        pass
+    return None, None
+
+
+def _gre_payload(frame, offset):
+    """
+    Mencari awal paket IP yang dibawa header GRE
+
+    Mengikuti binding layer Scapy: GRE versi apa pun dengan protocol type
+    IPv4/IPv6 (opsional lewat Ethernet 0x6558 dan tag VLAN). Header dengan
+    bit routing (RFC 1701) tidak diikuti, sama seperti Scapy yang
+    mendiseksinya sebagai GRErouting tanpa layer IP.
+
+    Returns:
+        tuple: (offset, versi IP) atau (None, None) jika payload bukan IP
+    """
+    flags, ethertype = _gre_header(frame, offset)
+    if flags & GRE_ROUTING:
+        return None, None
+    offset += 4
+    if flags & GRE_CHECKSUM:
+        offset += 4
+    if flags & GRE_KEY:
+        offset += 4
+    if flags & GRE_SEQUENCE:
+        offset += 4
+    if ethertype == ETH_P_TEB:
+        ethertype = _u16(frame, offset + 12)[0]
+        offset += 14
+    while ethertype in VLAN_ETHERTYPES:
+        ethertype = _u16(frame, offset + 2)[0]
+        offset += 4
+    if ethertype == ETH_P_IP:
+        return offset, 4
+    if ethertype == ETH_P_IPV6:
+        return offset, 6
+    return None, None
+
+
+def _transport_offset(frame, offset, version):
+    """
+    Mengikuti header IP (termasuk tunnel IP-in-IP, GRE dan extension header
+    IPv6) sampai header transport
+
+    Hasilnya sama dengan layer yang dipilih ``extract_features``: TCP
+    pertama di mana pun dalam paket, selain itu UDP pertama. Karena itu UDP
+    ke ``GRE_UDP_PORT`` hanya dipakai jika tunnel di dalamnya tidak
+    membawa TCP.
+
+    Returns:
+        tuple: (protocol transport, offset, akhir payload IP) atau
+            (None, None, None) jika paket adalah fragmen lanjutan
+    """
+    end = len(frame)
+    while True:
+        if version == 4:
+            ver_ihl, frag, _, proto, _, _ = _ipv4_header(frame, offset)
+            if frag & 0x1FFF:
+                return None, None, None
+            header_length = (ver_ihl & 0x0F) * 4
+            total_length = _u16(frame, offset + 2)[0]
+            if total_length >= header_length:
+                end = min(end, offset + total_length)
+            offset += header_length
+        else:
+            payload_length = _u16(frame, offset + 4)[0]
+            proto = _ipv6_header(frame, offset)[0]
+            offset += 40
+            if payload_length:
+                end = min(end, offset + payload_length)
+            while proto in IPV6_EXT_HEADERS or proto == IPV6_FRAGMENT_HEADER:
+                if proto == IPV6_FRAGMENT_HEADER:
+                    if _u16(frame, offset + 2)[0] & 0xFFF8:
+                        return None, None, None
+                    proto, offset = frame[offset], offset + 8
+                else:
+                    proto, offset = frame[offset], offset + (frame[offset + 1] + 1) * 8
+
+        if proto == PROTO_IPIP:
+            version = 4
+        elif proto == PROTO_IPV6:
+            version = 6
+        elif proto == PROTO_GRE:
+            # Header tunnel dan paket di dalamnya dibatasi panjang paket luar
+            frame = frame[:end]
+            inner, inner_version = _gre_payload(frame, offset)
+            if inner is None:
+                return proto, offset, end
+            offset, version = inner, inner_version
+        elif proto == PROTO_UDP and end >= offset + 8 and _u16(frame, offset + 2)[0] == GRE_UDP_PORT:
+            frame = frame[:end]
+            try:
+                inner, inner_version = _gre_payload(frame, offset + 8)
+                if inner is not None:
+                    transport, l4, inner_end = _transport_offset(frame, inner, inner_version)
+                    if transport == PROTO_TCP and inner_end >= l4 + 20:
+                        return transport, l4, inner_end
+            except (IndexError, struct.error):
+                pass
+            return proto, offset, end
+        else:
+            return proto, offset, end
+
+
+def extract_features_raw(frame, linktype=LINKTYPE_ETHERNET):
+    """
+    Ekstrak fitur paket langsung dari byte frame mentah
+
+    Args:
+        frame (bytes): Frame mentah termasuk header link layer
+        linktype (int): Tipe link layer (LINKTYPE_*)
+
+    Returns:
+        dict: Fitur yang identik dengan ``extract_features``, atau None jika
+            bukan paket IP
+    """
+    offset, version = network_offset(frame, linktype)
+    if offset is None:
+        return None
+
+    try:
+        if version == 4:
+            _, _, ttl, protocol, src, dst = _ipv4_header(frame, offset)
+            src_ip = _inet_ntoa(src)
+            dst_ip = _inet_ntoa(dst)
+        else:
+            protocol, ttl, src, dst = _ipv6_header(frame, offset)
+            src_ip = _inet6_ntoa(_AF_INET6, src)
+            dst_ip = _inet6_ntoa(_AF_INET6, dst)
+    except struct.error:
+        return None
+
+    features = {
+        'src_ip': src_ip,
+        'dst_ip': dst_ip,
+        'packet_size': len(frame),
+        'ttl': ttl,
+        'protocol': protocol,
+    }
+
+    try:
+        transport, l4, end = _transport_offset(frame, offset, version)
+        if transport == PROTO_TCP and end >= l4 + 20:
+            src_port, dst_port = _ports(frame, l4)
+            offset_ns, flags, window = _tcp_flags_window(frame, l4 + 12)
+            features['src_port'] = src_port
+            features['dst_port'] = dst_port
+            features['flags'] = TCP_FLAG_STRINGS[(offset_ns & 0x01) << 8 | flags]
+            features['window_size'] = window
+            return features
+        if transport == PROTO_UDP and end >= l4 + 8:
+            src_port, dst_port = _ports(frame, l4)
+            features['src_port'] = src_port
+            features['dst_port'] = dst_port
+            features['flags'] = ''
+            features['window_size'] = 0
+            return features
+    except (IndexError, struct.error):
+        pass
+
+    features['src_port'] = 0
+    features['dst_port'] = 0
+    features['flags'] = ''
+    features['window_size'] = 0
+    return features
+
+
+def flow_key(frame, linktype=LINKTYPE_ETHERNET):
+    """
+    Kunci flow simetris (arah A->B dan B->A sama) dari frame mentah
+
+    Args:
+        frame (bytes): Frame mentah
+        linktype (int): Tipe link layer (LINKTYPE_*)
+
+    Returns:
+        bytes: Kunci flow (protocol + endpoint terurut), atau None jika bukan paket IP
+    """
+    offset, version = network_offset(frame, linktype)
+    if offset is None:
+        return None
+
+    try:
+        if version == 4:
+            _, _, _, protocol, src, dst = _ipv4_header(frame, offset)
+        else:
+            protocol, _, src, dst = _ipv6_header(frame, offset)
+        transport, l4, end = _transport_offset(frame, offset, version)
+        if transport in (PROTO_TCP, PROTO_UDP) and end >= l4 + 4:
+            src = src + frame[l4:l4 + 2]
+            dst = dst + frame[l4 + 2:l4 + 4]
+    except (IndexError, struct.error):
+        return None
+
+    if src > dst:
+        src, dst = dst, src
+    return bytes((protocol,)) + src + dst
+
+
+def source_key(frame, linktype=LINKTYPE_ETHERNET):
+    """
+    Alamat sumber (header IP luar) dari frame mentah
+
+    Args:
+        frame (bytes): Frame mentah
+        linktype (int): Tipe link layer (LINKTYPE_*)
+
+    Returns:
+        bytes: Alamat 4 atau 16 byte, atau None jika bukan paket IP
+    """
+    offset, version = network_offset(frame, linktype)
+    if offset is None:
+        return None
+    if version == 4:
+        address = frame[offset + 12:offset + 16]
+        return address if len(address) == 4 else None
+    address = frame[offset + 8:offset + 24]
+    return address if len(address) == 16 else None
+
+
+def packet_tuple(frame, linktype=LINKTYPE_ETHERNET):
+    """
+    Protocol, alamat dan port dari frame mentah tanpa membuat dictionary fitur
+
+    Field sama dengan ``extract_features_raw`` (protocol dari header IP luar,
+    port dari header transport), tetapi alamat tetap berupa bytes.
+
+    Args:
+        frame (bytes): Frame mentah
+        linktype (int): Tipe link layer (LINKTYPE_*)
+
+    Returns:
+        tuple: (protocol, src, dst, src_port, dst_port) dengan alamat 4 atau
+            16 byte, atau None jika bukan paket IP
+    """
+    offset, version = network_offset(frame, linktype)
+    if offset is None:
+        return None
+
+    try:
+        if version == 4:
+            _, _, _, protocol, src, dst = _ipv4_header(frame, offset)
+        else:
+            protocol, _, src, dst = _ipv6_header(frame, offset)
+    except struct.error:
+        return None
+
+    try:
+        transport, l4, end = _transport_offset(frame, offset, version)
+        if (transport == PROTO_TCP and end >= l4 + 20) or (transport == PROTO_UDP and end >= l4 + 8):
+            src_port, dst_port = _ports(frame, l4)
+            return protocol, src, dst, src_port, dst_port
+    except (IndexError, struct.error):
+        pass
+    return protocol, src, dst, 0, 0
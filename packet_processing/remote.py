@@ -0,0 +1,596 @@
+"""
+Mode terdistribusi: sensor ringan dan collector pusat.
+
+Sensor hanya menangkap paket, mengekstrak fitur dan (opsional) mengagregasi
+flow, lalu mengirim record biner lebar tetap (lihat packet_processing.wire)
+lewat TCP ke collector. Collector menjalankan analyzer ML dan writer
+database untuk semua sensor, sehingga sensor tidak butuh kredensial
+database maupun scikit-learn.
+
+Pengiriman memakai jendela ack: sensor menyimpan paling banyak
+``max_in_flight`` batch yang belum di-ack dan mengirim ulang batch itu
+setelah reconnect. Collector mencatat nomor urut terakhir per sesi sensor
+sehingga batch yang dikirim ulang tidak diproses dua kali. Collector baru
+mengirim ack setelah batch masuk antrian analisisnya; saat antrian penuh
+collector berhenti membaca socket, jendela sensor penuh, dan batch baru di
+sensor dibuang (dihitung) tanpa pernah memblokir thread capture.
+"""
+import os
+import time
+import queue
+import socket
+import threading
+import socketserver
+from collections import deque, OrderedDict
+
+from packet_processing.capture import PacketCaptureManager, PACKETS_PROCESSED, FLOWS_EXPORTED
+from packet_processing.wire import (
+    KIND_PACKET, KIND_FLOW, MSG_HELLO, MSG_BATCH, MSG_ACK, ProtocolError,
+    encode_packet, encode_flow, encode_batch, encode_hello, decode_hello,
+    encode_ack, decode_ack, batch_seq, decode_batch, recv_message
+)
+from utils.logging_utils import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+SENSOR_RECORDS = metrics.counter('nta_sensor_records_total', 'Feature records handled by the sensor link', ('result',))
+SENSOR_ACKED = SENSOR_RECORDS.labels(result='acked')
+SENSOR_DROPPED = SENSOR_RECORDS.labels(result='dropped')
+SENSOR_BYTES = metrics.counter('nta_sensor_bytes_total', 'Batch bytes sent to the collector after compression')
+SENSOR_CONNECTS = metrics.counter('nta_sensor_connects_total', 'Connections established to the collector')
+SENSOR_CONNECTED = metrics.gauge('nta_sensor_connected', 'Whether the sensor is connected to the collector')
+SENSOR_QUEUE_DEPTH = metrics.gauge('nta_sensor_queue_depth', 'Batches waiting to be sent to the collector')
+COLLECTOR_RECORDS = metrics.counter('nta_collector_records_total', 'Records received from sensors', ('sensor',))
+COLLECTOR_DUPLICATES = metrics.counter('nta_collector_duplicate_batches_total',
+                                       'Resent batches that were already received')
+COLLECTOR_SENSORS = metrics.gauge('nta_collector_connections', 'Open sensor connections')
+COLLECTOR_QUEUE_DEPTH = metrics.gauge('nta_collector_queue_depth', 'Batches waiting for analysis')
+
+# Jumlah sesi sensor yang nomor urutnya diingat collector
+MAX_SESSIONS = 4096
+
+
+def parse_address(address, default_host='127.0.0.1'):
+    """
+    Mengubah 'host:port', '[ipv6]:port' atau 'port' menjadi (host, port)
+
+    Args:
+        address (str): Alamat
+        default_host (str): Host jika alamat hanya berisi port
+
+    Returns:
+        tuple: (host, port)
+    """
+    host, _, port = str(address).rpartition(':')
+    return host.strip('[]') or default_host, int(port)
+
+
+class SensorLink:
+    """
+    Pengirim record fitur dari sensor ke collector
+
+    Thread capture hanya meng-encode record dan menambahkannya ke batch;
+    batch penuh (atau yang lebih tua dari ``flush_interval_seconds``)
+    dimasukkan ke antrian berukuran tetap dan dibuang jika antrian penuh.
+    Thread pengirim mengompresi batch, mengirimnya, menunggu ack dengan
+    jendela ``max_in_flight`` batch, dan menyambung ulang dengan backoff
+    eksponensial saat koneksi putus.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize sensor link dan jalankan thread pengirim
+
+        Args:
+            config (dict): REMOTE_CONFIG (collector_address, sensor_name,
+                batch_size, flush_interval_seconds, queue_size, max_in_flight,
+                compression_level, reconnect_min_seconds, reconnect_max_seconds,
+                connect_timeout_seconds, drain_timeout_seconds)
+        """
+        self.host, self.port = parse_address(config['collector_address'])
+        self.name = config.get('sensor_name') or socket.gethostname()
+        self.batch_size = config.get('batch_size', 512)
+        self.flush_interval = config.get('flush_interval_seconds', 0.2)
+        self.max_in_flight = config.get('max_in_flight', 16)
+        self.compression_level = config.get('compression_level', 1)
+        self.reconnect_min = config.get('reconnect_min_seconds', 0.5)
+        self.reconnect_max = config.get('reconnect_max_seconds', 30)
+        self.connect_timeout = config.get('connect_timeout_seconds', 5)
+        self.drain_timeout = config.get('drain_timeout_seconds', 10)
+
+        # Id sesi acak: collector membedakan sensor yang restart dari reconnect
+        self.session_id = int.from_bytes(os.urandom(8), 'big')
+        self.queue = queue.Queue(maxsize=config.get('queue_size', 256))
+        SENSOR_QUEUE_DEPTH.set_function(self.queue.qsize)
+
+        # Batch yang sedang diisi per jenis record dan waktu record pertamanya
+        self._pending = {KIND_PACKET: [], KIND_FLOW: []}
+        self._started = {KIND_PACKET: 0.0, KIND_FLOW: 0.0}
+        self._lock = threading.Lock()
+
+        # Batch terkirim yang belum di-ack: (nomor urut, pesan, jumlah record)
+        self._seq = 0
+        self._unacked = deque()
+        self._window = threading.Condition()
+        self._connected = False
+        self._closing = threading.Event()
+        self._deadline = None
+
+        self.records_acked = 0
+        self.records_dropped = 0
+        self.batches_sent = 0
+        self.bytes_sent = 0
+        self.connects = 0
+
+        self._thread = threading.Thread(target=self._run, name='sensor-link', daemon=True)
+        self._thread.start()
+
+    def send_packet(self, features):
+        """
+        Tambahkan fitur satu paket ke batch berikutnya
+
+        Args:
+            features (dict): Fitur paket (termasuk timestamp)
+        """
+        record = encode_packet(features)
+        with self._lock:
+            pending = self._pending[KIND_PACKET]
+            if not pending:
+                self._started[KIND_PACKET] = time.monotonic()
+            pending.append(record)
+            if len(pending) >= self.batch_size:
+                self._enqueue(KIND_PACKET)
+
+    def send_flows(self, flow_records):
+        """
+        Tambahkan record flow yang sudah berakhir ke batch berikutnya
+
+        Args:
+            flow_records (list): Record flow dari FlowTable
+        """
+        records = [encode_flow(record) for record in flow_records]
+        with self._lock:
+            pending = self._pending[KIND_FLOW]
+            if not pending:
+                self._started[KIND_FLOW] = time.monotonic()
+            pending.extend(records)
+            if len(pending) >= self.batch_size:
+                self._enqueue(KIND_FLOW)
+
+    def _enqueue(self, kind):
+        """Pindahkan batch yang sedang diisi ke antrian kirim (dipanggil dengan lock dipegang)"""
+        records = self._pending[kind]
+        self._pending[kind] = []
+        try:
+            self.queue.put_nowait((kind, records))
+        except queue.Full:
+            self.records_dropped += len(records)
+            SENSOR_DROPPED.inc(len(records))
+
+    def _flush_due(self):
+        """Kirim batch yang belum penuh setelah flush_interval agar record tidak tertahan"""
+        now = time.monotonic()
+        with self._lock:
+            for kind, pending in self._pending.items():
+                if pending and now - self._started[kind] >= self.flush_interval:
+                    self._enqueue(kind)
+
+    def close(self):
+        """
+        Kirim sisa batch dan tunggu ack collector paling lama drain_timeout_seconds
+
+        Record yang belum di-ack saat batas waktu habis dihitung sebagai dibuang.
+        """
+        with self._lock:
+            for kind, pending in self._pending.items():
+                if pending:
+                    self._enqueue(kind)
+        self._deadline = time.monotonic() + self.drain_timeout
+        self._closing.set()
+        self._thread.join()
+
+        lost = sum(len(records) for _, records in self._drain_queue())
+        lost += sum(count for _, _, count in self._unacked)
+        self._unacked.clear()
+        if lost:
+            self.records_dropped += lost
+            SENSOR_DROPPED.inc(lost)
+            logger.warning(f"{lost} records were not acknowledged by the collector at {self.host}:{self.port}")
+
+    def _drain_queue(self):
+        while True:
+            try:
+                yield self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _expired(self):
+        return self._closing.is_set() and time.monotonic() >= self._deadline
+
+    def _finished(self):
+        """Thread pengirim selesai: semua batch di-ack setelah close(), atau batas waktu habis"""
+        if not self._closing.is_set():
+            return False
+        return self._expired() or (self.queue.empty() and not self._unacked)
+
+    def _run(self):
+        delay = self.reconnect_min
+        while not self._finished():
+            try:
+                sock = self._connect()
+            except (OSError, ProtocolError) as e:
+                logger.warning(f"Cannot connect to collector at {self.host}:{self.port}: {e} "
+                               f"(retrying in {delay:g}s)")
+                if self._closing.is_set():
+                    time.sleep(min(delay, max(0.0, self._deadline - time.monotonic())))
+                else:
+                    self._closing.wait(delay)
+                delay = min(delay * 2, self.reconnect_max)
+                continue
+
+            delay = self.reconnect_min
+            try:
+                self._send_batches(sock)
+            except (OSError, ProtocolError) as e:
+                logger.warning(f"Lost connection to collector at {self.host}:{self.port}: {e}")
+            finally:
+                sock.close()
+
+    def _connect(self):
+        """Buka koneksi, kirim HELLO dan buang batch yang sudah diterima collector"""
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(encode_hello(self.session_id, self.name))
+            message = recv_message(sock)
+            if message is None or message[0] != MSG_ACK:
+                raise ProtocolError("Collector did not acknowledge HELLO")
+            self._acked(decode_ack(message[1]))
+            sock.settimeout(None)
+        except BaseException:
+            sock.close()
+            raise
+        self.connects += 1
+        SENSOR_CONNECTS.inc()
+        logger.info(f"Connected to collector at {self.host}:{self.port} as sensor '{self.name}'")
+        return sock
+
+    def _send_batches(self, sock):
+        """Kirim ulang batch yang belum di-ack lalu kirim batch baru sampai koneksi putus"""
+        with self._window:
+            self._connected = True
+            resend = list(self._unacked)
+        SENSOR_CONNECTED.set(1)
+        reader = threading.Thread(target=self._read_acks, args=(sock,), name='sensor-acks', daemon=True)
+        reader.start()
+        try:
+            for _, message, _ in resend:
+                sock.sendall(message)
+
+            while not self._finished():
+                with self._window:
+                    # Jendela penuh: collector belum sempat memproses (backpressure)
+                    while len(self._unacked) >= self.max_in_flight and self._connected and not self._expired():
+                        self._window.wait(self.flush_interval)
+                    if not self._connected:
+                        raise ConnectionError("collector closed the connection")
+                    if len(self._unacked) >= self.max_in_flight:
+                        continue
+
+                try:
+                    kind, records = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    self._flush_due()
+                    continue
+                self._flush_due()
+
+                self._seq += 1
+                message = encode_batch(self._seq, kind, records, self.compression_level)
+                with self._window:
+                    self._unacked.append((self._seq, message, len(records)))
+                sock.sendall(message)
+                self.batches_sent += 1
+                self.bytes_sent += len(message)
+                SENSOR_BYTES.inc(len(message))
+        finally:
+            with self._window:
+                self._connected = False
+            SENSOR_CONNECTED.set(0)
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            reader.join()
+
+    def _read_acks(self, sock):
+        """Thread pembaca ack dari collector untuk satu koneksi"""
+        try:
+            while True:
+                message = recv_message(sock)
+                if message is None:
+                    break
+                if message[0] != MSG_ACK:
+                    raise ProtocolError(f"Unexpected message type {message[0]}")
+                self._acked(decode_ack(message[1]))
+        except (OSError, ProtocolError):
+            pass
+        finally:
+            with self._window:
+                self._connected = False
+                self._window.notify_all()
+
+    def _acked(self, seq):
+        """Lepaskan batch sampai nomor urut seq dari jendela"""
+        with self._window:
+            while self._unacked and self._unacked[0][0] <= seq:
+                count = self._unacked.popleft()[2]
+                self.records_acked += count
+                SENSOR_ACKED.inc(count)
+            self._window.notify_all()
+
+    def get_stats(self):
+        """
+        Statistik pengiriman ke collector
+
+        Returns:
+            dict: Record di-ack dan dibuang, batch dan byte terkirim, jumlah koneksi
+        """
+        return {
+            'records_acked': self.records_acked,
+            'records_dropped': self.records_dropped,
+            'batches_sent': self.batches_sent,
+            'bytes_sent': self.bytes_sent,
+            'connects': self.connects,
+            'connected': self._connected,
+        }
+
+
+class SensorCaptureManager(PacketCaptureManager):
+    """
+    Capture manager untuk sensor
+
+    Sama dengan PacketCaptureManager sampai ekstraksi fitur, trust list,
+    sketch perilaku host dan agregasi flow, tetapi fitur paket atau record
+    flow dikirim ke collector lewat SensorLink alih-alih dianalisis dan
+    disimpan. Load shedding, rate limit alert dan micro-batching berjalan
+    di collector.
+    """
+
+    def __init__(self, capture_config, remote_config):
+        """
+        Initialize sensor capture manager
+
+        Args:
+            capture_config (dict): Konfigurasi penangkapan paket (CAPTURE_CONFIG)
+            remote_config (dict): Konfigurasi sensor/collector (REMOTE_CONFIG)
+        """
+        super().__init__(None, dict(capture_config, load_shedding={}, alerts={}, analysis_batch_size=1))
+        self.link = SensorLink(remote_config)
+
+    def process_features(self, features, timestamp=None):
+        """
+        Kirim fitur satu paket (atau masukkan ke flow table) ke collector
+
+        Args:
+            features (dict): Fitur paket hasil ekstraksi
+            timestamp (float): Waktu penangkapan paket (default: sekarang)
+        """
+        features['timestamp'] = timestamp or time.time()
+        if self.sketches is not None:
+            self.sketches.observe(features)
+        if self.flow_table is not None:
+            self.aggregate(features, features['timestamp'])
+            return
+
+        self.link.send_packet(features)
+        self.packets_processed += 1
+        PACKETS_PROCESSED.inc()
+        if self.packets_processed % 1000 == 0:
+            logger.info(f"Forwarded {self.packets_processed} packets")
+
+    def process_flows(self, flow_records):
+        """
+        Kirim flow yang sudah berakhir ke collector
+
+        Args:
+            flow_records (list): Record flow dari FlowTable
+        """
+        if self.sketches is not None:
+            for record in flow_records:
+                self.sketches.annotate(record)
+        self.link.send_flows(flow_records)
+        self.flows_exported += len(flow_records)
+        FLOWS_EXPORTED.inc(len(flow_records))
+
+    def close(self):
+        """Kirim flow aktif dan sisa batch ke collector"""
+        super().close()
+        self.link.close()
+        stats = self.link.get_stats()
+        logger.info(f"Sensor link: {stats['records_acked']} records acknowledged, "
+                    f"{stats['records_dropped']} dropped, {stats['bytes_sent']} bytes in "
+                    f"{stats['batches_sent']} batches, {stats['connects']} connections")
+
+
+class _CollectorServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, collector):
+        self.collector = collector
+        if ':' in address[0]:
+            self.address_family = socket.AF_INET6
+        super().__init__(address, _SensorHandler)
+
+
+class _SensorHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.collector._serve_sensor(self.request, self.client_address)
+
+
+class Collector:
+    """
+    Collector pusat untuk stream fitur dari banyak sensor
+
+    Setiap koneksi sensor dibaca oleh thread sendiri yang men-decode batch
+    ke antrian berukuran tetap. Satu thread (pemanggil ``run``) mengambil
+    batch dari antrian dan memprosesnya dengan PacketCaptureManager milik
+    collector (analyzer, load shedding, alert dan writer database), sehingga
+    analyzer tidak pernah dipanggil dari beberapa thread sekaligus.
+    """
+
+    def __init__(self, config, capture_manager):
+        """
+        Initialize collector
+
+        Args:
+            config (dict): REMOTE_CONFIG (listen_address, collector_queue_size)
+            capture_manager (PacketCaptureManager): Manager yang menganalisis
+                dan menyimpan record dari sensor
+        """
+        self.host, self.port = parse_address(config['listen_address'], default_host='0.0.0.0')
+        self.manager = capture_manager
+        self.queue = queue.Queue(maxsize=config.get('collector_queue_size', 64))
+        COLLECTOR_QUEUE_DEPTH.set_function(self.queue.qsize)
+
+        # Id sesi sensor -> [lock, nomor urut batch terakhir yang diterima]
+        self._sessions = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        COLLECTOR_SENSORS.set_function(self._connections.__len__)
+        self._stopping = threading.Event()
+        self._server = None
+
+        # Nama sensor -> statistik
+        self.sensors = {}
+        self.duplicate_batches = 0
+
+    def start(self):
+        """Mulai menerima koneksi sensor di background thread"""
+        self._server = _CollectorServer((self.host, self.port), self)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='collector-server', daemon=True).start()
+        logger.info(f"Collector listening on {self.host}:{self.port}")
+
+    def stop(self):
+        """Minta run() berhenti; batch yang sudah di-ack tetap diproses"""
+        self._stopping.set()
+
+    def run(self):
+        """Terima stream sensor dan proses batch sampai stop() atau Ctrl+C"""
+        if self._server is None:
+            self.start()
+        try:
+            while not self._stopping.is_set():
+                self._process_next()
+        except KeyboardInterrupt:
+            logger.info("\nStopping collector...")
+        finally:
+            self._close_server()
+            # Batch yang sudah di-ack ke sensor diproses sebelum analyzer ditutup
+            while self._connections or not self.queue.empty():
+                self._process_next()
+
+    def _close_server(self):
+        self._stopping.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        with self._connections_lock:
+            for sock in self._connections:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _process_next(self, timeout=0.2):
+        """Proses satu batch dari antrian dengan capture manager collector"""
+        try:
+            kind, records = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        if kind == KIND_FLOW:
+            self.manager.process_flows(records)
+            return
+        process_features = self.manager.process_features
+        for features in records:
+            process_features(features, features['timestamp'])
+
+    def _session(self, session_id):
+        with self._sessions_lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = [threading.Lock(), 0]
+                if len(self._sessions) > MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def _serve_sensor(self, sock, address):
+        """Baca batch dari satu koneksi sensor (thread per koneksi)"""
+        peer = f"{address[0]}:{address[1]}"
+        name = None
+        with self._connections_lock:
+            self._connections.add(sock)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            message = recv_message(sock)
+            if message is None:
+                return
+            if message[0] != MSG_HELLO:
+                raise ProtocolError("Expected HELLO")
+            session_id, name = decode_hello(message[1])
+            session = self._session(session_id)
+            stats = self.sensors.setdefault(name, {'records': 0, 'batches': 0, 'connects': 0})
+            stats['connects'] += 1
+            records_received = COLLECTOR_RECORDS.labels(sensor=name)
+            sock.sendall(encode_ack(session[1]))
+            logger.info(f"Sensor '{name}' connected from {peer}")
+
+            while not self._stopping.is_set():
+                message = recv_message(sock)
+                if message is None:
+                    break
+                if message[0] != MSG_BATCH:
+                    raise ProtocolError(f"Unexpected message type {message[0]}")
+                # Lock sesi: batch kiriman ulang dari koneksi baru menunggu
+                # koneksi lama selesai memasukkan batch yang sama
+                with session[0]:
+                    seq = batch_seq(message[1])
+                    if seq > session[1]:
+                        seq, kind, records = decode_batch(message[1])
+                        # Antrian penuh: thread ini berhenti membaca socket (backpressure)
+                        self.queue.put((kind, records))
+                        session[1] = seq
+                        stats['records'] += len(records)
+                        stats['batches'] += 1
+                        records_received.inc(len(records))
+                    else:
+                        self.duplicate_batches += 1
+                        COLLECTOR_DUPLICATES.inc()
+                sock.sendall(encode_ack(seq))
+        except (OSError, ProtocolError) as e:
+            if not self._stopping.is_set():
+                logger.warning(f"Sensor connection from {peer} failed: {e}")
+        finally:
+            with self._connections_lock:
+                self._connections.discard(sock)
+            if name is not None:
+                logger.info(f"Sensor '{name}' disconnected ({peer})")
+
+    def get_stats(self):
+        """
+        Statistik collector
+
+        Returns:
+            dict: Koneksi aktif, batch duplikat dan statistik per sensor
+        """
+        return {
+            'connections': len(self._connections),
+            'duplicate_batches': self.duplicate_batches,
+            'sensors': {name: dict(stats) for name, stats in self.sensors.items()},
+        }
@@ -0,0 +1,236 @@
+import os
+import glob
+import mmap
+import time
+import struct
+
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+PCAPNG_IDB = 0x00000001
+PCAPNG_OBSOLETE_PB = 0x00000002
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+
+# Option if_tsresol pada Interface Description Block
+PCAPNG_IF_TSRESOL = 9
+
+CAPTURE_FILE_EXTENSIONS = ('.pcap', '.pcapng', '.cap')
+
+
+def expand_capture_paths(specs):
+    """
+    Mengubah daftar path, direktori atau pola glob menjadi daftar file capture
+
+    Args:
+        specs (list): Path file, direktori (semua file .pcap/.pcapng/.cap di
+            dalamnya) atau pola glob
+
+    Returns:
+        list: Path file capture terurut
+    """
+    paths = []
+    for spec in specs:
+        if os.path.isdir(spec):
+            paths.extend(sorted(
+                os.path.join(spec, name) for name in os.listdir(spec)
+                if name.lower().endswith(CAPTURE_FILE_EXTENSIONS)
+            ))
+        elif os.path.exists(spec):
+            paths.append(spec)
+        else:
+            matches = sorted(glob.glob(spec))
+            if not matches:
+                raise FileNotFoundError(f"No capture files match '{spec}'")
+            paths.extend(matches)
+    return paths
+
+
+def _iter_pcap(data):
+    """Iterasi frame dari file pcap klasik yang sudah di-mmap"""
+    magic = struct.unpack_from('<I', data, 0)[0]
+    if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+        endian = '<'
+    else:
+        endian = '>'
+        magic = struct.unpack_from('>I', data, 0)[0]
+    scale = 1e-9 if magic == PCAP_MAGIC_NS else 1e-6
+
+    linktype = struct.unpack_from(endian + 'I', data, 20)[0] & 0x0FFFFFFF
+    record_header = struct.Struct(endian + 'IIII')
+    unpack_header = record_header.unpack_from
+    header_size = record_header.size
+
+    offset = 24
+    end = len(data)
+    while offset + header_size <= end:
+        ts_sec, ts_frac, captured_length, _ = unpack_header(data, offset)
+        offset += header_size
+        if offset + captured_length > end:
+            logger.warning("Truncated pcap record at end of file")
+            return
+        yield ts_sec + ts_frac * scale, data[offset:offset + captured_length], linktype
+        offset += captured_length
+
+
+def _iter_pcapng(data):
+    """Iterasi frame dari file pcapng yang sudah di-mmap"""
+    end = len(data)
+    offset = 0
+    endian = '<'
+    interfaces = []  # (linktype, skala timestamp)
+    unknown_interfaces = set()
+
+    while offset + 12 <= end:
+        block_type = struct.unpack_from(endian + 'I', data, offset)[0]
+
+        if block_type == PCAPNG_SHB:
+            byte_order = struct.unpack_from('<I', data, offset + 8)[0]
+            endian = '<' if byte_order == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            interfaces = []
+            unknown_interfaces = set()
+
+        block_length = struct.unpack_from(endian + 'I', data, offset + 4)[0]
+        if block_length < 12 or offset + block_length > end:
+            logger.warning("Truncated pcapng block at end of file")
+            return
+        body = offset + 8
+
+        if block_type == PCAPNG_IDB:
+            linktype = struct.unpack_from(endian + 'H', data, body)[0]
+            interfaces.append((linktype, _pcapng_ts_scale(data, body + 8, offset + block_length - 4, endian)))
+
+        elif block_type == PCAPNG_EPB:
+            interface_id, ts_high, ts_low, captured_length, _ = struct.unpack_from(endian + 'IIIII', data, body)
+            if interface_id >= len(interfaces):
+                _warn_unknown_interface(interface_id, unknown_interfaces)
+            else:
+                linktype, scale = interfaces[interface_id]
+                start = body + 20
+                yield ((ts_high << 32) | ts_low) * scale, data[start:start + captured_length], linktype
+
+        elif block_type == PCAPNG_OBSOLETE_PB:
+            interface_id, _, ts_high, ts_low, captured_length, _ = struct.unpack_from(endian + 'HHIIII', data, body)
+            if interface_id >= len(interfaces):
+                _warn_unknown_interface(interface_id, unknown_interfaces)
+            else:
+                linktype, scale = interfaces[interface_id]
+                start = body + 20
+                yield ((ts_high << 32) | ts_low) * scale, data[start:start + captured_length], linktype
+
+        elif block_type == PCAPNG_SPB:
+            # Simple Packet Block tidak memiliki timestamp
+            original_length = struct.unpack_from(endian + 'I', data, body)[0]
+            captured_length = min(original_length, block_length - 16)
+            if not interfaces:
+                _warn_unknown_interface(0, unknown_interfaces)
+            else:
+                linktype, _ = interfaces[0]
+                start = body + 4
+                yield 0.0, data[start:start + captured_length], linktype
+
+        offset += block_length
+
+
+def _warn_unknown_interface(interface_id, warned):
+    """Peringatkan (sekali per section) paket pcapng yang merujuk interface yang tidak dideklarasikan"""
+    if interface_id not in warned:
+        warned.add(interface_id)
+        logger.warning(f"Skipping pcapng packets for undeclared interface {interface_id}")
+
+
+def _pcapng_ts_scale(data, offset, end, endian):
+    """Baca option if_tsresol dari Interface Description Block (default mikrodetik)"""
+    while offset + 4 <= end:
+        code, length = struct.unpack_from(endian + 'HH', data, offset)
+        if code == 0:
+            break
+        if code == PCAPNG_IF_TSRESOL and length >= 1:
+            resolution = data[offset + 4]
+            if resolution & 0x80:
+                return 2.0 ** -(resolution & 0x7F)
+            return 10.0 ** -resolution
+        offset += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+
+def iter_capture_file(path):
+    """
+    Iterasi frame dari file pcap atau pcapng menggunakan memory map
+
+    File tidak pernah dibaca seluruhnya ke memori; halaman file dimuat oleh
+    OS sesuai kebutuhan sehingga file berukuran beberapa GB tetap aman.
+
+    Args:
+        path (str): Path file capture
+
+    Yields:
+        tuple: (timestamp epoch detik, frame bytes, linktype)
+    """
+    with open(path, 'rb') as capture_file:
+        if os.fstat(capture_file.fileno()).st_size < 24:
+            return
+        with mmap.mmap(capture_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+
+            magic = struct.unpack_from('<I', data, 0)[0]
+            if magic == PCAPNG_SHB:
+                yield from _iter_pcapng(data)
+            elif magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS) or \
+                    struct.unpack_from('>I', data, 0)[0] in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+                yield from _iter_pcap(data)
+            else:
+                raise ValueError(f"{path} is not a pcap or pcapng file")
+
+
+def replay_capture_files(paths, frame_handler, realtime=False, speed=1.0):
+    """
+    Putar ulang file capture melalui handler frame
+
+    Args:
+        paths (list): Path file capture (lihat expand_capture_paths)
+        frame_handler (callable): Dipanggil ``frame_handler(frame, timestamp, linktype)``
+        realtime (bool): True untuk mengikuti jarak waktu asli antar paket,
+            False untuk memproses secepat mungkin
+        speed (float): Pengali kecepatan pada mode realtime
+
+    Returns:
+        dict: Statistik replay (packets, bytes, elapsed_seconds, packets_per_second)
+    """
+    packets = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    first_timestamp = None
+
+    for path in paths:
+        logger.info(f"Replaying {path}...")
+        for timestamp, frame, linktype in iter_capture_file(path):
+            if realtime:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = (timestamp - first_timestamp) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            frame_handler(frame, timestamp, linktype)
+            packets += 1
+            total_bytes += len(frame)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'files': len(paths),
+        'packets': packets,
+        'bytes': total_bytes,
+        'elapsed_seconds': elapsed,
+        'packets_per_second': packets / elapsed if elapsed > 0 else 0.0,
+    }
+    logger.info(f"Replay finished: {packets} packets in {elapsed:.2f}s "
+                f"({stats['packets_per_second']:.0f} packets/s)")
+    return stats
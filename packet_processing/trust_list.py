@@ -0,0 +1,532 @@
+"""
+Trust list: lalu lintas tepercaya (backup, DNS internal, monitoring) dibuang
+sebelum ekstraksi fitur, analisis dan penyimpanan.
+
+Satu aturan per baris; klausa dalam satu aturan digabung dengan AND::
+
+    # Komentar
+    net 10.20.0.0/16              # sumber atau tujuan di subnet
+    port 53                       # port sumber atau tujuan
+    port 9000-9100                # rentang port
+    src 10.0.5.10 dport 873       # arah tertentu
+    proto udp port 123            # tcp, udp, icmp atau nomor protocol
+    pair 10.0.0.5 10.9.0.0/24     # lalu lintas antara dua alamat/subnet
+
+Aturan sederhana (satu klausa ``net``/``src``/``dst``/``port``/``sport``/
+``dport``) bisa didorong ke filter BPF kernel sehingga paketnya tidak pernah
+sampai ke userspace. Semua aturan juga dicocokkan di userspace dengan trie
+prefix (stride 8 bit, paling banyak 4 langkah untuk IPv4 dan 16 untuk IPv6)
+dan tabel port, sehingga biaya per paket tidak bergantung pada jumlah CIDR.
+"""
+import os
+import socket
+import threading
+import ipaddress
+
+from packet_processing.raw_features import packet_tuple
+from utils.logging_utils import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+TRUSTED_PACKETS = metrics.counter('nta_trusted_packets_total', 'Packets dropped by the trust list before extraction')
+TRUST_RULES = metrics.gauge('nta_trust_rules', 'Rules loaded in the trust list')
+
+PROTOCOLS = {'icmp': 1, 'tcp': 6, 'udp': 17, 'icmp6': 58}
+
+# Klausa yang memakai satu argumen; 'pair' memakai dua
+CLAUSES = ('proto', 'net', 'host', 'src', 'dst', 'port', 'sport', 'dport', 'pair')
+
+# Ekspresi pcap untuk aturan satu klausa yang boleh didorong ke BPF
+BPF_CLAUSES = {
+    'net': 'net {}',
+    'host': 'net {}',
+    'src': 'src net {}',
+    'dst': 'dst net {}',
+    'port': 'port {}',
+    'sport': 'src port {}',
+    'dport': 'dst port {}',
+}
+
+
+def _parse_net(text):
+    """CIDR/alamat -> (panjang alamat dalam byte, shift, nilai prefix, bytes prefix, panjang prefix)"""
+    network = ipaddress.ip_network(text, strict=False)
+    size = network.max_prefixlen // 8
+    shift = network.max_prefixlen - network.prefixlen
+    value = int(network.network_address) >> shift
+    return size, shift, value, network.network_address.packed, network.prefixlen
+
+
+def _parse_ports(text):
+    """'53' atau '9000-9100' -> (awal, akhir)"""
+    low, _, high = text.partition('-')
+    low = int(low)
+    high = int(high) if high else low
+    if not 0 <= low <= high <= 65535:
+        raise ValueError(f"Invalid port range: {text}")
+    return low, high
+
+
+def _in_net(address, net):
+    size, shift, value = net[0], net[1], net[2]
+    return len(address) == size and int.from_bytes(address, 'big') >> shift == value
+
+
+def parse_rule(line):
+    """
+    Ubah satu baris aturan menjadi daftar klausa
+
+    Args:
+        line (str): Baris aturan tanpa komentar
+
+    Returns:
+        list: Pasangan (klausa, argumen)
+
+    Raises:
+        ValueError: Jika klausa atau argumennya tidak valid
+    """
+    tokens = line.split()
+    clauses = []
+    index = 0
+    while index < len(tokens):
+        keyword = tokens[index].lower()
+        if keyword not in CLAUSES:
+            raise ValueError(f"Unknown clause '{tokens[index]}'")
+        count = 2 if keyword == 'pair' else 1
+        args = tokens[index + 1:index + 1 + count]
+        if len(args) < count:
+            raise ValueError(f"Clause '{keyword}' needs {count} argument(s)")
+        if keyword == 'proto':
+            value = PROTOCOLS.get(args[0].lower())
+            clauses.append((keyword, value if value is not None else int(args[0])))
+        elif keyword in ('port', 'sport', 'dport'):
+            clauses.append((keyword, _parse_ports(args[0])))
+        elif keyword == 'pair':
+            clauses.append((keyword, (_parse_net(args[0]), _parse_net(args[1]))))
+        else:
+            clauses.append(('net' if keyword == 'host' else keyword, _parse_net(args[0])))
+        index += 1 + count
+    if not clauses:
+        raise ValueError("Empty rule")
+    return clauses
+
+
+def _intersect(position, current, field):
+    """Gabungan dua syarat pada field yang sama, atau None jika tidak mungkin terpenuhi bersama"""
+    if position == 0:
+        return current if current == field else None
+    if position >= 3:
+        low, high = max(current[0], field[0]), min(current[1], field[1])
+        return (low, high) if low <= high else None
+    # Dua subnet pada sisi yang sama: yang lebih sempit jika berada di dalam yang lain
+    narrow, wide = (current, field) if current[4] >= field[4] else (field, current)
+    return narrow if _in_net(narrow[3], wide) else None
+
+
+def _variants(clauses):
+    """
+    Ekspansi klausa dua arah (net, port, pair) menjadi varian berarah
+
+    Returns:
+        list: Tuple (proto, src_net, dst_net, src_ports, dst_ports); varian
+            dengan syarat yang saling bertentangan dibuang
+    """
+    variants = [(None, None, None, None, None)]
+    for keyword, value in clauses:
+        if keyword == 'proto':
+            options = [((0, value),)]
+        elif keyword == 'src':
+            options = [((1, value),)]
+        elif keyword == 'dst':
+            options = [((2, value),)]
+        elif keyword == 'sport':
+            options = [((3, value),)]
+        elif keyword == 'dport':
+            options = [((4, value),)]
+        elif keyword == 'net':
+            options = [((1, value),), ((2, value),)]
+        elif keyword == 'port':
+            options = [((3, value),), ((4, value),)]
+        else:
+            first, second = value
+            options = [((1, first), (2, second)), ((1, second), (2, first))]
+
+        expanded = []
+        for variant in variants:
+            for fields in options:
+                new = list(variant)
+                for position, field in fields:
+                    if new[position] is not None:
+                        field = _intersect(position, new[position], field)
+                        if field is None:
+                            break
+                    new[position] = field
+                else:
+                    expanded.append(tuple(new))
+        variants = expanded
+    return variants
+
+
+class _PrefixTrie:
+    """
+    Trie prefix multibit (stride 8 bit) untuk alamat IPv4 dan IPv6
+
+    Prefix yang tidak kelipatan 8 diekspansi ke semua nilai byte terakhirnya
+    (controlled prefix expansion), sehingga lookup cukup satu dictionary per
+    byte alamat dan mengumpulkan item dari semua prefix yang cocok.
+    """
+
+    def __init__(self):
+        # Panjang alamat (4/16) -> [anak per byte, item per byte]; item prefix /0 terpisah
+        self.roots = {}
+        self.any = {}
+
+    def insert(self, net, item):
+        size, _, _, packed, prefixlen = net
+        if prefixlen == 0:
+            self.any.setdefault(size, []).append(item)
+            return
+        node = self.roots.setdefault(size, ({}, {}))
+        depth = 0
+        while prefixlen - depth * 8 > 8:
+            node = node[0].setdefault(packed[depth], ({}, {}))
+            depth += 1
+        span = 1 << (8 - (prefixlen - depth * 8))
+        base = packed[depth] & (0x100 - span)
+        for value in range(base, base + span):
+            node[1].setdefault(value, []).append(item)
+
+    def lookup(self, address):
+        """Semua item dengan prefix yang mencakup alamat (bytes)"""
+        found = self.any.get(len(address), [])
+        node = self.roots.get(len(address))
+        if node is None:
+            return found
+        found = list(found)
+        for value in address:
+            items = node[1].get(value)
+            if items:
+                found.extend(items)
+            node = node[0].get(value)
+            if node is None:
+                break
+        return found
+
+    def __bool__(self):
+        return bool(self.roots or self.any)
+
+
+class TrustRules:
+    """Aturan trust list yang sudah dikompilasi (tidak berubah setelah dibuat)"""
+
+    def __init__(self, rules):
+        """
+        Initialize trust rules
+
+        Args:
+            rules (list): Pasangan (teks aturan, klausa dari parse_rule)
+        """
+        self.rules = [text for text, _ in rules]
+        self.clauses = [clauses for _, clauses in rules]
+        self.hits = [0] * len(rules)
+        self.src_trie = _PrefixTrie()
+        self.dst_trie = _PrefixTrie()
+        self.src_ports = None
+        self.dst_ports = None
+        self.always = []
+
+        for index, (_, clauses) in enumerate(rules):
+            for variant in _variants(clauses):
+                entry = (index,) + variant
+                proto, src_net, dst_net, src_ports, dst_ports = variant
+                # Setiap varian diindeks lewat satu field yang paling selektif
+                if src_net is not None:
+                    self.src_trie.insert(src_net, entry)
+                elif dst_net is not None:
+                    self.dst_trie.insert(dst_net, entry)
+                elif dst_ports is not None:
+                    self.dst_ports = self._index_ports(self.dst_ports, dst_ports, entry)
+                elif src_ports is not None:
+                    self.src_ports = self._index_ports(self.src_ports, src_ports, entry)
+                else:
+                    self.always.append(entry)
+
+    @staticmethod
+    def _index_ports(table, ports, entry):
+        if table is None:
+            table = [None] * 65536
+        for port in range(ports[0], ports[1] + 1):
+            if table[port] is None:
+                table[port] = []
+            table[port].append(entry)
+        return table
+
+    def match(self, protocol, src, dst, src_port, dst_port):
+        """
+        Cari aturan yang cocok dan tambahkan hit-nya
+
+        Jika beberapa aturan cocok, hit dihitung untuk aturan yang paling
+        awal di file.
+
+        Args:
+            protocol (int): Nomor protocol IP
+            src (bytes): Alamat sumber (4 atau 16 byte)
+            dst (bytes): Alamat tujuan
+            src_port (int): Port sumber (0 jika tidak ada)
+            dst_port (int): Port tujuan
+
+        Returns:
+            int: Indeks aturan, atau None jika tidak ada yang cocok
+        """
+        candidates = self.always
+        if self.src_trie:
+            candidates = candidates + self.src_trie.lookup(src)
+        if self.dst_trie:
+            candidates = candidates + self.dst_trie.lookup(dst)
+        if self.dst_ports is not None and self.dst_ports[dst_port]:
+            candidates = candidates + self.dst_ports[dst_port]
+        if self.src_ports is not None and self.src_ports[src_port]:
+            candidates = candidates + self.src_ports[src_port]
+
+        matched = None
+        for index, proto, src_net, dst_net, src_ports, dst_ports in candidates:
+            if matched is not None and index >= matched:
+                continue
+            if proto is not None and proto != protocol:
+                continue
+            if src_net is not None and not _in_net(src, src_net):
+                continue
+            if dst_net is not None and not _in_net(dst, dst_net):
+                continue
+            if src_ports is not None and not src_ports[0] <= src_port <= src_ports[1]:
+                continue
+            if dst_ports is not None and not dst_ports[0] <= dst_port <= dst_ports[1]:
+                continue
+            matched = index
+        if matched is not None:
+            self.hits[matched] += 1
+        return matched
+
+    def bpf_rules(self, limit):
+        """
+        Aturan satu klausa yang bisa dinyatakan sebagai ekspresi pcap
+
+        Args:
+            limit (int): Jumlah aturan maksimum (program BPF dibatasi kernel)
+
+        Returns:
+            list: Pasangan (indeks aturan, ekspresi pcap)
+        """
+        expressions = []
+        for index, (text, clauses) in enumerate(zip(self.rules, self.clauses)):
+            if len(expressions) >= limit:
+                break
+            if len(clauses) != 1 or clauses[0][0] not in BPF_CLAUSES:
+                continue
+            keyword, value = clauses[0]
+            if keyword in ('port', 'sport', 'dport'):
+                argument = str(value[0]) if value[0] == value[1] else f"{value[0]}-{value[1]}"
+                template = BPF_CLAUSES[keyword] if value[0] == value[1] else \
+                    BPF_CLAUSES[keyword].replace('port', 'portrange')
+            else:
+                size, _, _, packed, prefixlen = value
+                address = socket.inet_ntop(socket.AF_INET if size == 4 else socket.AF_INET6, packed)
+                argument = f"{address}/{prefixlen}"
+                template = BPF_CLAUSES[keyword]
+            expressions.append((index, template.format(argument)))
+        return expressions
+
+
+def load_rules(path=None, extra_rules=()):
+    """
+    Baca dan kompilasi aturan trust list
+
+    Args:
+        path (str): File aturan (opsional)
+        extra_rules (iterable): Aturan tambahan (misalnya dari EXCLUDE_PORTS)
+
+    Returns:
+        TrustRules: Aturan yang sudah dikompilasi
+
+    Raises:
+        ValueError: Jika ada baris yang tidak valid (dengan nomor barisnya)
+    """
+    lines = [("config", text) for text in extra_rules]
+    if path:
+        with open(path) as rule_file:
+            lines.extend((f"{path}:{number}", line) for number, line in enumerate(rule_file, 1))
+
+    rules = []
+    for location, line in lines:
+        text = ' '.join(line.split('#', 1)[0].split())
+        if not text:
+            continue
+        try:
+            rules.append((text, parse_rule(text)))
+        except ValueError as e:
+            raise ValueError(f"{location}: {e}") from None
+    return TrustRules(rules)
+
+
+class TrustList:
+    """
+    Prefilter trust list dengan reload otomatis saat file aturan berubah
+
+    Aturan aktif diganti sebagai satu objek TrustRules, sehingga thread
+    capture tidak perlu lock. Jumlah hit per aturan dipertahankan untuk
+    aturan yang teksnya sama setelah reload.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize trust list
+
+        Args:
+            config (dict): Konfigurasi trust list (file, rules,
+                reload_interval_seconds, bpf_rules)
+        """
+        self.path = config.get('file') or None
+        self.extra_rules = list(config.get('rules', ()))
+        self.reload_interval = config.get('reload_interval_seconds', 5)
+        self.bpf_limit = config.get('bpf_rules', 32)
+        self.rules = load_rules(self.path, self.extra_rules)
+        self.packets_trusted = 0
+        self._mtime = self._file_mtime()
+        self._bpf = []
+        self._stop = threading.Event()
+        self._thread = None
+        TRUST_RULES.set(len(self.rules.rules))
+        logger.info(f"Trust list loaded {len(self.rules.rules)} rules")
+        # Aturan dari konfigurasi tidak terlihat di file aturan, jadi selalu disebut saat startup
+        for rule in self.extra_rules:
+            logger.warning(f"Traffic matching '{rule}' (EXCLUDE_PORTS) is excluded from analysis")
+
+    def _file_mtime(self):
+        if not self.path:
+            return None
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def bpf_filter(self, base_filter=None):
+        """
+        Filter BPF capture dengan aturan sederhana sebagai pengecualian
+
+        Args:
+            base_filter (str): Filter capture asli (misalnya 'ip')
+
+        Returns:
+            str: Filter gabungan, atau base_filter jika tidak ada aturan yang didorong
+        """
+        self._bpf = self.rules.bpf_rules(self.bpf_limit) if self.bpf_limit > 0 else []
+        if not self._bpf:
+            return base_filter
+        excluded = ' or '.join(f"({expression})" for _, expression in self._bpf)
+        logger.info(f"Trust list pushed {len(self._bpf)} rules into the kernel BPF filter")
+        if base_filter:
+            return f"({base_filter}) and not ({excluded})"
+        return f"not ({excluded})"
+
+    def match_frame(self, frame, linktype):
+        """
+        Periksa frame mentah terhadap trust list
+
+        Args:
+            frame (bytes): Frame mentah (atau memoryview)
+            linktype (int): Tipe link layer (LINKTYPE_*)
+
+        Returns:
+            bool: True jika frame tepercaya dan harus dibuang
+        """
+        fields = packet_tuple(frame, linktype)
+        if fields is None or self.rules.match(*fields) is None:
+            return False
+        self.packets_trusted += 1
+        TRUSTED_PACKETS.inc()
+        return True
+
+    def match_features(self, features):
+        """
+        Periksa fitur paket (jalur Scapy yang sudah didiseksi) terhadap trust list
+
+        Args:
+            features (dict): Fitur hasil extract_features
+
+        Returns:
+            bool: True jika paket tepercaya dan harus dibuang
+        """
+        try:
+            src = ipaddress.ip_address(features['src_ip']).packed
+            dst = ipaddress.ip_address(features['dst_ip']).packed
+        except ValueError:
+            return False
+        if self.rules.match(features['protocol'], src, dst,
+                            features.get('src_port', 0), features.get('dst_port', 0)) is None:
+            return False
+        self.packets_trusted += 1
+        TRUSTED_PACKETS.inc()
+        return True
+
+    def reload(self):
+        """
+        Muat ulang file aturan; aturan lama tetap dipakai jika file tidak valid
+
+        Returns:
+            bool: True jika aturan baru dipakai
+        """
+        self._mtime = self._file_mtime()
+        try:
+            rules = load_rules(self.path, self.extra_rules)
+        except (OSError, ValueError) as e:
+            logger.error(f"Trust list reload failed, keeping {len(self.rules.rules)} rules: {e}")
+            return False
+
+        previous = dict(zip(self.rules.rules, self.rules.hits))
+        rules.hits = [previous.get(text, 0) for text in rules.rules]
+        self.rules = rules
+        TRUST_RULES.set(len(rules.rules))
+        logger.info(f"Trust list reloaded {len(rules.rules)} rules")
+
+        # Filter kernel hanya dipasang saat socket dibuka
+        pushed = {expression for _, expression in self._bpf}
+        if pushed and pushed != {expression for _, expression in rules.bpf_rules(self.bpf_limit)}:
+            logger.warning("Trust list rules in the kernel BPF filter changed; restart capture to apply them")
+        return True
+
+    def start(self):
+        """Periksa perubahan file aturan setiap ``reload_interval_seconds``"""
+        if not self.path or self.reload_interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._watch, name='trust-list-reload', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            if self._file_mtime() != self._mtime:
+                self.reload()
+
+    def get_stats(self, top=10):
+        """
+        Statistik trust list
+
+        Args:
+            top (int): Jumlah aturan dengan hit terbanyak yang dikembalikan
+
+        Returns:
+            dict: Jumlah paket tepercaya, jumlah aturan dan hit per aturan
+        """
+        rules = self.rules
+        ranked = sorted(zip(rules.rules, rules.hits), key=lambda item: item[1], reverse=True)
+        return {
+            'packets_trusted': self.packets_trusted,
+            'rules': len(rules.rules),
+            'rule_hits': [(text, hits) for text, hits in ranked[:top] if hits],
+        }
@@ -0,0 +1,376 @@
+"""
+Protokol wire biner antara sensor dan collector.
+
+Setiap pesan di atas TCP diawali header tetap (tipe pesan, panjang payload).
+Sensor membuka koneksi dengan HELLO (magic, versi, id sesi dan nama sensor),
+collector menjawab ACK berisi nomor urut batch terakhir yang sudah diterima
+untuk sesi itu, lalu sensor mengirim BATCH dan collector mengirim ACK untuk
+setiap batch yang sudah masuk antrian analisis.
+
+Payload BATCH berisi nomor urut, jenis record (paket atau flow), jumlah
+record dan body berisi record lebar tetap yang dikompresi zlib. Alamat IP
+disimpan sebagai 16 byte (IPv4 sebagai IPv4-mapped), flag TCP sebagai
+bitmask dan verdict perilaku sebagai indeks, sehingga satu paket hanya
+88 byte sebelum kompresi. Hasil decode identik dengan dictionary fitur dan
+record flow yang dibuat di sensor.
+"""
+import socket
+import struct
+import zlib
+
+from packet_processing.raw_features import TCP_FLAG_STRINGS
+from packet_processing.flow_table import FLOW_FLAGS
+from packet_processing.host_sketches import BEHAVIORS
+
+MAGIC = b'NTAW'
+VERSION = 1
+
+MSG_HELLO = 1
+MSG_BATCH = 2
+MSG_ACK = 3
+
+KIND_PACKET = 0
+KIND_FLOW = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+# Batas ukuran payload agar stream yang rusak tidak memicu alokasi besar
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+END_REASONS = ('idle', 'active', 'shutdown', 'evicted')
+
+# Bit pada field info: record membawa fitur sketch perilaku host
+INFO_SKETCH = 0x01
+
+_header = struct.Struct('!BI')            # tipe, panjang payload
+_hello = struct.Struct('!4sHQ')           # magic, versi, id sesi (+ nama sensor)
+_ack = struct.Struct('!Q')                # nomor urut batch
+_batch = struct.Struct('!QBBI')           # nomor urut, jenis, kompresi, jumlah record
+
+# timestamp, src, dst, info, protocol, ttl, src_port, dst_port, window,
+# packet_size, flags, behavior, lalu fitur sketch
+PACKET_RECORD = struct.Struct('!d16s16sBBBHHHIHBIIddd')
+# first_seen, last_seen, src, dst, info, protocol, ttl, src_port, dst_port,
+# window, packet_count, fwd_packet_count, byte_count, 8 flag count, iat
+# mean/std/min/max, end_reason, behavior, lalu fitur sketch
+FLOW_RECORD = struct.Struct('!dd16s16sBBBHHHIIQ8IddddBBIIddd')
+
+_IPV4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+_FLAG_MASKS = {flags: mask for mask, flags in enumerate(TCP_FLAG_STRINGS)}
+_BEHAVIOR_CODES = {behavior: code for code, behavior in enumerate(BEHAVIORS, 1)}
+_BEHAVIOR_NAMES = (None,) + BEHAVIORS
+_END_REASON_CODES = {reason: code for code, reason in enumerate(END_REASONS)}
+
+# Cache alamat string <-> 16 byte; host yang sama muncul berulang kali
+ADDRESS_CACHE_SIZE = 65536
+_packed_addresses = {}
+_address_strings = {}
+
+
+class ProtocolError(ValueError):
+    """Stream dari peer tidak mengikuti protokol wire"""
+
+
+def pack_address(address):
+    """Alamat IP string menjadi 16 byte (IPv4 sebagai IPv4-mapped)"""
+    packed = _packed_addresses.get(address)
+    if packed is None:
+        if ':' in address:
+            packed = socket.inet_pton(socket.AF_INET6, address)
+        else:
+            packed = _IPV4_MAPPED_PREFIX + socket.inet_aton(address)
+        if len(_packed_addresses) >= ADDRESS_CACHE_SIZE:
+            _packed_addresses.clear()
+        _packed_addresses[address] = packed
+    return packed
+
+
+def unpack_address(packed):
+    """Kebalikan pack_address"""
+    address = _address_strings.get(packed)
+    if address is None:
+        if packed.startswith(_IPV4_MAPPED_PREFIX):
+            address = socket.inet_ntoa(packed[12:])
+        else:
+            address = socket.inet_ntop(socket.AF_INET6, packed)
+        if len(_address_strings) >= ADDRESS_CACHE_SIZE:
+            _address_strings.clear()
+        _address_strings[packed] = address
+    return address
+
+
+def _sketch_fields(features):
+    """Info bit, kode behavior dan fitur sketch perilaku (nol jika tidak ada)"""
+    if 'src_port_count' not in features:
+        return 0, 0, 0, 0, 0.0, 0.0, 0.0
+    return (INFO_SKETCH, _BEHAVIOR_CODES.get(features.get('behavior'), 0),
+            features['src_port_count'], features['src_host_count'], features['src_packet_rate'],
+            features['src_syn_rate'], features['dst_syn_rate'])
+
+
+def _add_sketch_fields(features, info, behavior, port_count, host_count, packet_rate, src_syn_rate, dst_syn_rate):
+    if info & INFO_SKETCH:
+        features['src_port_count'] = port_count
+        features['src_host_count'] = host_count
+        features['src_packet_rate'] = packet_rate
+        features['src_syn_rate'] = src_syn_rate
+        features['dst_syn_rate'] = dst_syn_rate
+    if behavior:
+        features['behavior'] = _BEHAVIOR_NAMES[behavior]
+
+
+def encode_packet(features):
+    """
+    Encode fitur satu paket menjadi record lebar tetap
+
+    Args:
+        features (dict): Fitur paket (termasuk timestamp)
+
+    Returns:
+        bytes: Record PACKET_RECORD
+    """
+    info, behavior, port_count, host_count, packet_rate, src_syn_rate, dst_syn_rate = _sketch_fields(features)
+    return PACKET_RECORD.pack(
+        features['timestamp'], pack_address(features['src_ip']), pack_address(features['dst_ip']),
+        info, features['protocol'], features.get('ttl', 0),
+        features.get('src_port', 0), features.get('dst_port', 0), features.get('window_size', 0),
+        features['packet_size'], _FLAG_MASKS[features.get('flags', '')], behavior,
+        port_count, host_count, packet_rate, src_syn_rate, dst_syn_rate
+    )
+
+
+def decode_packets(body):
+    """
+    Decode body berisi record paket
+
+    Args:
+        body (bytes): Record PACKET_RECORD berurutan
+
+    Returns:
+        list: Dictionary fitur paket
+    """
+    packets = []
+    for (timestamp, src, dst, info, protocol, ttl, src_port, dst_port, window_size, packet_size, flags,
+         behavior, *sketch) in PACKET_RECORD.iter_unpack(body):
+        features = {
+            'src_ip': unpack_address(src),
+            'dst_ip': unpack_address(dst),
+            'packet_size': packet_size,
+            'ttl': ttl,
+            'protocol': protocol,
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'flags': TCP_FLAG_STRINGS[flags],
+            'window_size': window_size,
+            'timestamp': timestamp,
+        }
+        if info or behavior:
+            _add_sketch_fields(features, info, behavior, *sketch)
+        packets.append(features)
+    return packets
+
+
+def encode_flow(record):
+    """
+    Encode record flow dari FlowTable menjadi record lebar tetap
+
+    Args:
+        record (dict): Record flow
+
+    Returns:
+        bytes: Record FLOW_RECORD
+    """
+    info, behavior, port_count, host_count, packet_rate, src_syn_rate, dst_syn_rate = _sketch_fields(record)
+    flag_counts = record['flag_counts']
+    return FLOW_RECORD.pack(
+        record['first_seen'], record['last_seen'], pack_address(record['src_ip']), pack_address(record['dst_ip']),
+        info, record['protocol'], record['ttl'], record['src_port'], record['dst_port'], record['window_size'],
+        record['packet_count'], record['fwd_packet_count'], record['byte_count'],
+        *[flag_counts[flag] for flag in FLOW_FLAGS],
+        record['iat_mean_ms'], record['iat_std_ms'], record['iat_min_ms'], record['iat_max_ms'],
+        _END_REASON_CODES[record['end_reason']], behavior,
+        port_count, host_count, packet_rate, src_syn_rate, dst_syn_rate
+    )
+
+
+def decode_flows(body):
+    """
+    Decode body berisi record flow
+
+    Args:
+        body (bytes): Record FLOW_RECORD berurutan
+
+    Returns:
+        list: Record flow dengan field yang sama dengan FlowTable
+    """
+    records = []
+    for fields in FLOW_RECORD.iter_unpack(body):
+        (first_seen, last_seen, src, dst, info, protocol, ttl, src_port, dst_port, window_size,
+         packets, fwd_packets, byte_count) = fields[:13]
+        flag_counts = fields[13:21]
+        iat_mean, iat_std, iat_min, iat_max, end_reason, behavior = fields[21:27]
+        record = {
+            'src_ip': unpack_address(src),
+            'dst_ip': unpack_address(dst),
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'protocol': protocol,
+            'first_seen': first_seen,
+            'last_seen': last_seen,
+            'duration_ms': (last_seen - first_seen) * 1000,
+            'packet_count': packets,
+            'fwd_packet_count': fwd_packets,
+            'byte_count': byte_count,
+            'flag_counts': dict(zip(FLOW_FLAGS, flag_counts)),
+            'iat_mean_ms': iat_mean,
+            'iat_std_ms': iat_std,
+            'iat_min_ms': iat_min,
+            'iat_max_ms': iat_max,
+            'end_reason': END_REASONS[end_reason],
+            'packet_size': byte_count // packets,
+            'ttl': ttl,
+            'window_size': window_size,
+            'flags': ''.join(flag for flag, count in zip(FLOW_FLAGS, flag_counts) if count),
+        }
+        if info or behavior:
+            _add_sketch_fields(record, info, behavior, *fields[27:])
+        records.append(record)
+    return records
+
+
+def _message(msg_type, payload):
+    return _header.pack(msg_type, len(payload)) + payload
+
+
+def encode_hello(session_id, sensor_name):
+    """Pesan HELLO pembuka koneksi sensor"""
+    return _message(MSG_HELLO, _hello.pack(MAGIC, VERSION, session_id) + sensor_name.encode())
+
+
+def decode_hello(payload):
+    """
+    Decode payload HELLO
+
+    Returns:
+        tuple: (id sesi, nama sensor)
+    """
+    if len(payload) < _hello.size:
+        raise ProtocolError("Truncated HELLO")
+    magic, version, session_id = _hello.unpack_from(payload)
+    if magic != MAGIC:
+        raise ProtocolError("Bad magic, not a sensor stream")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported wire protocol version {version}")
+    return session_id, payload[_hello.size:].decode(errors='replace')
+
+
+def encode_ack(seq):
+    """Pesan ACK untuk batch dengan nomor urut seq (dan semua sebelumnya)"""
+    return _message(MSG_ACK, _ack.pack(seq))
+
+
+def decode_ack(payload):
+    """Nomor urut dari payload ACK"""
+    if len(payload) != _ack.size:
+        raise ProtocolError("Bad ACK")
+    return _ack.unpack(payload)[0]
+
+
+def encode_batch(seq, kind, records, compression_level=1):
+    """
+    Bentuk pesan BATCH dari record yang sudah di-encode
+
+    Args:
+        seq (int): Nomor urut batch dalam sesi
+        kind (int): KIND_PACKET atau KIND_FLOW
+        records (list): Record hasil encode_packet/encode_flow
+        compression_level (int): Level zlib (0 = tanpa kompresi)
+
+    Returns:
+        bytes: Pesan lengkap siap dikirim
+    """
+    body = b''.join(records)
+    compression = COMPRESSION_NONE
+    if compression_level:
+        body = zlib.compress(body, compression_level)
+        compression = COMPRESSION_ZLIB
+    return _message(MSG_BATCH, _batch.pack(seq, kind, compression, len(records)) + body)
+
+
+def batch_seq(payload):
+    """Nomor urut batch tanpa decode isinya"""
+    if len(payload) < _batch.size:
+        raise ProtocolError("Truncated BATCH")
+    return _batch.unpack_from(payload)[0]
+
+
+def decode_batch(payload):
+    """
+    Decode payload BATCH
+
+    Args:
+        payload (bytes): Payload pesan BATCH
+
+    Returns:
+        tuple: (nomor urut, jenis, list fitur paket atau record flow)
+    """
+    if len(payload) < _batch.size:
+        raise ProtocolError("Truncated BATCH")
+    seq, kind, compression, count = _batch.unpack_from(payload)
+    body = payload[_batch.size:]
+    if compression == COMPRESSION_ZLIB:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise ProtocolError(f"Corrupt batch {seq}: {e}") from None
+    elif compression != COMPRESSION_NONE:
+        raise ProtocolError(f"Unknown compression {compression}")
+
+    if kind == KIND_PACKET:
+        record_struct, decode = PACKET_RECORD, decode_packets
+    elif kind == KIND_FLOW:
+        record_struct, decode = FLOW_RECORD, decode_flows
+    else:
+        raise ProtocolError(f"Unknown record kind {kind}")
+    if len(body) != count * record_struct.size:
+        raise ProtocolError(f"Batch {seq} has {len(body)} bytes for {count} records")
+    return seq, kind, decode(body)
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if not n:
+            if received:
+                raise ProtocolError("Connection closed mid-message")
+            return None
+        received += n
+    return bytes(buffer)
+
+
+def recv_message(sock):
+    """
+    Baca satu pesan dari socket
+
+    Args:
+        sock (socket.socket): Socket yang terhubung
+
+    Returns:
+        tuple: (tipe pesan, payload), atau None jika peer menutup koneksi
+            di antara pesan
+    """
+    header = _recv_exact(sock, _header.size)
+    if header is None:
+        return None
+    msg_type, length = _header.unpack(header)
+    if length > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"Message of {length} bytes exceeds limit")
+    payload = _recv_exact(sock, length) if length else b''
+    if payload is None:
+        raise ProtocolError("Connection closed mid-message")
+    return msg_type, payload
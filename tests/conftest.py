@@ -0,0 +1,117 @@
+"""
+Fixture bersama untuk semua test.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ml.external_integration import ExternalMLIntegration
+from utils.logging_utils import configure_logging, stop_logging
+
+
+@pytest.fixture(autouse=True, scope='session')
+def log_to_tmp_path(tmp_path_factory):
+    """Tulis log selama test ke direktori sementara, bukan ke direktori kerja"""
+    configure_logging({'rotate_logs': False,
+                       'default_log_file': str(tmp_path_factory.mktemp('logs') / 'network_analyzer.log')})
+    yield
+    stop_logging()
+
+
+@pytest.fixture(scope='session')
+def database():
+    """Database SQLite di memori untuk test yang membaca atau menulis tabel"""
+    from database.models import db
+
+    db.bind(provider='sqlite', filename=':memory:')
+    db.generate_mapping(create_tables=True)
+    return db
+
+
+class FakeMLServer(ThreadingHTTPServer):
+    """Server API ML palsu yang mencatat setiap request"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeMLHandler)
+        self.requests = []
+        self.failing = False
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def paths(self):
+        with self.lock:
+            return [path for path, _ in self.requests]
+
+
+class FakeMLHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.requests.append((self.path, body))
+        if self.server.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        def verdict(features):
+            return {'anomaly_score': features['packet_size'] / 1000, 'cluster': 1,
+                    'is_suspicious': features['packet_size'] > 1000, 'model_version': 'fake'}
+
+        if self.path == '/batch':
+            reply = {'results': [verdict(features) for features in body['features']]}
+        else:
+            reply = verdict(body['features'])
+        data = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeMLServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_client(server):
+    clients = []
+
+    def make(**overrides):
+        config = {
+            'api_endpoint': server.url + '/score',
+            'api_key': 'test',
+            'timeout_seconds': 5,
+            'batch_size': 4,
+            'batch_endpoint': server.url + '/batch',
+            'batch_delay_ms': 10000,
+            'max_in_flight': 2,
+            'breaker_failure_threshold': 2,
+            'breaker_reset_seconds': 0.2,
+            'cache_size': 0,
+        }
+        config.update(overrides)
+        client = ExternalMLIntegration(config)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close(timeout=5)
@@ -0,0 +1,154 @@
+"""
+Analyzer internal: scoring batch, training dan warm start dari snapshot model.
+"""
+import random
+import threading
+import time
+
+import pytest
+from sklearn.cluster import KMeans
+
+from ml.analyzer import NetworkTrafficAnalyzer
+
+
+def config(model_dir, **overrides):
+    values = {
+        'n_clusters': 3,
+        'buffer_size': 60,
+        'suspicious_threshold': 2.0,
+        'background_training': False,
+        'model_dir': str(model_dir),
+        'warm_start': True,
+    }
+    values.update(overrides)
+    return values
+
+
+def packets(count, seed=1):
+    rng = random.Random(seed)
+    return [{'packet_size': rng.randint(40, 1500), 'ttl': rng.choice((64, 128)),
+             'src_port': rng.randint(1024, 65535), 'dst_port': rng.choice((53, 80, 443)),
+             'window_size': rng.randint(0, 65535), 'protocol': rng.choice((6, 17)),
+             'flags': rng.choice(('S', 'SA', 'A', 'PA', ''))}
+            for _ in range(count)]
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    analyzer = NetworkTrafficAnalyzer(config(tmp_path))
+    for features in packets(60):
+        analyzer.analyze(features)
+    analyzer.train_if_needed()
+    assert analyzer.trained
+    assert analyzer.save_model()
+    return tmp_path
+
+
+def test_warm_start_keeps_configured_threshold(snapshot_dir):
+    analyzer = NetworkTrafficAnalyzer(config(snapshot_dir, suspicious_threshold=3.5))
+
+    assert analyzer.trained
+    assert analyzer.suspicious_threshold == 3.5
+    assert analyzer.n_clusters == 3
+
+
+def test_warm_start_skips_snapshot_with_other_cluster_count(snapshot_dir, caplog):
+    analyzer = NetworkTrafficAnalyzer(config(snapshot_dir, n_clusters=5))
+
+    assert not analyzer.trained
+    assert analyzer.n_clusters == 5
+    assert 'has 3 clusters but N_CLUSTERS is 5' in caplog.text
+
+
+def test_explicit_snapshot_loads_with_other_cluster_count(snapshot_dir, caplog):
+    path = next(snapshot_dir.glob('*.npz'))
+    analyzer = NetworkTrafficAnalyzer(config(snapshot_dir, n_clusters=5, model_snapshot=str(path)))
+
+    assert analyzer.trained
+    assert analyzer.state.model.n_clusters == 3
+    assert analyzer.n_clusters == 5
+    assert 'next full training uses 5' in caplog.text
+
+
+@pytest.mark.parametrize('training_mode', ['full', 'incremental'])
+@pytest.mark.parametrize('fast_scoring', [True, False], ids=['fused', 'sklearn'])
+def test_analyze_batch_matches_analyze_across_training(tmp_path, training_mode, fast_scoring):
+    values = config(tmp_path, warm_start=False, buffer_size=50, retrain_interval=30,
+                    training_mode=training_mode, fast_scoring=fast_scoring)
+    single = NetworkTrafficAnalyzer(values)
+    batched = NetworkTrafficAnalyzer(values)
+    features = packets(200, seed=3)
+
+    expected = [single.analyze(f) for f in features]
+    # Ukuran batch tidak sejajar dengan titik training (50, 80, 110, ...)
+    results = []
+    for start in range(0, len(features), 37):
+        results.extend(batched.analyze_batch(features[start:start + 37]))
+
+    assert results == expected
+    assert len({result['model_version'] for result in results}) >= 4
+    assert batched.state.version == single.state.version
+
+
+@pytest.mark.parametrize('training_mode, versions', [('full', ['1.0', '2.0', '3.0']),
+                                                      ('incremental', ['1.0', '1.1', '1.2'])])
+def test_retraining_increments_version(tmp_path, training_mode, versions):
+    analyzer = NetworkTrafficAnalyzer(config(tmp_path, warm_start=False, buffer_size=50, retrain_interval=20,
+                                             training_mode=training_mode))
+    seen = []
+    # Training dipicu pada paket ke-50, 70 dan 90; versi terakhir terlihat mulai paket ke-91
+    for features in packets(91):
+        version = analyzer.analyze(features)['model_version']
+        if version != 'training' and version not in seen:
+            seen.append(version)
+
+    assert seen == versions
+    assert (analyzer.version_major, analyzer.version_minor) == tuple(int(v) for v in versions[-1].split('.'))
+
+
+class BlockingKMeans(KMeans):
+    """KMeans yang menunggu event sebelum fit (training yang lama)"""
+
+    release = None
+
+    def fit(self, X, y=None, sample_weight=None):
+        assert BlockingKMeans.release.wait(10)
+        return super().fit(X, y, sample_weight)
+
+
+def test_scoring_continues_with_old_model_during_background_training(tmp_path, monkeypatch):
+    analyzer = NetworkTrafficAnalyzer(config(tmp_path, warm_start=False, buffer_size=50, retrain_interval=20,
+                                             background_training=True))
+    features = packets(200)
+    for f in features[:50]:
+        analyzer.analyze(f)
+    analyzer.wait_for_training(10)
+    old_state = analyzer.state
+    assert old_state.version == '1.0'
+
+    BlockingKMeans.release = threading.Event()
+    monkeypatch.setattr('ml.analyzer.KMeans', BlockingKMeans)
+    for f in features[50:70]:
+        analyzer.analyze(f)
+    assert analyzer.training_in_progress
+
+    # Selama training berjalan scoring tidak menunggu dan memakai model lama
+    start = time.monotonic()
+    results = [analyzer.analyze(f) for f in features[70:170]]
+    assert time.monotonic() - start < 5
+    assert {result['model_version'] for result in results} == {'1.0'}
+    assert analyzer.state is old_state
+
+    BlockingKMeans.release.set()
+    analyzer.wait_for_training(10)
+
+    # Model baru dipasang sebagai satu objek; objek lama tidak diubah
+    new_state = analyzer.state
+    assert new_state is not old_state
+    assert new_state.version == '2.0'
+    assert isinstance(new_state.model, BlockingKMeans)
+    assert new_state.scorer.model is new_state.model
+    assert new_state.scorer.mean is new_state.scaler.mean_
+    assert old_state.version == '1.0' and not isinstance(old_state.model, BlockingKMeans)
+    assert analyzer.analyze(features[170])['model_version'] == '2.0'
+    analyzer.wait_for_training(10)
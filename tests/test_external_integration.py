@@ -0,0 +1,110 @@
+"""
+Client API ML eksternal terhadap server HTTP lokal (``http.server`` di port 0).
+"""
+import time
+
+import pytest
+
+from ml.external_integration import CircuitBreaker
+
+
+def packet(size, dst_port=80):
+    return {'src_ip': '10.0.0.1', 'dst_ip': '10.0.0.2', 'packet_size': size, 'ttl': 64, 'protocol': 6,
+            'src_port': 40000, 'dst_port': dst_port, 'flags': 'A', 'window_size': 512}
+
+
+def test_batches_go_to_batch_endpoint(server, make_client):
+    client = make_client()
+
+    results = client.analyze_batch([packet(100 + i) for i in range(10)])
+
+    assert sorted(len(body['features']) for _, body in server.requests) == [2, 4, 4]
+    assert set(server.paths()) == {'/batch'}
+    assert [result['anomaly_score'] for result in results] == [(100 + i) / 1000 for i in range(10)]
+    assert all(result['analyzer_type'] == 'external' for result in results)
+
+
+def test_async_batches_fill_then_flush(server, make_client):
+    client = make_client()
+    received = []
+
+    for i in range(10):
+        client.analyze_async(packet(100 + i), lambda features, result: received.append((features, result)))
+    assert client.flush(timeout=5)
+
+    assert sorted(len(body['features']) for _, body in server.requests) == [2, 4, 4]
+    assert sorted(features['packet_size'] for features, _ in received) == list(range(100, 110))
+    assert all(result['anomaly_score'] == features['packet_size'] / 1000 for features, result in received)
+
+
+@pytest.mark.parametrize('overrides', [{'batch_endpoint': None}, {'batch_size': 1}],
+                         ids=['no_batch_endpoint', 'batch_size_one'])
+def test_single_request_path_uses_api_endpoint(server, make_client, overrides):
+    client = make_client(**overrides)
+
+    results = client.analyze_batch([packet(100), packet(2000)])
+    client.analyze_async(packet(300), lambda features, result: results.append(result))
+    assert client.flush(timeout=5)
+
+    assert server.paths() == ['/score'] * 3
+    assert all(isinstance(body['features'], dict) for _, body in server.requests)
+    assert [result['is_suspicious'] for result in results] == [False, True, False]
+    assert client.analyze(packet(50))['anomaly_score'] == 0.05
+
+
+def test_duplicate_features_are_sent_once(server, make_client):
+    client = make_client(cache_size=100)
+
+    results = client.analyze_batch([packet(100), packet(200), packet(100), packet(100)])
+
+    assert len(server.requests) == 1
+    assert [features['packet_size'] for features in server.requests[0][1]['features']] == [100, 200]
+    assert [result['anomaly_score'] for result in results] == [0.1, 0.2, 0.1, 0.1]
+
+    # Verdict yang sudah ada di cache tidak dikirim lagi
+    assert client.analyze(packet(200))['anomaly_score'] == 0.2
+    assert len(server.requests) == 1
+
+
+def test_circuit_breaker_opens_half_opens_and_closes(server, make_client):
+    client = make_client(batch_size=1)
+    server.failing = True
+
+    # Dua kegagalan berturut-turut membuka circuit
+    for _ in range(2):
+        assert client.analyze(packet(100))['analyzer_type'] == 'external-fallback'
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert len(server.requests) == 2
+
+    # Selama circuit terbuka API tidak dihubungi
+    assert client.analyze(packet(100))['analyzer_type'] == 'external-fallback'
+    assert len(server.requests) == 2
+
+    # Request percobaan yang gagal membuka circuit lagi
+    time.sleep(0.25)
+    assert client.analyze(packet(100))['analyzer_type'] == 'external-fallback'
+    assert len(server.requests) == 3
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    # Request percobaan yang berhasil menutup circuit
+    server.failing = False
+    time.sleep(0.25)
+    assert client.analyze(packet(100))['analyzer_type'] == 'external'
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.analyze(packet(200))['analyzer_type'] == 'external'
+    assert len(server.requests) == 5
+
+
+def test_half_open_circuit_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.1)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
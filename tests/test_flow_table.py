@@ -0,0 +1,116 @@
+"""
+Agregasi paket per flow dua arah di FlowTable.
+"""
+import math
+
+import pytest
+
+from packet_processing.flow_table import FlowTable
+
+
+def table(**overrides):
+    config = {'max_flows': 16, 'idle_timeout_seconds': 10, 'active_timeout_seconds': 100,
+              'expire_interval_seconds': 1.0}
+    config.update(overrides)
+    return FlowTable(config)
+
+
+def packet(src='10.0.0.1', dst='10.0.0.2', src_port=40000, dst_port=443, size=100, flags='A', **extra):
+    features = {'src_ip': src, 'dst_ip': dst, 'src_port': src_port, 'dst_port': dst_port, 'protocol': 6,
+                'packet_size': size, 'ttl': 64, 'flags': flags, 'window_size': 512}
+    features.update(extra)
+    return features
+
+
+def reply(**extra):
+    return packet(src='10.0.0.2', dst='10.0.0.1', src_port=443, dst_port=40000, **extra)
+
+
+def test_both_directions_share_one_flow():
+    flows = table()
+    flows.update(packet(flags='S', size=60), 1.0)
+    flows.update(reply(flags='SA', size=60), 1.1)
+    flows.update(packet(flags='A', size=52), 1.2)
+    flows.update(reply(flags='PA', size=500), 1.3)
+
+    assert len(flows) == 1
+    record, = flows.flush()
+    # Arah forward mengikuti paket pertama
+    assert (record['src_ip'], record['src_port'], record['dst_ip'], record['dst_port']) == (
+        '10.0.0.1', 40000, '10.0.0.2', 443)
+    assert (record['packet_count'], record['fwd_packet_count'], record['byte_count']) == (4, 2, 672)
+    assert record['flag_counts']['S'] == 2
+    assert record['flag_counts']['A'] == 3
+    assert record['flag_counts']['P'] == 1
+    assert record['flags'] == 'SPA'
+    assert record['duration_ms'] == pytest.approx(300)
+    assert record['end_reason'] == 'shutdown'
+    assert len(flows) == 0
+
+
+def test_other_ports_are_separate_flows():
+    flows = table()
+    flows.update(packet(src_port=40000), 1.0)
+    flows.update(packet(src_port=40001), 1.0)
+    flows.update(packet(protocol=17), 1.0)
+
+    assert len(flows) == 3
+
+
+def test_inter_arrival_statistics():
+    flows = table()
+    for timestamp in (0.0, 1.0, 3.0, 6.0):
+        flows.update(packet(), timestamp)
+
+    record, = flows.flush()
+    # Interval 1, 2, 3 detik: mean 2, standar deviasi populasi sqrt(2/3)
+    assert record['iat_mean_ms'] == pytest.approx(2000)
+    assert record['iat_std_ms'] == pytest.approx(math.sqrt(2 / 3) * 1000)
+    assert (record['iat_min_ms'], record['iat_max_ms']) == (1000, 3000)
+
+
+def test_single_packet_flow_has_zero_inter_arrival_statistics():
+    flows = table()
+    flows.update(packet(), 5.0)
+
+    record, = flows.flush()
+    assert (record['iat_mean_ms'], record['iat_std_ms'], record['iat_min_ms'], record['iat_max_ms']) == (0, 0, 0, 0)
+    assert record['duration_ms'] == 0
+
+
+def test_idle_and_active_timeouts():
+    # Pengecekan timeout otomatis di update dimatikan, expire dipanggil langsung
+    flows = table(idle_timeout_seconds=10, active_timeout_seconds=30, expire_interval_seconds=1000)
+    flows.update(packet(src_port=1), 0.0)                 # idle sejak t=0
+    for second in range(0, 40, 5):
+        flows.update(packet(src_port=2), float(second))   # aktif terus
+    flows.update(packet(src_port=3), 35.0)
+
+    records = flows.expire(35.0)
+
+    assert {(r['src_port'], r['end_reason']) for r in records} == {(1, 'idle'), (2, 'active')}
+    assert len(flows) == 1
+
+
+def test_update_expires_flows_once_per_interval():
+    flows = table(idle_timeout_seconds=10, expire_interval_seconds=5)
+    assert flows.update(packet(src_port=1), 0.0) == []
+    # Belum waktunya pengecekan timeout
+    assert flows.update(packet(src_port=2), 4.0) == []
+
+    expired = flows.update(packet(src_port=2), 12.0)
+
+    assert [(r['src_port'], r['end_reason']) for r in expired] == [(1, 'idle')]
+
+
+def test_full_table_evicts_least_recently_seen_flow():
+    flows = table(max_flows=4)
+    for port, timestamp in ((1, 3.0), (2, 1.0), (3, 4.0), (4, 2.0)):
+        flows.update(packet(src_port=port), timestamp)
+
+    evicted = flows.update(packet(src_port=5), 5.0)
+
+    assert [(r['src_port'], r['end_reason']) for r in evicted] == [(2, 'evicted')]
+    assert flows.flows_evicted == 1
+    assert len(flows) == 4
+    assert {r['src_port'] for r in flows.flush()} == {1, 3, 4, 5}
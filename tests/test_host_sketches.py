@@ -0,0 +1,140 @@
+"""
+Sketch perilaku per host: verdict scan/flood dan memori tetap.
+"""
+import random
+
+import pytest
+
+from packet_processing.host_sketches import CountMinSketch, HostSketches, HyperLogLogBank
+
+CONFIG = {'window_seconds': 10.0, 'slots': 4096, 'precision': 6, 'width': 16384, 'heavy_hitters': 20,
+          'port_scan_ports': 100, 'host_sweep_hosts': 50, 'syn_flood_rate': 500, 'packet_flood_rate': 10000}
+
+START = 1700000000.0
+
+
+def packet(src, dst, dst_port=443, flags='PA', timestamp=START):
+    return {'src_ip': src, 'dst_ip': dst, 'dst_port': dst_port, 'flags': flags, 'timestamp': timestamp}
+
+
+def spoofed(rng):
+    return f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}'
+
+
+def observe_spoofed(sketches, count, seed=0, **fields):
+    """Satu paket dari setiap sumber acak (derau), dikembalikan verdict-nya"""
+    rng = random.Random(seed)
+    return [sketches.observe(packet(spoofed(rng), fields.get('dst', f'192.0.2.{rng.randrange(1, 255)}'),
+                                    fields.get('dst_port', rng.randrange(1, 65536)), fields.get('flags', 'PA'),
+                                    START + index * fields.get('spacing', 1e-4)))
+            for index in range(count)]
+
+
+def test_hyperloglog_estimate_within_error():
+    bank = HyperLogLogBank(2, 10)
+    rng = random.Random(1)
+    for _ in range(5000):
+        bank.add(0, rng.getrandbits(64))
+
+    # Galat standar 1.04 / sqrt(1024) ~ 3%
+    assert bank.estimate(0) == pytest.approx(5000, rel=0.1)
+    assert bank.estimate(1) == 0.0
+
+
+def test_count_min_never_underestimates():
+    sketch = CountMinSketch(64)
+    rng = random.Random(2)
+    counts = {}
+    for _ in range(2000):
+        key = rng.getrandbits(64) if rng.random() < 0.5 else 7
+        counts[key] = counts.get(key, 0) + 1
+        sketch.add(sketch.indexes(key))
+
+    assert all(sketch.estimate(sketch.indexes(key)) >= count for key, count in counts.items())
+    assert sketch.estimate(sketch.indexes(7)) < counts[7] * 1.2
+
+
+@pytest.mark.parametrize('width', [0, 100, 1 << 17])
+def test_count_min_rejects_bad_width(width):
+    with pytest.raises(ValueError):
+        CountMinSketch(width)
+
+
+def test_port_scan_among_spoofed_sources():
+    sketches = HostSketches(CONFIG)
+    assert not any(observe_spoofed(sketches, 20000))
+
+    verdicts = [sketches.observe(packet('203.0.113.9', '192.0.2.10', port, 'S', START + 2 + port * 1e-3))
+                for port in range(1, 301)]
+    normal = sketches.observe(packet('203.0.113.50', '192.0.2.10', 443, 'S', START + 3))
+
+    # Verdict muncul setelah ambang 100 port, host biasa tidak ikut
+    assert verdicts[:90] == [None] * 90
+    assert verdicts[-100:] == ['port_scan'] * 100
+    assert normal is None
+    assert ('port_scan', '203.0.113.9') in sketches.current.alerted
+
+
+def test_host_sweep():
+    sketches = HostSketches(CONFIG)
+    observe_spoofed(sketches, 5000)
+
+    features = [packet('203.0.113.7', f'198.51.{host // 256}.{host % 256}', 22, 'S', START + 1 + host * 1e-3)
+                for host in range(200)]
+    verdicts = [sketches.observe(f) for f in features]
+
+    assert verdicts[:40] == [None] * 40
+    assert verdicts[-50:] == ['host_sweep'] * 50
+    assert features[-1]['src_host_count'] == pytest.approx(200, rel=0.2)
+    # Satu port tujuan: bukan port scan
+    assert features[-1]['src_port_count'] < 10
+
+
+def test_syn_flood_to_spoofed_destination():
+    sketches = HostSketches(dict(CONFIG, window_seconds=1.0))
+    # 1000 SYN/detik dari sumber berbeda: setiap sumber pelan, tujuan dibanjiri
+    verdicts = observe_spoofed(sketches, 1000, dst='192.0.2.80', dst_port=80, flags='S', spacing=1e-3)
+    reply = sketches.observe(packet('192.0.2.80', '10.0.0.1', 1234, 'SA', START + 0.999))
+    other = sketches.observe(packet('10.9.9.9', '192.0.2.81', 80, 'S', START + 0.999))
+
+    assert verdicts[:400] == [None] * 400
+    assert verdicts[-400:] == ['syn_flood'] * 400
+    assert reply is None
+    assert other is None
+    # Alert ditujukan ke host tujuan, bukan ke setiap sumber spoofed
+    assert sketches.current.alerted == {('syn_flood', '192.0.2.80')}
+
+
+def test_syn_flood_continues_across_window_boundary():
+    sketches = HostSketches(dict(CONFIG, window_seconds=1.0))
+    observe_spoofed(sketches, 1000, dst='192.0.2.80', dst_port=80, flags='S', spacing=1e-3)
+
+    # Awal jendela berikutnya: jendela sebelumnya masih dihitung sebagian
+    features = packet('10.200.0.1', '192.0.2.80', 80, 'S', START + 1.05)
+    assert sketches.observe(features) == 'syn_flood'
+    assert features['dst_syn_rate'] > 500
+
+
+def test_memory_does_not_grow_with_sources():
+    sketches = HostSketches(CONFIG)
+    observe_spoofed(sketches, 1000)
+    small = sketches.memory_bytes
+    observe_spoofed(sketches, 50000, seed=1)
+
+    assert sketches.memory_bytes == small
+    assert sketches.get_stats()['memory_bytes'] == small
+    assert len(sketches.get_stats()['heavy_hitters']) <= CONFIG['heavy_hitters']
+
+
+def test_heavy_hitters_reported_after_window():
+    sketches = HostSketches(CONFIG)
+    observe_spoofed(sketches, 2000)
+    for index in range(300):
+        sketches.observe(packet('203.0.113.1', '192.0.2.1', timestamp=START + 1 + index * 1e-3))
+    for index in range(100):
+        sketches.observe(packet('203.0.113.2', '192.0.2.1', timestamp=START + 2 + index * 1e-3))
+    sketches.observe(packet('203.0.113.3', '192.0.2.1', timestamp=START + 10))
+
+    top = sketches.heavy_hitters()
+    assert [src for src, _ in top[:2]] == ['203.0.113.1', '203.0.113.2']
+    assert top[0][1] >= 300
@@ -0,0 +1,119 @@
+"""
+Analyzer hybrid: hanya paket di rentang ragu yang dikirim ke API eksternal (server palsu).
+"""
+import threading
+
+import pytest
+
+from ml.hybrid import HybridAnalyzer
+
+
+class StubInternal:
+    """Analyzer internal dengan anomaly score yang ditentukan oleh fitur ``score``"""
+
+    def __init__(self):
+        self.results = []
+
+    def analyze_batch(self, features_list):
+        results = [{'analyzer_type': 'internal', 'anomaly_score': features['score'], 'cluster': 2,
+                    'is_suspicious': features['score'] >= 2.0, 'model_version': '1.0'}
+                   for features in features_list]
+        self.results.extend(results)
+        return results
+
+
+def packet(score, size=100):
+    return {'src_ip': '10.0.0.1', 'dst_ip': '10.0.0.2', 'packet_size': size, 'ttl': 64, 'protocol': 6,
+            'src_port': 40000, 'dst_port': 443, 'flags': 'A', 'window_size': 512, 'score': score}
+
+
+@pytest.fixture
+def make_hybrid(make_client):
+    def make(max_pending=100, **client_overrides):
+        internal = StubInternal()
+        hybrid = HybridAnalyzer({'uncertain_low': 1.0, 'uncertain_high': 2.0, 'max_pending': max_pending},
+                                internal, make_client(**client_overrides))
+        return hybrid, internal
+    return make
+
+
+class Recorder:
+    """Callback yang mencatat hasil final per paket"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, features, ml_results):
+        with self.lock:
+            self.calls.append((features, ml_results))
+
+
+def test_only_uncertain_packets_are_escalated(server, make_hybrid):
+    hybrid, _ = make_hybrid()
+
+    # Ukuran > 1000 membuat server palsu menilai paket mencurigakan
+    results = hybrid.analyze_batch([packet(0.5), packet(1.5, size=2000), packet(1.2), packet(3.0)])
+
+    assert [[f['packet_size'] for f in body['features']] for _, body in server.requests] == [[2000, 100]]
+    assert [r['analyzer_type'] for r in results] == ['internal', 'hybrid', 'hybrid', 'internal']
+    assert [r['is_suspicious'] for r in results] == [False, True, False, True]
+    # Skala anomaly score dan cluster tetap dari model internal
+    assert results[1]['anomaly_score'] == 1.5 and results[1]['cluster'] == 2
+    assert results[1]['model_version'] == '1.0+fake'
+    assert hybrid.get_stats()['overridden'] == 1
+
+
+def test_certain_packets_reach_callback_before_external_verdict(server, make_hybrid):
+    hybrid, _ = make_hybrid()
+    recorder = Recorder()
+
+    hybrid.analyze_batch_async([packet(0.5), packet(1.5, size=2000), packet(3.0)], recorder)
+
+    # Paket pasti langsung diteruskan, paket ragu menunggu batch eksternal
+    assert [features['score'] for features, _ in recorder.calls] == [0.5, 3.0]
+    assert hybrid.get_stats()['pending'] == 1
+
+    assert hybrid.flush(timeout=5)
+    assert len(recorder.calls) == 3
+    features, ml_results = recorder.calls[2]
+    assert features['score'] == 1.5
+    assert (ml_results['analyzer_type'], ml_results['is_suspicious']) == ('hybrid', True)
+    assert ml_results['analysis_duration_ms'] >= 0
+    assert hybrid.get_stats()['pending'] == 0
+    assert len(server.requests) == 1
+
+
+def test_uncertain_packets_over_max_pending_keep_internal_verdict(server, make_hybrid):
+    hybrid, _ = make_hybrid(max_pending=1)
+    recorder = Recorder()
+
+    hybrid.analyze_batch_async([packet(1.1), packet(1.2), packet(1.3)], recorder)
+
+    assert [(f['score'], r['analyzer_type']) for f, r in recorder.calls] == [(1.2, 'internal'), (1.3, 'internal')]
+    assert hybrid.flush(timeout=5)
+    assert [(f['score'], r['analyzer_type']) for f, r in recorder.calls][2] == (1.1, 'hybrid')
+    stats = hybrid.get_stats()
+    assert (stats['escalated'], stats['skipped'], stats['pending']) == (1, 2, 0)
+
+
+def test_external_fallback_keeps_a_copy_of_the_internal_verdict(server, make_hybrid):
+    server.failing = True
+    hybrid, internal = make_hybrid(batch_size=1)
+    recorder = Recorder()
+
+    hybrid.analyze_batch_async([packet(1.5, size=2000)], recorder)
+    assert hybrid.flush(timeout=5)
+
+    (_, ml_results), = recorder.calls
+    internal_result, = internal.results
+    assert ml_results is not internal_result
+    assert {k: ml_results[k] for k in ('analyzer_type', 'anomaly_score', 'is_suspicious')} == {
+        'analyzer_type': 'internal', 'anomaly_score': 1.5, 'is_suspicious': False}
+    ml_results['is_suspicious'] = True
+    assert internal_result['is_suspicious'] is False
+    assert hybrid.get_stats()['external_fallback'] == 1
+
+    result = hybrid.analyze(packet(1.5, size=2000))
+    assert result is not internal.results[-1]
+    assert result['analyzer_type'] == 'internal'
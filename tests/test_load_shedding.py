@@ -0,0 +1,167 @@
+"""
+Keputusan admit/shed LoadShedder dan pergerakan sampling rate.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from packet_processing.load_shedding import LoadShedder
+
+
+class Backlog:
+    """Sumber backlog yang nilainya diatur test"""
+
+    value = 0.0
+
+    def __call__(self):
+        return self.value
+
+
+def shedder(backlog=None, histograms=(), **overrides):
+    config = {'check_interval_seconds': 3600, 'high_watermark': 0.5, 'low_watermark': 0.1,
+              'min_sampling_rate': 0.05, 'new_flow_packets': 3, 'benign_ports': '80,443'}
+    config.update(overrides)
+    return LoadShedder(config, [backlog or Backlog()], histograms)
+
+
+def packet(src_port=40000, dst_port=443, src='10.0.0.1', dst='10.0.0.2'):
+    return {'src_ip': src, 'dst_ip': dst, 'src_port': src_port, 'dst_port': dst_port, 'protocol': 6}
+
+
+def reply(features):
+    return packet(features['dst_port'], features['src_port'], features['dst_ip'], features['src_ip'])
+
+
+def overloaded(rate_steps=2, **overrides):
+    """Shedder yang sampling rate-nya sudah diturunkan ``rate_steps`` kali"""
+    backlog = Backlog()
+    controller = shedder(backlog, **overrides)
+    backlog.value = 0.9
+    for _ in range(rate_steps):
+        controller.update()
+    return controller
+
+
+def test_rate_moves_between_watermarks():
+    backlog = Backlog()
+    controller = shedder(backlog)
+
+    backlog.value = 0.5
+    rates = []
+    for _ in range(6):
+        controller.update()
+        rates.append(controller.sampling_rate)
+    assert rates == [0.5, 0.25, 0.125, 0.0625, 0.05, 0.05]
+
+    # Di antara watermark rate tidak berubah
+    backlog.value = 0.3
+    controller.update()
+    assert controller.sampling_rate == 0.05
+
+    backlog.value = 0.1
+    controller.update()
+    assert controller.sampling_rate == pytest.approx(0.0625)
+    for _ in range(20):
+        controller.update()
+    assert controller.sampling_rate == 1.0
+
+
+def test_latency_budget_triggers_shedding():
+    histogram = SimpleNamespace(sum=0.0, count=0)
+    controller = shedder(histograms=[histogram], latency_budget_ms=2)
+
+    histogram.sum, histogram.count = 0.3, 100          # 3 ms per paket
+    controller.update()
+    assert controller.sampling_rate == 0.5
+    assert controller.last_latency_ms == pytest.approx(3)
+
+    histogram.sum, histogram.count = 0.35, 200         # 0.5 ms per paket sejak pengecekan terakhir
+    controller.update()
+    assert controller.sampling_rate == 0.625
+
+
+def test_no_shedding_admits_everything():
+    controller = shedder()
+
+    assert all(controller.admit(packet(src_port=port)) == 1.0 for port in range(1000, 2000))
+    assert controller.get_stats()['tracked_flows'] == 0
+
+
+def test_new_flow_grace_period_then_consistent_per_flow_decision():
+    controller = overloaded()
+    decisions = {}
+    for port in range(1000, 1400):
+        features = packet(src_port=port)
+        # Paket pertama flow baru selalu diproses penuh
+        assert [controller.admit(features) for _ in range(3)] == [1.0, 1.0, 1.0]
+        later = {controller.admit(features) for _ in range(5)} | {controller.admit(reply(features))}
+        assert len(later) == 1
+        decisions[port] = later.pop()
+
+    assert set(decisions.values()) == {0.0, 0.25}
+    kept = sum(1 for rate in decisions.values() if rate) / len(decisions)
+    assert 0.15 < kept < 0.35
+    assert controller.shed_packets == 6 * sum(1 for rate in decisions.values() if not rate)
+
+
+def test_rare_ports_are_never_shed():
+    controller = overloaded(rate_steps=10)
+
+    for port in range(1000, 1100):
+        features = packet(src_port=port, dst_port=9999)
+        assert {controller.admit(features) for _ in range(10)} == {1.0}
+    assert controller.shed_packets == 0
+
+
+def shed_flow(controller):
+    """Flow benign yang sedang dilewati pada sampling rate saat ini"""
+    for port in range(1000, 2000):
+        features = packet(src_port=port)
+        for _ in range(4):
+            rate = controller.admit(features)
+        if rate == 0.0:
+            return features
+    raise AssertionError("no shed flow found")
+
+
+def test_suspicious_flow_is_always_processed():
+    controller = overloaded()
+    features = shed_flow(controller)
+
+    controller.mark_suspicious(reply(features))
+
+    assert controller.admit(features) == 1.0
+    assert controller.admit(reply(features)) == 1.0
+
+
+def test_suspicious_reputation_survives_recovery():
+    backlog = Backlog()
+    controller = shedder(backlog)
+    backlog.value = 0.9
+    controller.update()
+    controller.update()
+    features = shed_flow(controller)
+    benign = packet(src_port=60000)
+    controller.admit(benign)
+    controller.mark_suspicious(features)
+
+    backlog.value = 0.0
+    for _ in range(10):
+        controller.update()
+    assert controller.sampling_rate == 1.0
+    assert controller.get_stats()['tracked_flows'] == 1
+
+    backlog.value = 0.9
+    controller.update()
+    controller.update()
+    assert controller.admit(features) == 1.0
+
+
+def test_flow_records_use_packet_count_and_same_hash():
+    controller = overloaded()
+    features = shed_flow(controller)
+    record = dict(reply(features))
+
+    assert controller.admit(record, packet_count=3) == 1.0
+    assert controller.admit(record, packet_count=50) == 0.0
+    assert controller.shed_flows == 1
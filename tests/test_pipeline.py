@@ -0,0 +1,126 @@
+"""
+Pembagian frame ke worker pipeline.
+"""
+import sqlite3
+import time
+
+import pytest
+
+from packet_processing.feature_extraction import load_scapy_layers
+from packet_processing.pipeline import PipelineCaptureManager, flow_shard, source_shard
+from packet_processing.raw_features import LINKTYPE_ETHERNET
+
+load_scapy_layers()
+
+from scapy.layers.inet import IP, TCP  # noqa: E402
+from scapy.layers.inet6 import IPv6  # noqa: E402
+from scapy.layers.l2 import Ether  # noqa: E402
+from scapy.utils import wrpcap  # noqa: E402
+
+# MAC eksplisit agar Scapy tidak me-resolve alamat tujuan lewat jaringan
+ETH = Ether(src='02:00:00:00:00:01', dst='02:00:00:00:00:02')
+
+
+def frame(src, dst, sport, dport):
+    layer = IPv6 if ':' in src else IP
+    return bytes(ETH / layer(src=src, dst=dst) / TCP(sport=sport, dport=dport))
+
+
+@pytest.mark.parametrize('src', ['192.0.2.7', '2001:db8::7'])
+def test_source_shard_keeps_a_source_on_one_worker(src):
+    dst = '198.51.100.1' if '.' in src else '2001:db8::1'
+    frames = [frame(src, dst, 40000 + port, port) for port in range(1, 200)]
+
+    assert len({source_shard(f, 4) for f in frames}) == 1
+    assert len({flow_shard(f, 4) for f in frames}) == 4
+
+
+def test_flow_shard_is_symmetric():
+    for port in range(1, 100):
+        assert flow_shard(frame('10.0.0.1', '10.0.0.2', 40000, port), 4) == \
+            flow_shard(frame('10.0.0.2', '10.0.0.1', port, 40000), 4)
+
+
+@pytest.mark.parametrize('aggregation, expected', [('packet', source_shard), ('flow', flow_shard)])
+def test_host_sketches_select_source_sharding(aggregation, expected):
+    config = {'workers': 4, 'aggregation': aggregation, 'host_sketches': {'enabled': True}}
+
+    assert PipelineCaptureManager(config, {}).shard is expected
+    assert PipelineCaptureManager(dict(config, host_sketches={}), {}).shard is flow_shard
+
+
+def test_stop_workers_terminates_stuck_worker(caplog):
+    manager = PipelineCaptureManager({'workers': 1, 'worker_stop_timeout': 0.5}, {})
+    packet_queue = manager.context.Queue(maxsize=1)
+    packet_queue.put([])
+    # Worker yang tidak pernah membaca antriannya (sentinel tidak bisa masuk)
+    worker = manager.context.Process(target=time.sleep, args=(60,), daemon=True)
+    worker.start()
+    manager.queues, manager.workers = [packet_queue], [worker]
+
+    start = time.monotonic()
+    manager.stop_workers()
+
+    assert time.monotonic() - start < 5
+    assert not worker.is_alive()
+    assert manager.workers == []
+    assert 'did not exit' in caplog.text
+
+
+def worker_config(tmp_path, **db_overrides):
+    db_config = dict({'provider': 'sqlite', 'filename': str(tmp_path / 'packets.sqlite'), 'create_db': True},
+                     **db_overrides)
+    return {
+        'ml_type': 'internal',
+        'ml_config': {'internal': {'n_clusters': 3, 'buffer_size': 50, 'suspicious_threshold': 2.0,
+                                   'background_training': False, 'warm_start': False}},
+        'db_config': db_config,
+        'db_writer_config': {'queue_size': 10000, 'batch_size': 100, 'flush_interval_seconds': 0.1},
+        # Log worker ikut ke direktori sementara (proses spawn tidak mewarisi conftest)
+        'log_config': {'rotate_logs': False, 'default_log_file': str(tmp_path / 'worker.log')},
+    }
+
+
+def pipeline_config(**overrides):
+    config = {'workers': 2, 'worker_chunk_size': 16, 'worker_flush_interval': 0.05,
+              'worker_stop_timeout': 60, 'extractor': 'raw'}
+    config.update(overrides)
+    return config
+
+
+def test_two_worker_replay_drains_cleanly(tmp_path):
+    frames = [ETH / IP(src=f'10.0.{i % 7}.1', dst='10.1.0.1') / TCP(sport=40000 + i, dport=443)
+              for i in range(400)]
+    for i, packet in enumerate(frames):
+        packet.time = 1700000000 + i / 100
+    wrpcap(str(tmp_path / 'capture.pcap'), frames)
+
+    manager = PipelineCaptureManager(pipeline_config(), worker_config(tmp_path))
+    stats = manager.replay([str(tmp_path / 'capture.pcap')])
+
+    assert stats['packets_captured'] == 400
+    assert stats['packets_processed'] == 400
+    assert stats['packets_dropped'] == 0
+    assert all(worker['packets_processed'] > 0 for worker in stats['per_worker'])
+    with sqlite3.connect(tmp_path / 'packets.sqlite') as connection:
+        assert connection.execute('SELECT COUNT(*) FROM PacketData').fetchone()[0] == 400
+
+
+def test_dead_worker_stops_dispatch(tmp_path):
+    manager = PipelineCaptureManager(pipeline_config(worker_chunk_size=1),
+                                     worker_config(tmp_path, provider='no-such-provider'))
+    manager.start_workers()
+    try:
+        for worker in manager.workers:
+            worker.join(60)
+        assert [worker.exitcode for worker in manager.workers] == [1, 1]
+
+        with pytest.raises(RuntimeError, match='died'):
+            for port in range(10):
+                manager.dispatch(frame('10.0.0.1', '10.0.0.2', 40000, port), 0.0, LINKTYPE_ETHERNET)
+    finally:
+        manager.stop_workers()
+
+    assert manager.packets_dropped == 1
+    assert manager.failed_worker in (0, 1)
+    assert 'failed to start' in (tmp_path / 'worker.log').read_text()
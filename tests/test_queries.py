@@ -0,0 +1,42 @@
+"""
+Paginasi keyset PacketData (terbaru dulu, urut timestamp lalu id).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from pony.orm import db_session
+
+from database.models import PacketData
+from database.queries import iter_packets, query_packets
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope='module')
+def packets(database):
+    with db_session:
+        PacketData.select().delete(bulk=True)
+        for index in range(7):
+            # Beberapa paket berbagi timestamp: urutan kedua memakai id
+            PacketData(timestamp=START + timedelta(seconds=index // 3), src_ip='10.0.0.1', dst_ip='10.0.0.2',
+                       protocol='6', src_port=40000 + index, dst_port=443, packet_size=60, flags='S', ttl=64,
+                       window_size=512, analyzer_type='internal', anomaly_score=1.0, cluster=0,
+                       is_suspicious=index != 3, ml_model_version='1.0', analysis_duration_ms=0.1)
+    with db_session:
+        return [p.id for p in PacketData.select().order_by(PacketData.id)]
+
+
+def test_pages_follow_timestamp_then_id_newest_first(packets):
+    ids = [row['id'] for row in iter_packets(batch_size=2, suspicious_only=False)]
+
+    assert ids == packets[::-1]
+
+
+def test_cursor_continues_after_ties(packets):
+    first, cursor = query_packets(limit=2)
+    second, cursor = query_packets(limit=2, after=cursor)
+    rest, cursor = query_packets(limit=10, after=cursor)
+
+    expected = [packet_id for packet_id in packets[::-1] if packet_id != packets[3]]
+    assert [row['id'] for row in first + second + rest] == expected
+    assert cursor is None
@@ -0,0 +1,117 @@
+"""
+Paritas backend ekstraksi raw dengan backend Scapy untuk frame yang sama.
+"""
+import socket
+
+import pytest
+
+from packet_processing.feature_extraction import extract_features, load_scapy_layers
+from packet_processing.raw_features import LINKTYPE_RAW, extract_features_raw, packet_tuple
+
+load_scapy_layers()
+
+from scapy.layers.inet import ICMP, IP, TCP, UDP  # noqa: E402
+from scapy.layers.inet6 import IPv6, IPv6ExtHdrFragment, IPv6ExtHdrHopByHop  # noqa: E402
+from scapy.layers.l2 import ARP, GRE, Dot1Q, Ether  # noqa: E402
+
+# MAC eksplisit agar Scapy tidak me-resolve alamat tujuan lewat jaringan
+ETH = Ether(src='02:00:00:00:00:01', dst='02:00:00:00:00:02')
+V4 = IP(src='192.0.2.1', dst='198.51.100.2', ttl=61)
+V6 = IPv6(src='2001:db8::1', dst='2001:db8::2', hlim=55)
+INNER_V4 = IP(src='10.0.0.1', dst='10.0.0.2')
+INNER_V6 = IPv6(src='fd00::1', dst='fd00::2')
+SYN = TCP(sport=11, dport=22, flags='S', window=8192)
+ACK = TCP(sport=443, dport=50000, flags='PA', window=512)
+DNS = UDP(sport=5353, dport=53)
+
+
+def truncate(packet, drop):
+    """Frame dengan ``drop`` byte terakhir dibuang (header transport terpotong)"""
+    return bytes(packet)[:-drop]
+
+
+FRAMES = {
+    'v4_tcp': ETH / V4 / SYN,
+    'v4_udp': ETH / V4 / DNS / b'query',
+    'v4_icmp': ETH / V4 / ICMP(),
+    'v4_icmp_error': ETH / V4 / ICMP(type=3) / INNER_V4 / ACK,
+    'v4_vlan': ETH / Dot1Q(vlan=7) / V4 / ACK,
+    'v4_padding': ETH / V4 / UDP(sport=1, dport=2) / (b'\x00' * 30),
+    'v6_tcp': ETH / V6 / SYN,
+    'v6_udp': ETH / V6 / DNS,
+    'v6_hop_by_hop': ETH / V6 / IPv6ExtHdrHopByHop() / ACK,
+    'ipip': ETH / V4 / INNER_V4 / SYN,
+    'v6_in_v4': ETH / V4 / INNER_V6 / DNS,
+    'v4_in_v6': ETH / V6 / INNER_V4 / ACK,
+    'gre_v4': ETH / V4 / GRE() / INNER_V4 / SYN,
+    'gre_v6': ETH / V4 / GRE() / INNER_V6 / DNS,
+    'gre_over_v6': ETH / V6 / GRE() / INNER_V4 / ACK,
+    'gre_key_seq_checksum': ETH / V4 / GRE(chksum_present=1, key_present=1, key=9,
+                                               seqnum_present=1, sequence_number=3) / INNER_V4 / SYN,
+    'gre_key': ETH / V6 / GRE(key_present=1, key=1) / INNER_V6 / ACK,
+    'gre_ethernet': ETH / V4 / GRE(proto=0x6558) / ETH / INNER_V4 / SYN,
+    'gre_ethernet_vlan': ETH / V4 / GRE(proto=0x6558) / ETH / Dot1Q(vlan=3) / INNER_V4 / DNS,
+    'gre_vlan': ETH / V4 / GRE(proto=0x8100) / Dot1Q(vlan=3) / INNER_V4 / ACK,
+    'gre_routing': ETH / V4 / GRE(routing_present=1, proto=0x0800) / (b'\x00' * 8) / INNER_V4 / SYN,
+    'gre_arp': ETH / V4 / GRE(proto=0x0806) / ARP(),
+    'gre_in_udp_tcp': ETH / V4 / UDP(sport=5, dport=4754) / GRE() / INNER_V4 / SYN,
+    'gre_in_udp_udp': ETH / V4 / UDP(sport=5, dport=4754) / GRE() / INNER_V4 / DNS,
+    'gre_in_udp_truncated': truncate(ETH / V4 / UDP(sport=5, dport=4754) / GRE() / INNER_V4 / SYN, 10),
+    'truncated_tcp': truncate(ETH / V4 / SYN, 10),
+    'truncated_udp': truncate(ETH / V6 / DNS, 4),
+    'truncated_gre': truncate(ETH / V4 / GRE(key_present=1) / INNER_V4 / SYN, 30),
+    'truncated_gre_inner_tcp': truncate(ETH / V4 / GRE() / INNER_V4 / SYN, 10),
+    'v4_first_fragment': ETH / IP(src='192.0.2.1', dst='198.51.100.2', flags='MF') / SYN,
+    'v4_later_fragment': ETH / IP(src='192.0.2.1', dst='198.51.100.2', frag=185) / SYN,
+    'ipip_later_fragment': ETH / V4 / IP(src='10.0.0.1', dst='10.0.0.2', frag=3) / SYN,
+    'v6_first_fragment': ETH / V6 / IPv6ExtHdrFragment(offset=0, m=1) / ACK,
+    'v6_later_fragment': ETH / V6 / IPv6ExtHdrFragment(offset=100) / ACK,
+    'gre_later_fragment': ETH / V4 / GRE() / IP(src='10.0.0.1', dst='10.0.0.2', frag=8) / SYN,
+}
+
+
+@pytest.mark.parametrize('name', sorted(FRAMES))
+def test_raw_matches_scapy(name):
+    frame = bytes(FRAMES[name])
+
+    expected = extract_features(Ether(frame))
+    assert expected is not None
+    assert extract_features_raw(frame) == expected
+
+
+@pytest.mark.parametrize('name', sorted(FRAMES))
+def test_packet_tuple_matches_features(name):
+    frame = bytes(FRAMES[name])
+    features = extract_features_raw(frame)
+
+    protocol, src, dst, src_port, dst_port = packet_tuple(frame)
+    family = socket.AF_INET if len(src) == 4 else socket.AF_INET6
+    assert (protocol, socket.inet_ntop(family, src), socket.inet_ntop(family, dst), src_port, dst_port) == (
+        features['protocol'], features['src_ip'], features['dst_ip'], features['src_port'], features['dst_port'])
+
+
+def test_gre_tunnel_uses_outer_addresses_and_inner_ports():
+    features = extract_features_raw(bytes(FRAMES['gre_v4']))
+
+    assert (features['src_ip'], features['dst_ip'], features['protocol'], features['ttl']) == (
+        '192.0.2.1', '198.51.100.2', 47, 61)
+    assert (features['src_port'], features['dst_port'], features['flags'], features['window_size']) == (
+        11, 22, 'S', 8192)
+
+
+@pytest.mark.parametrize('packet', [V4 / GRE() / INNER_V4 / SYN, V6 / DNS], ids=['v4_gre', 'v6_udp'])
+def test_raw_ip_linktype(packet):
+    frame = bytes(packet)
+    layer = IP if packet.version == 4 else IPv6
+
+    assert extract_features_raw(frame, LINKTYPE_RAW) == extract_features(layer(frame))
+
+
+@pytest.mark.parametrize('packet', [ETH / ARP(), bytes(ETH / V4 / SYN)[:14 + 12]],
+                         ids=['arp', 'truncated_ip'])
+def test_non_ip_frames(packet):
+    frame = bytes(packet)
+
+    assert extract_features(Ether(frame)) is None
+    assert extract_features_raw(frame) is None
+    assert packet_tuple(frame) is None
@@ -0,0 +1,279 @@
+"""
+Protokol wire dan jalur sensor -> collector lewat TCP loopback.
+"""
+import socket
+import struct
+import threading
+import time
+import zlib
+
+import pytest
+
+from packet_processing.flow_table import FlowTable
+from packet_processing.remote import Collector, SensorLink
+from packet_processing.wire import (
+    KIND_PACKET, MSG_BATCH, MSG_HELLO, ProtocolError,
+    decode_ack, decode_batch, decode_flows, decode_hello, decode_packets,
+    encode_ack, encode_batch, encode_flow, encode_hello, encode_packet, recv_message
+)
+
+SKETCH = {'src_port_count': 120, 'src_host_count': 3, 'src_packet_rate': 812.5,
+          'src_syn_rate': 640.25, 'dst_syn_rate': 12.0}
+
+
+class RecordingManager:
+    """Pengganti PacketCaptureManager collector yang mencatat record yang diproses"""
+
+    def __init__(self):
+        self.packets = []
+        self.flows = []
+
+    def process_features(self, features, timestamp=None):
+        assert timestamp == features['timestamp']
+        self.packets.append(features)
+
+    def process_flows(self, flow_records):
+        self.flows.extend(flow_records)
+
+
+def packet(index, src='10.0.0.1', dst='10.0.0.2', **extra):
+    features = {'src_ip': src, 'dst_ip': dst, 'packet_size': 60 + index % 1400, 'ttl': 64, 'protocol': 6,
+                'src_port': 1024 + index, 'dst_port': 443, 'flags': 'PA', 'window_size': 512,
+                'timestamp': 1700000000.0 + index / 1000}
+    features.update(extra)
+    return features
+
+
+def flow_records(src, dst, **extra):
+    table = FlowTable({'max_flows': 16, 'idle_timeout_seconds': 10, 'active_timeout_seconds': 100})
+    table.update(packet(0, src, dst, flags='S'), 1.0)
+    table.update(packet(0, dst, src, src_port=443, dst_port=1024, flags='SA'), 1.25)
+    table.update(packet(0, src, dst, flags='A'), 1.75)
+    records = table.flush()
+    for record in records:
+        record.update(extra)
+    return records
+
+
+def start_collector(queue_size=8):
+    manager = RecordingManager()
+    collector = Collector({'listen_address': '127.0.0.1:0', 'collector_queue_size': queue_size}, manager)
+    collector.start()
+    thread = threading.Thread(target=collector.run, daemon=True)
+    thread.start()
+    return collector, manager, thread
+
+
+def link_config(port, name, **overrides):
+    config = {'collector_address': f'127.0.0.1:{port}', 'sensor_name': name, 'batch_size': 64,
+              'flush_interval_seconds': 0.05, 'max_in_flight': 4, 'reconnect_min_seconds': 0.05,
+              'reconnect_max_seconds': 0.2, 'drain_timeout_seconds': 10}
+    config.update(overrides)
+    return config
+
+
+@pytest.mark.parametrize('src, dst', [('192.0.2.1', '198.51.100.2'), ('2001:db8::1', 'fe80::2')],
+                         ids=['ipv4', 'ipv6'])
+@pytest.mark.parametrize('extra', [{}, SKETCH, dict(SKETCH, behavior='port_scan')],
+                         ids=['plain', 'sketch', 'behavior'])
+def test_packet_record_round_trip(src, dst, extra):
+    features = [packet(index, src, dst, **extra) for index in range(3)]
+    features[1]['flags'] = 'FSRPAUECN'
+    features[2].update(flags='', protocol=17, window_size=0)
+
+    assert decode_packets(b''.join(encode_packet(f) for f in features)) == features
+
+
+@pytest.mark.parametrize('src, dst', [('192.0.2.1', '198.51.100.2'), ('2001:db8::1', 'fe80::2')],
+                         ids=['ipv4', 'ipv6'])
+@pytest.mark.parametrize('extra', [{}, SKETCH, dict(SKETCH, behavior='syn_flood')],
+                         ids=['plain', 'sketch', 'behavior'])
+def test_flow_record_round_trip(src, dst, extra):
+    records = flow_records(src, dst, **extra)
+
+    assert decode_flows(b''.join(encode_flow(r) for r in records)) == records
+
+
+@pytest.mark.parametrize('compression_level', [0, 1])
+def test_batch_round_trip(compression_level):
+    packets = [packet(index) for index in range(10)]
+    message = encode_batch(7, KIND_PACKET, [encode_packet(f) for f in packets], compression_level)
+
+    assert message[0] == MSG_BATCH
+    assert decode_batch(message[5:]) == (7, KIND_PACKET, packets)
+
+
+def test_hello_and_ack_round_trip():
+    message = encode_hello(2 ** 63 + 5, 'sensor-a')
+    assert message[0] == MSG_HELLO
+    assert decode_hello(message[5:]) == (2 ** 63 + 5, 'sensor-a')
+    assert decode_ack(encode_ack(42)[5:]) == 42
+
+
+@pytest.mark.parametrize('payload', [
+    b'NTA',                                       # HELLO terpotong
+    b'XXXX' + encode_hello(1, 'x')[9:],           # magic salah
+    b'NTAW\x00\x63' + b'\x00' * 8,                # versi tidak dikenal
+], ids=['truncated', 'bad_magic', 'bad_version'])
+def test_bad_hello_raises(payload):
+    with pytest.raises(ProtocolError):
+        decode_hello(payload)
+
+
+def batch_payload(**changes):
+    fields = {'seq': 1, 'kind': KIND_PACKET, 'compression': 1, 'count': 2,
+              'body': zlib.compress(encode_packet(packet(0)) * 2)}
+    fields.update(changes)
+    return struct.pack('!QBBI', fields['seq'], fields['kind'], fields['compression'], fields['count']) + fields['body']
+
+
+@pytest.mark.parametrize('payload', [
+    batch_payload()[:10],
+    batch_payload(count=3),
+    batch_payload(body=zlib.compress(encode_packet(packet(0)) * 2)[:-4]),
+    batch_payload(body=b'not zlib'),
+    batch_payload(compression=9),
+    batch_payload(kind=5),
+], ids=['truncated_header', 'wrong_count', 'truncated_body', 'corrupt_body', 'unknown_compression', 'unknown_kind'])
+def test_bad_batch_raises(payload):
+    with pytest.raises(ProtocolError):
+        decode_batch(payload)
+
+
+def test_recv_message_truncated_stream_raises():
+    left, right = socket.socketpair()
+    message = encode_batch(1, KIND_PACKET, [encode_packet(packet(0))])
+    left.sendall(message[:len(message) - 5])
+    left.close()
+    with pytest.raises(ProtocolError):
+        recv_message(right)
+    right.close()
+
+
+def test_recv_message_rejects_oversized_payload():
+    left, right = socket.socketpair()
+    left.sendall(struct.pack('!BI', MSG_BATCH, 1 << 31))
+    with pytest.raises(ProtocolError):
+        recv_message(right)
+    left.close()
+    right.close()
+
+
+def test_collector_drops_connection_with_bad_magic():
+    collector, manager, thread = start_collector()
+    try:
+        sock = socket.create_connection(('127.0.0.1', collector.port), timeout=5)
+        sock.sendall(encode_hello(1, 'x').replace(b'NTAW', b'HTTP'))
+        assert recv_message(sock) is None
+        sock.close()
+    finally:
+        collector.stop()
+        thread.join(5)
+    assert collector.sensors == {}
+
+
+def test_three_sensors_into_one_collector():
+    collector, manager, thread = start_collector()
+    links = [SensorLink(link_config(collector.port, f'sensor-{n}')) for n in range(3)]
+    try:
+        for index in range(1000):
+            for n, link in enumerate(links):
+                link.send_packet(packet(index, src=f'10.0.{n}.1'))
+    finally:
+        for link in links:
+            link.close()
+        collector.stop()
+        thread.join(10)
+
+    assert [link.records_acked for link in links] == [1000, 1000, 1000]
+    assert [link.records_dropped for link in links] == [0, 0, 0]
+    assert len(manager.packets) == 3000
+    assert {(f['src_ip'], f['src_port']) for f in manager.packets} == {
+        (f'10.0.{n}.1', 1024 + index) for n in range(3) for index in range(1000)}
+    assert {name: stats['records'] for name, stats in collector.get_stats()['sensors'].items()} == {
+        'sensor-0': 1000, 'sensor-1': 1000, 'sensor-2': 1000}
+    assert collector.duplicate_batches == 0
+
+
+def test_flows_reach_collector():
+    collector, manager, thread = start_collector()
+    link = SensorLink(link_config(collector.port, 'flows'))
+    records = flow_records('192.0.2.1', '198.51.100.2', **SKETCH)
+    try:
+        link.send_flows(records)
+    finally:
+        link.close()
+        collector.stop()
+        thread.join(10)
+
+    assert manager.flows == records
+
+
+def test_collector_suppresses_resent_batches():
+    collector, manager, thread = start_collector()
+    batches = [encode_batch(seq, KIND_PACKET, [encode_packet(packet(seq * 10 + i)) for i in range(10)])
+               for seq in (1, 2, 3)]
+    try:
+        sock = socket.create_connection(('127.0.0.1', collector.port), timeout=5)
+        sock.sendall(encode_hello(99, 'resender'))
+        assert decode_ack(recv_message(sock)[1]) == 0
+        sock.sendall(batches[0] + batches[1])
+        assert [decode_ack(recv_message(sock)[1]) for _ in range(2)] == [1, 2]
+        sock.close()
+
+        # Reconnect dengan sesi yang sama: collector melaporkan batch terakhir,
+        # batch 2 yang dikirim ulang di-ack tetapi tidak diproses lagi
+        sock = socket.create_connection(('127.0.0.1', collector.port), timeout=5)
+        sock.sendall(encode_hello(99, 'resender'))
+        assert decode_ack(recv_message(sock)[1]) == 2
+        sock.sendall(batches[1] + batches[2])
+        assert [decode_ack(recv_message(sock)[1]) for _ in range(2)] == [2, 3]
+        sock.close()
+    finally:
+        collector.stop()
+        thread.join(10)
+
+    assert sorted(f['src_port'] - 1024 for f in manager.packets) == list(range(10, 40))
+    assert collector.duplicate_batches == 1
+    assert collector.sensors['resender'] == {'records': 30, 'batches': 3, 'connects': 2}
+
+
+def test_sensor_resends_unacked_batches_after_reconnect():
+    server = socket.create_server(('127.0.0.1', 0))
+    server.settimeout(10)
+    port = server.getsockname()[1]
+    link = SensorLink(link_config(port, 'flaky', batch_size=5, drain_timeout_seconds=5))
+    try:
+        # Koneksi pertama: dua batch diterima tetapi tidak pernah di-ack
+        first, _ = server.accept()
+        message_type, payload = recv_message(first)
+        assert message_type == MSG_HELLO
+        session_id, _ = decode_hello(payload)
+        first.sendall(encode_ack(0))
+        for index in range(10):
+            link.send_packet(packet(index))
+        first_seqs = [decode_batch(recv_message(first)[1])[0] for _ in range(2)]
+        first.close()
+
+        # Koneksi kedua dari sesi yang sama mengirim ulang keduanya
+        second, _ = server.accept()
+        second.settimeout(10)
+        message_type, payload = recv_message(second)
+        assert message_type == MSG_HELLO
+        assert decode_hello(payload)[0] == session_id
+        second.sendall(encode_ack(0))
+        resent = [decode_batch(recv_message(second)[1]) for _ in range(2)]
+        second.sendall(encode_ack(resent[-1][0]))
+
+        deadline = time.monotonic() + 5
+        while link.records_acked < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        link.close()
+        server.close()
+
+    assert first_seqs == [1, 2]
+    assert [seq for seq, _, _ in resent] == [1, 2]
+    assert [f['src_port'] for _, _, records in resent for f in records] == list(range(1024, 1034))
+    assert link.records_acked == 10
+    assert link.connects == 2
@@ -0,0 +1,37 @@
+"""
+Pembacaan file pcapng oleh replay.
+"""
+import logging
+import struct
+
+from packet_processing.replay import PCAPNG_BYTE_ORDER_MAGIC, PCAPNG_EPB, PCAPNG_IDB, PCAPNG_SHB, \
+    iter_capture_file
+
+
+def block(block_type, body):
+    body += b'\x00' * (-len(body) % 4)
+    length = len(body) + 12
+    return struct.pack('<II', block_type, length) + body + struct.pack('<I', length)
+
+
+def epb(interface_id, timestamp_us, frame):
+    return block(PCAPNG_EPB, struct.pack('<IIIII', interface_id, timestamp_us >> 32, timestamp_us & 0xFFFFFFFF,
+                                         len(frame), len(frame)) + frame)
+
+
+def test_pcapng_packet_with_unknown_interface_is_skipped(tmp_path, caplog):
+    path = tmp_path / 'capture.pcapng'
+    path.write_bytes(
+        block(PCAPNG_SHB, struct.pack('<IHHq', PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1))
+        + block(PCAPNG_IDB, struct.pack('<HHI', 1, 0, 65535))
+        + epb(0, 1_000_000, b'first')
+        + epb(5, 2_000_000, b'orphan')
+        + epb(5, 3_000_000, b'orphan')
+        + epb(0, 4_000_000, b'last')
+    )
+
+    with caplog.at_level(logging.WARNING):
+        frames = list(iter_capture_file(str(path)))
+
+    assert frames == [(1.0, b'first', 1), (4.0, b'last', 1)]
+    assert caplog.text.count('undeclared interface 5') == 1
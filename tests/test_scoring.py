@@ -0,0 +1,88 @@
+"""
+Paritas FusedScorer dengan jalur sklearn (StandardScaler.transform + KMeans.predict).
+"""
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+from ml.scoring import FusedScorer
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    rng = np.random.default_rng(7)
+    # Kolom dengan skala berbeda jauh seperti fitur paket (ukuran, TTL, port, window)
+    scales = np.array([1500, 255, 65535, 65535, 65535, 1, 1, 1, 1, 1, 1, 17])
+    X = rng.random((4000, len(scales))) * scales
+    scaler = StandardScaler().fit(X)
+    model = KMeans(n_clusters=5, n_init=1, random_state=0).fit(scaler.transform(X))
+    return scaler, model, rng.random((20000, len(scales))) * scales
+
+
+def sklearn_score(scaler, model, X):
+    X_scaled = scaler.transform(X)
+    clusters = model.predict(X_scaled)
+    diff = X_scaled - model.cluster_centers_[clusters]
+    return clusters, np.sqrt(np.vecdot(diff, diff))
+
+
+def test_score_matches_sklearn_bit_for_bit(fitted):
+    scaler, model, X = fitted
+
+    clusters, distances = FusedScorer(scaler, model).score(X)
+
+    expected_clusters, expected_distances = sklearn_score(scaler, model, X)
+    assert np.array_equal(clusters, expected_clusters)
+    assert np.array_equal(distances, expected_distances)
+
+
+def test_score_one_matches_sklearn_bit_for_bit(fitted):
+    scaler, model, X = fitted
+    scorer = FusedScorer(scaler, model)
+    X = X[:3000]
+
+    results = [scorer.score_one(row) for row in X.tolist()]
+
+    expected_clusters, expected_distances = sklearn_score(scaler, model, X)
+    assert [cluster for cluster, _ in results] == expected_clusters.tolist()
+    assert [distance for _, distance in results] == expected_distances.tolist()
+    assert all(type(cluster) is int and type(distance) is float for cluster, distance in results)
+
+
+class PredictSpy:
+    """Bungkus model untuk menghitung panggilan predict"""
+
+    def __init__(self, model):
+        self.model = model
+        self.cluster_centers_ = model.cluster_centers_
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += 1
+        return self.model.predict(X)
+
+
+def test_near_tie_falls_back_to_predict(fitted):
+    scaler, model, X = fitted
+    spy = PredictSpy(model)
+    scorer = FusedScorer(scaler, spy)
+    # Titik tengah dua pusat cluster: jarak ke keduanya (hampir) seri
+    midpoint = (model.cluster_centers_[0] + model.cluster_centers_[1]) / 2 * scaler.scale_ + scaler.mean_
+
+    cluster, distance = scorer.score_one(midpoint.tolist())
+    assert spy.calls == 1
+    expected_clusters, expected_distances = sklearn_score(scaler, model, midpoint[None, :])
+    assert (cluster, distance) == (expected_clusters[0], expected_distances[0])
+
+    batch = np.vstack([X[:100], midpoint])
+    clusters, distances = scorer.score(batch)
+    assert spy.calls == 2
+    expected_clusters, expected_distances = sklearn_score(scaler, model, batch)
+    assert np.array_equal(clusters, expected_clusters)
+    assert np.array_equal(distances, expected_distances)
+
+    # Tanpa baris seri predict tidak dipanggil
+    scorer.score(X[:100])
+    scorer.score_one(X[0].tolist())
+    assert spy.calls == 2
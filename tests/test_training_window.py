@@ -0,0 +1,87 @@
+"""
+Window training float32 prealokasi: ring buffer dan reservoir sampling.
+"""
+import numpy as np
+import pytest
+
+from ml.training_window import TrainingWindow
+
+
+def rows(start, stop):
+    """Baris dua fitur yang menyimpan nomor urut paket"""
+    return [[index, -index] for index in range(start, stop)]
+
+
+def test_window_is_preallocated_float32():
+    window = TrainingWindow(8, 2)
+    data = window.data
+
+    window.add(rows(0, 20))
+
+    assert window.data is data
+    assert data.dtype == np.float32 and data.shape == (8, 2)
+    assert window.rows().dtype == np.float32
+    assert window.rows(dtype=np.float64).dtype == np.float64
+
+
+def test_recent_window_wraps_around_in_arrival_order():
+    window = TrainingWindow(5, 2)
+    window.add(rows(0, 3))
+    assert window.rows()[:, 0].tolist() == [0, 1, 2]
+    assert not window.full
+
+    # Satu per satu dan batch yang melewati akhir array
+    window.add(rows(3, 4))
+    window.add(rows(4, 8))
+
+    assert window.full
+    assert window.rows()[:, 0].tolist() == [3, 4, 5, 6, 7]
+    assert window.rows(2)[:, 0].tolist() == [6, 7]
+    assert window.rows()[:, 1].tolist() == [-3, -4, -5, -6, -7]
+
+
+def test_recent_window_keeps_tail_of_oversized_batch():
+    window = TrainingWindow(5, 2)
+    window.add(rows(0, 2))
+
+    window.add(rows(2, 14))
+
+    assert window.rows()[:, 0].tolist() == [9, 10, 11, 12, 13]
+    assert window.seen == 14
+
+
+def test_recent_rows_are_a_view_when_contiguous():
+    window = TrainingWindow(5, 2)
+    window.add(rows(0, 4))
+
+    assert np.shares_memory(window.rows(), window.data)
+    assert not np.shares_memory(window.rows(dtype=np.float64), window.data)
+
+
+def test_reservoir_size_is_bounded_and_samples_all_history():
+    window = TrainingWindow(100, 2, mode='reservoir', seed=1)
+    for start in range(0, 20000, 250):
+        window.add(rows(start, start + 250))
+
+    sample = window.rows()[:, 0]
+    assert len(window) == 100 and window.full and len(sample) == 100
+    assert window.seen == 20000
+    assert len(set(sample.tolist())) == 100
+    assert ((sample >= 0) & (sample < 20000)).all()
+    # Sampel seragam atas seluruh riwayat, bukan hanya paket terbaru
+    assert sample.min() < 2000 and sample.max() > 18000
+    assert 7000 < sample.mean() < 13000
+
+
+def test_reservoir_keeps_everything_until_full():
+    window = TrainingWindow(10, 2, mode='reservoir', seed=1)
+    window.add(rows(0, 6))
+
+    assert sorted(window.rows()[:, 0].tolist()) == [0, 1, 2, 3, 4, 5]
+    # n_rows diabaikan: reservoir tidak menyimpan urutan waktu
+    assert len(window.rows(2)) == 6
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        TrainingWindow(10, 2, mode='fifo')
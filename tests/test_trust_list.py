@@ -0,0 +1,197 @@
+"""
+Trust list: parsing aturan, ekspansi arah, trie prefix, ekspresi BPF dan reload.
+"""
+import ipaddress
+
+import pytest
+
+from packet_processing.feature_extraction import load_scapy_layers
+from packet_processing.trust_list import TrustList, _intersect, _parse_net, _PrefixTrie, _variants, load_rules, \
+    parse_rule
+
+load_scapy_layers()
+
+from scapy.layers.inet import IP, TCP, UDP  # noqa: E402
+from scapy.layers.l2 import Ether  # noqa: E402
+
+# MAC eksplisit agar Scapy tidak me-resolve alamat tujuan lewat jaringan
+ETH = Ether(src='02:00:00:00:00:01', dst='02:00:00:00:00:02')
+
+
+def ip(text):
+    return ipaddress.ip_address(text).packed
+
+
+def match(rules, src, dst, src_port=40000, dst_port=443, protocol=6):
+    return rules.match(protocol, ip(src), ip(dst), src_port, dst_port)
+
+
+def test_variants_expand_both_directions():
+    net = _parse_net('10.0.0.0/8')
+    other = _parse_net('192.0.2.0/24')
+
+    assert _variants(parse_rule('net 10.0.0.0/8')) == [(None, net, None, None, None), (None, None, net, None, None)]
+    assert _variants(parse_rule('port 53')) == [(None, None, None, (53, 53), None), (None, None, None, None, (53, 53))]
+    assert _variants(parse_rule('pair 10.0.0.0/8 192.0.2.0/24')) == [
+        (None, net, other, None, None), (None, other, net, None, None)]
+    assert _variants(parse_rule('proto udp port 123')) == [
+        (17, None, None, (123, 123), None), (17, None, None, None, (123, 123))]
+
+
+def test_variants_drop_contradictions():
+    # src di 10/8 dan 'net 192.0.2.0/24' hanya bisa terpenuhi lewat sisi tujuan
+    assert _variants(parse_rule('src 10.0.0.5 net 192.0.2.0/24')) == [
+        (None, _parse_net('10.0.0.5'), _parse_net('192.0.2.0/24'), None, None)]
+    assert _variants(parse_rule('proto tcp proto udp')) == []
+    assert _variants(parse_rule('sport 1-10 sport 20-30')) == []
+
+
+def test_intersect():
+    wide, narrow = _parse_net('10.0.0.0/8'), _parse_net('10.1.0.0/16')
+
+    assert _intersect(0, 6, 6) == 6
+    assert _intersect(0, 6, 17) is None
+    assert _intersect(3, (1000, 2000), (1500, 3000)) == (1500, 2000)
+    assert _intersect(4, (1, 10), (11, 20)) is None
+    assert _intersect(1, wide, narrow) == narrow
+    assert _intersect(2, narrow, wide) == narrow
+    assert _intersect(1, narrow, _parse_net('10.2.0.0/16')) is None
+
+
+@pytest.mark.parametrize('prefix, inside, outside', [
+    ('172.16.0.0/12', ['172.16.0.1', '172.31.255.255', '172.20.9.9'], ['172.15.255.255', '172.32.0.0']),
+    ('10.1.2.3/32', ['10.1.2.3'], ['10.1.2.2', '10.1.2.4']),
+    ('10.1.2.128/25', ['10.1.2.128', '10.1.2.255'], ['10.1.2.127']),
+    ('0.0.0.0/0', ['1.2.3.4', '255.255.255.255'], ['::1']),
+    ('2001:db8::/33', ['2001:db8::1', '2001:db8:7fff::1'], ['2001:db8:8000::1', '2001:db9::1', '10.0.0.1']),
+], ids=['v4_12', 'v4_32', 'v4_25', 'v4_0', 'v6_33'])
+def test_prefix_trie_non_octet_prefixes(prefix, inside, outside):
+    trie = _PrefixTrie()
+    trie.insert(_parse_net(prefix), 'rule')
+    trie.insert(_parse_net('192.168.0.0/16'), 'other')
+
+    assert [trie.lookup(ip(address)) for address in inside] == [['rule']] * len(inside)
+    assert [trie.lookup(ip(address)) for address in outside] == [[]] * len(outside)
+
+
+def test_prefix_trie_collects_nested_prefixes():
+    trie = _PrefixTrie()
+    for prefix in ('10.0.0.0/8', '10.16.0.0/12', '10.17.0.0/16', '10.17.0.9/32'):
+        trie.insert(_parse_net(prefix), prefix)
+
+    assert sorted(trie.lookup(ip('10.17.0.9'))) == ['10.0.0.0/8', '10.16.0.0/12', '10.17.0.0/16', '10.17.0.9/32']
+    assert sorted(trie.lookup(ip('10.18.0.1'))) == ['10.0.0.0/8', '10.16.0.0/12']
+
+
+@pytest.mark.parametrize('line', [
+    'net 10.0.0.0/33', 'port 70000', 'port 20-10', 'pair 10.0.0.1', 'bogus 1', 'proto nope', 'src',
+], ids=['v4_33', 'port_range', 'reversed_range', 'pair_one_arg', 'unknown_clause', 'bad_proto', 'missing_arg'])
+def test_parse_rule_rejects_invalid(line):
+    with pytest.raises(ValueError):
+        parse_rule(line)
+
+
+def test_pair_matches_both_directions():
+    rules = load_rules(extra_rules=['pair 10.0.0.5 10.9.0.0/24'])
+
+    assert match(rules, '10.0.0.5', '10.9.0.77') == 0
+    assert match(rules, '10.9.0.77', '10.0.0.5') == 0
+    assert match(rules, '10.0.0.5', '10.9.1.77') is None
+    assert match(rules, '10.0.0.6', '10.9.0.77') is None
+    assert rules.hits == [2]
+
+
+def test_directional_rule_matches_one_direction():
+    rules = load_rules(extra_rules=['src 10.0.5.10 dport 873'])
+
+    assert match(rules, '10.0.5.10', '192.0.2.1', dst_port=873) == 0
+    # Balasan (arah sebaliknya) dan port lain tidak cocok
+    assert match(rules, '192.0.2.1', '10.0.5.10', src_port=873, dst_port=40000) is None
+    assert match(rules, '10.0.5.10', '192.0.2.1', src_port=873, dst_port=40000) is None
+    assert match(rules, '10.0.5.10', '192.0.2.1', dst_port=874) is None
+
+
+def test_proto_rules():
+    rules = load_rules(extra_rules=['proto udp port 123', 'proto 1'])
+
+    assert match(rules, '192.0.2.1', '192.0.2.2', dst_port=123, protocol=17) == 0
+    assert match(rules, '192.0.2.1', '192.0.2.2', src_port=123, dst_port=40000, protocol=17) == 0
+    assert match(rules, '192.0.2.1', '192.0.2.2', dst_port=123, protocol=6) is None
+    assert match(rules, '192.0.2.1', '192.0.2.2', 0, 0, protocol=1) == 1
+
+
+def test_earliest_rule_gets_the_hit():
+    rules = load_rules(extra_rules=['port 9000-9100', 'net 10.0.0.0/8', 'dport 9050'])
+
+    assert match(rules, '10.0.0.1', '192.0.2.1', dst_port=9050) == 0
+    assert match(rules, '10.0.0.1', '192.0.2.1', dst_port=443) == 1
+    assert rules.hits == [1, 1, 0]
+
+
+def test_bpf_rules_only_single_simple_clauses():
+    rules = load_rules(extra_rules=[
+        'net 172.16.0.0/12', 'src 10.0.5.10', 'dst 2001:db8::/33', 'port 53', 'sport 9000-9100',
+        'dport 873', 'proto udp port 123', 'pair 10.0.0.5 10.9.0.0/24', 'src 10.0.5.10 dport 873',
+    ])
+
+    assert rules.bpf_rules(32) == [
+        (0, 'net 172.16.0.0/12'),
+        (1, 'src net 10.0.5.10/32'),
+        (2, 'dst net 2001:db8::/33'),
+        (3, 'port 53'),
+        (4, 'src portrange 9000-9100'),
+        (5, 'dst port 873'),
+    ]
+    assert [index for index, _ in rules.bpf_rules(2)] == [0, 1]
+
+
+def test_bpf_filter_combines_with_base_filter():
+    trust = TrustList({'rules': ['port 53', 'proto udp port 123'], 'bpf_rules': 32})
+
+    assert trust.bpf_filter('ip') == '(ip) and not ((port 53))'
+    assert TrustList({'rules': ['port 53'], 'bpf_rules': 0}).bpf_filter('ip') == 'ip'
+
+
+def test_match_frame_and_features():
+    trust = TrustList({'rules': ['net 172.16.0.0/12 dport 22']})
+    trusted = ETH / IP(src='192.0.2.1', dst='172.20.0.1') / TCP(sport=40000, dport=22)
+    udp = ETH / IP(src='192.0.2.1', dst='172.20.0.1') / UDP(sport=40000, dport=22)
+
+    assert trust.match_frame(bytes(trusted), 1)
+    assert not trust.match_frame(bytes(ETH / IP(src='192.0.2.1', dst='172.32.0.1') / TCP(dport=22)), 1)
+    assert trust.match_features({'protocol': 17, 'src_ip': '192.0.2.1', 'dst_ip': '172.20.0.1',
+                                 'src_port': 40000, 'dst_port': 22})
+    assert trust.match_frame(bytes(udp), 1)
+    assert trust.packets_trusted == 3
+
+
+def test_reload_keeps_hit_counts(tmp_path):
+    path = tmp_path / 'trust.rules'
+    path.write_text('# backup\nnet 10.20.0.0/16\nport 53  # DNS\n')
+    trust = TrustList({'file': str(path), 'rules': ['port 8125']})
+    for _ in range(3):
+        match(trust.rules, '10.20.0.1', '192.0.2.1')
+    match(trust.rules, '192.0.2.1', '192.0.2.2', dst_port=53)
+
+    path.write_text('port 53\nport 123\n')
+    assert trust.reload()
+
+    assert trust.rules.rules == ['port 8125', 'port 53', 'port 123']
+    assert trust.rules.hits == [0, 1, 0]
+    assert trust.get_stats()['rule_hits'] == [('port 53', 1)]
+
+
+def test_reload_rejects_invalid_file(tmp_path):
+    path = tmp_path / 'trust.rules'
+    path.write_text('port 53\n')
+    trust = TrustList({'file': str(path)})
+    match(trust.rules, '192.0.2.1', '192.0.2.2', dst_port=53)
+    rules = trust.rules
+
+    path.write_text('port 53\nnet 10.0.0.0/33\n')
+    assert not trust.reload()
+    assert trust.rules is rules
+    assert trust.rules.hits == [1]
+
+    with pytest.raises(ValueError, match='trust.rules:2'):
+        load_rules(str(path))
@@ -1,44 +1,149 @@
-import os
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
-def get_logger(name, log_file='network_analyzer.log', level=logging.INFO):
+FILE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Pengaturan handler; diubah oleh configure_logging (LOG_CONFIG)
+_settings = {
+    'rotate_logs': True,
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 5,
+    'queue': False,
+    'queue_size': 10000,
+    'default_log_file': 'network_analyzer.log',
+}
+_loggers = {}          # Logger yang dibuat get_logger -> file log (None = file default)
+_file_handlers = {}    # File log -> handler file
+_queue_handlers = {}   # File log -> QueueHandler (mode antrian)
+_listeners = []
+_console_handler = None
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler yang membuang record saat antrian penuh agar pemanggil tidak pernah menunggu"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+class _Listener(QueueListener):
+    """QueueListener yang menunggu slot kosong untuk sentinel berhenti (antrian bisa penuh)"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+def _console():
+    global _console_handler
+    if _console_handler is None:
+        _console_handler = logging.StreamHandler()
+        _console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    return _console_handler
+
+def _file(log_file):
+    handler = _file_handlers.get(log_file)
+    if handler is None:
+        if _settings['rotate_logs']:
+            handler = RotatingFileHandler(
+                log_file,
+                maxBytes=_settings['max_bytes'],
+                backupCount=_settings['backup_count'],
+                delay=True
+            )
+        else:
+            handler = logging.FileHandler(log_file, delay=True)
+        handler.setFormatter(logging.Formatter(FILE_FORMAT))
+        _file_handlers[log_file] = handler
+    return handler
+
+def _handlers_for(log_file):
+    """Handler untuk logger yang menulis ke log_file sesuai mode saat ini"""
+    log_file = log_file or _settings['default_log_file']
+    if not _settings['queue']:
+        return [_file(log_file), _console()]
+
+    # Mode antrian: logger hanya memasukkan record ke antrian, thread listener
+    # per file log yang menulis ke disk dan konsol
+    handler = _queue_handlers.get(log_file)
+    if handler is None:
+        record_queue = queue.Queue(maxsize=_settings['queue_size'])
+        handler = _DroppingQueueHandler(record_queue)
+        listener = _Listener(record_queue, _file(log_file), _console())
+        listener.start()
+        _listeners.append(listener)
+        _queue_handlers[log_file] = handler
+    return [handler]
+
+def get_logger(name, log_file=None, level=logging.INFO):
     """
     Mendapatkan logger yang dikonfigurasi
-    
+
     Args:
         name (str): Nama logger
-        log_file (str): Path file log
+        log_file (str): Path file log (default ``network_analyzer.log``)
         level: Level logging
-        
+
     Returns:
         logging.Logger: Objek logger yang dikonfigurasi
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # Periksa jika handler sudah ada
     if not logger.handlers:
-        # File handler dengan rotasi
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5
-        )
-        file_format = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        file_handler.setFormatter(file_format)
-        
-        # Console handler
-        console_handler = logging.StreamHandler()
-        console_format = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s'
-        )
-        console_handler.setFormatter(console_format)
-        
-        # Tambahkan handlers ke logger
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-    
-    return logger
\ No newline at end of file
+        # Handler file (dengan rotasi) dan konsol dipakai bersama oleh semua
+        # logger yang menulis ke file yang sama
+        for handler in _handlers_for(log_file):
+            logger.addHandler(handler)
+        _loggers[logger] = log_file
+
+    return logger
+
+def configure_logging(config):
+    """
+    Terapkan LOG_CONFIG ke semua logger yang dibuat get_logger
+
+    Pada mode antrian (``queue``) logger hanya memasukkan record ke antrian
+    berukuran tetap dan thread listener yang menulis ke file dan konsol,
+    sehingga thread capture tidak pernah menunggu I/O disk atau terminal.
+    Record dibuang (dan dihitung) saat antrian penuh.
+
+    Args:
+        config (dict): LOG_CONFIG (rotate_logs, max_log_size_mb,
+            backup_count, queue, queue_size); ``default_log_file`` mengganti
+            file log untuk logger yang tidak memberi log_file
+    """
+    stop_logging()
+    _settings.update(
+        rotate_logs=config.get('rotate_logs', True),
+        max_bytes=int(config.get('max_log_size_mb', 10) * 1024 * 1024),
+        backup_count=config.get('backup_count', 5),
+        queue=config.get('queue', False),
+        queue_size=config.get('queue_size', 10000),
+        default_log_file=config.get('default_log_file', _settings['default_log_file']),
+    )
+    for logger, log_file in _loggers.items():
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        for handler in _handlers_for(log_file):
+            logger.addHandler(handler)
+
+def stop_logging():
+    """Tulis semua record yang masih di antrian lalu tutup handler file"""
+    while _listeners:
+        _listeners.pop().stop()
+    _queue_handlers.clear()
+    for handler in _file_handlers.values():
+        handler.close()
+    _file_handlers.clear()
+    if _DroppingQueueHandler.dropped:
+        logging.getLogger(__name__).warning(
+            f"Dropped {_DroppingQueueHandler.dropped} log records (log queue full)")
+        _DroppingQueueHandler.dropped = 0
+
+atexit.register(stop_logging)
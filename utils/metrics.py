@@ -0,0 +1,364 @@
+import time
+import bisect
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Bucket default (detik) untuk histogram latensi: 5 us sampai 10 s
+LATENCY_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+class _CounterValue:
+    """Nilai counter untuk satu kombinasi label"""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class _GaugeValue:
+    """Nilai gauge; bisa di-set langsung atau dibaca dari fungsi saat scrape"""
+
+    __slots__ = ('value', 'func')
+
+    def __init__(self):
+        self.value = 0
+        self.func = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, func):
+        self.func = func
+
+    def get(self):
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return float('nan')
+        return self.value
+
+class _HistogramValue:
+    """Histogram bucket tetap untuk satu kombinasi label"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value, count=1):
+        """
+        Catat satu observasi (atau ``count`` observasi bernilai sama)
+
+        Args:
+            value (float): Nilai observasi (detik untuk histogram latensi)
+            count (int): Jumlah observasi
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += count
+            self.sum += value * count
+            self.count += count
+
+    def time(self):
+        """Context manager yang mengukur durasi blok kode"""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """
+        Perkiraan kuantil dengan interpolasi linear di dalam bucket
+
+        Args:
+            q (float): Kuantil (0..1)
+
+        Returns:
+            float: Perkiraan nilai, atau None jika belum ada observasi
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return None
+
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Metric:
+    """
+    Keluarga metrik dengan nama, deskripsi dan label opsional
+
+    Metrik tanpa label dipakai langsung (``metric.inc()``); metrik berlabel
+    dipakai lewat ``metric.labels(stage='extract').observe(...)``. Simpan hasil
+    ``labels()`` di variabel modul agar lookup tidak terjadi per paket.
+    """
+
+    def __init__(self, kind, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.children = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._default = self._child(())
+
+    def labels(self, **labels):
+        """
+        Nilai metrik untuk kombinasi label tertentu
+
+        Returns:
+            Objek dengan ``inc``/``set``/``observe`` sesuai jenis metrik
+        """
+        return self._child(tuple(str(labels[name]) for name in self.label_names))
+
+    def _child(self, key):
+        child = self.children.get(key)
+        if child is None:
+            with self._lock:
+                child = self.children.get(key)
+                if child is None:
+                    if self.kind == 'counter':
+                        child = _CounterValue()
+                    elif self.kind == 'gauge':
+                        child = _GaugeValue()
+                    else:
+                        child = _HistogramValue(self.buckets)
+                    self.children[key] = child
+        return child
+
+    # Akses langsung untuk metrik tanpa label
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, func):
+        self._default.set_function(func)
+
+    def observe(self, value, count=1):
+        self._default.observe(value, count)
+
+    def time(self):
+        return self._default.time()
+
+    def render(self):
+        """Baris format eksposisi teks Prometheus"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self.children.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, key))
+            if self.kind == 'histogram':
+                with child._lock:
+                    counts = list(child.counts)
+                    total, total_sum = child.count, child.sum
+                cumulative = 0
+                prefix = f"{label_text}," if label_text else ''
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {total}')
+                suffix = f"{{{label_text}}}" if label_text else ''
+                lines.append(f"{self.name}_sum{suffix} {total_sum!r}")
+                lines.append(f"{self.name}_count{suffix} {total}")
+            else:
+                value = child.value if self.kind == 'counter' else child.get()
+                lines.append(f"{self.name}{{{label_text}}} {value}" if label_text else f"{self.name} {value}")
+        return lines
+
+class MetricsRegistry:
+    """Kumpulan metrik yang diekspos bersama"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, kind, name, documentation, label_names=(), **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = Metric(kind, name, documentation, label_names, **kwargs)
+                self.metrics[name] = metric
+            elif metric.kind != kind:
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self._get_or_create('counter', name, documentation, label_names)
+
+    def gauge(self, name, documentation, label_names=()):
+        return self._get_or_create('gauge', name, documentation, label_names)
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create('histogram', name, documentation, label_names, buckets=buckets)
+
+    def render(self):
+        """
+        Semua metrik dalam format eksposisi teks Prometheus
+
+        Returns:
+            str: Isi respons /metrics
+        """
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+def counter(name, documentation, label_names=()):
+    """Counter pada registry default"""
+    return REGISTRY.counter(name, documentation, label_names)
+
+def gauge(name, documentation, label_names=()):
+    """Gauge pada registry default"""
+    return REGISTRY.gauge(name, documentation, label_names)
+
+def histogram(name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+    """Histogram pada registry default"""
+    return REGISTRY.histogram(name, documentation, label_names, buckets)
+
+def start_metrics_server(port, host='127.0.0.1', registry=REGISTRY):
+    """
+    Jalankan endpoint HTTP Prometheus (/metrics) di background thread
+
+    Args:
+        port (int): Port TCP
+        host (str): Alamat bind (default hanya lokal)
+        registry (MetricsRegistry): Registry yang diekspos
+
+    Returns:
+        ThreadingHTTPServer: Server yang berjalan (panggil ``shutdown()`` untuk berhenti)
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
+
+class StatsReporter:
+    """
+    Mencatat ringkasan metrik ke log secara berkala
+
+    Setiap baris berisi total dan laju counter sejak laporan sebelumnya,
+    nilai gauge, serta p50/p99 setiap histogram yang sudah memiliki data.
+    """
+
+    def __init__(self, interval_seconds, registry=REGISTRY):
+        """
+        Initialize stats reporter
+
+        Args:
+            interval_seconds (float): Jarak antar laporan
+            registry (MetricsRegistry): Registry yang diringkas
+        """
+        self.interval = interval_seconds
+        self.registry = registry
+        self.previous = {}
+        self.previous_time = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stats-reporter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            line = self.format_line()
+            if line:
+                logger.info(f"Stats: {line}")
+
+    def format_line(self):
+        """
+        Bentuk satu baris ringkasan
+
+        Returns:
+            str: Ringkasan metrik
+        """
+        now = time.monotonic()
+        elapsed = max(now - self.previous_time, 1e-9)
+        self.previous_time = now
+
+        parts = []
+        for name in sorted(self.registry.metrics):
+            metric = self.registry.metrics[name]
+            for key, child in sorted(metric.children.items()):
+                label = f"{_short_name(name)}[{','.join(key)}]" if key else _short_name(name)
+                if metric.kind == 'counter':
+                    value = child.value
+                    if not value:
+                        continue
+                    rate = (value - self.previous.get((name, key), 0)) / elapsed
+                    self.previous[(name, key)] = value
+                    parts.append(f"{label}={value} ({rate:.0f}/s)")
+                elif metric.kind == 'gauge':
+                    parts.append(f"{label}={child.get():g}")
+                elif child.count:
+                    p50, p99 = child.quantile(0.5), child.quantile(0.99)
+                    parts.append(f"{label} p50={p50 * 1000:.3f}ms p99={p99 * 1000:.3f}ms")
+        return ', '.join(parts)
+
+def _short_name(name):
+    """Nama metrik tanpa prefix 'nta_' dan suffix satuan untuk baris stats"""
+    if name.startswith('nta_'):
+        name = name[len('nta_'):]
+    for suffix in ('_total', '_seconds'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name